@@ -12,12 +12,32 @@ import subprocess
 import ctypes
 import updater_utils
 import threading
+import time
+import collections
+import multiprocessing
 import winreg
-from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.enums import TA_CENTER, TA_LEFT
+import metrics_utils
+from db_utils import (
+    DB_FILE, add_transaction_db, get_summary_stats, get_comment_index,
+    get_available_years, get_recent_transactions, get_chart_data, get_filtered_transactions,
+    get_summary_by_comment, aggregate_transactions, ChangeWatcher, close_writers, filter_where,
+    BASE_CURRENCY, CURRENCY_SYMBOLS, format_money, get_period_comparison, change, signed_amount
+)
+from ledger_utils import (
+    list_ledgers, create_ledger, get_active_ledger, switch_ledger, valid_ledger_name,
+    get_consolidated_summary, get_consolidated_summary_by_comment, get_consolidated_period_comparison
+)
+from category_utils import categorize, list_rules, add_rule, remove_rule, recategorize, RULE_KINDS
+from pdf_utils import generate_modern_pdf
+from backup_utils import BackupScheduler
+from maintenance_utils import MaintenanceScheduler
+from report_utils import ReportBuffer
+from edit_utils import bulk_update, bulk_delete, count_rows
+from statement_utils import statement_data, export_statements
+from export_utils import export_filtered, EXPORT_FORMATS
+from recurring_utils import add_recurring, list_recurring, remove_recurring, materialize, describe
+from budget_utils import budget_status, budget_warning, set_budget, remove_budget
+from view_utils import save_view, delete_view, list_views, open_view, make_spec, view_window
 
 import winreg
 
@@ -72,10 +92,6 @@ def resource_path(relative_path):
 # We store this in the same folder where the EXE is running
 EXE_LOCATION = os.path.dirname(os.path.abspath(sys.argv[0])) 
 
-# Database config
-DB_FILENAME = "finance.db"
-DB_FILE = os.path.join(EXE_LOCATION, DB_FILENAME)
-
 # Assets config (Logos moved to assets folder)
 SCRIPT_DIR = resource_path(".")
 LOGO_FILENAME = "logo.png"
@@ -97,12 +113,14 @@ log_filename = os.path.join(log_dir, log_file_name)
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
-try:
-    file_handler = logging.FileHandler(log_filename, 'w', 'utf-8')
-    file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-    logger.addHandler(file_handler)
-except Exception as e:
-    print(f"CRITICAL ERROR: Failed to create log file handler: {e}")
+# Statement export workers re-import this module on Windows; only the app itself gets a log file
+if multiprocessing.parent_process() is None:
+    try:
+        file_handler = logging.FileHandler(log_filename, 'w', 'utf-8')
+        file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        logger.addHandler(file_handler)
+    except Exception as e:
+        print(f"CRITICAL ERROR: Failed to create log file handler: {e}")
 
 class LoggerWriter:
     def __init__(self, level): self.level = level
@@ -117,290 +135,7 @@ logger.info("--- Application Started ---")
 logger.info(f"Script Directory: {SCRIPT_DIR}")
 logger.info(f"Logo Path (PNG): {LOGO_FULL_PATH}")
 logger.info(f"Logo Path (ICO): {LOGO_ICO_FULL_PATH}")
-
-# --- BACKEND LOGIC ---
-def initialize_database():
-    logger.info("Initializing database...")
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS transactions (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            transaction_datetime TEXT NOT NULL,
-            type TEXT NOT NULL,
-            comment TEXT,
-            amount REAL NOT NULL
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def clean_comment_sql(column_name="comment"):
-    return f"LOWER(TRIM(REPLACE(REPLACE({column_name}, '\n', ''), '\r', '')))"
-
-def add_transaction_db(datetime_str, trans_type, comment, amount):
-    logger.info(f"Adding transaction: {trans_type}, {amount}")
-    try:
-        if trans_type in ['Base Expense', 'Borrow']:
-            amount = -abs(amount)
-        else:
-            amount = abs(amount)
-
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute(
-            "INSERT INTO transactions (transaction_datetime, type, comment, amount) VALUES (?, ?, ?, ?)",
-            (datetime_str, trans_type, comment, amount)
-        )
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        logger.error(f"DB Error: {e}")
-        return False
-
-def get_summary_stats():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT
-        SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS total_deposits,
-        SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) AS total_expenditure
-        FROM transactions
-    ''')
-    result = cursor.fetchone()
-    conn.close()
-    return result[0] or 0.0, result[1] or 0.0
-
-def get_unique_comments():
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        query = f"SELECT DISTINCT {clean_comment_sql()} FROM transactions WHERE comment IS NOT NULL ORDER BY 1"
-        cursor.execute(query)
-        records = cursor.fetchall()
-        conn.close()
-        return [row[0].title() for row in records if row[0]]
-    except Exception as e:
-        logger.error(f"Error fetching comments: {e}")
-        return []
-
-def get_available_years():
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT strftime('%Y', transaction_datetime) FROM transactions ORDER BY 1 DESC")
-        years = [row[0] for row in cursor.fetchall() if row[0]]
-        conn.close()
-        if not years:
-            return [str(datetime.datetime.now().year)]
-        return years
-    except Exception as e:
-        logger.error(f"Error fetching years: {e}")
-        return [str(datetime.datetime.now().year)]
-
-def get_recent_transactions(limit=10):
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, transaction_datetime, type, comment, amount FROM transactions ORDER BY transaction_datetime DESC LIMIT ?", (limit,))
-    data = cursor.fetchall()
-    conn.close()
-    return data
-
-def get_chart_data():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    clean_col = clean_comment_sql('comment')
-    query = f'''
-        SELECT {clean_col}, ABS(SUM(amount))
-        FROM transactions
-        WHERE amount < 0
-        GROUP BY {clean_col}
-        ORDER BY ABS(SUM(amount)) DESC
-        LIMIT 5
-    '''
-    cursor.execute(query)
-    data = cursor.fetchall()
-    conn.close()
-    return data
-
-def get_filtered_transactions(start_date, end_date, trans_type, comment_like):
-    logger.info(f"Filtering: {start_date} to {end_date}, Type: {trans_type}, Comment: {comment_like}")
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        query = "SELECT transaction_datetime, type, comment, amount, id FROM transactions WHERE 1=1"
-        params = []
-        if start_date:
-            query += " AND DATE(transaction_datetime) >= ?"
-            params.append(start_date)
-        if end_date:
-            query += " AND DATE(transaction_datetime) <= ?"
-            params.append(end_date)
-        if trans_type and trans_type != "All":
-            query += " AND type = ?"
-            params.append(trans_type)
-        if comment_like and comment_like != "All":
-            query += f" AND {clean_comment_sql()} LIKE ?"
-            params.append(f"%{comment_like.lower()}%")
-        query += " ORDER BY transaction_datetime DESC"
-        cursor.execute(query, params)
-        records = cursor.fetchall()
-        conn.close()
-        return records
-    except Exception as e:
-        logger.error(f"Filter error: {e}")
-        return []
-
-def get_summary_by_comment():
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        query = f"""
-            SELECT {clean_comment_sql()} AS clean_comment, type, SUM(amount), COUNT(id)
-            FROM transactions GROUP BY clean_comment, type ORDER BY SUM(amount) ASC
-        """
-        cursor.execute(query)
-        records = cursor.fetchall()
-        conn.close()
-        return records
-    except Exception as e:
-        logger.error(f"Summary error: {e}")
-        return []
-
-# --- MODERN PDF GENERATOR ---
-def draw_canvas_elements(canvas, doc):
-    """Draws Watermark AND Page Border"""
-    try:
-        canvas.saveState()
-        page_width, page_height = letter
-
-        canvas.setStrokeColor(colors.black)
-        canvas.setLineWidth(2)
-        canvas.rect(20, 20, page_width - 40, page_height - 40)
-
-        if os.path.exists(LOGO_FULL_PATH):
-            canvas.setFillAlpha(0.1)
-            image_width = 300
-            image_height = 300
-            x = (page_width - image_width) / 2
-            y = (page_height - image_height) / 2
-            canvas.drawImage(LOGO_FULL_PATH, x, y, width=image_width, height=image_height, mask='auto', preserveAspectRatio=True)
-        canvas.restoreState()
-    except Exception as e:
-        logger.warning(f"Canvas error: {e}")
-
-def generate_modern_pdf(filename, data_dict):
-    try:
-        doc = SimpleDocTemplate(filename, pagesize=letter)
-        elements = []
-        styles = getSampleStyleSheet()
-
-        title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=20, alignment=TA_LEFT, spaceAfter=5, textColor=colors.darkblue)
-        header_name_style = ParagraphStyle('Name', parent=styles['Heading1'], fontSize=24, alignment=TA_LEFT, spaceAfter=2, textColor=colors.black)
-
-        text_col = [
-            Paragraph("Santanu Ghosh", header_name_style),
-            Spacer(1, 6),
-            Paragraph(data_dict.get("title", "Finance Report"), title_style)
-        ]
-        if os.path.exists(LOGO_FULL_PATH):
-            logo_img = RLImage(LOGO_FULL_PATH, width=60, height=60)
-            header_table = Table([[logo_img, text_col]], colWidths=[70, 400])
-            header_table.setStyle(TableStyle([
-                ('VALIGN', (0,0), (-1,-1), 'TOP'),
-                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                ('LEFTPADDING', (0,0), (-1,-1), 0),
-            ]))
-            elements.append(header_table)
-        else:
-            elements.extend(text_col)
-
-        elements.append(Spacer(1, 10))
-
-        filter_info = data_dict.get("filter_info", "")
-        if filter_info:
-            p_filter = Paragraph(f"<b>REPORT CONTEXT:</b> {filter_info}", styles['Normal'])
-            t_filter = Table([[p_filter]], colWidths=[480])
-            t_filter.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, -1), colors.aliceblue),
-                ('BOX', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-                ('PADDING', (0, 0), (-1, -1), 10),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            elements.append(t_filter)
-            elements.append(Spacer(1, 20))
-
-        summary_data = data_dict.get("summary", [])
-        if summary_data:
-            elements.append(Paragraph("<b>Summary Overview</b>", styles['Heading3']))
-            elements.append(Spacer(1, 5))
-            t_sum = Table(summary_data, hAlign='LEFT', colWidths=[200, 150])
-            t_sum.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.whitesmoke),
-                ('TEXTCOLOR', (0, 0), (0, -1), colors.darkgrey),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
-            ]))
-            elements.append(t_sum)
-            elements.append(Spacer(1, 25))
-
-        cat_headers = data_dict.get("cat_headers", [])
-        cat_rows = data_dict.get("cat_rows", [])
-        if cat_headers and cat_rows:
-            elements.append(Paragraph("<b>Category Breakdown</b>", styles['Heading3']))
-            elements.append(Spacer(1, 10))
-            cat_table_data = [cat_headers] + cat_rows
-            t_cat = Table(cat_table_data, repeatRows=1, colWidths=[200, 100, 60, 120])
-            cat_style = TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkslategray),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                ('TOPPADDING', (0, 0), (-1, 0), 10),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ])
-            for i, row in enumerate(cat_rows):
-                bg_color = colors.white if i % 2 == 0 else colors.whitesmoke
-                cat_style.add('BACKGROUND', (0, i+1), (-1, i+1), bg_color)
-            t_cat.setStyle(cat_style)
-            elements.append(t_cat)
-            elements.append(Spacer(1, 25))
-
-        headers = data_dict.get("headers", [])
-        rows = data_dict.get("rows", [])
-        if headers and rows:
-            elements.append(Paragraph("<b>Transaction Details</b>", styles['Heading3']))
-            elements.append(Spacer(1, 10))
-            table_data = [headers] + rows
-            t = Table(table_data, repeatRows=1, colWidths=[120, 100, 160, 100])
-            main_style = TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkslategray),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
-                ('TOPPADDING', (0, 0), (-1, 0), 10),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
-            ])
-            for i, row in enumerate(rows):
-                bg_color = colors.white if i % 2 == 0 else colors.whitesmoke
-                main_style.add('BACKGROUND', (0, i+1), (-1, i+1), bg_color)
-            t.setStyle(main_style)
-            elements.append(t)
-
-        doc.build(elements, onFirstPage=draw_canvas_elements, onLaterPages=draw_canvas_elements)
-        logger.info(f"PDF Generated: {filename}")
-        return True
-    except Exception as e:
-        logger.error(f"PDF Error: {e}")
-        traceback.print_exc()
-        return False
+logger.info(f"Database: {DB_FILE}")
 
 # --- UI COMPONENTS ---
 class StatCard(ft.Container):
@@ -435,6 +170,116 @@ class MiniStat(ft.Container):
             ft.Text(value, size=16, weight="bold", color=color, font_family="Roboto Mono")
         ], spacing=2)
 
+class ReportViewer(ft.Container):
+    """
+    Monospace report output that only renders the lines on screen. set_lines() takes any
+    iterable of formatted lines; scrolling, the position slider and find move a window
+    over a ReportBuffer instead of sending the whole report to the client.
+    """
+    LINE_HEIGHT = 18   # px per line at size 14 with line height 1.25
+
+    def __init__(self, visible_lines=40):
+        super().__init__()
+        self.visible_lines = visible_lines
+        self.buffer = ReportBuffer()
+        self.offset = 0
+        self.current_match = None
+        self.bgcolor = "#111111"
+        self.border_radius = 6
+        self.padding = 10
+        self.expand = True
+
+        self.text = ft.Text(font_family="Courier New", size=14, color="#00FF00", no_wrap=True,
+                            style=ft.TextStyle(height=1.25), selectable=True)
+        self.slider = ft.Slider(min=0, max=1, value=0, expand=True, on_change=lambda e: self.scroll_to(int(e.control.value)))
+        self.status = ft.Text("", size=12, color="grey")
+        self.find_field = ft.TextField(hint_text="Find in report", width=220, dense=True, text_size=13,
+                                       on_submit=lambda e: self.find(e.control.value))
+        self.content = ft.Column([
+            ft.Row([
+                self.find_field,
+                ft.IconButton(icon="keyboard_arrow_up", tooltip="Previous match", on_click=lambda e: self.goto_match(False)),
+                ft.IconButton(icon="keyboard_arrow_down", tooltip="Next match", on_click=lambda e: self.goto_match(True)),
+                self.status
+            ]),
+            ft.GestureDetector(
+                content=ft.Container(content=self.text, expand=True),
+                on_scroll=lambda e: self.scroll_by(e.scroll_delta_y / self.LINE_HEIGHT),
+                on_vertical_drag_update=lambda e: self.scroll_by(-e.delta_y / self.LINE_HEIGHT),
+                expand=True
+            ),
+            self.slider
+        ], expand=True, spacing=4)
+
+    def set_lines(self, lines):
+        """Replaces the report. The first window is shown as soon as the generator has produced it."""
+        self.buffer.clear()
+        self.buffer.find(self.find_field.value)
+        self.offset, self.current_match = 0, None
+        shown = False
+        for count in self.buffer.feed(lines):
+            if not shown and count >= self.visible_lines:
+                self.render()
+                shown = True
+        self.render()
+
+    def render(self):
+        matched = self.buffer.match_number
+        spans = []
+        for i, line in enumerate(self.buffer.window(self.offset, self.visible_lines), self.offset):
+            if i == self.current_match:
+                style = ft.TextStyle(bgcolor="#8D6E00", color="white")
+            elif self.buffer.query and matched(i):
+                style = ft.TextStyle(bgcolor="#3E3E1E")
+            else:
+                style = None
+            spans.append(ft.TextSpan(line + "\n", style))
+        self.text.spans = spans
+        total = len(self.buffer)
+        self.slider.max = max(1, total - self.visible_lines)
+        self.slider.value = self.offset
+        self.slider.disabled = total <= self.visible_lines
+        status = f"Lines {min(total, self.offset + 1):,}-{min(total, self.offset + self.visible_lines):,} of {total:,}"
+        if self.buffer.query:
+            number = matched(self.current_match) if self.current_match is not None else 0
+            status += f"  |  {number:,}/{len(self.buffer.matches):,} matches" if number else f"  |  {len(self.buffer.matches):,} matches"
+        self.status.value = status
+        if self.page:
+            self.update()
+
+    def scroll_to(self, offset):
+        offset = self.buffer.clamp(offset, self.visible_lines)
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def scroll_by(self, lines):
+        # At least one line per wheel notch, however small the delta
+        step = int(lines) or (1 if lines > 0 else -1 if lines < 0 else 0)
+        self.scroll_to(self.offset + step)
+
+    def find(self, query):
+        self.buffer.find(query)
+        self.current_match = None
+        if self.buffer.matches:
+            self.goto_match(True, start=self.offset - 1)
+        else:
+            self.render()
+
+    def goto_match(self, forward, start=None):
+        if self.buffer.query != (self.find_field.value or "").lower():
+            return self.find(self.find_field.value)
+        if start is None:
+            start = self.current_match if self.current_match is not None else self.offset - 1
+        line = self.buffer.next_match(start, forward)
+        if line is None:
+            return
+        self.current_match = line
+        if not self.offset <= line < self.offset + self.visible_lines:
+            # Put the match a third of the way down, with some context above it
+            self.offset = self.buffer.clamp(line - self.visible_lines // 3, self.visible_lines)
+        self.render()
+
 # --- MAIN APP ---
 def main(page: ft.Page):
     # SYNC REGISTRY VERSION
@@ -460,6 +305,17 @@ def main(page: ft.Page):
         style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=8))
     )
 
+    # --- LEDGER SWITCHER ---
+    ledger_dropdown = ft.Dropdown(width=180, dense=True, text_size=13, content_padding=8, tooltip="Active ledger")
+    new_ledger_button = ft.IconButton(icon="library_add", tooltip="New Ledger", icon_color="white")
+    backup_button = ft.IconButton(icon="backup", tooltip="Back Up Now", icon_color="white")
+    categories_button = ft.IconButton(icon="category", tooltip="Category Rules", icon_color="white")
+    recurring_button = ft.IconButton(icon="event_repeat", tooltip="Recurring Transactions", icon_color="white")
+    budgets_button = ft.IconButton(icon="savings", tooltip="Monthly Budgets", icon_color="white")
+    # Totals are shown in this currency for the session; rows keep their own
+    reporting_dropdown = ft.Dropdown(width=90, dense=True, text_size=13, content_padding=8, tooltip="Reporting currency",
+                                     options=[ft.dropdown.Option(c) for c in CURRENCY_SYMBOLS], value=BASE_CURRENCY)
+
     # --- TOP APP BAR ---
     page.appbar = ft.AppBar(
         leading=ft.Icon("account_balance_wallet", color="#2196F3", size=30), # FIXED HERE
@@ -468,6 +324,7 @@ def main(page: ft.Page):
         center_title=False,
         bgcolor="#1f1f1f",
         actions=[
+            ft.Row([ledger_dropdown, reporting_dropdown, new_ledger_button, categories_button, recurring_button, budgets_button, backup_button], spacing=0),
             ft.Container(content=update_button, padding=ft.padding.only(right=20))
         ]
     )
@@ -493,14 +350,22 @@ def main(page: ft.Page):
     def on_window_event(e):
         if e.data == "close":
             logger.info("--- Application Closed by User ---")
+            backup_scheduler.stop()
+            maintenance_scheduler.stop()
+            close_writers()
             page.window.destroy()
     page.window.on_event = on_window_event
 
-    initialize_database()
+    switch_ledger(get_active_ledger())
 
-    app_state = {"chart_data": [], "touched_index": -1}
+    app_state = {"chart_data": [], "chart_badges": [], "touched_index": -1, "db_watcher": None,
+                 "pie_touch_ms": collections.deque(maxlen=200), "reporting": None,
+                 "history_selected": set(), "history_where": None,
+                 "history_filter": (None, None, "All", "All"), "saved_view": None}
 
 # --- UPDATE CHECKER LOGIC ---
+    # Runs on a worker thread. Only the (cached, pooled) network check happens here;
+    # the button is updated back on the page's event loop.
     def check_for_update_on_startup():
         try:
             result = updater_utils.check_for_updates()
@@ -508,45 +373,56 @@ def main(page: ft.Page):
             if result and result[0]:
                 download_url, version_tag, file_size = result
                 
+                # 1. DOWNLOAD WHILE THE APP KEEPS RUNNING
                 def on_update_click(e):
-                    import shutil
-                    import subprocess
-                    import sys
-                    import ctypes
-                    
-                    # 1. EXTRACT UPDATER
+                    update_button.disabled = True
+                    update_button.text = "Downloading..."
+                    update_button.update()
+                    threading.Thread(target=download_and_install, daemon=True).start()
+
+                def download_and_install():
+                    def on_progress(fraction):
+                        async def show_progress():
+                            update_button.text = f"Downloading {fraction:.0%}"
+                            update_button.update()
+                        page.run_task(show_progress)
+
+                    if updater_utils.download_update(download_url, file_size, on_progress, to_version=version_tag):
+                        page.run_task(hand_over_to_updater)
+                    else:
+                        page.run_task(download_failed)
+
+                async def download_failed():
+                    update_button.disabled = False
+                    update_button.text = f"Update Available ({version_tag})"
+                    update_button.update()
+                    show_msg("Update download failed", is_error=True)
+
+                # 2. START UPDATER & EXIT. It waits on our PID, swaps the EXE and relaunches.
+                async def hand_over_to_updater():
                     try:
                         updater_src = resource_path(os.path.join("assets", "updater.exe"))
-                        updater_dest = os.path.join(os.path.dirname(sys.executable), "updater_tool.exe")
-                        shutil.copy(updater_src, updater_dest)
-                    except: return
-
-                    # 2. CREATE BATCH LAUNCHER
-                    bat_content = f"""
-@echo off
-timeout /t 1 >nul
-start "" "{updater_dest}" "{download_url}" "{version_tag}" "{sys.executable}"
-del "%~f0"
-"""
-                    launcher_bat = "launch.bat"
-                    with open(launcher_bat, "w") as f:
-                        f.write(bat_content)
-
-                    # 3. HIDE WINDOW INSTANTLY (Fixes Black Screen Freeze)
+                        updater_utils.install_update(updater_src, version_tag)
+                    except Exception as ex:
+                        logger.error(f"Updater launch failed: {ex}")
+                        await download_failed()
+                        return
+
+                    # HIDE WINDOW INSTANTLY (Fixes Black Screen Freeze)
                     page.window.visible = False
                     page.update()
 
-                    # 4. RUN BATCH & HARD KILL
-                    os.startfile(launcher_bat)
-                    logger.info("Batch launched. Killing Main App.")
-                    
+                    logger.info("Updater launched. Exiting Main App.")
+                    logging.shutdown()
                     ctypes.windll.kernel32.ExitProcess(0)
 
                 # SHOW BUTTON
-                update_button.text = f"Update Available ({version_tag})"
-                update_button.on_click = on_update_click
-                update_button.visible = True
-                update_button.update()
+                async def show_update_button():
+                    update_button.text = f"Update Available ({version_tag})"
+                    update_button.on_click = on_update_click
+                    update_button.visible = True
+                    update_button.update()
+                page.run_task(show_update_button)
                 
         except Exception as e:
             logger.error(f"Update UI Error: {e}")
@@ -576,9 +452,12 @@ del "%~f0"
     # --- SAVE DIALOG & STATE ---
     save_state = {"data_dict": {}, "filename": "Report.pdf"}
 
-    def show_msg(message, is_error=False, open_path=None):
+    def show_msg(message, is_error=False, open_path=None, is_warning=False):
         bg_color = "#D32F2F" if is_error else "#2E7D32"
         icon_name = "error_outline" if is_error else "check_circle"
+        if is_warning:
+            bg_color = "#EF6C00"
+            icon_name = "warning_amber"
         if open_path:
             bg_color = "#1565C0"
             icon_name = "description"
@@ -598,7 +477,7 @@ del "%~f0"
             behavior=ft.SnackBarBehavior.FLOATING,
             shape=ft.RoundedRectangleBorder(radius=8),
             margin=ft.margin.all(15),
-            duration=6000 if open_path else 3000
+            duration=6000 if open_path or is_warning else 3000
         )
         page.open(snack)
 
@@ -621,6 +500,12 @@ del "%~f0"
     card_income = StatCard("Income", "₹0.00", "arrow_upward", "#FFFFFF", "#2E7D32")
     card_expense = StatCard("Expense", "₹0.00", "arrow_downward", "#FFFFFF", "#C62828")
 
+    # One progress bar per budget for the current month; hidden while there are none
+    budget_bars = ft.Column(spacing=10)
+    budget_title = ft.Text("Budgets", size=18, weight="bold")
+    budget_panel = ft.Container(content=ft.Column([budget_title, budget_bars]), bgcolor="#1f1f1f",
+                                border_radius=15, padding=20, visible=False)
+
     expense_chart = ft.PieChart(sections=[], sections_space=2, center_space_radius=40, expand=True)
 
     dashboard_table = ft.DataTable(columns=[
@@ -635,7 +520,15 @@ del "%~f0"
         width=400
     )
     comment_input = ft.TextField(label="Comment", width=400)
-    amount_input = ft.TextField(label="Amount", width=400, keyboard_type="number", prefix_text="₹ ")
+    comment_suggestions = ft.Row(wrap=True, spacing=5, width=400)
+    amount_input = ft.TextField(label="Amount", width=290, keyboard_type="number", prefix_text="₹ ")
+    currency_dropdown = ft.Dropdown(label="Currency", options=[ft.dropdown.Option(c) for c in CURRENCY_SYMBOLS],
+                                    value=BASE_CURRENCY, width=100)
+    # Anything but "Once" saves a recurring rule starting at the date and time above
+    repeat_dropdown = ft.Dropdown(label="Repeat", width=190, value="once",
+                                  options=[ft.dropdown.Option(key="once", text="Once")] +
+                                          [ft.dropdown.Option(key=unit, text=f"Every {unit}") for unit in ("day", "week", "month", "year")])
+    repeat_until = ft.TextField(label="Until (YYYY-MM-DD)", width=200, hint_text="Optional")
 
     now = datetime.datetime.now()
     date_input = ft.TextField(label="Date", value=now.strftime("%Y-%m-%d"), width=150, read_only=True)
@@ -684,11 +577,22 @@ del "%~f0"
         value="All", width=130, text_size=12, content_padding=10, dense=True
     )
     filter_comment = ft.Dropdown(label="Comment", options=[ft.dropdown.Option("All")], value="All", width=180, text_size=12, content_padding=10, dense=True)
+    # Named filters whose results are stored in the ledger and refreshed from the change journal
+    saved_view_dropdown = ft.Dropdown(label="Saved Views", width=220, text_size=12, content_padding=10, dense=True)
+    saved_view_name = ft.TextField(label="View Name", width=300, autofocus=True)
+    saved_view_follow = ft.Switch(label="Follow the current month / year", value=False)
 
     history_table_full = ft.DataTable(columns=[
         ft.DataColumn(ft.Text("Date")), ft.DataColumn(ft.Text("Type")),
         ft.DataColumn(ft.Text("Comment")), ft.DataColumn(ft.Text("Amount", weight="bold"))
-    ], heading_row_color="#424242")
+    ], heading_row_color="#424242", show_checkbox_column=True)
+    bulk_scope = ft.Dropdown(
+        width=190, dense=True, text_size=12, value="selected",
+        options=[ft.dropdown.Option("selected", "Ticked rows"), ft.dropdown.Option("filter", "Every row in this filter")]
+    )
+    bulk_selected_text = ft.Text("0 ticked", size=12, color="grey")
+    bulk_edit_button = ft.IconButton("edit_note", tooltip="Edit rows")
+    bulk_delete_button = ft.IconButton("delete_sweep", tooltip="Delete rows", icon_color="#EF5350")
 
     sidebar_balance = ft.Container()
     sidebar_income = ft.Container()
@@ -702,91 +606,138 @@ del "%~f0"
         heading_text_style=ft.TextStyle(size=12, weight="bold"), data_text_style=ft.TextStyle(size=11)
     )
 
-    report_output = ft.TextField(
-        multiline=True, read_only=True,
-        text_style=ft.TextStyle(font_family="Courier New", size=14, color="#00FF00"),
-        bgcolor="#111111", expand=True
+    report_all_ledgers = ft.Switch(label="All Ledgers", value=False)
+    report_period = ft.Dropdown(
+        label="Compare", width=190, dense=True, text_size=13, value="all",
+        options=[ft.dropdown.Option("all", "All Time Totals"), ft.dropdown.Option("month", "Month over Month"),
+                 ft.dropdown.Option("year", "Year over Year")]
     )
+    report_month = ft.Dropdown(options=[ft.dropdown.Option(m) for m in months], value=months[datetime.datetime.now().month-1],
+                               width=130, dense=True, label="Month", visible=False)
+    report_year = ft.Dropdown(options=[ft.dropdown.Option(y) for y in available_years], value=current_year,
+                              width=100, dense=True, label="Year", visible=False)
+
+    report_output = ReportViewer()
 
     # --- LOGIC FUNCTIONS ---
+    def money(amount):
+        return format_money(amount, app_state["reporting"])
+
+    def pdf_money(amount):
+        # The PDF font has no rupee sign
+        return f"{app_state['reporting'] or 'Rs.'} {amount:,.2f}"
+
+    def chart_label(cat):
+        # None is the "Other" slice; an empty category is expenses without a comment
+        return "Other" if cat is None else (cat or "Misc").strip().title()
+
     def update_chart_sections(touched_index):
         sections = []
+        badges = []
         colors_list = ["#9C27B0", "#2196F3", "#009688", "#FF9800", "#F44336"]
+        app_state["chart_badges"] = badges
         if not app_state["chart_data"]:
             return [ft.PieChartSection(1, title="No Data", color="grey", radius=45)]
         for i, (cat, amt) in enumerate(app_state["chart_data"]):
             is_touched = (i == touched_index)
             radius = 55 if is_touched else 45
-            cat_name = (cat or "Misc").strip().title()
-            badge = None
-            if is_touched:
-                badge = ft.Container(
-                    content=ft.Text(f"{cat_name}\n₹{amt:,.2f}", color="white", size=12, weight="bold", text_align="center"),
-                    bgcolor="#2C2C2C", padding=8, border_radius=6, border=ft.border.all(1, "#555555")
-                )
+            cat_name = chart_label(cat)
+            # Badges are built once per refresh; hovering only attaches/detaches them
+            badges.append(ft.Container(
+                content=ft.Text(f"{cat_name}\n{money(amt)}", color="white", size=12, weight="bold", text_align="center"),
+                bgcolor="#2C2C2C", padding=8, border_radius=6, border=ft.border.all(1, "#555555")
+            ))
             sections.append(ft.PieChartSection(
                 amt, title="" if is_touched else f"{cat_name[:10]}",
-                color=colors_list[i % len(colors_list)],
+                color="#757575" if cat is None else colors_list[i % len(colors_list)],
                 radius=radius,
                 title_style=ft.TextStyle(size=10, weight=ft.FontWeight.BOLD, color="white"),
-                badge=badge, badge_position=1.0
+                badge=badges[i] if is_touched else None, badge_position=1.0
             ))
         return sections
 
+    def set_section_touched(i, touched):
+        if not (0 <= i < len(app_state["chart_badges"])):
+            return
+        section = expense_chart.sections[i]
+        section.radius = 55 if touched else 45
+        section.title = "" if touched else chart_label(app_state["chart_data"][i][0])[:10]
+        section.badge = app_state["chart_badges"][i] if touched else None
+
     def on_pie_touch(e: ft.PieChartEvent):
         idx = e.section_index if e.section_index is not None else -1
         if idx != app_state["touched_index"]:
+            started = time.perf_counter()
+            # Only the slice losing and the slice gaining the hover change; Flet sends just their diff
+            set_section_touched(app_state["touched_index"], False)
+            set_section_touched(idx, True)
             app_state["touched_index"] = idx
-            expense_chart.sections = update_chart_sections(idx)
             expense_chart.update()
+            elapsed = (time.perf_counter() - started) * 1000
+            app_state["pie_touch_ms"].append(elapsed)
+            logger.debug(f"Pie hover {idx}: {elapsed:.2f} ms")
     expense_chart.on_chart_event = on_pie_touch
 
     def refresh_dashboard():
-        dep, exp = get_summary_stats()
-        card_balance.content.controls[1].controls[1].value = f"₹{(dep+exp):,.2f}"
-        card_income.content.controls[1].controls[1].value = f"₹{dep:,.2f}"
-        card_expense.content.controls[1].controls[1].value = f"₹{abs(exp):,.2f}"
+        started = time.perf_counter()
+        dep, exp = get_summary_stats(app_state["reporting"])
+        card_balance.content.controls[1].controls[1].value = money(dep + exp)
+        card_income.content.controls[1].controls[1].value = money(dep)
+        card_expense.content.controls[1].controls[1].value = money(abs(exp))
 
         recent_data = get_recent_transactions(8)
         new_rows = []
         for row in recent_data:
-            dt, typ, cmt, amt = row[1], row[2], row[3], row[4]
+            dt, typ, cmt, amt, cur = row[1], row[2], row[3], row[4], row[5]
             cmt = (cmt or "").strip().title()
             color = "#EF5350" if amt < 0 else "#66BB6A"
             new_rows.append(ft.DataRow(cells=[
                 ft.DataCell(ft.Text(dt[:10])), ft.DataCell(ft.Text(typ)),
-                ft.DataCell(ft.Text(cmt)), ft.DataCell(ft.Text(f"₹{amt:,.2f}", color=color, weight="bold"))
+                ft.DataCell(ft.Text(cmt)), ft.DataCell(ft.Text(format_money(amt, cur), color=color, weight="bold"))
             ]))
         dashboard_table.rows = new_rows
 
-        app_state["chart_data"] = get_chart_data()
+        app_state["chart_data"] = get_chart_data(reporting=app_state["reporting"])
+        app_state["touched_index"] = -1
         expense_chart.sections = update_chart_sections(-1)
+        update_budget_bars()
         page.update()
+        metrics_utils.ui_refresh("dashboard", started)
+
+    def update_budget_bars():
+        # Seeks on the usage counters; the month's transactions are not summed here
+        status = budget_status()
+        budget_title.value = f"Budgets - {datetime.date.today():%B %Y}"
+        bars = []
+        for key, limit, spent in status:
+            used = spent / limit
+            color = "#66BB6A" if used < 0.8 else "#FFA726" if used <= 1 else "#EF5350"
+            bars.append(ft.Row([
+                ft.Text(key.title(), width=160, size=13, weight="bold"),
+                ft.ProgressBar(value=min(used, 1.0), color=color, bgcolor="#333333", bar_height=8, expand=True),
+                ft.Text(f"{format_money(spent)} / {format_money(limit)}", width=220, size=12, color=color,
+                        text_align="right")
+            ], spacing=15))
+        budget_bars.controls = bars
+        budget_panel.visible = bool(bars)
 
     def update_filter_comments(force_update=False):
-        comments = ["All"] + get_unique_comments()
+        comments = ["All"] + get_comment_index().all_comments()
         filter_comment.options = [ft.dropdown.Option(c) for c in comments]
         if force_update:
             filter_comment.update()
 
-    def update_sidebar_ui(transactions_data):
-        agg = {}
-        total_dep = 0.0
-        total_exp = 0.0
-        for row in transactions_data:
-            _, t_type, cmt, amt, _ = row
-            cmt = (cmt or "N/A").replace("\n", "").replace("\r", "").strip().title()
-            if amt > 0: total_dep += amt
-            else: total_exp += amt
-            key = (cmt, t_type)
-            if key not in agg: agg[key] = [0, 0.0]
-            agg[key][0] += 1
-            agg[key][1] += amt
+    def update_sidebar_ui(transactions_data, totals=None):
+        # A saved view's stored totals are in the base currency
+        if totals and app_state["reporting"] is None:
+            agg, total_dep, total_exp = totals
+        else:
+            agg, total_dep, total_exp = aggregate_transactions(transactions_data, reporting=app_state["reporting"])
 
         net = total_dep + total_exp
-        sidebar_balance.content = MiniStat("Balance", f"₹{net:,.2f}", "#FFFFFF")
-        sidebar_income.content = MiniStat("Deposits", f"₹{total_dep:,.2f}", "#66BB6A")
-        sidebar_expense.content = MiniStat("Expense", f"₹{total_exp:,.2f}", "#EF5350")
+        sidebar_balance.content = MiniStat("Balance", money(net), "#FFFFFF")
+        sidebar_income.content = MiniStat("Deposits", money(total_dep), "#66BB6A")
+        sidebar_expense.content = MiniStat("Expense", money(total_exp), "#EF5350")
 
         table_rows = []
         for k in sorted(agg.keys(), key=lambda k: agg[k][1]):
@@ -813,10 +764,49 @@ del "%~f0"
         container_year.visible = (mode == "year")
         container_range.visible = (mode == "range")
         page.update()
+        app_state["saved_view"] = None
+        saved_view_dropdown.value = None
         run_filter(None)
     filter_mode.on_change = toggle_filter_visibility
 
+    def set_filter_controls(spec):
+        mode = {"this_month": "month", "this_year": "year"}.get(spec["mode"], spec["mode"])
+        start, _ = view_window(spec)
+        filter_mode.value = mode
+        if mode == "month":
+            sel_month.value = months[int(start[5:7]) - 1]
+            sel_year.value = start[:4]
+        elif mode == "year":
+            sel_year_only.value = start[:4]
+        elif mode == "range":
+            filter_start.value, filter_end.value = spec["start"], spec["end"]
+        container_month.visible = (mode == "month")
+        container_year.visible = (mode == "year")
+        container_range.visible = (mode == "range")
+        filter_type.value = spec["type"]
+        filter_comment.value = spec["comment"]
+
+    def load_saved_view():
+        """(rows, totals) of the saved view picked, after setting the filter controls to its spec; None without one."""
+        name = app_state["saved_view"]
+        if not name:
+            return None
+        try:
+            spec, data, totals = open_view(name)
+        except ValueError:
+            # Deleted meanwhile, or not in this ledger
+            app_state["saved_view"] = saved_view_dropdown.value = None
+            return None
+        set_filter_controls(spec)
+        return data, totals
+
     def run_filter(e):
+        maintenance_scheduler.touch()
+        started = time.perf_counter()
+        if e is not None:
+            # Applying the filter by hand leaves the saved view it may have started from
+            app_state["saved_view"] = saved_view_dropdown.value = None
+        saved = load_saved_view()
         mode = filter_mode.value
         start_val = None; end_val = None; today = datetime.datetime.now()
         if mode == "month":
@@ -838,20 +828,128 @@ del "%~f0"
         elif mode == "range":
             start_val = filter_start.value; end_val = filter_end.value
 
-        data = get_filtered_transactions(start_val, end_val, filter_type.value, filter_comment.value)
+        data, totals = saved or (get_filtered_transactions(start_val, end_val, filter_type.value, filter_comment.value), None)
+        app_state["history_where"] = filter_where(start_val, end_val, filter_type.value, filter_comment.value)
+        app_state["history_filter"] = (start_val, end_val, filter_type.value, filter_comment.value)
+        selected = app_state["history_selected"]
         new_rows = []
-        for row in data:
-            dt, typ, cmt, amt, _ = row
-            cmt = (cmt or "N/A").strip().title()
+        # Comments come back from the batch already cleaned and title-cased. Recurring
+        # occurrences (negative ids) aren't rows yet, so bulk edits can't reach them and
+        # they get no tick box.
+        for dt, typ, cmt, amt, row_id, cur in data:
             color = "#EF5350" if amt < 0 else "#66BB6A"
             new_rows.append(ft.DataRow(cells=[
                 ft.DataCell(ft.Text(dt[:16])), ft.DataCell(ft.Text(typ)),
-                ft.DataCell(ft.Text(cmt.title())), ft.DataCell(ft.Text(f"₹{amt:,.2f}", color=color, weight="bold"))
-            ]))
+                ft.DataCell(ft.Text(cmt)), ft.DataCell(ft.Text(format_money(amt, cur), color=color, weight="bold"))
+            ], data=row_id, selected=row_id in selected,
+               on_select_changed=on_history_row_select if row_id > 0 else None))
         history_table_full.rows = new_rows
-        update_sidebar_ui(data)
+        # Ticks on rows the new filter no longer shows are dropped
+        selected.intersection_update(row.data for row in new_rows)
+        update_bulk_selection()
+        update_sidebar_ui(data, totals)
         if history_table_full.page:
             history_table_full.update()
+        metrics_utils.observe("fmp_history_rows_rendered", len(new_rows), buckets=metrics_utils.ROW_BUCKETS)
+        metrics_utils.ui_refresh("history", started)
+
+    # --- HISTORY SELECTION ---
+    def update_bulk_selection():
+        bulk_selected_text.value = f"{len(app_state['history_selected']):,} ticked"
+        if bulk_selected_text.page:
+            bulk_selected_text.update()
+
+    def on_history_row_select(e):
+        row = e.control
+        row.selected = e.data == "true"
+        if row.selected:
+            app_state["history_selected"].add(row.data)
+        else:
+            app_state["history_selected"].discard(row.data)
+        row.update()
+        update_bulk_selection()
+
+    def on_history_select_all(e):
+        tick = e.data == "true"
+        rows = [row for row in history_table_full.rows if row.data > 0]
+        for row in rows:
+            row.selected = tick
+        app_state["history_selected"] = {row.data for row in rows} if tick else set()
+        history_table_full.update()
+        update_bulk_selection()
+    history_table_full.on_select_all = on_history_select_all
+
+    # --- SAVED VIEWS ---
+    def load_saved_views():
+        saved_view_dropdown.options = [ft.dropdown.Option(name) for _, name, _, _, _ in list_views()]
+        saved_view_dropdown.value = app_state["saved_view"]
+
+    def on_saved_view_pick(e):
+        app_state["saved_view"] = saved_view_dropdown.value
+        run_filter(None)
+        page.update()
+    saved_view_dropdown.on_change = on_saved_view_pick
+
+    def current_filter_spec():
+        mode = filter_mode.value
+        if saved_view_follow.value and mode in ("month", "year"):
+            mode = f"this_{mode}"
+        month = f"{sel_year.value}-{months.index(sel_month.value) + 1:02d}" if mode == "month" else None
+        return make_spec(mode, filter_type.value, filter_comment.value, month=month, year=sel_year_only.value,
+                         start=filter_start.value, end=filter_end.value)
+
+    def open_save_view(e):
+        saved_view_name.value = app_state["saved_view"] or ""
+        saved_view_follow.value = False
+        saved_view_follow.visible = filter_mode.value in ("month", "year")
+        page.open(save_view_dialog)
+
+    def save_view_click(e):
+        name = (saved_view_name.value or "").strip()
+        try:
+            spec = current_filter_spec()
+        except ValueError as ex:
+            show_msg(str(ex), is_error=True); return
+        page.close(save_view_dialog)
+
+        # The first computation reads the whole filter, so it stays off the UI thread
+        def work():
+            try:
+                save_view(name, spec)
+                text, failed = f"Saved view '{name}'", False
+            except (ValueError, sqlite3.Error) as ex:
+                text, failed = str(ex), True
+            async def done():
+                if not failed:
+                    app_state["saved_view"] = name
+                load_saved_views()
+                show_msg(text, is_error=failed)
+                page.update()
+            page.run_task(done)
+        threading.Thread(target=work, daemon=True).start()
+
+    def delete_saved_view_click(e):
+        if not saved_view_dropdown.value:
+            show_msg("Pick a saved view first", is_error=True); return
+        delete_view(saved_view_dropdown.value)
+        show_msg(f"Deleted view '{saved_view_dropdown.value}'")
+        app_state["saved_view"] = None
+        load_saved_views()
+        page.update()
+
+    save_view_dialog = ft.AlertDialog(
+        title=ft.Text("Save Filter as View"),
+        content=ft.Column([
+            ft.Text("The view keeps its rows and totals and only looks at what changed when it is opened again.",
+                    size=12, color="grey"),
+            saved_view_name, saved_view_follow
+        ], tight=True, width=420),
+        actions=[
+            ft.TextButton("Save", on_click=save_view_click),
+            ft.TextButton("Cancel", on_click=lambda _: page.close(save_view_dialog))
+        ]
+    )
+    load_saved_views()
 
     def save_history_pdf_click(e):
         mode = filter_mode.value; start_val = None; end_val = None; today = datetime.datetime.now()
@@ -881,76 +979,164 @@ del "%~f0"
         if filter_comment.value != "All": context_str_parts.append(f"Category: {filter_comment.value}")
 
         data = get_filtered_transactions(start_val, end_val, filter_type.value, filter_comment.value)
-        agg = {}; total_dep = 0.0; total_exp = 0.0; pdf_rows = []
-        for row in data:
-            dt, typ, cmt, amt, _ = row
-            cmt = (cmt or "N/A").replace("\n", "").strip().title()
-            if amt > 0: total_dep += amt
-            else: total_exp += amt
-            key = (cmt, typ)
-            if key not in agg: agg[key] = [0, 0.0]
-            agg[key][0] += 1; agg[key][1] += amt
-            pdf_rows.append([dt[:16], typ, cmt, f"{amt:,.2f}"])
-
-        cat_rows = []
-        for k in sorted(agg.keys(), key=lambda x: agg[x][1]):
-            cat_rows.append([k[0], k[1], str(agg[k][0]), f"{agg[k][1]:,.2f}"])
+        save_state["data_dict"] = statement_data(data, "Transaction History Report", " \n ".join(context_str_parts),
+                                                 app_state["reporting"])
+        save_file_dialog.save_file(file_name=f"Transactions_{today.strftime('%Y-%m-%d-%H-%M-%S')}.pdf", allowed_extensions=["pdf"])
 
-        summary_list = [
-            ("Date Generated", today.strftime('%Y-%m-%d %H:%M')),
-            ("Total Records", str(len(pdf_rows))),
-            ("Total Deposits", f"Rs. {total_dep:,.2f}"),
-            ("Total Expenditure", f"Rs. {total_exp:,.2f}"),
-            ("Net Balance", f"Rs. {(total_dep+total_exp):,.2f}")
-        ]
+    # --- DATA EXPORT ---
+    def save_history_export_click(fmt):
+        stamp = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+        export_state["format"] = fmt
+        export_file_dialog.save_file(file_name=f"Transactions_{stamp}.{fmt}", allowed_extensions=[fmt])
 
-        save_state["data_dict"] = {
-            "title": "Transaction History Report",
-            "filter_info": " \n ".join(context_str_parts),
-            "summary": summary_list,
-            "cat_headers": ["Category", "Type", "Cnt", "Amount"],
-            "cat_rows": cat_rows,
-            "headers": ["Date", "Type", "Comment", "Amount"],
-            "rows": pdf_rows
-        }
-        save_file_dialog.save_file(file_name=f"Transactions_{today.strftime('%Y-%m-%d-%H-%M-%S')}.pdf", allowed_extensions=["pdf"])
+    def on_export_file(e: ft.FilePickerResultEvent):
+        if not e.path:
+            return
+        fmt = export_state["format"]
+        path = e.path if e.path.lower().endswith(f".{fmt}") else f"{e.path}.{fmt}"
+        filters = app_state["history_filter"]
+        show_msg(f"Exporting {fmt.upper()}...")
 
-    # --- FIXED: Generate View (aligned text report) ---
-    def generate_report_click(e):
-        records = get_summary_by_comment()
+        def work():
+            try:
+                rows, seconds = export_filtered(path, *filters, fmt=fmt)
+                text, failed = f"Exported {rows:,} rows in {seconds:.1f}s ({rows / seconds if seconds else 0:,.0f} rows/s)", False
+            except ValueError as ex:
+                text, failed = str(ex), True
+            except Exception as ex:
+                logger.error(f"{fmt.upper()} export failed: {ex}")
+                text, failed = f"{fmt.upper()} export failed", True
+            async def done():
+                show_msg(text, is_error=failed, open_path=None if failed else path)
+            page.run_task(done)
+        threading.Thread(target=work, daemon=True).start()
+
+    export_state = {"format": "csv"}
+    export_file_dialog = ft.FilePicker(on_result=on_export_file)
+    page.overlay.append(export_file_dialog)
+
+    # --- PERIOD COMPARISONS ---
+    def on_report_period_change(e):
+        report_month.visible = report_period.value == "month"
+        report_year.visible = report_period.value != "all"
+        page.update()
+    report_period.on_change = on_report_period_change
+
+    def load_comparison():
+        """(period labels, records) for the chosen comparison, one SQL pass per ledger group."""
+        month = months.index(report_month.value) + 1 if report_period.value == "month" else 1
+        anchor = datetime.date(int(report_year.value or current_year), month, 1)
+        reporting = app_state["reporting"]
+        if report_all_ledgers.value:
+            return get_consolidated_period_comparison(report_period.value, anchor, reporting=reporting)
+        return get_period_comparison(report_period.value, anchor, reporting)
+
+    def pct_text(pct):
+        return "n/a" if pct is None else f"{pct:+.1f}%"
+
+    def comparison_columns(labels):
+        # Change vs the previous period, and for months vs the same month last year
+        cols = [f"vs {labels[1]}"]
+        if len(labels) > 2:
+            cols.append(f"vs {labels[2]}")
+        return cols
+
+    def comparison_changes(totals):
+        return [change(totals[0], previous) for previous in totals[1:]]
+
+    def comparison_report_lines(labels, records):
+        header = (f"{'Category':<25} {'Type':<12} " + " ".join(f"{label:>12}" for label in labels)
+                  + "".join(f" {col:>21}" for col in comparison_columns(labels)))
+        yield f"---- Period Comparison ({app_state['reporting'] or BASE_CURRENCY}) ----"
+        yield "-" * len(header)
+        yield header
+        yield "-" * len(header)
+
+        def line(name, r_type, totals):
+            amounts = " ".join("           -" if t is None else f"{t:>12.2f}" for t in totals)
+            changes = "".join(f" {diff:>13.2f} {pct_text(pct):>7}" for diff, pct in comparison_changes(totals))
+            return f"{name:<25} {r_type:<12} {amounts}{changes}"
+
+        net = [0.0] * len(labels)
+        for comm, r_type, *totals in records:
+            name = (comm or "N/A").title()
+            if len(name) > 25:
+                name = name[:24] + "…"
+            yield line(name, r_type, totals)
+            net = [n + (t or 0.0) for n, t in zip(net, totals)]
+        yield "=" * len(header)
+        yield line("Net", "", net)
 
+    def category_report_lines(records, reporting, per_ledger=None):
         header = f"{'Comment':<25} {'Type':<12} {'Cnt':>3} {'Amount':>12}"
-        lines = []
-        lines.append("---- Category Summary Report ----")
-        lines.append("-" * len(header))
-        lines.append(header)
-        lines.append("-" * len(header))
+        yield f"---- Category Summary Report ({reporting or BASE_CURRENCY}) ----"
+        yield "-" * len(header)
+        yield header
+        yield "-" * len(header)
 
         total_dep = 0.0
         total_exp = 0.0
 
         for rec in records:
             comm, r_type, total, count = rec
+            total = total or 0.0
             name = (comm or "N/A").title()
             if len(name) > 25:
                 name = name[:24] + "…"
-            lines.append(f"{name:<25} {r_type:<12} {count:>3} {total:>12.2f}")
+            yield f"{name:<25} {r_type:<12} {count:>3} {total:>12.2f}"
 
             if total > 0:
                 total_dep += total
             else:
                 total_exp += total
 
-        lines.append("=" * len(header))
-        lines.append(f"{'Total Deposits:':<40}{total_dep:>12.2f}")
-        lines.append(f"{'Total Expenditure:':<40}{total_exp:>12.2f}")
-        lines.append(f"{'Remaining Balance:':<40}{(total_dep + total_exp):>12.2f}")
+        yield "=" * len(header)
+        yield f"{'Total Deposits:':<40}{total_dep:>12.2f}"
+        yield f"{'Total Expenditure:':<40}{total_exp:>12.2f}"
+        yield f"{'Remaining Balance:':<40}{(total_dep + total_exp):>12.2f}"
 
-        report_output.value = "\n".join(lines)
-        report_output.update()
+        if per_ledger is not None:
+            yield ""
+            yield "---- Per Ledger ----"
+            for name, (dep, exp) in per_ledger.items():
+                yield f"{name[:25]:<25} {dep:>12.2f} {exp:>12.2f} {(dep + exp):>12.2f}"
+
+    # --- FIXED: Generate View (aligned text report) ---
+    def generate_report_click(e):
+        if report_period.value != "all":
+            report_output.set_lines(comparison_report_lines(*load_comparison()))
+            return
+        reporting = app_state["reporting"]
+        if report_all_ledgers.value:
+            records = get_consolidated_summary_by_comment(reporting=reporting)
+            per_ledger = get_consolidated_summary(reporting=reporting)[2]
+        else:
+            records = get_summary_by_comment(reporting)
+            per_ledger = None
+        report_output.set_lines(category_report_lines(records, reporting, per_ledger))
+
+    # --- COMMENT TYPE-AHEAD ---
+    def pick_suggestion(e):
+        comment_input.value = e.control.data
+        comment_suggestions.controls = []
+        page.update()
+
+    def on_comment_typed(e):
+        typed = comment_input.value or ""
+        # load=False: while the index is still building, typing just shows no suggestions
+        matches = get_comment_index(load=False).suggest(typed, 6) if typed.strip() else []
+        if len(matches) == 1 and matches[0].lower() == typed.strip().lower():
+            matches = []
+        comment_suggestions.controls = [
+            ft.TextButton(m, data=m, on_click=pick_suggestion, style=ft.ButtonStyle(padding=ft.padding.symmetric(horizontal=8)))
+            for m in matches
+        ]
+        comment_suggestions.update()
+    comment_input.on_change = on_comment_typed
 
     # --- RESTORED: Add Transaction handler ---
     def add_transaction_click(e):
+        maintenance_scheduler.touch()
         try:
             if not amount_input.value:
                 show_msg("Enter amount", is_error=True); return
@@ -964,9 +1150,31 @@ del "%~f0"
             except ValueError:
                 show_msg("Invalid Date/Time", is_error=True); return
 
-            if add_transaction_db(dt_str, type_dropdown.value, comment_input.value, amt):
-                show_msg("Transaction Saved!")
-                amount_input.value = ""; comment_input.value = ""
+            if repeat_dropdown.value != "once":
+                try:
+                    add_recurring(dt_str, repeat_dropdown.value, type_dropdown.value, amt, comment_input.value,
+                                  end_date=repeat_until.value or None, currency=currency_dropdown.value)
+                except ValueError as ex:
+                    show_msg(str(ex), is_error=True); return
+                show_msg("Recurring Transaction Saved!")
+                amount_input.value = ""; comment_input.value = ""; comment_suggestions.controls = []
+                repeat_dropdown.value = "once"; repeat_until.value = ""
+                page.update()
+                return
+
+            category_id = categorize(comment_input.value, type_dropdown.value, amt)
+            if add_transaction_db(dt_str, type_dropdown.value, comment_input.value, amt, category_id, currency_dropdown.value):
+                try:
+                    warning = budget_warning(dt_str, comment_input.value, signed_amount(type_dropdown.value, amt),
+                                             category_id, currency_dropdown.value)
+                except sqlite3.Error as ex:
+                    logger.error(f"Budget check failed: {ex}")
+                    warning = None
+                if warning:
+                    show_msg(f"Transaction Saved. {warning}", is_warning=True)
+                else:
+                    show_msg("Transaction Saved!")
+                amount_input.value = ""; comment_input.value = ""; comment_suggestions.controls = []
                 now_reset = datetime.datetime.now()
                 date_input.value = now_reset.strftime("%Y-%m-%d")
                 time_input.value = now_reset.strftime("%H:%M")
@@ -976,10 +1184,45 @@ del "%~f0"
         except ValueError:
             show_msg("Invalid Amount", is_error=True)
 
+    def save_comparison_pdf():
+        labels, records = load_comparison()
+        scope = "All Ledgers" if report_all_ledgers.value else ledger_dropdown.value
+        cols = comparison_columns(labels)
+        pdf_rows = []
+        net = [0.0] * len(labels)
+        for comm, r_type, *totals in records:
+            row = [(comm or "N/A").title()[:22], r_type]
+            row += ["-" if t is None else f"{t:,.2f}" for t in totals]
+            for diff, pct in comparison_changes(totals):
+                row.append(f"{diff:+,.2f} ({pct_text(pct)})")
+            pdf_rows.append(row)
+            net = [n + (t or 0.0) for n, t in zip(net, totals)]
+
+        summary_list = [("Date Generated", datetime.datetime.now().strftime('%Y-%m-%d %H:%M'))]
+        summary_list += [(f"Net {label}", pdf_money(total)) for label, total in zip(labels, net)]
+        summary_list += [(f"Change {col}", f"{diff:+,.2f} ({pct_text(pct)})") for col, (diff, pct) in zip(cols, comparison_changes(net))]
+        count = 2 + len(labels) + len(cols)
+        save_state["data_dict"] = {
+            "title": "Period Comparison Report",
+            "filter_info": f"{scope} - {labels[0]} " + " and ".join(cols),
+            "summary": summary_list,
+            "headers": ["Category", "Type"] + labels + cols,
+            "col_widths": [95, 65] + [int((520 - 160) / (count - 2))] * (count - 2),
+            "rows": pdf_rows
+        }
+        save_file_dialog.save_file(file_name=f"Comparison_{datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.pdf", allowed_extensions=["pdf"])
+
     def save_report_pdf_click(e):
-        records = get_summary_by_comment(); total_dep = 0.0; total_exp = 0.0; pdf_rows = []
+        if report_period.value != "all":
+            save_comparison_pdf()
+            return
+        all_ledgers = report_all_ledgers.value
+        reporting = app_state["reporting"]
+        records = get_consolidated_summary_by_comment(reporting=reporting) if all_ledgers else get_summary_by_comment(reporting)
+        total_dep = 0.0; total_exp = 0.0; pdf_rows = []
         for rec in records:
             comm, r_type, total, count = rec
+            total = total or 0.0
             comm = (comm or "N/A").title()
             if total > 0: total_dep += total
             else: total_exp += total
@@ -987,12 +1230,13 @@ del "%~f0"
 
         summary_list = [
             ("Date Generated", datetime.datetime.now().strftime('%Y-%m-%d %H:%M')),
-            ("Total Deposits", f"Rs. {total_dep:,.2f}"),
-            ("Total Expenditure", f"Rs. {total_exp:,.2f}"),
-            ("Net Balance", f"Rs. {(total_dep+total_exp):,.2f}")
+            ("Total Deposits", pdf_money(total_dep)),
+            ("Total Expenditure", pdf_money(total_exp)),
+            ("Net Balance", pdf_money(total_dep + total_exp))
         ]
         save_state["data_dict"] = {
-            "title": "Category Summary Report", "filter_info": "All Time Category Aggregation",
+            "title": "Category Summary Report",
+            "filter_info": "All Ledgers - All Time Category Aggregation" if all_ledgers else f"{ledger_dropdown.value} - All Time Category Aggregation",
             "summary": summary_list, "headers": ["Category", "Type", "Count", "Total Amount"], "rows": pdf_rows
         }
         save_file_dialog.save_file(file_name=f"Summary_{datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.pdf", allowed_extensions=["pdf"])
@@ -1013,7 +1257,9 @@ del "%~f0"
                 expense_chart
             ], horizontal_alignment="center", expand=True),
             expand=3, height=400, bgcolor="#1f1f1f", border_radius=15, padding=20)
-        ], spacing=20, expand=True)
+        ], spacing=20, expand=True),
+        ft.Divider(color="transparent", height=10),
+        budget_panel
     ], scroll="auto"), padding=20, expand=True)
 
     view_add = ft.Container(content=ft.Column([
@@ -1024,7 +1270,8 @@ del "%~f0"
             ft.Row([date_input, ft.IconButton(icon="calendar_month", on_click=lambda _: page.open(date_picker_add))], spacing=0),
             ft.Row([time_input, ft.IconButton(icon="access_time", on_click=lambda _: page.open(time_picker_add))], spacing=0)
         ], alignment="center", spacing=20),
-        type_dropdown, comment_input, amount_input,
+        type_dropdown, comment_input, comment_suggestions, ft.Row([amount_input, currency_dropdown], alignment="center", spacing=10),
+        ft.Row([repeat_dropdown, repeat_until], alignment="center", spacing=10),
         ft.Divider(height=20, color="transparent"),
         ft.ElevatedButton("Save Transaction", on_click=add_transaction_click, height=50, width=400)
     ], horizontal_alignment="center", spacing=15), alignment=ft.alignment.center, expand=True)
@@ -1037,8 +1284,18 @@ del "%~f0"
             ft.Row([
                 filter_type, filter_comment,
                 ft.IconButton("search", on_click=run_filter, bgcolor="#1976D2", tooltip="Apply Filters"),
-                ft.IconButton("picture_as_pdf", on_click=save_history_pdf_click, bgcolor="#C62828", tooltip="Export Current View")
+                ft.IconButton("picture_as_pdf", on_click=save_history_pdf_click, bgcolor="#C62828", tooltip="Export Current View"),
+                ft.PopupMenuButton(icon="table_view", tooltip="Export Data", items=[
+                    ft.PopupMenuItem(text=fmt.upper(), on_click=lambda _, fmt=fmt: save_history_export_click(fmt))
+                    for fmt in EXPORT_FORMATS]),
+                ft.IconButton("library_books", on_click=lambda _: open_statements(), tooltip="Batch Statements")
             ], spacing=10, wrap=True),
+            ft.Row([
+                saved_view_dropdown,
+                ft.IconButton("bookmark_add", on_click=open_save_view, tooltip="Save Filter as View"),
+                ft.IconButton("bookmark_remove", on_click=delete_saved_view_click, tooltip="Delete Saved View")
+            ], spacing=5),
+            ft.Row([bulk_selected_text, bulk_scope, bulk_edit_button, bulk_delete_button], spacing=5),
             ft.Column(controls=[history_table_full], scroll="auto", expand=True)
         ], expand=True), expand=7, padding=10),
         ft.VerticalDivider(width=1, color="grey"),
@@ -1058,15 +1315,86 @@ del "%~f0"
         ft.Text("Detailed Report", size=24, weight="bold"),
         ft.Row([
             ft.ElevatedButton("Generate View", icon="visibility", on_click=generate_report_click),
-            ft.ElevatedButton("Save as PDF", icon="save_alt", on_click=save_report_pdf_click, bgcolor="#C62828")
+            ft.ElevatedButton("Save as PDF", icon="save_alt", on_click=save_report_pdf_click, bgcolor="#C62828"),
+            report_all_ledgers, report_period, report_month, report_year
         ]),
         ft.Divider(),
         report_output
     ], expand=True), padding=20, expand=True)
 
+    # --- DIAGNOSTICS ---
+    # Hidden until Ctrl+Shift+D (or FMP_METRICS_PORT) adds it to the rail; opening it turns metrics on.
+    diag_status = ft.Text("", size=12, color="grey")
+    diag_memory = ft.Text("", size=13, font_family="Roboto Mono")
+    diag_table = ft.DataTable(columns=[ft.DataColumn(ft.Text(h)) for h in ("Metric", "Labels", "Count", "Value / Mean", "p95")],
+                              rows=[], column_spacing=20, data_row_min_height=28, data_row_max_height=28)
+    diag_allocations = ft.Column(spacing=2)
+    diag_trace = ft.Switch(label="Trace Python allocations (slower)", value=metrics_utils.TRACE_MEMORY)
+
+    def metric_value(name, value):
+        if value is None:
+            return ""
+        if name.endswith("_seconds") and name != "fmp_uptime_seconds":
+            return f"{value * 1000:,.2f} ms"
+        if name.endswith("_bytes"):
+            return f"{value / 2**20:,.1f} MB"
+        return f"{value:,.0f}" if value >= 100 else f"{value:,.2f}"
+
+    def mb(value):
+        return "n/a" if value is None else f"{value / 2**20:,.1f} MB"
+
+    def refresh_diagnostics():
+        _, rss, traced, peak = metrics_utils.sample_memory()
+        diag_memory.value = f"RSS {mb(rss)}   traced {mb(traced)}   traced peak {mb(peak)}   threads {threading.active_count()}"
+        diag_status.value = (f"Collecting since {datetime.datetime.fromtimestamp(metrics_utils.REGISTRY.started):%Y-%m-%d %H:%M}"
+                             + (f", endpoint on port {metrics_utils.METRICS_PORT}" if metrics_utils.METRICS_PORT else ""))
+        diag_table.rows = [ft.DataRow(cells=[
+            ft.DataCell(ft.Text(name)), ft.DataCell(ft.Text(", ".join(v for _, v in labels))),
+            ft.DataCell(ft.Text("" if count is None else f"{count:,}")),
+            ft.DataCell(ft.Text(metric_value(name, value))), ft.DataCell(ft.Text(metric_value(name, p95)))
+        ]) for name, labels, kind, count, value, p95 in metrics_utils.REGISTRY.rows()]
+        diag_allocations.controls = [
+            ft.Text(f"{size / 1024:>10,.0f} KiB {blocks:>8,}  {where}", size=12, font_family="Roboto Mono")
+            for where, size, blocks in metrics_utils.top_allocations()]
+
+    def on_trace_change(e):
+        metrics_utils.trace_memory(diag_trace.value)
+        refresh_diagnostics()
+        page.update()
+    diag_trace.on_change = on_trace_change
+
+    def reset_metrics_click(e):
+        metrics_utils.REGISTRY.reset()
+        refresh_diagnostics()
+        page.update()
+
+    view_diagnostics = ft.Container(content=ft.Column([
+        ft.Text("Diagnostics", size=24, weight="bold"),
+        ft.Row([
+            ft.ElevatedButton("Refresh", icon="refresh", on_click=lambda _: (refresh_diagnostics(), page.update())),
+            ft.TextButton("Reset", on_click=reset_metrics_click),
+            diag_trace
+        ]),
+        diag_status, diag_memory, ft.Divider(),
+        ft.Column([diag_table, ft.Text("Top allocations", weight="bold"), diag_allocations], scroll="auto", expand=True)
+    ], expand=True), padding=20, expand=True)
+
+    def add_diagnostics_destination():
+        metrics_utils.enable(trace=diag_trace.value)
+        if len(rail.destinations) == 4:
+            rail.destinations.append(ft.NavigationRailDestination(icon="monitor_heart", label="Diagnostics"))
+
+    def show_diagnostics():
+        add_diagnostics_destination()
+        rail.selected_index = 4
+        refresh_diagnostics()
+        main_area.content = view_diagnostics
+        page.update()
+
     main_area = ft.Container(content=view_dashboard, expand=True)
 
     def nav_change(e):
+        maintenance_scheduler.touch()
         idx = e.control.selected_index
         if idx == 0:
             refresh_dashboard()
@@ -1079,8 +1407,444 @@ del "%~f0"
             main_area.content = view_transactions
         elif idx == 3:
             main_area.content = view_reports
+        elif idx == 4:
+            refresh_diagnostics()
+            main_area.content = view_diagnostics
+        page.update()
+
+    # --- LIVE REFRESH ---
+    # Another instance (or the CLI) committed to finance.db: redraw whatever is on screen.
+    async def refresh_visible_view():
+        if main_area.content is view_dashboard:
+            refresh_dashboard()
+        elif main_area.content is view_transactions:
+            get_comment_index().load()
+            update_filter_comments(force_update=True)
+            run_filter(None)
+
+    def on_currency_picked(e):
+        amount_input.prefix_text = CURRENCY_SYMBOLS.get(currency_dropdown.value, currency_dropdown.value) + " "
+        amount_input.update()
+    currency_dropdown.on_change = on_currency_picked
+
+    def on_reporting_change(e):
+        app_state["reporting"] = None if reporting_dropdown.value == BASE_CURRENCY else reporting_dropdown.value
+        page.run_task(refresh_visible_view)
+    reporting_dropdown.on_change = on_reporting_change
+
+    def watch_active_ledger():
+        if app_state["db_watcher"]:
+            app_state["db_watcher"].stop()
+        app_state["db_watcher"] = ChangeWatcher(lambda: page.run_task(refresh_visible_view)).start()
+
+    watch_active_ledger()
+
+    # --- LEDGER SWITCHING ---
+    def load_ledger_options():
+        ledger_dropdown.options = [ft.dropdown.Option(name) for name in list_ledgers()]
+        ledger_dropdown.value = get_active_ledger()
+
+    def on_ledger_change(e):
+        try:
+            switch_ledger(ledger_dropdown.value)
+        except Exception as ex:
+            logger.error(f"Ledger switch failed: {ex}")
+            show_msg("Could not open ledger", is_error=True)
+            return
+        watch_active_ledger()
+        app_state["saved_view"] = None
+        load_saved_views()
+        threading.Thread(target=get_comment_index, daemon=True).start()
+        years = get_available_years()
+        sel_year.options = [ft.dropdown.Option(y) for y in years]
+        sel_year_only.options = [ft.dropdown.Option(y) for y in years]
+        page.run_task(refresh_visible_view)
+        show_msg(f"Switched to {ledger_dropdown.value}")
+    ledger_dropdown.on_change = on_ledger_change
+
+    new_ledger_name = ft.TextField(label="Ledger Name", width=300, autofocus=True)
+
+    def create_ledger_click(e):
+        name = (new_ledger_name.value or "").strip()
+        if not valid_ledger_name(name):
+            show_msg("Use letters, numbers, spaces, '-', '_' or '.'", is_error=True); return
+        try:
+            create_ledger(name)
+        except ValueError as ex:
+            show_msg(str(ex), is_error=True); return
+        page.close(new_ledger_dialog)
+        new_ledger_name.value = ""
+        load_ledger_options()
+        ledger_dropdown.value = name
+        on_ledger_change(None)
+        page.update()
+
+    new_ledger_dialog = ft.AlertDialog(
+        title=ft.Text("New Ledger"),
+        content=new_ledger_name,
+        actions=[
+            ft.TextButton("Cancel", on_click=lambda _: page.close(new_ledger_dialog)),
+            ft.ElevatedButton("Create", on_click=create_ledger_click)
+        ]
+    )
+    new_ledger_button.on_click = lambda _: page.open(new_ledger_dialog)
+    load_ledger_options()
+
+    # --- CATEGORY RULES ---
+    rule_category = ft.TextField(label="Category", width=160, dense=True)
+    rule_kind = ft.Dropdown(label="Match", width=120, dense=True, value="keyword",
+                            options=[ft.dropdown.Option(k) for k in RULE_KINDS])
+    rule_pattern = ft.TextField(label="Keyword / Regex", width=200, dense=True)
+    rule_type = ft.Dropdown(label="Type", width=140, dense=True, value="Any",
+                            options=[ft.dropdown.Option(t) for t in ("Any", "Deposit", "Base Expense", "Borrow")])
+    rule_min = ft.TextField(label="Min", width=90, dense=True, keyboard_type="number")
+    rule_max = ft.TextField(label="Max", width=90, dense=True, keyboard_type="number")
+    rules_list = ft.Column(spacing=0, scroll="auto", height=260)
+    recategorize_status = ft.Text("", size=12, color="grey")
+
+    def load_rules_list():
+        rows = []
+        for rule_id, name, kind, pattern, t_type, lo, hi, priority in list_rules():
+            limits = ", ".join(x for x in (t_type, lo is not None and f">= {lo:,.0f}", hi is not None and f"<= {hi:,.0f}") if x)
+            rows.append(ft.Row([
+                ft.Text(name, width=140, weight="bold", size=13),
+                ft.Text(kind, width=70, size=12, color="grey"),
+                ft.Text(pattern or "", width=220, size=13),
+                ft.Text(limits, width=180, size=12, color="grey"),
+                ft.IconButton(icon="delete_outline", icon_size=18, data=rule_id, on_click=delete_rule_click)
+            ], spacing=5))
+        rules_list.controls = rows or [ft.Text("No rules yet. Comments are grouped as typed.", color="grey")]
+
+    def run_recategorize():
+        def work():
+            try:
+                seen, changed, seconds = recategorize()
+                text = f"{seen:,} transactions checked, {changed:,} changed in {seconds:.1f}s"
+            except Exception as ex:
+                logger.error(f"Recategorize failed: {ex}")
+                text = "Re-categorize failed"
+            # The ChangeWatcher sees the commits and redraws the dashboard/history by itself
+            async def done():
+                recategorize_status.value = text
+                if recategorize_status.page:
+                    recategorize_status.update()
+            page.run_task(done)
+        recategorize_status.value = "Re-categorizing..."
+        threading.Thread(target=work, daemon=True).start()
+
+    def add_rule_click(e):
+        try:
+            lo = float(rule_min.value) if rule_min.value else None
+            hi = float(rule_max.value) if rule_max.value else None
+        except ValueError:
+            show_msg("Invalid Amount", is_error=True); return
+        try:
+            add_rule(rule_category.value, rule_kind.value, rule_pattern.value,
+                     None if rule_type.value == "Any" else rule_type.value, lo, hi)
+        except ValueError as ex:
+            show_msg(str(ex), is_error=True); return
+        rule_pattern.value = ""; rule_min.value = ""; rule_max.value = ""
+        load_rules_list()
+        run_recategorize()
+        page.update()
+
+    def delete_rule_click(e):
+        remove_rule(e.control.data)
+        load_rules_list()
+        run_recategorize()
         page.update()
 
+    def open_categories(e):
+        load_rules_list()
+        recategorize_status.value = ""
+        page.open(categories_dialog)
+
+    # --- BULK EDIT / DELETE ---
+    bulk_type = ft.Dropdown(label="Type", width=160, dense=True, value="Keep",
+                            options=[ft.dropdown.Option(t) for t in ("Keep", "Deposit", "Base Expense", "Borrow")])
+    bulk_comment = ft.TextField(label="New comment (blank keeps it)", width=300, dense=True)
+    bulk_shift = ft.TextField(label="Shift date by days", width=160, dense=True, value="0", keyboard_type="number")
+    bulk_delete_text = ft.Text("")
+
+    def bulk_target():
+        """(ids, where) for the edit: the ticked rows, or the History filter's predicate."""
+        if bulk_scope.value == "filter":
+            return None, app_state["history_where"]
+        return sorted(app_state["history_selected"]), None
+
+    def run_bulk(work, done_text):
+        def task():
+            try:
+                count = work()
+                msg, error = done_text.format(count=count), False
+            except Exception as ex:
+                logger.error(f"Bulk edit failed: {ex}")
+                msg, error = "Bulk edit failed", True
+            async def done():
+                app_state["history_selected"].clear()
+                show_msg(msg, is_error=error)
+                run_filter(None)
+            page.run_task(done)
+        threading.Thread(target=task, daemon=True).start()
+
+    def open_bulk_edit(e):
+        ids, where = bulk_target()
+        if ids == [] or (ids is None and where is None):
+            show_msg("Tick some rows first", is_error=True); return
+        bulk_type.value = "Keep"; bulk_comment.value = ""; bulk_shift.value = "0"
+        page.open(bulk_edit_dialog)
+
+    def apply_bulk_edit(e):
+        try:
+            shift = int(bulk_shift.value or 0)
+        except ValueError:
+            show_msg("Invalid number of days", is_error=True); return
+        trans_type = None if bulk_type.value == "Keep" else bulk_type.value
+        comment = bulk_comment.value.strip() or None
+        if not trans_type and comment is None and not shift:
+            page.close(bulk_edit_dialog); return
+        ids, where = bulk_target()
+        page.close(bulk_edit_dialog)
+        maintenance_scheduler.touch()
+        run_bulk(lambda: bulk_update(ids, where, trans_type, comment, shift), "{count:,} transactions updated")
+
+    def open_bulk_delete(e):
+        ids, where = bulk_target()
+        if ids == [] or (ids is None and where is None):
+            show_msg("Tick some rows first", is_error=True); return
+        bulk_delete_text.value = f"Delete {count_rows(ids, where):,} transactions? This can't be undone."
+        page.open(bulk_delete_dialog)
+
+    def apply_bulk_delete(e):
+        ids, where = bulk_target()
+        page.close(bulk_delete_dialog)
+        maintenance_scheduler.touch()
+        run_bulk(lambda: bulk_delete(ids, where), "{count:,} transactions deleted")
+
+    bulk_edit_dialog = ft.AlertDialog(
+        title=ft.Text("Edit Transactions"),
+        content=ft.Column([bulk_type, bulk_comment, bulk_shift], tight=True, spacing=10),
+        actions=[
+            ft.TextButton("Cancel", on_click=lambda _: page.close(bulk_edit_dialog)),
+            ft.ElevatedButton("Apply", on_click=apply_bulk_edit)
+        ]
+    )
+    bulk_delete_dialog = ft.AlertDialog(
+        title=ft.Text("Delete Transactions"),
+        content=bulk_delete_text,
+        actions=[
+            ft.TextButton("Cancel", on_click=lambda _: page.close(bulk_delete_dialog)),
+            ft.ElevatedButton("Delete", on_click=apply_bulk_delete, bgcolor="#C62828")
+        ]
+    )
+    bulk_edit_button.on_click = open_bulk_edit
+    bulk_delete_button.on_click = open_bulk_delete
+
+    # --- BATCH STATEMENTS ---
+    statement_from_month = ft.Dropdown(options=[ft.dropdown.Option(m) for m in months], value=months[0], width=130, dense=True, label="From")
+    statement_from_year = ft.Dropdown(options=[ft.dropdown.Option(y) for y in available_years], value=current_year, width=100, dense=True, label="Year")
+    statement_to_month = ft.Dropdown(options=[ft.dropdown.Option(m) for m in months], value=months[-1], width=130, dense=True, label="To")
+    statement_to_year = ft.Dropdown(options=[ft.dropdown.Option(y) for y in available_years], value=current_year, width=100, dense=True, label="Year")
+    statement_annual = ft.Checkbox(label="Annual statement per year", value=True)
+    statement_log = ft.Column(spacing=2, scroll="auto", height=220)
+    statement_status = ft.Text("", size=12, color="grey")
+
+    def statement_range():
+        first = datetime.date(int(statement_from_year.value), months.index(statement_from_month.value) + 1, 1)
+        last = datetime.date(int(statement_to_year.value), months.index(statement_to_month.value) + 1, 1)
+        return first, last
+
+    def open_statements():
+        statement_log.controls = []
+        statement_status.value = "Pick the months, then the folder to write the PDFs to."
+        page.open(statements_dialog)
+
+    def on_statement_folder(e: ft.FilePickerResultEvent):
+        if not e.path:
+            return
+        try:
+            first, last = statement_range()
+        except (TypeError, ValueError):
+            show_msg("Pick the months", is_error=True); return
+        if last < first:
+            show_msg("The last month is before the first", is_error=True); return
+        out_dir = e.path
+        statement_log.controls = []
+        statement_status.value = "Exporting..."
+        page.update()
+
+        def file_done(path, ok, seconds, rows):
+            async def show():
+                statement_log.controls.append(ft.Text(
+                    f"{os.path.basename(path)}  {rows:,} rows  {seconds:.2f}s" + ("" if ok else "  FAILED"),
+                    size=12, color=None if ok else "#EF5350", font_family="Roboto Mono"))
+                if statement_log.page:
+                    statement_log.update()
+            page.run_task(show)
+
+        def work():
+            try:
+                report = export_statements(first, last, out_dir, statement_annual.value, app_state["reporting"],
+                                           ledger=ledger_dropdown.value, progress=file_done)
+                text = (f"{len(report['files'])} files, {report['rows']:,} rows in {report['seconds']:.1f}s "
+                        f"({report['workers']} workers, {report['files_per_second']:.1f} files/s)")
+                failed = bool(report["failed"])
+            except Exception as ex:
+                logger.error(f"Statement export failed: {ex}")
+                text, failed = "Statement export failed", True
+            async def done():
+                statement_status.value = text
+                if statement_status.page:
+                    statement_status.update()
+                show_msg(text, is_error=failed, open_path=None if failed else out_dir)
+            page.run_task(done)
+        threading.Thread(target=work, daemon=True).start()
+
+    statement_folder_picker = ft.FilePicker(on_result=on_statement_folder)
+    page.overlay.append(statement_folder_picker)
+
+    statements_dialog = ft.AlertDialog(
+        title=ft.Text("Batch Statements"),
+        content=ft.Column([
+            ft.Text("One PDF per month, and one per year, rendered side by side.", size=12, color="grey"),
+            ft.Row([statement_from_month, statement_from_year]),
+            ft.Row([statement_to_month, statement_to_year]),
+            statement_annual, statement_status, statement_log
+        ], tight=True, spacing=10, width=460),
+        actions=[
+            ft.TextButton("Close", on_click=lambda _: page.close(statements_dialog)),
+            ft.ElevatedButton("Choose Folder & Export", icon="folder_open",
+                              on_click=lambda _: statement_folder_picker.get_directory_path(dialog_title="Save statements to"))
+        ]
+    )
+
+    categories_dialog = ft.AlertDialog(
+        title=ft.Text("Category Rules"),
+        content=ft.Column([
+            ft.Text("The first matching rule names the category used by the chart and reports.", size=12, color="grey"),
+            ft.Row([rule_category, rule_kind, rule_pattern], spacing=8),
+            ft.Row([rule_type, rule_min, rule_max, ft.ElevatedButton("Add Rule", icon="add", on_click=add_rule_click)], spacing=8),
+            ft.Divider(),
+            rules_list,
+            recategorize_status
+        ], tight=True, width=680),
+        actions=[
+            ft.TextButton("Re-categorize All", on_click=lambda _: (run_recategorize(), page.update())),
+            ft.TextButton("Close", on_click=lambda _: page.close(categories_dialog))
+        ]
+    )
+    categories_button.on_click = open_categories
+
+    # --- RECURRING TRANSACTIONS ---
+    recurring_list = ft.Column(spacing=0, scroll="auto", height=260)
+    recurring_status = ft.Text("", size=12, color="grey")
+
+    def load_recurring_list():
+        rows = []
+        for rule in list_recurring():
+            rows.append(ft.Row([
+                ft.Text((rule.comment or "").strip().title() or "N/A", width=150, weight="bold", size=13),
+                ft.Text(rule.type, width=100, size=12, color="grey"),
+                ft.Text(format_money(rule.amount, rule.currency), width=120, size=13),
+                ft.Text(describe(rule), width=280, size=12, color="grey"),
+                ft.IconButton(icon="delete_outline", icon_size=18, data=rule.id, on_click=delete_recurring_click)
+            ], spacing=5))
+        recurring_list.controls = rows or [ft.Text("No recurring transactions. Pick a Repeat in the Add view.", color="grey")]
+
+    def delete_recurring_click(e):
+        remove_recurring(e.control.data)
+        load_recurring_list()
+        page.update()
+
+    def materialize_click(e):
+        def work():
+            try:
+                text = f"{materialize():,} transactions written up to today"
+            except Exception as ex:
+                logger.error(f"Materialize failed: {ex}")
+                text = "Writing the occurrences failed"
+            # The ChangeWatcher redraws the dashboard/history once the rows are committed
+            async def done():
+                recurring_status.value = text
+                if recurring_status.page:
+                    recurring_status.update()
+            page.run_task(done)
+        recurring_status.value = "Writing occurrences..."
+        page.update()
+        threading.Thread(target=work, daemon=True).start()
+
+    def open_recurring(e):
+        load_recurring_list()
+        recurring_status.value = ""
+        page.open(recurring_dialog)
+
+    recurring_dialog = ft.AlertDialog(
+        title=ft.Text("Recurring Transactions"),
+        content=ft.Column([
+            ft.Text("Occurrences up to today count in History, the dashboard and reports without being stored.",
+                    size=12, color="grey"),
+            recurring_list,
+            recurring_status
+        ], tight=True, width=720),
+        actions=[
+            ft.TextButton("Write Occurrences Up To Today", on_click=materialize_click),
+            ft.TextButton("Close", on_click=lambda _: page.close(recurring_dialog))
+        ]
+    )
+    recurring_button.on_click = open_recurring
+
+    # --- BUDGETS ---
+    budget_list = ft.Column(spacing=0, scroll="auto", height=240)
+    budget_key_input = ft.TextField(label="Category or comment", width=260, dense=True)
+    budget_limit_input = ft.TextField(label="Monthly limit", width=160, dense=True, keyboard_type=ft.KeyboardType.NUMBER)
+
+    def load_budget_list():
+        rows = []
+        for key, limit, spent in budget_status():
+            rows.append(ft.Row([
+                ft.Text(key.title(), width=200, weight="bold", size=13),
+                ft.Text(format_money(limit), width=130, size=13),
+                ft.Text(f"{format_money(spent)} this month", width=200, size=12,
+                        color="#EF5350" if spent > limit else "grey"),
+                ft.IconButton(icon="delete_outline", icon_size=18, data=key, on_click=delete_budget_click)
+            ], spacing=5))
+        budget_list.controls = rows or [ft.Text("No budgets yet.", color="grey")]
+
+    def add_budget_click(e):
+        try:
+            limit = float(budget_limit_input.value)
+        except (TypeError, ValueError):
+            show_msg("Enter a monthly limit", is_error=True); return
+        try:
+            set_budget(budget_key_input.value, limit)
+        except ValueError as ex:
+            show_msg(str(ex), is_error=True); return
+        budget_key_input.value = ""; budget_limit_input.value = ""
+        # The ChangeWatcher redraws the dashboard's bars
+        load_budget_list()
+        page.update()
+
+    def delete_budget_click(e):
+        remove_budget(e.control.data)
+        load_budget_list()
+        page.update()
+
+    def open_budgets(e):
+        load_budget_list()
+        page.open(budgets_dialog)
+
+    budgets_dialog = ft.AlertDialog(
+        title=ft.Text("Monthly Budgets"),
+        content=ft.Column([
+            ft.Text("A budget applies to a category, or to a comment for rows no rule has categorized.",
+                    size=12, color="grey"),
+            ft.Row([budget_key_input, budget_limit_input, ft.IconButton(icon="add", on_click=add_budget_click)]),
+            budget_list
+        ], tight=True, width=600),
+        actions=[ft.TextButton("Close", on_click=lambda _: page.close(budgets_dialog))]
+    )
+    budgets_button.on_click = open_budgets
+
     nav_logo = ft.Container(content=ft.Image(src=LOGO_FILENAME, width=50, height=50), padding=10) if os.path.exists(LOGO_FULL_PATH) else None
     rail = ft.NavigationRail(
         selected_index=0, label_type="all", group_alignment=-0.9, leading=nav_logo,
@@ -1093,13 +1857,53 @@ del "%~f0"
         on_change=nav_change
     )
 
+    # --- BACKUPS ---
+    # Daily online snapshot of the active ledger from a background thread; the button forces one.
+    def on_backup_done(path, error):
+        async def report():
+            backup_button.disabled = False
+            backup_button.update()
+            if error:
+                show_msg("Backup Failed", is_error=True)
+            elif app_state.get("manual_backup"):
+                show_msg("Backup Saved", open_path=os.path.dirname(path))
+            app_state["manual_backup"] = False
+        page.run_task(report)
+
+    def backup_now_click(e):
+        app_state["manual_backup"] = True
+        backup_button.disabled = True
+        backup_button.update()
+        backup_scheduler.run_now()
+    backup_button.on_click = backup_now_click
+
+    backup_scheduler = BackupScheduler(on_done=on_backup_done).start()
+
+    # ANALYZE / incremental vacuum / checkpoint only once the user has left the app alone
+    maintenance_scheduler = MaintenanceScheduler().start()
+    def on_keyboard(e: ft.KeyboardEvent):
+        maintenance_scheduler.touch()
+        if e.ctrl and e.shift and e.key == "D":
+            show_diagnostics()
+    page.on_keyboard_event = on_keyboard
+
+    if metrics_utils.METRICS_PORT:
+        try:
+            metrics_utils.start_endpoint()
+            add_diagnostics_destination()
+        except OSError as e:
+            logger.error(f"Metrics endpoint failed to start on port {metrics_utils.METRICS_PORT}: {e}")
+
     page.add(ft.Row([rail, ft.VerticalDivider(width=1), main_area], expand=True))
-    timer = threading.Timer(2.0, check_for_update_on_startup)
-    timer.start()
     refresh_dashboard()
+    # One GROUP BY scan builds the comment index; suggestions and the History filter use it from then on
+    threading.Thread(target=get_comment_index, daemon=True).start()
+    threading.Thread(target=check_for_update_on_startup, daemon=True).start()
     logger.info("UI Initialized")
 
 if __name__ == "__main__":
+    # The frozen EXE is also what the statement export's worker processes run
+    multiprocessing.freeze_support()
     try:
         # Ensure assets are served from the script folder
         ft.app(target=main, assets_dir="assets")
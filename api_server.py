@@ -0,0 +1,532 @@
+"""
+Headless local JSON API over the active ledger, for other tools that would otherwise
+open finance.db themselves and re-implement the filters and sign rules.
+
+Listens on 127.0.0.1 only. Reads run on a small pool of read connections in worker
+threads (WAL lets them run beside the writer) and streamed exports on a connection of
+their own; writes go through db_utils' single-writer queue, so they batch with the app's
+own writes.
+
+Every endpoint reads stored rows only: recurring rules show up once their occurrences
+are materialized (recurring_utils.materialize), unlike in the app's own views.
+
+    python api_server.py --db finance.db --port 8765
+
+    GET  /health
+    GET  /transactions?start=2025-01-01&end=2025-12-31&type=Deposit&comment=salary&limit=100&cursor=...
+    GET  /summary?currency=USD              (totals in a reporting currency, default the base)
+    GET  /summary/comments?currency=USD
+    GET  /chart?currency=USD
+    GET  /comments?prefix=sw
+    GET  /export.ndjson?<same filters>     (streamed)
+    GET  /export.csv?<same filters>        (streamed)
+    GET  /export.xlsx?<same filters>       (built in a temp file, then streamed)
+    GET  /export.parquet?<same filters>
+    POST /transactions    [{"datetime": "2025-06-01 10:00", "type": "Base Expense", "comment": "rent", "amount": 12000, "currency": "INR"}, ...]
+"""
+import asyncio
+import sqlite3
+import os
+import sys
+import io
+import csv
+import json
+import base64
+import logging
+import argparse
+import datetime
+import tempfile
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+import db_utils
+import category_utils
+import export_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+# --- CONFIGURATION ---
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = int(os.environ.get("FMP_API_PORT", 8765))
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+READ_POOL_SIZE = 4
+PAGE_LIMIT = 100
+MAX_PAGE_LIMIT = 5000
+MAX_BODY = 16 * 1024 * 1024
+MAX_BULK_ROWS = 50_000
+STREAM_BATCH = 2000
+FILE_CHUNK = 256 * 1024
+MAX_SUGGESTIONS = 50
+KEEPALIVE_TIMEOUT = 30
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+# --- READ POOL ---
+class ReadPool:
+    """
+    A fixed set of read connections, each used by one worker thread at a time. Requests
+    wait for a connection on the event loop, never in a worker thread, so a worker is
+    always free to finish the query that will hand one back.
+    """
+    def __init__(self, db_file, size=READ_POOL_SIZE):
+        self.db_file = db_file
+        self.conns = asyncio.Queue()
+        for _ in range(size):
+            self.conns.put_nowait(self._connect())
+        self.size = size
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="api-read")
+
+    def _connect(self):
+        conn = db_utils.connect(self.db_file, check_same_thread=False)
+        conn.execute("PRAGMA query_only=1")
+        return conn
+
+    async def run(self, fn, *args):
+        """Runs fn(conn, *args) on a pooled connection off the event loop."""
+        conn = await self.conns.get()
+        future = asyncio.get_running_loop().run_in_executor(self.executor, fn, conn, *args)
+        # Back in the pool once the worker is done with it, even if the request was cancelled
+        future.add_done_callback(lambda _: self.conns.put_nowait(conn))
+        return await asyncio.shield(future)
+
+    async def stream(self, sql, params, batch=STREAM_BATCH):
+        """
+        Yields lists of rows from a connection of the stream's own. A stream lasts as long
+        as the client takes to download it, so it never holds one of the pooled connections.
+        """
+        loop = asyncio.get_running_loop()
+        conn = await loop.run_in_executor(self.executor, self._connect)
+        try:
+            cursor = await loop.run_in_executor(self.executor, conn.execute, sql, params)
+            while True:
+                rows = await loop.run_in_executor(self.executor, cursor.fetchmany, batch)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            conn.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        while not self.conns.empty():
+            self.conns.get_nowait().close()
+
+# --- HELPERS ---
+def encode_cursor(row):
+    dt, row_id = row[0], row[4]
+    return base64.urlsafe_b64encode(json.dumps([dt, row_id]).encode()).decode().rstrip("=")
+
+def decode_cursor(text):
+    try:
+        dt, row_id = json.loads(base64.urlsafe_b64decode(text + "=" * (-len(text) % 4)))
+        return str(dt), int(row_id)
+    except Exception:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Invalid cursor")
+
+def row_to_json(row):
+    dt, t_type, comment, amount, row_id, currency = row
+    return {"id": row_id, "datetime": dt, "type": t_type, "comment": comment, "amount": amount,
+            "currency": currency or db_utils.BASE_CURRENCY}
+
+def _param(query, name, default=None):
+    values = query.get(name)
+    return values[0] if values else default
+
+def _date_param(query, name):
+    value = _param(query, name)
+    if value:
+        try:
+            datetime.datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"{name} must be YYYY-MM-DD")
+    return value
+
+def filters_from(query):
+    t_type = _param(query, "type", "All")
+    if t_type != "All" and t_type not in db_utils.TRANSACTION_TYPES:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"type must be one of {', '.join(db_utils.TRANSACTION_TYPES)}")
+    return _date_param(query, "start"), _date_param(query, "end"), t_type, _param(query, "comment", "All")
+
+def parse_new_transaction(item):
+    """Validates one POSTed row and applies the app's sign rules."""
+    if not isinstance(item, dict):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "Each transaction must be an object")
+    dt = item.get("datetime")
+    t_type = item.get("type")
+    try:
+        datetime.datetime.strptime(dt, "%Y-%m-%d %H:%M")
+    except (TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "datetime must be 'YYYY-MM-DD HH:MM'")
+    if t_type not in db_utils.TRANSACTION_TYPES:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"type must be one of {', '.join(db_utils.TRANSACTION_TYPES)}")
+    try:
+        amount = float(item.get("amount"))
+    except (TypeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "amount must be a number")
+    comment = item.get("comment")
+    if comment is not None and not isinstance(comment, str):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "comment must be a string")
+    try:
+        currency = db_utils.normalize_currency(item.get("currency"))
+    except (AttributeError, ValueError):
+        raise ApiError(HTTPStatus.BAD_REQUEST, "currency must be a 3-letter ISO code")
+    return dt, t_type, comment, db_utils.signed_amount(t_type, amount), currency
+
+def reporting_from(query):
+    try:
+        return db_utils.normalize_currency(_param(query, "currency"))
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "currency must be a 3-letter ISO code")
+
+def _data_version(conn):
+    """(change journal sequence, category version, fx version): all only ever grow."""
+    seq, categories, fx = conn.execute("""
+        SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'change_log'),
+               (SELECT value FROM journal_meta WHERE key = 'category_version'),
+               (SELECT value FROM journal_meta WHERE key = 'fx_version')
+    """).fetchone()
+    return seq or 0, int(categories or 0), int(fx or 0)
+
+# --- SERVER ---
+class ApiServer:
+    def __init__(self, db_file=None, host=DEFAULT_HOST, port=DEFAULT_PORT, readers=READ_POOL_SIZE):
+        if host not in LOOPBACK_HOSTS:
+            raise ValueError("The API only listens on the loopback interface")
+        self.db_file = os.path.abspath(db_file or db_utils.DB_FILE)
+        self.host = host
+        self.port = port
+        self.readers = readers
+        self.pool = None
+        self.server = None
+        self.cache = {}
+        self.pending = {}
+        self.routes = {
+            ("GET", "/health"): self.health,
+            ("GET", "/transactions"): self.list_transactions,
+            ("POST", "/transactions"): self.add_transactions,
+            ("GET", "/summary"): self.summary,
+            ("GET", "/summary/comments"): self.summary_by_comment,
+            ("GET", "/chart"): self.chart,
+            ("GET", "/comments"): self.comments,
+            ("GET", "/export.ndjson"): self.export_ndjson,
+            ("GET", "/export.csv"): self.export_csv,
+            ("GET", "/export.xlsx"): self.export_xlsx,
+            ("GET", "/export.parquet"): self.export_parquet,
+        }
+
+    async def start(self):
+        saved = db_utils.DB_FILE
+        db_utils.DB_FILE = self.db_file
+        try:
+            db_utils.initialize_database()
+        finally:
+            db_utils.DB_FILE = saved
+        self.pool = ReadPool(self.db_file, self.readers)
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"API listening on http://{self.host}:{self.port} for {self.db_file}")
+        return self
+
+    async def close(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        if self.pool:
+            self.pool.close()
+
+    # --- HTTP ---
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self.send_json(writer, HTTPStatus.BAD_REQUEST, {"error": "Malformed request line"}, close=True)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+
+                try:
+                    body = b""
+                    length = int(headers.get("content-length") or 0)
+                    if length > MAX_BODY:
+                        raise ApiError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Request body too large")
+                    if length:
+                        body = await reader.readexactly(length)
+                    await self.dispatch(writer, method, target, headers, body, keep_alive)
+                except ApiError as e:
+                    await self.send_json(writer, e.status, {"error": e.message}, close=not keep_alive)
+                except Exception as e:
+                    logger.error(f"API error on {method} {target}: {e}")
+                    await self.send_json(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "Internal error"}, close=True)
+                    break
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, writer, method, target, headers, body, keep_alive):
+        # Browsers can reach localhost too: a foreign Host means DNS rebinding, and insisting on
+        # a JSON content type forces a CORS preflight, which this server never approves.
+        host = headers.get("host", "").rsplit(":", 1)[0].strip("[]")
+        if host not in LOOPBACK_HOSTS:
+            raise ApiError(HTTPStatus.FORBIDDEN, "Forbidden host")
+        if method == "POST" and not headers.get("content-type", "").startswith("application/json"):
+            raise ApiError(HTTPStatus.UNSUPPORTED_MEDIA_TYPE, "Content-Type must be application/json")
+
+        url = urlsplit(target)
+        handler = self.routes.get((method, url.path.rstrip("/") or "/"))
+        if handler is None:
+            if any(path == url.path for _, path in self.routes):
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed")
+            raise ApiError(HTTPStatus.NOT_FOUND, "Not found")
+        query = parse_qs(url.query)
+        result = await handler(query, body) if method == "POST" else await handler(query)
+        if isinstance(result, tuple):
+            status, payload = result
+        else:
+            status, payload = HTTPStatus.OK, result
+        if hasattr(payload, "__aiter__"):
+            await self.send_stream(writer, status, *await payload.__anext__(), payload, close=not keep_alive)
+        else:
+            await self.send_json(writer, status, payload, close=not keep_alive)
+
+    async def send_json(self, writer, status, payload, close=False):
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def send_stream(self, writer, status, content_type, filename, chunks, close=False):
+        head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Disposition: attachment; filename=\"{filename}\"\r\n"
+                f"Transfer-Encoding: chunked\r\n"
+                f"Connection: {'close' if close else 'keep-alive'}\r\n\r\n")
+        writer.write(head.encode("latin-1"))
+        async for chunk in chunks:
+            if chunk:
+                writer.write(f"{len(chunk):x}\r\n".encode("latin-1") + chunk + b"\r\n")
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    async def cached(self, name, fn):
+        """
+        fn(conn) for the whole-ledger aggregates, reused until the ledger changes. The change
+        journal's AUTOINCREMENT counter moves on every insert, update and delete, whoever
+        makes it; re-categorizing and rate imports bump counters of their own. Reading them
+        is three single-row lookups. Requests arriving while the value is being recomputed wait
+        for that run instead of starting their own scan.
+        """
+        version = await self.pool.run(_data_version)
+        hit = self.cache.get(name)
+        if hit and hit[0] >= version:
+            return hit[1]
+        pending = self.pending.get(name)
+        if pending is None or pending[0] < version:
+            def run(conn):
+                # Read the counter first: the result is at least as new as the version it's stored under
+                return _data_version(conn), fn(conn)
+            pending = (version, asyncio.ensure_future(self.pool.run(run)))
+            self.pending[name] = pending
+        try:
+            computed = await asyncio.shield(pending[1])
+        finally:
+            if self.pending.get(name) is pending and pending[1].done():
+                del self.pending[name]
+        if computed[0] > self.cache.get(name, ((-1,),))[0]:
+            self.cache[name] = computed
+        return computed[1]
+
+    # --- ENDPOINTS ---
+    async def health(self, query):
+        return {"status": "ok", "db": os.path.basename(self.db_file)}
+
+    async def list_transactions(self, query):
+        try:
+            limit = min(int(_param(query, "limit", PAGE_LIMIT)), MAX_PAGE_LIMIT)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "limit must be an integer")
+        if limit < 1:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "limit must be positive")
+        cursor = _param(query, "cursor")
+        after = decode_cursor(cursor) if cursor else None
+        sql, params = db_utils.filtered_query(*filters_from(query), after=after, limit=limit + 1)
+        rows = await self.pool.run(lambda conn: conn.execute(sql, params).fetchall())
+        more = len(rows) > limit
+        rows = rows[:limit]
+        return {
+            "items": [row_to_json(r) for r in rows],
+            "next_cursor": encode_cursor(rows[-1]) if more else None,
+        }
+
+    async def summary(self, query):
+        reporting = reporting_from(query)
+        def run(conn):
+            return conn.execute(db_utils.summary_stats_sql(reporting, db_utils.is_multi_currency(conn))).fetchone()
+        dep, exp, count = await self.cached(f"summary/{reporting}", run)
+        dep, exp = dep or 0.0, exp or 0.0
+        return {"currency": reporting or db_utils.BASE_CURRENCY,
+                "deposits": dep, "expenditure": exp, "balance": dep + exp, "count": count}
+
+    async def summary_by_comment(self, query):
+        reporting = reporting_from(query)
+        def run(conn):
+            return conn.execute(db_utils.summary_by_comment_sql(reporting, db_utils.is_multi_currency(conn))).fetchall()
+        rows = await self.cached(f"by_comment/{reporting}", run)
+        return {"currency": reporting or db_utils.BASE_CURRENCY,
+                "items": [{"comment": c, "type": t, "total": total, "count": n} for c, t, total, n in rows]}
+
+    async def chart(self, query):
+        reporting = reporting_from(query)
+        def run(conn):
+            return conn.execute(*db_utils.chart_query(reporting=reporting, mixed=db_utils.is_multi_currency(conn))).fetchall()
+        rows = await self.cached(f"chart/{reporting}", run)
+        return {"currency": reporting or db_utils.BASE_CURRENCY,
+                "items": [{"comment": c if c is not None else "Other", "other": c is None, "total": total}
+                          for c, total in rows]}
+
+    async def comments(self, query):
+        index = db_utils.get_comment_index(self.db_file, load=False)
+        if not index.loaded:
+            # The first lookup pays for the GROUP BY scan, off the event loop
+            await self.pool.run(lambda conn: index.load())
+        prefix = _param(query, "prefix", "")
+        try:
+            limit = min(int(_param(query, "limit", 10)), MAX_SUGGESTIONS)
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "limit must be an integer")
+        return {"items": index.suggest(prefix, limit)}
+
+    async def add_transactions(self, query, body):
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "Body is not valid JSON")
+        items = payload if isinstance(payload, list) else [payload]
+        if not items or len(items) > MAX_BULK_ROWS:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Send between 1 and {MAX_BULK_ROWS} transactions")
+        rows = [parse_new_transaction(item) for item in items]
+        categorizer = await self.pool.run(lambda conn: category_utils.get_categorizer(self.db_file, conn))
+        rows = [(dt, t_type, comment, amount, categorizer.categorize(comment, t_type, amount), currency)
+                for dt, t_type, comment, amount, currency in rows]
+
+        def job(conn):
+            first = conn.execute("SELECT COALESCE(MAX(id), 0) FROM transactions").fetchone()[0]
+            conn.executemany(
+                "INSERT INTO transactions (transaction_datetime, type, comment, amount, category_id, currency) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            return first
+        # One queued job, so the whole batch lands in one transaction or not at all
+        first = await asyncio.wrap_future(db_utils.get_writer(self.db_file).submit(job))
+        for row in rows:
+            db_utils.note_comment(row[2], self.db_file)
+        return HTTPStatus.CREATED, {"inserted": len(rows), "first_id": first + 1, "last_id": first + len(rows)}
+
+    def _export(self, query, content_type, extension, encode):
+        sql, params = db_utils.filtered_query(*filters_from(query))
+        stamp = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+
+        async def chunks():
+            yield content_type, f"Transactions_{stamp}.{extension}"
+            header = encode(None)
+            if header:
+                yield header
+            async for rows in self.pool.stream(sql, params):
+                yield encode(rows)
+        return chunks()
+
+    async def export_ndjson(self, query):
+        def encode(rows):
+            if rows is None:
+                return b""
+            return "".join(json.dumps(row_to_json(r), separators=(",", ":")) + "\n" for r in rows).encode("utf-8")
+        return self._export(query, "application/x-ndjson", "ndjson", encode)
+
+    async def export_csv(self, query):
+        def encode(rows):
+            buf = io.StringIO()
+            out = csv.writer(buf, lineterminator="\r\n")
+            if rows is None:
+                out.writerow(["id", "datetime", "type", "comment", "amount", "currency"])
+            else:
+                base = db_utils.BASE_CURRENCY
+                out.writerows((r[4], r[0], r[1], r[2], r[3], r[5] or base) for r in rows)
+            return buf.getvalue().encode("utf-8")
+        return self._export(query, "text/csv; charset=utf-8", "csv", encode)
+
+    def _export_file(self, query, fmt, content_type):
+        """XLSX and Parquet are only valid once finished, so they are written to a temp file first."""
+        sql, params = export_utils.export_query(*filters_from(query))
+        filename = f"Transactions_{datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}.{fmt}"
+
+        async def chunks():
+            with tempfile.TemporaryFile() as tmp:
+                try:
+                    await self.pool.run(lambda conn: export_utils.write_rows(
+                        fmt, tmp, export_utils.fetch_batches(conn, sql, params)))
+                except ValueError as e:
+                    # The writer's library isn't installed
+                    raise ApiError(HTTPStatus.NOT_IMPLEMENTED, str(e))
+                yield content_type, filename
+                tmp.seek(0)
+                while True:
+                    chunk = await asyncio.to_thread(tmp.read, FILE_CHUNK)
+                    if not chunk:
+                        break
+                    yield chunk
+        return chunks()
+
+    async def export_xlsx(self, query):
+        return self._export_file(query, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+
+    async def export_parquet(self, query):
+        return self._export_file(query, "parquet", "application/vnd.apache.parquet")
+
+async def serve(db_file, host, port, readers):
+    server = await ApiServer(db_file, host, port, readers).start()
+    print(f"Listening on http://{server.host}:{server.port}", flush=True)
+    try:
+        await server.server.serve_forever()
+    finally:
+        await server.close()
+        db_utils.close_writers()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro local JSON API")
+    parser.add_argument("--db", default=db_utils.DB_FILE, help="Ledger file (default: finance.db next to the app)")
+    parser.add_argument("--host", default=DEFAULT_HOST, choices=LOOPBACK_HOSTS)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="0 picks a free port")
+    parser.add_argument("--readers", type=int, default=READ_POOL_SIZE, help="Read connections in the pool")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.db, args.host, args.port, args.readers))
+    except KeyboardInterrupt:
+        pass
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -0,0 +1,330 @@
+"""
+Online backups of the active ledger.
+
+Snapshots are taken with the SQLite backup API in small page steps from a background
+thread. Each step holds the database only briefly and the GIL not at all, so the app
+keeps reading and writing while a backup runs and the copy is still consistent. The
+snapshot is optionally gzip'd, and old snapshots are thinned out by a
+daily/weekly/monthly retention policy.
+
+    python backup_utils.py backup finance.db
+    python backup_utils.py list finance.db
+    python backup_utils.py restore backups/finance/finance_20250101-120000.db.gz finance.db
+"""
+import sqlite3
+import os
+import sys
+import re
+import gzip
+import shutil
+import logging
+import datetime
+import tempfile
+import threading
+import time
+import argparse
+
+import db_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+# --- CONFIGURATION ---
+BACKUP_ROOT = os.path.join(db_utils.EXE_LOCATION, "backups")
+BACKUP_INTERVAL = int(os.environ.get("FMP_BACKUP_INTERVAL", 24 * 60 * 60))
+BACKUP_COMPRESS = True
+
+# Pages copied per backup step and the pause between steps. 1024 pages of 4 KiB is 4 MiB
+# per step; the pause hands the disk (and the GIL) back to the app in between.
+BACKUP_STEP_PAGES = 1024
+BACKUP_STEP_PAUSE = 0.002
+
+# A commit from another connection restarts a stepped backup from page one. In WAL mode
+# the source connection holds one read transaction for the whole backup, which pins a
+# snapshot (so there is nothing to restart) without blocking the app's writes. On other
+# journal modes, after this many restarts the copy is taken in a single step instead.
+MAX_BACKUP_RESTARTS = 3
+
+# Retention: newest snapshot of each of the last N days, ISO weeks and months
+KEEP_DAILY = 7
+KEEP_WEEKLY = 4
+KEEP_MONTHLY = 12
+
+STAMP_FORMAT = "%Y%m%d-%H%M%S"
+COPY_CHUNK = 1024 * 1024
+
+class BackupError(Exception):
+    pass
+
+class _TooManyRestarts(Exception):
+    pass
+
+def backup_dir_for(db_file):
+    """backups/<ledger file name>/, one folder per ledger."""
+    return os.path.join(BACKUP_ROOT, os.path.splitext(os.path.basename(db_file))[0])
+
+def _snapshot_re(stem):
+    return re.compile(rf"^{re.escape(stem)}_(\d{{8}}-\d{{6}})\.db(\.gz)?$")
+
+def list_backups(db_file=None, dest_dir=None):
+    """[(datetime, path)] of a ledger's snapshots, newest first."""
+    db_file = db_file or db_utils.DB_FILE
+    dest_dir = dest_dir or backup_dir_for(db_file)
+    pattern = _snapshot_re(os.path.splitext(os.path.basename(db_file))[0])
+    backups = []
+    try:
+        for entry in os.listdir(dest_dir):
+            match = pattern.match(entry)
+            if match:
+                stamp = datetime.datetime.strptime(match.group(1), STAMP_FORMAT)
+                backups.append((stamp, os.path.join(dest_dir, entry)))
+    except FileNotFoundError:
+        pass
+    backups.sort(reverse=True)
+    return backups
+
+# --- BACKUP ---
+def _copy_pages(db_file, tmp_path, pages, pause, progress_callback, stop_event):
+    state = {"remaining": None, "restarts": 0}
+
+    def on_progress(status, remaining, total):
+        if stop_event is not None and stop_event.is_set():
+            raise BackupError("Backup cancelled")
+        if state["remaining"] is not None and remaining > state["remaining"]:
+            state["restarts"] += 1
+            if state["restarts"] > MAX_BACKUP_RESTARTS:
+                raise _TooManyRestarts()
+        state["remaining"] = remaining
+        if progress_callback and total:
+            progress_callback((total - remaining) / total)
+        if pause and remaining:
+            time.sleep(pause)
+
+    src = db_utils.connect(db_file)
+    src.isolation_level = None
+    dst = sqlite3.connect(tmp_path)
+    try:
+        if src.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            src.execute("BEGIN")
+            src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(dst, pages=pages, progress=on_progress)
+        # The copy keeps the source's WAL setting; a standalone snapshot is simpler as one file
+        dst.execute("PRAGMA journal_mode=DELETE")
+    finally:
+        if src.in_transaction:
+            src.execute("COMMIT")
+        src.close()
+        dst.close()
+
+def backup_database(db_file=None, dest_dir=None, compress=BACKUP_COMPRESS, pages=BACKUP_STEP_PAGES,
+                    pause=BACKUP_STEP_PAUSE, progress_callback=None, stop_event=None, suffix=""):
+    """
+    Takes an online snapshot of db_file and returns its path. progress_callback gets the
+    fraction copied; setting stop_event abandons the backup. Snapshots with a suffix are
+    not picked up by list_backups or the retention policy.
+    """
+    db_file = db_file or db_utils.DB_FILE
+    dest_dir = dest_dir or backup_dir_for(db_file)
+    os.makedirs(dest_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(db_file))[0]
+    stamp = datetime.datetime.now().strftime(STAMP_FORMAT)
+    snapshot = os.path.join(dest_dir, f"{stem}_{stamp}{suffix}.db")
+    tmp_path = snapshot + ".part"
+
+    started = datetime.datetime.now()
+    try:
+        try:
+            _copy_pages(db_file, tmp_path, pages, pause, progress_callback, stop_event)
+        except _TooManyRestarts:
+            logger.warning("Ledger kept changing during the backup; copying it in one step")
+            _copy_pages(db_file, tmp_path, -1, 0, progress_callback, stop_event)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if compress:
+        with open(tmp_path, "rb") as f_in, gzip.open(snapshot + ".gz.part", "wb", compresslevel=6) as f_out:
+            while True:
+                if stop_event is not None and stop_event.is_set():
+                    break
+                chunk = f_in.read(COPY_CHUNK)
+                if not chunk:
+                    break
+                f_out.write(chunk)
+        os.remove(tmp_path)
+        if stop_event is not None and stop_event.is_set():
+            os.remove(snapshot + ".gz.part")
+            raise BackupError("Backup cancelled")
+        snapshot += ".gz"
+        os.replace(snapshot + ".part", snapshot)
+    else:
+        os.replace(tmp_path, snapshot)
+
+    logger.info(f"Backup written: {snapshot} ({os.path.getsize(snapshot):,} bytes, "
+                f"{(datetime.datetime.now() - started).total_seconds():.1f}s)")
+    return snapshot
+
+def apply_retention(db_file=None, dest_dir=None, daily=KEEP_DAILY, weekly=KEEP_WEEKLY, monthly=KEEP_MONTHLY):
+    """Deletes snapshots not kept by the daily/weekly/monthly policy. Returns the removed paths."""
+    backups = list_backups(db_file, dest_dir)
+    keep = set()
+    for count, bucket in ((daily, lambda d: d.date()),
+                          (weekly, lambda d: d.isocalendar()[:2]),
+                          (monthly, lambda d: (d.year, d.month))):
+        seen = []
+        for stamp, path in backups:   # newest first, so the first per bucket is its newest
+            key = bucket(stamp)
+            if key in seen:
+                continue
+            if len(seen) >= count:
+                break
+            seen.append(key)
+            keep.add(path)
+    removed = []
+    for _, path in backups:
+        if path not in keep:
+            try:
+                os.remove(path)
+                removed.append(path)
+            except OSError as e:
+                logger.error(f"Could not remove old backup {path}: {e}")
+    return removed
+
+# --- RESTORE ---
+def verify_snapshot(path):
+    """Runs PRAGMA integrity_check on a plain .db snapshot; raises BackupError unless it is ok."""
+    conn = sqlite3.connect(path)
+    try:
+        result = [row[0] for row in conn.execute("PRAGMA integrity_check").fetchall()]
+        conn.execute("SELECT COUNT(*) FROM transactions").fetchone()
+    except sqlite3.DatabaseError as e:
+        raise BackupError(f"{os.path.basename(path)} is not a usable ledger: {e}")
+    finally:
+        conn.close()
+    if result != ["ok"]:
+        raise BackupError(f"{os.path.basename(path)} failed integrity_check: {'; '.join(result[:5])}")
+
+def restore_backup(backup_path, db_file=None):
+    """
+    Replaces db_file's contents with a snapshot once it passes integrity_check. The live
+    database is backed up first, and the restore itself goes through the backup API, so
+    other connections see either the old ledger or the restored one.
+    """
+    db_file = db_file or db_utils.DB_FILE
+    with tempfile.TemporaryDirectory() as workdir:
+        plain = backup_path
+        if backup_path.endswith(".gz"):
+            plain = os.path.join(workdir, "restore.db")
+            with gzip.open(backup_path, "rb") as f_in, open(plain, "wb") as f_out:
+                shutil.copyfileobj(f_in, f_out, COPY_CHUNK)
+        verify_snapshot(plain)
+
+        safety = None
+        if os.path.exists(db_file):
+            safety = backup_database(db_file, compress=False, suffix="_pre-restore")
+            logger.info(f"Pre-restore backup: {safety}")
+
+        src = sqlite3.connect(plain)
+        dst = db_utils.connect(db_file)
+        try:
+            src.backup(dst)
+        finally:
+            src.close()
+            dst.close()
+
+    saved = db_utils.DB_FILE
+    db_utils.DB_FILE = db_file
+    try:
+        db_utils.initialize_database()   # WAL, journal triggers for snapshots from older versions
+    finally:
+        db_utils.DB_FILE = saved
+    logger.info(f"Restored {db_file} from {backup_path}")
+    return safety
+
+# --- SCHEDULER ---
+class BackupScheduler:
+    """
+    Backs up the active ledger (whatever db_utils.DB_FILE points at) once per interval
+    from a daemon thread, then applies retention. run_now() queues an immediate backup.
+    """
+    def __init__(self, interval=BACKUP_INTERVAL, on_done=None, check_every=60, initial_delay=30):
+        self.interval = interval
+        self.initial_delay = initial_delay   # stay out of the way while the app starts up
+        self.on_done = on_done          # called with (path or None, error or None)
+        self.check_every = check_every
+        self.stop_event = threading.Event()
+        self.wake = threading.Event()
+        self.force = False
+        self.thread = threading.Thread(target=self._run, name="backup", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake.set()
+
+    def run_now(self):
+        self.force = True
+        self.wake.set()
+
+    def due(self, db_file):
+        backups = list_backups(db_file)
+        if not backups:
+            return True
+        return (datetime.datetime.now() - backups[0][0]).total_seconds() >= self.interval
+
+    def _run(self):
+        self.wake.wait(self.initial_delay)
+        self.wake.clear()
+        while not self.stop_event.is_set():
+            db_file = db_utils.DB_FILE
+            if self.force or self.due(db_file):
+                self.force = False
+                path, error = None, None
+                try:
+                    path = backup_database(db_file, stop_event=self.stop_event)
+                    apply_retention(db_file)
+                except Exception as e:
+                    error = e
+                    logger.error(f"Backup failed: {e}")
+                if self.on_done and not self.stop_event.is_set():
+                    try:
+                        self.on_done(path, error)
+                    except Exception as e:
+                        logger.error(f"Backup callback error: {e}")
+            self.wake.wait(self.check_every)
+            self.wake.clear()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro backups")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_backup = sub.add_parser("backup", help="Take an online snapshot now")
+    p_backup.add_argument("db")
+    p_backup.add_argument("--dest", help="Backup folder (default backups/<ledger>)")
+    p_backup.add_argument("--no-compress", action="store_true")
+    p_list = sub.add_parser("list", help="List a ledger's snapshots")
+    p_list.add_argument("db")
+    p_list.add_argument("--dest")
+    p_restore = sub.add_parser("restore", help="Verify a snapshot and restore it over a ledger")
+    p_restore.add_argument("snapshot")
+    p_restore.add_argument("db")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "backup":
+            print(backup_database(args.db, args.dest, compress=not args.no_compress))
+            for path in apply_retention(args.db, args.dest):
+                print(f"Removed {path}")
+        elif args.command == "list":
+            for stamp, path in list_backups(args.db, args.dest):
+                print(f"{stamp:%Y-%m-%d %H:%M:%S}  {os.path.getsize(path):>14,}  {path}")
+        else:
+            safety = restore_backup(args.snapshot, args.db)
+            print(f"Restored. Previous contents saved to {safety}" if safety else "Restored.")
+    except (BackupError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
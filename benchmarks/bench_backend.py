@@ -0,0 +1,107 @@
+"""Benchmarks for the db_utils backend, the History aggregation and the PDF export."""
+import datetime
+import os
+
+import db_utils
+from harness import benchmark
+from synthetic_ledger import END_DATE
+
+PDF_ROWS = (100, 1000, 5000)
+
+_today = END_DATE
+FILTERS = {
+    "all": (None, None, "All", "All"),
+    "year": (f"{_today.year}-01-01", f"{_today.year}-12-31", "All", "All"),
+    "month": (f"{_today.year}-{_today.month:02d}-01", _today.strftime("%Y-%m-%d"), "All", "All"),
+    "6_months": ((_today - datetime.timedelta(days=180)).strftime("%Y-%m-%d"), _today.strftime("%Y-%m-%d"), "All", "All"),
+    "type": (None, None, "Borrow", "All"),
+    "comment": (None, None, "All", "swiggy"),
+}
+
+
+def _use(ctx):
+    db_utils.DB_FILE = ctx.db_path
+
+
+def _simple(func, *args):
+    def setup(ctx):
+        _use(ctx)
+        return lambda: func(*args)
+    return setup
+
+
+benchmark("initialize_database")(_simple(db_utils.initialize_database))
+benchmark("get_summary_stats")(_simple(db_utils.get_summary_stats))
+benchmark("get_unique_comments")(_simple(db_utils.get_unique_comments))
+benchmark("get_available_years")(_simple(db_utils.get_available_years))
+benchmark("get_recent_transactions")(_simple(db_utils.get_recent_transactions, 8))
+benchmark("get_chart_data")(_simple(db_utils.get_chart_data))
+benchmark("get_summary_by_comment")(_simple(db_utils.get_summary_by_comment))
+
+for _name, _args in FILTERS.items():
+    benchmark(f"get_filtered_transactions/{_name}")(_simple(db_utils.get_filtered_transactions, *_args))
+
+
+@benchmark("add_transaction_db x20")
+def bench_add_transaction(ctx):
+    _use(ctx)
+    conn = ctx.connect()
+    max_id = conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0] or 0
+    conn.close()
+
+    def run():
+        for i in range(20):
+            db_utils.add_transaction_db("2025-12-31 12:00", "Base Expense", f"bench {i}", 100.0 + i)
+
+    def teardown():
+        conn = ctx.connect()
+        conn.execute("DELETE FROM transactions WHERE id > ?", (max_id,))
+        conn.commit()
+        conn.close()
+
+    return run, teardown
+
+
+@benchmark("aggregate_transactions/sidebar")
+def bench_sidebar_aggregation(ctx):
+    _use(ctx)
+    data = db_utils.get_filtered_transactions(*FILTERS["all"])
+    return lambda: db_utils.aggregate_transactions(data)
+
+
+@benchmark("aggregate_transactions/pdf_rows")
+def bench_pdf_aggregation(ctx):
+    _use(ctx)
+    data = db_utils.get_filtered_transactions(*FILTERS["all"])
+
+    def run():
+        pdf_rows = []
+        agg, total_dep, total_exp = db_utils.aggregate_transactions(data, pdf_rows)
+        sorted(agg.keys(), key=lambda x: agg[x][1])
+    return run
+
+
+def _pdf_bench(rows):
+    def setup(ctx):
+        import pdf_utils
+        _use(ctx)
+        data = db_utils.get_filtered_transactions(*FILTERS["all"])[:rows]
+        pdf_rows = []
+        agg, total_dep, total_exp = db_utils.aggregate_transactions(data, pdf_rows)
+        cat_rows = [[k[0], k[1], str(agg[k][0]), f"{agg[k][1]:,.2f}"] for k in sorted(agg, key=lambda x: agg[x][1])]
+        data_dict = {
+            "title": "Transaction History Report",
+            "filter_info": "Benchmark",
+            "summary": [("Total Records", str(len(pdf_rows))), ("Net Balance", f"Rs. {(total_dep + total_exp):,.2f}")],
+            "cat_headers": ["Category", "Type", "Cnt", "Amount"],
+            "cat_rows": cat_rows,
+            "headers": ["Date", "Type", "Comment", "Amount"],
+            "rows": pdf_rows,
+        }
+        out = os.path.join(ctx.workdir, f"bench_{rows}.pdf")
+        return lambda: pdf_utils.generate_modern_pdf(out, data_dict)
+    return setup
+
+
+for _rows in PDF_ROWS:
+    benchmark(f"generate_modern_pdf/{_rows}_rows", once=True, repeat=3)(_pdf_bench(_rows))
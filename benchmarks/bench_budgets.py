@@ -0,0 +1,90 @@
+"""
+Monthly budgets: what the usage triggers add to the insert path (one add_transaction_db
+per row, and one 10,000-row executemany), against the same ledger with the triggers
+dropped. Also times the reads that replace a SUM over the month (the dashboard's status,
+the warning after a save) and the full verify and recompute.
+"""
+import os
+import shutil
+import sqlite3
+
+import db_utils
+import budget_utils
+from harness import benchmark
+
+INSERTS = 200
+BULK = 10_000
+BUDGETS = ("groceries", "rent", "fuel", "electricity bill", "dining out", "shopping")
+MONTH = "2025-06"
+
+
+def _copy(ctx, name, budgets):
+    path = os.path.join(ctx.workdir, f"{name}_{ctx.label}.db")
+    shutil.copyfile(ctx.db_path, path)
+    conn = sqlite3.connect(path)
+    if budgets:
+        conn.executemany("INSERT OR REPLACE INTO budgets (key, monthly_limit) VALUES (?, 10000)", [(k,) for k in BUDGETS])
+    else:
+        for trigger in ("budget_insert", "budget_update", "budget_delete"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.commit()
+    conn.close()
+    db_utils.DB_FILE = path
+
+    def teardown():
+        db_utils.close_writers()
+        os.remove(path)
+    return path, teardown
+
+
+def _insert_bench(budgets):
+    def setup(ctx):
+        _, teardown = _copy(ctx, "budgets_on" if budgets else "budgets_off", budgets)
+
+        def run():
+            for i in range(INSERTS):
+                db_utils.add_transaction_db("2025-06-15 12:00", "Base Expense", BUDGETS[i % len(BUDGETS)], 100.0 + i)
+        return run, teardown
+    return setup
+
+
+def _bulk_bench(budgets):
+    def setup(ctx):
+        path, teardown = _copy(ctx, "budgets_bulk_on" if budgets else "budgets_bulk_off", budgets)
+        rows = [("2025-06-15 12:00", "Base Expense", BUDGETS[i % len(BUDGETS)], -100.0 - i) for i in range(BULK)]
+
+        def run():
+            db_utils.get_writer(path).executemany(
+                "INSERT INTO transactions (transaction_datetime, type, comment, amount) VALUES (?, ?, ?, ?)", rows)
+        return run, teardown
+    return setup
+
+
+benchmark(f"budgets/add_transaction_db x{INSERTS}/no_triggers")(_insert_bench(False))
+benchmark(f"budgets/add_transaction_db x{INSERTS}/triggers")(_insert_bench(True))
+benchmark(f"budgets/insert x{BULK}/no_triggers", repeat=3)(_bulk_bench(False))
+benchmark(f"budgets/insert x{BULK}/triggers", repeat=3)(_bulk_bench(True))
+
+
+@benchmark("budgets/status")
+def bench_status(ctx):
+    path, teardown = _copy(ctx, "budgets_status", True)
+    return (lambda: budget_utils.budget_status(MONTH, path)), teardown
+
+
+@benchmark("budgets/warning")
+def bench_warning(ctx):
+    path, teardown = _copy(ctx, "budgets_warning", True)
+    return (lambda: budget_utils.budget_warning(f"{MONTH}-15 12:00", "Groceries", -250.0, db_file=path)), teardown
+
+
+@benchmark("budgets/verify", repeat=3)
+def bench_verify(ctx):
+    path, teardown = _copy(ctx, "budgets_verify", True)
+    return (lambda: budget_utils.verify_usage(path)), teardown
+
+
+@benchmark("budgets/recompute", repeat=3)
+def bench_recompute(ctx):
+    path, teardown = _copy(ctx, "budgets_recompute", True)
+    return (lambda: budget_utils.recompute_usage(path)), teardown
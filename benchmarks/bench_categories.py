@@ -0,0 +1,60 @@
+"""
+Categorizer: a full re-categorize of the ledger with a realistic rule set (the first run
+changes every row, a re-run changes none), and the per-insert lookup for a new comment.
+"""
+import os
+import shutil
+
+import db_utils
+import category_utils
+from harness import benchmark
+
+RULES = [
+    ("Food", "keyword", "swiggy"), ("Food", "keyword", "zomato"), ("Food", "keyword", "restaurant"),
+    ("Groceries", "regex", r"\b(groceries|dmart|big basket|blinkit|zepto|vegetables|fruits|milk)\b"),
+    ("Transport", "regex", r"\b(petrol|uber|ola|train|flight|toll|parking|auto rickshaw)\b"),
+    ("Subscriptions", "regex", r"\b(netflix|spotify|youtube premium|internet|mobile recharge)\b"),
+    ("Bills", "keyword", "bill"), ("Shopping", "keyword", "amazon"), ("Shopping", "keyword", "flipkart"),
+    ("Health", "regex", r"\b(medicine|doctor|pharmacy|gym)\b"),
+]
+
+
+def _ledger_with_rules(ctx, name):
+    path = os.path.join(ctx.workdir, f"{name}_{ctx.label}.db")
+    shutil.copyfile(ctx.db_path, path)
+    db_utils.DB_FILE = path
+    db_utils.initialize_database()
+    for category, kind, pattern in RULES:
+        category_utils.add_rule(category, kind, pattern, db_file=path)
+    category_utils.add_rule("Income", "keyword", "salary", trans_type="Deposit", db_file=path)
+    # An amount-only rule ahead of the rest puts every expense row on the CASE path
+    category_utils.add_rule("Large Expense", "amount", trans_type="Base Expense", min_amount=20000, priority=50, db_file=path)
+    return path
+
+
+def _teardown(path):
+    def teardown():
+        db_utils.close_writers()
+        os.remove(path)
+    return teardown
+
+
+@benchmark("recategorize/first_run", repeat=1)
+def bench_first_run(ctx):
+    path = _ledger_with_rules(ctx, "recat_first")
+    return (lambda: category_utils.recategorize(path)), _teardown(path)
+
+
+@benchmark("recategorize/rerun", repeat=3)
+def bench_rerun(ctx):
+    path = _ledger_with_rules(ctx, "recat_rerun")
+    category_utils.recategorize(path)
+    return (lambda: category_utils.recategorize(path)), _teardown(path)
+
+
+@benchmark("categorize/new_comment", once=True, repeat=50)
+def bench_categorize(ctx):
+    path = _ledger_with_rules(ctx, "categorize")
+    categorizer = category_utils.get_categorizer(path)
+    counter = iter(range(10**9))
+    return (lambda: categorizer.categorize(f"swiggy order {next(counter)}", "Base Expense", 450.0)), _teardown(path)
@@ -0,0 +1,50 @@
+"""
+Comment autocomplete: building the prefix index from a ledger, and suggestion lookups on
+an index of 100k distinct comments (the target is well under 1 ms per keystroke).
+"""
+import random
+
+import db_utils
+from harness import benchmark
+from synthetic_ledger import VOCABULARY
+
+DISTINCT = 100_000
+PREFIXES = ("", "m", "misc", "misc 1", "misc 123", "sw", "zz")
+
+
+def _big_index():
+    rng = random.Random(7)
+    counts = {f"misc {i}": rng.randint(1, 5) for i in range(DISTINCT)}
+    for words in VOCABULARY.values():
+        for word in words:
+            counts[word] = rng.randint(100, 5000)
+    return db_utils.CommentIndex().build(counts)
+
+
+@benchmark("CommentIndex.load")
+def bench_load(ctx):
+    db_utils.DB_FILE = ctx.db_path
+    return lambda: db_utils.CommentIndex(ctx.db_path).load()
+
+
+@benchmark(f"CommentIndex.build/{DISTINCT // 1000}k_distinct", once=True, repeat=3)
+def bench_build(ctx):
+    return _big_index
+
+
+def _suggest(prefix):
+    def setup(ctx):
+        index = _big_index()
+        return lambda: index.suggest(prefix)
+    return setup
+
+
+for _prefix in PREFIXES:
+    benchmark(f"CommentIndex.suggest/{DISTINCT // 1000}k_distinct/'{_prefix}'", once=True, repeat=50)(_suggest(_prefix))
+
+
+@benchmark(f"CommentIndex.note/{DISTINCT // 1000}k_distinct", once=True, repeat=50)
+def bench_note(ctx):
+    index = _big_index()
+    counter = iter(range(10**9))
+    return lambda: index.note(f"misc {next(counter) % 500}")
@@ -0,0 +1,61 @@
+"""
+Bulk edits from the History view on 100k rows in one operation: by a ticked id list and
+by the filter predicate, a comment change (which also re-categorizes and adjusts the
+comment index), a date shift, and a delete. Each runs on a scratch copy of the ledger.
+"""
+import os
+import shutil
+
+import db_utils
+import edit_utils
+from harness import benchmark
+
+EDIT_ROWS = 100_000
+
+
+def _scratch(ctx, name):
+    path = os.path.join(ctx.workdir, f"{name}_{ctx.label}.db")
+    shutil.copyfile(ctx.db_path, path)
+    db_utils.DB_FILE = path
+    db_utils.get_comment_index(path)
+    conn = db_utils.connect(path)
+    ids = [row[0] for row in conn.execute("SELECT id FROM transactions WHERE id % ? = 0 LIMIT ?",
+                                          (max(1, ctx.rows // EDIT_ROWS), EDIT_ROWS))]
+    # The newest EDIT_ROWS rows, as a date-range filter
+    start = conn.execute("SELECT transaction_datetime FROM transactions ORDER BY transaction_datetime DESC LIMIT 1 OFFSET ?",
+                         (min(EDIT_ROWS, ctx.rows) - 1,)).fetchone()[0]
+    conn.close()
+    return path, ids, db_utils.filter_where(start, None, "All", "All")
+
+
+def _teardown(path):
+    def teardown():
+        db_utils.close_writers()
+        os.remove(path)
+    return teardown
+
+
+@benchmark("bulk_edit/comment_by_ids", repeat=3)
+def bench_comment_ids(ctx):
+    path, ids, _ = _scratch(ctx, "edit_ids")
+    counter = iter(range(10**6))
+    return (lambda: edit_utils.bulk_update(ids, comment=f"bulk fix {next(counter)}", db_file=path)), _teardown(path)
+
+
+@benchmark("bulk_edit/type_by_filter", repeat=3)
+def bench_type_filter(ctx):
+    path, _, where = _scratch(ctx, "edit_filter")
+    types = iter(db_utils.TRANSACTION_TYPES * 10)
+    return (lambda: edit_utils.bulk_update(where=where, trans_type=next(types), db_file=path)), _teardown(path)
+
+
+@benchmark("bulk_edit/shift_by_ids", repeat=3)
+def bench_shift(ctx):
+    path, ids, _ = _scratch(ctx, "edit_shift")
+    return (lambda: edit_utils.bulk_update(ids, shift_days=1, db_file=path)), _teardown(path)
+
+
+@benchmark("bulk_edit/delete_by_ids", repeat=1)
+def bench_delete(ctx):
+    path, ids, _ = _scratch(ctx, "edit_delete")
+    return (lambda: edit_utils.bulk_delete(ids, db_file=path)), _teardown(path)
@@ -0,0 +1,25 @@
+"""
+Whole-ledger data exports from the History filter: rows are fetched in FETCH_SIZE
+batches and streamed to the writer, so time grows with the row count and memory doesn't.
+XLSX and Parquet need openpyxl / pyarrow; without them the run lists them as skipped.
+"""
+import os
+
+import export_utils
+from harness import benchmark
+
+
+def _export(fmt):
+    def setup(ctx):
+        path = os.path.join(ctx.workdir, f"export_{ctx.label}.{fmt}")
+
+        def teardown():
+            if os.path.exists(path):
+                os.remove(path)
+        return (lambda: export_utils.export_filtered(path, fmt=fmt, db_file=ctx.db_path)), teardown
+    return setup
+
+
+benchmark("export/csv", repeat=1)(_export("csv"))
+benchmark("export/xlsx", repeat=1, requires=("openpyxl",))(_export("xlsx"))
+benchmark("export/parquet", repeat=1, requires=("pyarrow",))(_export("parquet"))
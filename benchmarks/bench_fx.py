@@ -0,0 +1,70 @@
+"""
+Multi-currency aggregates against the single-currency path: the dashboard totals, the
+report's per-category sums and the History sidebar aggregate, on the plain ledger, on a
+copy with 10% of rows in USD/EUR (daily rates for every day), and on that copy reported
+in USD (every row converted).
+"""
+import os
+import shutil
+import datetime
+
+import db_utils
+from harness import benchmark
+
+RATE_START = datetime.date(2015, 1, 1)
+RATE_DAYS = 12 * 366
+
+
+def _mixed_ledger(ctx):
+    path = os.path.join(ctx.workdir, f"fx_{ctx.label}.db")
+    if not os.path.exists(path):
+        shutil.copyfile(ctx.db_path, path)
+        db_utils.DB_FILE = path
+        db_utils.initialize_database()
+        conn = db_utils.connect(path)
+        conn.execute("UPDATE transactions SET currency = CASE id % 20 WHEN 0 THEN 'USD' ELSE 'EUR' END WHERE id % 20 IN (0, 1)")
+        days = [(RATE_START + datetime.timedelta(days=i)).isoformat() for i in range(RATE_DAYS)]
+        conn.executemany("INSERT OR REPLACE INTO fx_rates VALUES (?, ?, ?)",
+                         [(c, d, base + (i % 90) / 10) for c, base in (("USD", 70.0), ("EUR", 80.0)) for i, d in enumerate(days)])
+        conn.commit()
+        conn.close()
+        db_utils.close_writers()
+    return path
+
+
+def _use(path):
+    db_utils.DB_FILE = path
+    db_utils.forget_rate_table(path)
+
+
+VARIANTS = {
+    "base": (lambda ctx: ctx.db_path, None),
+    "mixed": (_mixed_ledger, None),
+    "mixed_usd": (_mixed_ledger, "USD"),
+}
+
+
+def _query_bench(fn, variant):
+    ledger, reporting = VARIANTS[variant]
+
+    def setup(ctx):
+        _use(ledger(ctx))
+        return lambda: fn(reporting)
+    return setup
+
+
+def _aggregate_bench(variant):
+    ledger, reporting = VARIANTS[variant]
+
+    def setup(ctx):
+        _use(ledger(ctx))
+        data = db_utils.get_filtered_transactions(None, None, "All", "All")
+        # Cold rate memo each run, as after a fresh filter
+        return lambda: db_utils.aggregate_transactions(data, reporting=reporting, rates=db_utils.RateTable.load())
+    return setup
+
+
+for _variant in VARIANTS:
+    benchmark(f"fx/get_summary_stats/{_variant}")(_query_bench(db_utils.get_summary_stats, _variant))
+    benchmark(f"fx/get_summary_by_comment/{_variant}")(_query_bench(db_utils.get_summary_by_comment, _variant))
+    benchmark(f"fx/aggregate_transactions/{_variant}")(_aggregate_bench(_variant))
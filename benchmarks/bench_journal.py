@@ -0,0 +1,104 @@
+"""
+Change journal: what the triggers add to the add_transaction_db path, and how long an
+incremental export and replay of 1,000 changes take.
+"""
+import os
+import shutil
+import sqlite3
+
+import db_utils
+import journal_utils
+from harness import benchmark
+
+INSERTS = 200
+CHANGES = 1000
+
+
+def _copy(ctx, name):
+    path = os.path.join(ctx.workdir, f"{name}_{ctx.label}.db")
+    shutil.copyfile(ctx.db_path, path)
+    return path
+
+
+def _insert_bench(journal):
+    def setup(ctx):
+        path = _copy(ctx, "journal_on" if journal else "journal_off")
+        if not journal:
+            conn = sqlite3.connect(path)
+            for trigger in ("journal_insert", "journal_update", "journal_delete"):
+                conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            conn.commit()
+            conn.close()
+        db_utils.DB_FILE = path
+
+        def run():
+            for i in range(INSERTS):
+                db_utils.add_transaction_db("2025-12-31 12:00", "Base Expense", f"bench {i}", 100.0 + i)
+
+        def teardown():
+            db_utils.close_writers()
+            os.remove(path)
+        return run, teardown
+    return setup
+
+
+benchmark(f"add_transaction_db x{INSERTS}/no_journal")(_insert_bench(False))
+benchmark(f"add_transaction_db x{INSERTS}/journal")(_insert_bench(True))
+
+
+def _with_changes(ctx):
+    """A copy with CHANGES journalled inserts/updates/deletes after its last export."""
+    path = _copy(ctx, "journal_src")
+    conn = sqlite3.connect(path)
+    # One journalled change, exported already, so the timed export is a delta and not a snapshot
+    conn.execute("UPDATE transactions SET amount = amount WHERE id = (SELECT MIN(id) FROM transactions)")
+    since = conn.execute("SELECT MAX(seq) FROM change_log").fetchone()[0]
+    conn.execute("INSERT OR REPLACE INTO journal_meta (key, value) VALUES ('exported_seq', ?)", (since,))
+    max_id = conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0] or 0
+    inserts = CHANGES * 8 // 10
+    conn.executemany("INSERT INTO transactions (transaction_datetime, type, comment, amount) VALUES (?, ?, ?, ?)",
+                     [("2025-12-31 12:00", "Base Expense", f"journal {i}", -10.0 - i) for i in range(inserts)])
+    conn.execute("UPDATE transactions SET amount = amount - 1 WHERE id IN (SELECT id FROM transactions WHERE id <= ? LIMIT ?)",
+                 (max_id, CHANGES // 10))
+    conn.execute("DELETE FROM transactions WHERE id IN (SELECT id FROM transactions WHERE id <= ? ORDER BY id DESC LIMIT ?)",
+                 (max_id, CHANGES - inserts - CHANGES // 10))
+    conn.commit()
+    conn.close()
+    return path, since
+
+
+@benchmark(f"journal export/{CHANGES}_changes")
+def bench_export(ctx):
+    path, since = _with_changes(ctx)
+    out_dir = os.path.join(ctx.workdir, "journal_out")
+
+    def teardown():
+        db_utils.close_writers()
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.remove(path)
+    return lambda: journal_utils.export_changes(out_dir, path, since), teardown
+
+
+@benchmark(f"journal apply/{CHANGES}_changes")
+def bench_apply(ctx):
+    path, since = _with_changes(ctx)
+    out_dir = os.path.join(ctx.workdir, "journal_apply")
+    delta = journal_utils.export_changes(out_dir, path, since)
+    source = journal_utils.read_journal_header(delta)["source"]
+    replica = _copy(ctx, "journal_replica")
+
+    def run():
+        # Rewind the replica to the export's start so every repeat replays the whole file
+        conn = sqlite3.connect(replica)
+        conn.execute("INSERT OR REPLACE INTO journal_meta (key, value) VALUES ('db_id', 'replica')")
+        conn.execute("INSERT OR REPLACE INTO journal_meta (key, value) VALUES (?, ?)", (f"applied:{source}", since))
+        conn.commit()
+        conn.close()
+        journal_utils.apply_changes([delta], replica)
+
+    def teardown():
+        db_utils.close_writers()
+        shutil.rmtree(out_dir, ignore_errors=True)
+        os.remove(path)
+        os.remove(replica)
+    return run, teardown
@@ -0,0 +1,43 @@
+"""
+Cross-ledger aggregation: the consolidated queries over N ledger files, run on one worker
+(serial) and on one worker per core. With enough cores the parallel time should stay
+close to a single ledger's instead of growing with N.
+"""
+import os
+import shutil
+
+import ledger_utils
+from harness import benchmark
+
+LEDGER_COUNTS = (4, 8)
+MAX_ROWS = 1_000_000
+
+
+def _ledgers(ctx, count):
+    """`count` copies of the benchmark ledger in a ledgers dir under the workdir."""
+    ledger_dir = os.path.join(ctx.workdir, f"ledgers_{ctx.label}_{count}")
+    os.makedirs(ledger_dir, exist_ok=True)
+    names = []
+    for i in range(count):
+        name = f"bench {i}"
+        path = os.path.join(ledger_dir, f"{name}.db")
+        if not os.path.exists(path):
+            shutil.copyfile(ctx.db_path, path)
+        names.append(name)
+    ledger_utils.LEDGERS_DIR = ledger_dir
+    return names
+
+
+def _consolidated(func, count, workers):
+    def setup(ctx):
+        names = _ledgers(ctx, count)
+        return lambda: func(names, workers)
+    return setup
+
+
+for _count in LEDGER_COUNTS:
+    for _mode, _workers in (("serial", 1), ("parallel", os.cpu_count() or 1)):
+        benchmark(f"get_consolidated_summary/{_count}_ledgers/{_mode}", max_rows=MAX_ROWS)(
+            _consolidated(ledger_utils.get_consolidated_summary, _count, _workers))
+        benchmark(f"get_consolidated_summary_by_comment/{_count}_ledgers/{_mode}", max_rows=MAX_ROWS)(
+            _consolidated(ledger_utils.get_consolidated_summary_by_comment, _count, _workers))
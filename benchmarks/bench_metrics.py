@@ -0,0 +1,49 @@
+"""
+Cost of the runtime metrics: 100k calls through an instrumented function with collection
+off (one flag check) and on (a lock and a bisect), against the bare function; and one
+scrape of the Prometheus text with every db_utils function in the registry.
+"""
+import metrics_utils
+from harness import benchmark
+
+CALLS = 100_000
+
+
+def _noop():
+    return None
+
+
+def _calls(fn):
+    def run():
+        for _ in range(CALLS):
+            fn()
+    return run
+
+
+def _with_metrics(on):
+    def setup(ctx):
+        saved = metrics_utils.enabled
+        metrics_utils.enabled = on
+        metrics_utils.REGISTRY.reset()
+
+        def teardown():
+            metrics_utils.enabled = saved
+        return _calls(metrics_utils.db_call(_noop)), teardown
+    return setup
+
+
+benchmark("metrics/100k_calls/bare", once=True, repeat=5)(lambda ctx: _calls(_noop))
+benchmark("metrics/100k_calls/off", once=True, repeat=5)(_with_metrics(False))
+benchmark("metrics/100k_calls/on", once=True, repeat=5)(_with_metrics(True))
+
+
+@benchmark("metrics/prometheus_text", once=True, repeat=20)
+def bench_scrape(ctx):
+    registry = metrics_utils.Registry()
+    for i in range(40):
+        labels = (("function", f"get_thing_{i}"),)
+        for j in range(200):
+            registry.observe("fmp_db_call_seconds", j / 1000, labels)
+    registry.inc("fmp_db_write_jobs_total", 1000)
+    registry.set("fmp_process_resident_bytes", 123_456_789)
+    return registry.prometheus_text
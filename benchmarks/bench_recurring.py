@@ -0,0 +1,86 @@
+"""
+Recurring rules expanded on read: 300 rules (mostly monthly, some weekly, yearly and
+daily) running for the last 20 years, stored on a scratch copy of the ledger. Times the
+expansion alone, the 20-year History filter with the occurrences merged into the query
+results (and without rules, for comparison), a one-month filter, and the dashboard
+totals, where base-currency rules are counted rather than expanded.
+"""
+import os
+import random
+import shutil
+import datetime
+
+import db_utils
+from harness import benchmark
+
+RULES = 300
+YEARS = 20
+UNITS = ["month"] * 12 + ["week"] * 5 + ["year"] * 2 + ["day"]
+
+
+def _scratch(ctx, name, rules=RULES):
+    path = os.path.join(ctx.workdir, f"{name}_{ctx.label}.db")
+    shutil.copyfile(ctx.db_path, path)
+    db_utils.DB_FILE = path
+    db_utils.initialize_database()
+    rng = random.Random(ctx.seed)
+    today = datetime.date.today()
+    rows = []
+    for i in range(rules):
+        start = today.replace(year=today.year - YEARS) + datetime.timedelta(days=rng.randrange(365))
+        trans_type = rng.choice(db_utils.TRANSACTION_TYPES)
+        rows.append((f"{start.isoformat()} {rng.randrange(24):02d}:00", rng.choice(UNITS), 1, trans_type,
+                     f"recurring {i}", db_utils.signed_amount(trans_type, rng.randrange(100, 50_000))))
+    conn = db_utils.connect(path)
+    conn.executemany("INSERT INTO recurring_rules (start_datetime, unit, every, type, comment, amount) VALUES (?, ?, ?, ?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+    def teardown():
+        db_utils.close_writers()
+        os.remove(path)
+    return path, teardown
+
+
+def _range():
+    today = datetime.date.today()
+    return today.replace(year=today.year - YEARS).isoformat(), today.isoformat()
+
+
+@benchmark("recurring/expand_20y", once=True, repeat=5)
+def bench_expand(ctx):
+    path, teardown = _scratch(ctx, "recurring_expand")
+    conn = db_utils.connect(path)
+    rules = db_utils.load_recurring(conn)
+    conn.close()
+    first, last = db_utils.recurring_range(*_range())
+    return (lambda: sum(1 for _ in db_utils.recurring_occurrences(rules, first, last))), teardown
+
+
+def _filter(rules, start_date):
+    def setup(ctx):
+        path, teardown = _scratch(ctx, f"recurring_filter_{rules}", rules)
+        start, end = _range()
+        start = start_date(end) if start_date else start
+        return (lambda: db_utils.get_filtered_transactions(start, end, "All", "All")), teardown
+    return setup
+
+
+def _month_start(end):
+    return end[:8] + "01"
+
+
+benchmark("recurring/filter_20y", repeat=3)(_filter(RULES, None))
+benchmark("recurring/filter_20y/no_rules", repeat=3)(_filter(0, None))
+benchmark("recurring/filter_month", repeat=5)(_filter(RULES, _month_start))
+
+
+def _summary(rules):
+    def setup(ctx):
+        _, teardown = _scratch(ctx, f"recurring_summary_{rules}", rules)
+        return db_utils.get_summary_stats, teardown
+    return setup
+
+
+benchmark("recurring/summary_stats", repeat=5)(_summary(RULES))
+benchmark("recurring/summary_stats/no_rules", repeat=5)(_summary(0))
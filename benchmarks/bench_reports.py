@@ -0,0 +1,89 @@
+"""
+Month-over-month and year-over-year comparisons on a ten-year ledger with 500 assigned
+categories: one conditional-aggregate pass over the compared date ranges, grouped by
+category id before the names are joined in.
+
+The report viewer benchmarks time what the Reports view does per interaction on a 100k
+line report: showing the first window, loading the rest, a find, and scrolling.
+"""
+import os
+import random
+import sqlite3
+import datetime
+
+import db_utils
+from harness import benchmark
+from synthetic_ledger import create_ledger
+from report_utils import ReportBuffer
+
+CATEGORY_COUNT = 500
+ANCHOR = datetime.date(2025, 12, 15)
+
+
+def _categorized_ledger(ctx):
+    path = os.path.join(ctx.workdir, f"reports_{ctx.label}.db")
+    if not os.path.exists(path):
+        create_ledger(path, ctx.rows, years=10)
+        conn = sqlite3.connect(path)
+        conn.executemany("INSERT INTO categories (name) VALUES (?)", [(f"Category {i}",) for i in range(CATEGORY_COUNT)])
+        rng = random.Random(42)
+        ids = [row[0] for row in conn.execute("SELECT id FROM transactions")]
+        conn.executemany("UPDATE transactions SET category_id = ? WHERE id = ?",
+                         [(rng.randint(1, CATEGORY_COUNT), i) for i in ids])
+        conn.commit()
+        conn.close()
+    return path
+
+
+def _comparison(period):
+    def setup(ctx):
+        db_utils.DB_FILE = _categorized_ledger(ctx)
+        return lambda: db_utils.get_period_comparison(period, ANCHOR)
+    return setup
+
+
+for _period in db_utils.COMPARISON_PERIODS:
+    benchmark(f"comparison/{_period}")(_comparison(_period))
+
+
+# --- Report viewer: 100k formatted lines, independent of the ledger size ---
+VIEWER_LINES = 100_000
+VIEWER_WINDOW = 40
+
+
+def _report_lines():
+    return (f"{f'Category {i}':<25} {'Base Expense':<12} {i % 997:>3} {-(i * 7.31) % 100000:>12.2f}"
+            for i in range(VIEWER_LINES))
+
+
+@benchmark("report_viewer/feed", once=True)
+def _viewer_feed(ctx):
+    return lambda: ReportBuffer().feed(_report_lines()).__next__()
+
+
+@benchmark("report_viewer/load_all", once=True)
+def _viewer_load(ctx):
+    def run():
+        buffer = ReportBuffer()
+        for _ in buffer.feed(_report_lines()):
+            pass
+    return run
+
+
+@benchmark("report_viewer/find", once=True)
+def _viewer_find(ctx):
+    buffer = ReportBuffer(_report_lines())
+    buffer.find("warmup")
+    return lambda: buffer.find("category 99")
+
+
+@benchmark("report_viewer/scroll_200_windows", once=True)
+def _viewer_scroll(ctx):
+    buffer = ReportBuffer(_report_lines())
+    buffer.find("category 99")
+
+    def run():
+        for offset in range(0, VIEWER_LINES, VIEWER_LINES // 200):
+            offset = buffer.clamp(offset, VIEWER_WINDOW)
+            [(line, buffer.match_number(i)) for i, line in enumerate(buffer.window(offset, VIEWER_WINDOW), offset)]
+    return run
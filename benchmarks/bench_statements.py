@@ -0,0 +1,39 @@
+"""
+Year-end batch statements: twelve monthly PDFs plus the annual one from one read of the
+ledger, rendered in one process and across a process pool. The read and aggregation are
+timed on their own as statements/build.
+"""
+import os
+import shutil
+import datetime
+
+import db_utils
+import statement_utils
+from harness import benchmark
+
+FIRST_MONTH = datetime.date(2025, 1, 1)
+LAST_MONTH = datetime.date(2025, 12, 1)
+
+
+def _out_dir(ctx, name):
+    path = os.path.join(ctx.workdir, f"{name}_{ctx.label}")
+    return path, lambda: shutil.rmtree(path, ignore_errors=True)
+
+
+@benchmark("statements/build", once=True, repeat=3)
+def bench_build(ctx):
+    periods = statement_utils.statement_periods(FIRST_MONTH, LAST_MONTH)
+    return lambda: statement_utils.build_statements(periods, db_file=ctx.db_path)
+
+
+def _export(workers):
+    def setup(ctx):
+        db_utils.DB_FILE = ctx.db_path
+        out_dir, teardown = _out_dir(ctx, f"statements_{workers or 'pool'}")
+        return (lambda: statement_utils.export_statements(FIRST_MONTH, LAST_MONTH, out_dir, workers=workers,
+                                                          db_file=ctx.db_path)), teardown
+    return setup
+
+
+benchmark("statements/export_year/serial", once=True, repeat=1)(_export(1))
+benchmark("statements/export_year/pool", once=True, repeat=1)(_export(None))
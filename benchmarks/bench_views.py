@@ -0,0 +1,96 @@
+"""
+Saved History views against re-running the filter. For three views ("Borrow, last 6
+months", "Base Expense, groceries, this year", "All time"):
+    views/filter/*          get_filtered_transactions over the same window (the baseline)
+    views/open/*            open_view with nothing changed since the last refresh
+    views/open_after_100/*  100 rows inserted in one writer job, then open_view (both timed)
+    views/slide_day/*       open_view one day later each run: the rolling window slides
+plus views/save/* for the first computation. Days are pinned to the end of the
+synthetic ledger, so the rolling windows hold rows.
+"""
+import os
+import shutil
+import datetime
+
+import db_utils
+import view_utils
+from harness import benchmark
+
+TODAY = datetime.date(2025, 12, 31)
+VIEWS = {
+    "borrow_6_months": view_utils.make_spec("6_months", "Borrow"),
+    "groceries_this_year": view_utils.make_spec("this_year", "Base Expense", "groceries"),
+    "all_time": view_utils.make_spec("all"),
+}
+INSERTS = 100
+
+
+def _saved(ctx, name):
+    """A copy of the ledger with the view saved and current as of TODAY."""
+    path = os.path.join(ctx.workdir, f"views_{name}_{ctx.label}.db")
+    shutil.copyfile(ctx.db_path, path)
+    db_utils.DB_FILE = path
+    view_utils.save_view(name, VIEWS[name], path, TODAY)
+
+    def teardown():
+        db_utils.close_writers()
+        os.remove(path)
+    return path, teardown
+
+
+def _filter(name):
+    def setup(ctx):
+        db_utils.DB_FILE = ctx.db_path
+        spec = VIEWS[name]
+        start, end = view_utils.view_window(spec, TODAY)
+        return lambda: db_utils.get_filtered_transactions(start, end, spec["type"], spec["comment"])
+    return setup
+
+
+def _save(name):
+    def setup(ctx):
+        path = os.path.join(ctx.workdir, f"views_save_{ctx.label}.db")
+        shutil.copyfile(ctx.db_path, path)
+
+        def teardown():
+            db_utils.close_writers()
+            os.remove(path)
+        return (lambda: view_utils.save_view(name, VIEWS[name], path, TODAY)), teardown
+    return setup
+
+
+def _open(name):
+    def setup(ctx):
+        path, teardown = _saved(ctx, name)
+        return (lambda: view_utils.open_view(name, path, TODAY)), teardown
+    return setup
+
+
+def _open_after_inserts(name):
+    def setup(ctx):
+        path, teardown = _saved(ctx, name)
+        rows = [(f"{TODAY} 12:{i % 60:02d}", "Base Expense" if i % 2 else "Borrow", "groceries" if i % 3 else "loan",
+                 -10.0 - i) for i in range(INSERTS)]
+
+        def run():
+            db_utils.get_writer(path).executemany(
+                "INSERT INTO transactions (transaction_datetime, type, comment, amount) VALUES (?, ?, ?, ?)", rows)
+            view_utils.open_view(name, path, TODAY)
+        return run, teardown
+    return setup
+
+
+def _slide(name):
+    def setup(ctx):
+        path, teardown = _saved(ctx, name)
+        days = iter(range(1, 10_000))
+        return (lambda: view_utils.open_view(name, path, TODAY + datetime.timedelta(days=next(days)))), teardown
+    return setup
+
+
+for _name in VIEWS:
+    benchmark(f"views/filter/{_name}", repeat=3)(_filter(_name))
+    benchmark(f"views/save/{_name}", repeat=1)(_save(_name))
+    benchmark(f"views/open/{_name}", repeat=3)(_open(_name))
+    benchmark(f"views/open_after_{INSERTS}/{_name}", repeat=3)(_open_after_inserts(_name))
+benchmark("views/slide_day/borrow_6_months", repeat=3)(_slide("borrow_6_months"))
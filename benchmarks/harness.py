@@ -0,0 +1,153 @@
+"""
+Tiny benchmark harness: a registry of benchmark functions, a timer, JSON output and
+comparison against a stored baseline. Benchmarks live in benchmarks/bench_*.py and
+register themselves with @benchmark.
+"""
+import gc
+import importlib.util
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+BASELINE_FILE = os.path.join(BENCH_DIR, "baseline.json")
+
+# Differences below this are timer noise, never a regression
+NOISE_FLOOR = 0.002
+
+SIZE_LABELS = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+BENCHMARKS = []
+
+
+class Benchmark:
+    def __init__(self, name, func, once=False, max_rows=None, repeat=None, requires=()):
+        self.name = name
+        self.func = func
+        self.once = once            # run only against the first ledger size
+        self.max_rows = max_rows    # skip ledgers larger than this
+        self.repeat = repeat
+        self.requires = requires    # optional libraries it needs
+
+    def missing(self):
+        """The required libraries that aren't installed."""
+        return [module for module in self.requires if importlib.util.find_spec(module) is None]
+
+
+def benchmark(name, once=False, max_rows=None, repeat=None, requires=()):
+    """
+    Registers a benchmark. The decorated function gets a Context and returns the
+    callable to time, or (callable, teardown). A benchmark whose `requires` libraries
+    are missing is reported as skipped rather than run.
+    """
+    def decorator(func):
+        BENCHMARKS.append(Benchmark(name, func, once, max_rows, repeat, requires))
+        return func
+    return decorator
+
+
+class Context:
+    def __init__(self, db_path, rows, label, seed, workdir):
+        self.db_path = db_path
+        self.rows = rows
+        self.label = label
+        self.seed = seed
+        self.workdir = workdir
+
+    def connect(self):
+        return sqlite3.connect(self.db_path)
+
+
+def parse_sizes(text):
+    sizes = []
+    for part in text.split(","):
+        part = part.strip().lower()
+        if not part:
+            continue
+        sizes.append((part, SIZE_LABELS[part] if part in SIZE_LABELS else int(part)))
+    return sizes
+
+
+def time_callable(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return {
+        "median_s": statistics.median(samples),
+        "min_s": min(samples),
+        "max_s": max(samples),
+        "repeat": repeat,
+    }
+
+
+def run_benchmark(bench, ctx, repeat):
+    prepared = bench.func(ctx)
+    fn, teardown = prepared if isinstance(prepared, tuple) else (prepared, None)
+    try:
+        result = time_callable(fn, bench.repeat or repeat)
+    finally:
+        if teardown:
+            teardown()
+    result["rows"] = ctx.rows
+    return result
+
+
+def metadata(args):
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "sizes": args.sizes,
+    }
+
+
+def load_baseline(path=BASELINE_FILE):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def compare(results, baseline, tolerance):
+    """Returns {key: {...}} with the ratio against the baseline median and a status."""
+    comparison = {}
+    base_results = (baseline or {}).get("results", {})
+    for key, result in results.items():
+        base = base_results.get(key)
+        if not base:
+            comparison[key] = {"status": "new"}
+            continue
+        ratio = result["median_s"] / base["median_s"] if base["median_s"] else float("inf")
+        delta = result["median_s"] - base["median_s"]
+        if ratio > 1 + tolerance and delta > NOISE_FLOOR:
+            status = "regression"
+        elif ratio < 1 - tolerance and -delta > NOISE_FLOOR:
+            status = "improved"
+        else:
+            status = "ok"
+        comparison[key] = {"status": status, "ratio": ratio, "baseline_median_s": base["median_s"]}
+    return comparison
+
+
+def format_seconds(value):
+    if value >= 1:
+        return f"{value:8.2f} s "
+    if value >= 0.001:
+        return f"{value * 1000:8.2f} ms"
+    return f"{value * 1_000_000:8.1f} us"
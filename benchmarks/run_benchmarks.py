@@ -0,0 +1,98 @@
+"""
+Runs every benchmark in benchmarks/bench_*.py against synthetic ledgers and writes a
+JSON report, compared against benchmarks/baseline.json when one is stored.
+
+    python benchmarks/run_benchmarks.py --sizes 10k,100k,1m
+    python benchmarks/run_benchmarks.py --sizes 10k,100k --save-baseline     (before a release)
+    python benchmarks/run_benchmarks.py --sizes 10k,100k --check             (exit 1 on regressions)
+"""
+import argparse
+import glob
+import importlib
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import harness
+from harness import BENCHMARKS, Context, parse_sizes, format_seconds
+from synthetic_ledger import DEFAULT_SEED, cached_ledger
+
+
+def load_benchmarks():
+    for path in sorted(glob.glob(os.path.join(harness.BENCH_DIR, "bench_*.py"))):
+        importlib.import_module(os.path.splitext(os.path.basename(path))[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Finance Manager Pro benchmark suite")
+    parser.add_argument("--sizes", default="10k,100k", help="Ledger sizes: 10k,100k,1m,10m or row counts")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--filter", default="", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--out", default="bench_results.json", help="Where to write the JSON report")
+    parser.add_argument("--baseline", default=harness.BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true", help="Store this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before flagging (0.25 = 25%%)")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if any benchmark regressed")
+    args = parser.parse_args()
+
+    load_benchmarks()
+    sizes = parse_sizes(args.sizes)
+    baseline = harness.load_baseline(args.baseline)
+    results = {}
+    skipped = {}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        for index, (label, rows) in enumerate(sizes):
+            print(f"== {label}: {rows:,} rows ==", flush=True)
+            db_path = cached_ledger(rows, args.seed)
+            ctx = Context(db_path, rows, label, args.seed, workdir)
+            for bench in BENCHMARKS:
+                if args.filter and args.filter not in bench.name:
+                    continue
+                if bench.once and index > 0:
+                    continue
+                if bench.max_rows and rows > bench.max_rows:
+                    continue
+                key = bench.name if bench.once else f"{bench.name}@{label}"
+                missing = bench.missing()
+                if missing:
+                    skipped[key] = f"{', '.join(missing)} not installed"
+                    print(f"  {key:<50} skipped: {skipped[key]}", flush=True)
+                    continue
+                result = harness.run_benchmark(bench, ctx, args.repeat)
+                results[key] = result
+                print(f"  {key:<50} {format_seconds(result['median_s'])}", flush=True)
+
+    comparison = harness.compare(results, baseline, args.tolerance)
+    report = {"meta": harness.metadata(args), "results": results, "skipped": skipped, "comparison": comparison}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {args.out}")
+    if skipped:
+        print(f"Skipped (library not installed): {', '.join(sorted(skipped))}")
+
+    regressions = [k for k, c in comparison.items() if c["status"] == "regression"]
+    if baseline:
+        for key in regressions:
+            c = comparison[key]
+            print(f"  REGRESSION {key}: {c['ratio']:.2f}x baseline "
+                  f"({format_seconds(c['baseline_median_s']).strip()} -> {format_seconds(results[key]['median_s']).strip()})")
+        improved = sum(1 for c in comparison.values() if c["status"] == "improved")
+        print(f"Compared with baseline: {len(regressions)} regressions, {improved} improved")
+
+    if args.save_baseline:
+        merged = dict((baseline or {}).get("results", {}))
+        merged.update(results)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"meta": report["meta"], "results": merged}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+
+    if args.check and regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
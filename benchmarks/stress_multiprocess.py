@@ -0,0 +1,185 @@
+"""
+Multi-process stress test for concurrent finance.db access.
+
+Several processes (think: two app windows, the CLI and a relaunching updater) each run
+writer threads calling add_transaction_db and reader threads running dashboard queries
+against one database. Reports insert throughput, read throughput, write latency, lock
+errors and how many change notifications a watching process received.
+
+    python benchmarks/stress_multiprocess.py --processes 4 --writers 4 --rows 500
+    python benchmarks/stress_multiprocess.py --mode legacy     (the old connect/insert/commit per row on a rollback journal)
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_utils
+
+
+def legacy_insert(datetime_str, trans_type, comment, amount):
+    """add_transaction_db as it was before the write queue: a fresh default connection and commit per row."""
+    conn = sqlite3.connect(db_utils.DB_FILE)
+    conn.execute("INSERT INTO transactions (transaction_datetime, type, comment, amount) VALUES (?, ?, ?, ?)",
+                 (datetime_str, trans_type, comment, -abs(amount)))
+    conn.commit()
+    conn.close()
+
+
+def legacy_read():
+    conn = sqlite3.connect(db_utils.DB_FILE)
+    conn.execute("SELECT SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), "
+                 "SUM(CASE WHEN amount < 0 THEN amount ELSE 0 END) FROM transactions").fetchone()
+    conn.close()
+
+
+def worker_process(db_file, mode, writers, readers, rows, start_at, out_queue):
+    db_utils.DB_FILE = db_file
+    stats = {"inserted": 0, "write_errors": 0, "lock_errors": 0, "reads": 0, "read_errors": 0, "latencies": []}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def write_loop(tid):
+        for i in range(rows):
+            t0 = time.perf_counter()
+            try:
+                if mode == "legacy":
+                    legacy_insert("2025-06-01 10:00", "Base Expense", f"stress {os.getpid()} {tid}", i + 1)
+                    ok = True
+                else:
+                    ok = db_utils.add_transaction_db("2025-06-01 10:00", "Base Expense", f"stress {os.getpid()} {tid}", i + 1)
+                error = None if ok else "failed"
+            except sqlite3.OperationalError as e:
+                error = str(e)
+            elapsed = time.perf_counter() - t0
+            with lock:
+                stats["latencies"].append(elapsed)
+                if error is None:
+                    stats["inserted"] += 1
+                else:
+                    stats["write_errors"] += 1
+                    if "locked" in error or "busy" in error:
+                        stats["lock_errors"] += 1
+
+    def read_loop():
+        while not done.is_set():
+            try:
+                if mode == "legacy":
+                    legacy_read()
+                else:
+                    db_utils.get_summary_stats()
+                    db_utils.get_recent_transactions(8)
+                with lock:
+                    stats["reads"] += 1
+            except sqlite3.OperationalError:
+                with lock:
+                    stats["read_errors"] += 1
+
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    reader_threads = [threading.Thread(target=read_loop) for _ in range(readers)]
+    writer_threads = [threading.Thread(target=write_loop, args=(t,)) for t in range(writers)]
+    for t in reader_threads + writer_threads:
+        t.start()
+    for t in writer_threads:
+        t.join()
+    done.set()
+    for t in reader_threads:
+        t.join()
+    if mode != "legacy":
+        db_utils.close_writers()
+    out_queue.put(stats)
+
+
+def run(mode, processes, writers, readers, rows):
+    with tempfile.TemporaryDirectory() as workdir:
+        db_file = os.path.join(workdir, "finance.db")
+        db_utils.DB_FILE = db_file
+        db_utils.initialize_database()
+        if mode == "legacy":
+            conn = sqlite3.connect(db_file)
+            conn.execute("PRAGMA journal_mode=DELETE")
+            conn.close()
+
+        notifications = []
+        watcher = None
+        if mode != "legacy":
+            watcher = db_utils.ChangeWatcher(lambda: notifications.append(time.time()), db_file, interval=0.05).start()
+
+        # Separate interpreters, like separate app instances (and no forking under live SQLite threads)
+        mp = multiprocessing.get_context("spawn")
+        out_queue = mp.Queue()
+        start_at = time.time() + 3.0
+        procs = [mp.Process(target=worker_process,
+                                         args=(db_file, mode, writers, readers, rows, start_at, out_queue))
+                 for _ in range(processes)]
+        for p in procs:
+            p.start()
+        results = [out_queue.get() for _ in procs]
+        for p in procs:
+            p.join()
+        elapsed = time.time() - start_at
+        time.sleep(0.2)
+        if watcher:
+            watcher.stop()
+
+        conn = sqlite3.connect(db_file)
+        stored = conn.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        conn.close()
+
+    latencies = sorted(l for r in results for l in r["latencies"])
+    inserted = sum(r["inserted"] for r in results)
+    return {
+        "mode": mode,
+        "processes": processes,
+        "writers_per_process": writers,
+        "readers_per_process": readers,
+        "attempted": processes * writers * rows,
+        "inserted": inserted,
+        "stored": stored,
+        "write_errors": sum(r["write_errors"] for r in results),
+        "lock_errors": sum(r["lock_errors"] for r in results),
+        "read_errors": sum(r["read_errors"] for r in results),
+        "reads": sum(r["reads"] for r in results),
+        "elapsed_s": elapsed,
+        "inserts_per_s": inserted / elapsed if elapsed else 0,
+        "reads_per_s": sum(r["reads"] for r in results) / elapsed if elapsed else 0,
+        "write_latency_median_ms": statistics.median(latencies) * 1000 if latencies else None,
+        "write_latency_p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+        "change_notifications": len(notifications) if mode != "legacy" else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-process finance.db stress test")
+    parser.add_argument("--mode", choices=["queue", "legacy", "both"], default="both")
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--writers", type=int, default=4, help="Writer threads per process")
+    parser.add_argument("--readers", type=int, default=2, help="Reader threads per process")
+    parser.add_argument("--rows", type=int, default=250, help="Inserts per writer thread")
+    parser.add_argument("--out", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    modes = ["legacy", "queue"] if args.mode == "both" else [args.mode]
+    reports = [run(mode, args.processes, args.writers, args.readers, args.rows) for mode in modes]
+    for r in reports:
+        print(f"{r['mode']:>7}: {r['inserted']:>6}/{r['attempted']} rows stored in {r['elapsed_s']:.2f}s "
+              f"({r['inserts_per_s']:,.0f} inserts/s, {r['reads_per_s']:,.0f} reads/s) | "
+              f"lock errors {r['lock_errors']} writes / {r['read_errors']} reads | "
+              f"write p50 {r['write_latency_median_ms']:.1f} ms p99 {r['write_latency_p99_ms']:.1f} ms"
+              + (f" | {r['change_notifications']} change notifications" if r["change_notifications"] is not None else ""))
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""
+Deterministic synthetic ledgers for benchmarks.
+
+Rows follow the real app's shape: mostly Base Expense, some Deposit and Borrow, amounts
+signed the way add_transaction_db signs them, free-text comments drawn from a skewed
+vocabulary (with the case/whitespace/reference-number noise users actually type), and
+timestamps spread over several years.
+
+    python benchmarks/synthetic_ledger.py 1m --out ledger_1m.db
+"""
+import argparse
+import datetime
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import db_utils
+
+DEFAULT_SEED = 42
+END_DATE = datetime.datetime(2025, 12, 31, 23, 59)
+YEARS = 6
+BATCH = 50_000
+
+TYPE_WEIGHTS = [("Base Expense", 0.80), ("Deposit", 0.12), ("Borrow", 0.08)]
+
+VOCABULARY = {
+    "Base Expense": [
+        "groceries", "swiggy", "zomato", "rent", "electricity bill", "petrol", "uber", "ola",
+        "amazon", "flipkart", "netflix", "mobile recharge", "internet", "medicine", "doctor",
+        "gym", "movie", "restaurant", "coffee", "milk", "vegetables", "fruits", "water bill",
+        "gas cylinder", "insurance", "school fees", "tuition", "books", "clothes", "shoes",
+        "salon", "laundry", "maid", "car service", "bike service", "parking", "toll", "train",
+        "flight", "hotel", "gift", "donation", "emi", "credit card", "spotify", "youtube premium",
+        "dmart", "big basket", "blinkit", "zepto", "pharmacy", "stationery", "electronics",
+        "furniture", "repairs", "pet food", "snacks", "bakery", "chai", "auto rickshaw",
+    ],
+    "Deposit": [
+        "salary", "bonus", "interest", "dividend", "refund", "cashback", "freelance",
+        "rent received", "gift received", "loan repaid", "tax refund", "sold items",
+    ],
+    "Borrow": [
+        "loan from friend", "personal loan", "borrowed from dad", "credit line", "advance salary",
+        "borrowed from brother", "office advance",
+    ],
+}
+
+AMOUNTS = {
+    "Base Expense": (6.0, 1.1),   # lognormal mu/sigma: median ~400
+    "Deposit": (10.2, 0.9),       # median ~27k
+    "Borrow": (9.0, 0.8),         # median ~8k
+}
+
+
+def _zipf_weights(n, s=1.1):
+    return [1.0 / (rank + 1) ** s for rank in range(n)]
+
+
+def _noisy(rng, comment):
+    """The spelling noise clean_comment_sql has to cope with."""
+    roll = rng.random()
+    if roll < 0.10:
+        return comment.upper()
+    if roll < 0.20:
+        return comment.title()
+    if roll < 0.25:
+        return f" {comment} "
+    if roll < 0.28:
+        return comment + "\n"
+    if roll < 0.33:
+        return f"{comment.upper()}*{rng.randint(1000, 9999)}"
+    if roll < 0.38:
+        return f"{comment} order"
+    return comment
+
+
+def generate_rows(count, seed=DEFAULT_SEED, years=YEARS, end=END_DATE, distinct_tail=None):
+    """
+    Yields (transaction_datetime, type, comment, amount) tuples. distinct_tail adds that many
+    rare one-off comments so the number of distinct categories grows with the ledger.
+    """
+    rng = random.Random(seed)
+    types = [t for t, _ in TYPE_WEIGHTS]
+    type_weights = [w for _, w in TYPE_WEIGHTS]
+    vocab_weights = {t: _zipf_weights(len(words)) for t, words in VOCABULARY.items()}
+    if distinct_tail is None:
+        distinct_tail = max(count // 50, 10)
+
+    start = end - datetime.timedelta(days=365 * years)
+    span_minutes = int((end - start).total_seconds() // 60)
+
+    for _ in range(count):
+        trans_type = rng.choices(types, type_weights)[0]
+        if trans_type == "Base Expense" and rng.random() < 0.05:
+            comment = f"misc {rng.randrange(distinct_tail)}"
+        elif rng.random() < 0.02:
+            comment = None
+        else:
+            comment = _noisy(rng, rng.choices(VOCABULARY[trans_type], vocab_weights[trans_type])[0])
+
+        mu, sigma = AMOUNTS[trans_type]
+        amount = round(rng.lognormvariate(mu, sigma), 2)
+        amount = abs(amount) if trans_type == "Deposit" else -abs(amount)
+
+        dt = start + datetime.timedelta(minutes=rng.randrange(span_minutes))
+        yield dt.strftime("%Y-%m-%d %H:%M"), trans_type, comment, amount
+
+
+def create_ledger(path, count, seed=DEFAULT_SEED, **kwargs):
+    """Creates a ledger with the app's own schema and fills it with `count` synthetic rows."""
+    if os.path.exists(path):
+        os.remove(path)
+    saved = db_utils.DB_FILE
+    db_utils.DB_FILE = path
+    try:
+        db_utils.initialize_database()
+    finally:
+        db_utils.DB_FILE = saved
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA journal_mode=MEMORY")   # bulk load outside WAL; initialize_database turns it back on
+    # The generated rows are history from before the change journal existed
+    conn.execute("DROP TRIGGER IF EXISTS journal_insert")
+    # Budget usage is rebuilt in one GROUP BY by the initialize_database below instead of row by row
+    conn.execute("DROP TRIGGER IF EXISTS budget_insert")
+    rows = generate_rows(count, seed, **kwargs)
+    while True:
+        batch = [row for _, row in zip(range(BATCH), rows)]
+        if not batch:
+            break
+        conn.executemany(
+            "INSERT INTO transactions (transaction_datetime, type, comment, amount) VALUES (?, ?, ?, ?)", batch)
+    conn.commit()
+    conn.close()
+
+    db_utils.DB_FILE = path
+    try:
+        db_utils.initialize_database()
+    finally:
+        db_utils.DB_FILE = saved
+    return path
+
+
+def cached_ledger(count, seed=DEFAULT_SEED, cache_dir=None):
+    """Returns a generated ledger from the temp cache, building it on first use."""
+    cache_dir = cache_dir or os.path.join(tempfile.gettempdir(), "fmp_bench")
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"ledger_{count}_{seed}.db")
+    if not os.path.exists(path):
+        tmp_path = path + ".building"
+        create_ledger(tmp_path, count, seed)
+        os.replace(tmp_path, path)
+    # Bring cached ledgers from older runs up to the current schema
+    saved = db_utils.DB_FILE
+    db_utils.DB_FILE = path
+    try:
+        db_utils.initialize_database()
+    finally:
+        db_utils.DB_FILE = saved
+    return path
+
+
+if __name__ == "__main__":
+    from harness import parse_sizes
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic finance.db")
+    parser.add_argument("size", help="Row count: 10k, 100k, 1m, 10m or a number")
+    parser.add_argument("--out", default="finance_synthetic.db")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    args = parser.parse_args()
+
+    (_, count), = parse_sizes(args.size)
+    create_ledger(args.out, count, args.seed)
+    print(f"Wrote {count:,} rows to {args.out}")
@@ -0,0 +1,198 @@
+"""
+Monthly budgets per category: a limit on what a category (or, for rows no rule has
+categorized, a comment) may spend in a calendar month, in the base currency.
+
+What each (month, category) has spent is kept in budget_usage by triggers on the
+transactions table (see db_utils.create_budgets), whichever path writes the row:
+add_transaction_db, bulk edits, re-categorizing, the API. Reading a
+budget is a primary-key seek; the month's rows are never summed again. Recurring
+occurrences that are not materialized are not rows, so they are added from their rules.
+
+verify_usage() compares the counters against a fresh SUM over the ledger and
+recompute_usage() rebuilds them from it.
+
+    python budget_utils.py set finance.db groceries 12000
+    python budget_utils.py status finance.db --month 2025-06
+    python budget_utils.py verify finance.db
+"""
+import sqlite3
+import os
+import sys
+import time
+import logging
+import argparse
+import datetime
+
+import db_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+# Differences below this are float rounding from adding and removing amounts, not drift
+TOLERANCE = 0.005
+
+def current_month():
+    return datetime.date.today().strftime("%Y-%m")
+
+def _month_days(month):
+    """First and last day of a 'YYYY-MM' month, the last capped at today like every recurring read."""
+    first = datetime.date.fromisoformat(f"{month}-01")
+    following = db_utils._month_start(first, -1)
+    return first, min(following - datetime.timedelta(days=1), datetime.date.today())
+
+def set_budget(key, monthly_limit, db_file=None):
+    """Sets (or replaces) the monthly limit of a category or comment."""
+    key = db_utils.normalize_comment(key)
+    if not key:
+        raise ValueError("A budget needs a category or comment")
+    if float(monthly_limit) <= 0:
+        raise ValueError("The monthly limit must be positive")
+    db_utils.get_writer(db_file).execute(
+        "INSERT INTO budgets (key, monthly_limit) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET monthly_limit = excluded.monthly_limit",
+        (key, float(monthly_limit)))
+
+def remove_budget(key, db_file=None):
+    def job(conn):
+        return conn.execute("DELETE FROM budgets WHERE key = ?", (db_utils.normalize_comment(key),)).rowcount > 0
+    return db_utils.get_writer(db_file).submit(job).result()
+
+def list_budgets(db_file=None):
+    """[(key, monthly_limit)] by key."""
+    conn = db_utils.connect(db_file)
+    try:
+        return conn.execute("SELECT key, monthly_limit FROM budgets ORDER BY key").fetchall()
+    finally:
+        conn.close()
+
+def _recurring_spent(conn, month):
+    """{key: expense} of the month's recurring occurrences that are not rows yet."""
+    rules = db_utils.load_recurring(conn)
+    if not rules:
+        return {}
+    spent = {}
+    for (key, _), (_, total) in db_utils.recurring_totals(rules, *_month_days(month)).items():
+        if total < 0:
+            spent[key] = spent.get(key, 0.0) - total
+    return spent
+
+def budget_status(month=None, db_file=None):
+    """[(key, monthly_limit, spent)] for a 'YYYY-MM' month (default this one), the most used first."""
+    month = month or current_month()
+    conn = db_utils.connect(db_file)
+    try:
+        rows = conn.execute('''
+            SELECT b.key, b.monthly_limit, COALESCE(u.spent, 0)
+            FROM budgets b LEFT JOIN budget_usage u ON u.month = ? AND u.key = b.key
+        ''', (month,)).fetchall()
+        recurring = _recurring_spent(conn, month) if rows else {}
+    finally:
+        conn.close()
+    status = [(key, limit, spent + recurring.get(key, 0.0)) for key, limit, spent in rows]
+    return sorted(status, key=lambda row: row[2] / row[1], reverse=True)
+
+def budget_key(conn, comment, category_id=None):
+    """The key a transaction counts against: its category's name, else its cleaned comment."""
+    if category_id:
+        row = conn.execute("SELECT LOWER(name) FROM categories WHERE id = ?", (category_id,)).fetchone()
+        if row:
+            return row[0]
+    return db_utils.normalize_comment(comment)
+
+def budget_warning(datetime_str, comment, amount, category_id=None, currency=None, db_file=None):
+    """
+    The warning to show after saving an expense, when it took its category over the
+    month's limit; None otherwise (no budget, not an expense, or already over before).
+    """
+    if amount >= 0:
+        return None
+    conn = db_utils.connect(db_file)
+    try:
+        key = budget_key(conn, comment, category_id)
+        month = datetime_str[:7]
+        row = conn.execute('''
+            SELECT b.monthly_limit, COALESCE(u.spent, 0)
+            FROM budgets b LEFT JOIN budget_usage u ON u.month = ? AND u.key = b.key WHERE b.key = ?
+        ''', (month, key)).fetchone()
+        if row is None:
+            return None
+        limit, spent = row
+        spent += _recurring_spent(conn, month).get(key, 0.0)
+    finally:
+        conn.close()
+    currency = db_utils.normalize_currency(currency)
+    this = -amount if currency is None else -(db_utils.get_rate_table(db_file).convert(amount, currency, datetime_str[:10]) or 0.0)
+    if spent > limit >= spent - this:
+        return (f"Over budget: {key.title()} has spent {db_utils.format_money(spent)} "
+                f"of {db_utils.format_money(limit)} in {month}")
+    return None
+
+def verify_usage(db_file=None):
+    """[(month, key, stored, actual)] for every counter that differs from a fresh SUM; empty when all agree."""
+    conn = db_utils.connect(db_file)
+    try:
+        stored = {(month, key): spent for month, key, spent in conn.execute("SELECT month, key, spent FROM budget_usage")}
+        actual = {(month, key): spent for month, key, spent in conn.execute(db_utils.budget_usage_sql())}
+    finally:
+        conn.close()
+    wrong = []
+    for pair in sorted(stored.keys() | actual.keys()):
+        have, want = stored.get(pair, 0.0), actual.get(pair, 0.0)
+        if abs(have - want) > TOLERANCE:
+            wrong.append(pair + (have, want))
+    return wrong
+
+def recompute_usage(db_file=None):
+    """Rebuilds budget_usage from the ledger in one writer job. Returns the seconds taken."""
+    started = time.perf_counter()
+    db_utils.get_writer(db_file).submit(db_utils.rebuild_budget_usage).result()
+    seconds = time.perf_counter() - started
+    logger.info(f"Recomputed budget usage in {seconds:.2f}s")
+    return seconds
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro budgets")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_set = sub.add_parser("set", help="Set a category's monthly limit")
+    p_set.add_argument("db")
+    p_set.add_argument("key", help="Category name, or comment for uncategorized rows")
+    p_set.add_argument("limit", type=float)
+    p_remove = sub.add_parser("remove", help="Delete a budget")
+    p_remove.add_argument("db")
+    p_remove.add_argument("key")
+    p_status = sub.add_parser("status", help="Spent against each budget")
+    p_status.add_argument("db")
+    p_status.add_argument("--month", help="YYYY-MM (default this month)")
+    p_verify = sub.add_parser("verify", help="Compare the usage counters with a fresh SUM")
+    p_verify.add_argument("db")
+    p_verify.add_argument("--fix", action="store_true", help="Recompute them if they differ")
+    p_recompute = sub.add_parser("recompute", help="Rebuild the usage counters")
+    p_recompute.add_argument("db")
+    args = parser.parse_args()
+
+    try:
+        db_utils.DB_FILE = os.path.abspath(args.db)
+        db_utils.initialize_database()
+        if args.command == "set":
+            set_budget(args.key, args.limit)
+            print(f"{args.key}: {db_utils.format_money(args.limit)} a month")
+        elif args.command == "remove":
+            print("Removed" if remove_budget(args.key) else "No such budget")
+        elif args.command == "status":
+            for key, limit, spent in budget_status(args.month):
+                print(f"{key[:30]:<30} {db_utils.format_money(spent):>14} of {db_utils.format_money(limit):>14}  "
+                      f"{spent / limit:6.1%}{'  OVER' if spent > limit else ''}")
+        elif args.command == "verify":
+            wrong = verify_usage()
+            for month, key, stored, actual in wrong[:20]:
+                print(f"{month} {key[:30]:<30} counter {stored:,.2f}  actual {actual:,.2f}")
+            print(f"{len(wrong)} counters differ" if wrong else "All counters match")
+            if wrong and args.fix:
+                print(f"Recomputed in {recompute_usage():.2f}s")
+        else:
+            print(f"Recomputed in {recompute_usage():.2f}s")
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()
@@ -0,0 +1,417 @@
+"""
+Rule-based categories for free-text comments.
+
+A rule assigns a category when a comment contains a keyword, matches a regex, or (for
+"amount" rules) just when the amount and type fit. Every rule can also be limited to
+one transaction type and an amount range (absolute amounts, as typed in the Add view).
+Rules are tried by priority, lowest first; the first match wins.
+
+All patterns are compiled into one regex, so a comment is scanned once however many
+rules there are. New transactions are categorized on insert; recategorize() re-runs the
+rules over the whole ledger after they change.
+
+    python category_utils.py add-rule finance.db Food keyword swiggy
+    python category_utils.py add-rule finance.db Rent amount --type "Base Expense" --min 10000
+    python category_utils.py rules finance.db
+    python category_utils.py recategorize finance.db
+"""
+import sqlite3
+import os
+import re
+import sys
+import time
+import logging
+import argparse
+import threading
+
+import db_utils
+from db_utils import NO_CATEGORY
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+RULE_KINDS = ("keyword", "regex", "amount")
+DEFAULT_PRIORITY = 100
+
+# Ids updated per writer job; small enough that the app's own writes get a turn in between
+RECATEGORIZE_BATCH = 50_000
+
+RULE_COLUMNS = "r.id, r.category_id, r.kind, r.pattern, r.trans_type, r.min_amount, r.max_amount"
+
+# Group names and numbers belong to the combined matcher: a pattern's own named groups
+# clash across rules, and its backreferences would point at another rule's group
+GROUP_REFERENCE = re.compile(r"\(\?P[<=]|(?<!\\)(?:\\\\)*\\(?:[1-9]|g<)")
+
+class Rule:
+    __slots__ = ("rule_id", "category_id", "kind", "pattern", "trans_type", "min_amount", "max_amount", "regex",
+                 "by_amount")
+
+    def __init__(self, rule_id, category_id, kind, pattern, trans_type, min_amount, max_amount):
+        self.rule_id = rule_id
+        self.category_id = category_id
+        self.kind = kind
+        self.pattern = pattern
+        self.trans_type = trans_type
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.regex = re.compile(self.body(), re.IGNORECASE | re.DOTALL)
+        self.by_amount = min_amount is not None or max_amount is not None
+
+    def body(self):
+        if self.kind == "keyword":
+            return re.escape(db_utils.normalize_comment(self.pattern))
+        if self.kind == "regex":
+            return f"(?:{self.pattern})"
+        return ""
+
+    def accepts_type(self, trans_type):
+        return not self.trans_type or trans_type == self.trans_type
+
+    def accepts(self, trans_type, amount):
+        if self.trans_type and trans_type != self.trans_type:
+            return False
+        if not self.by_amount:
+            return True
+        amount = abs(amount or 0.0)
+        if self.min_amount is not None and amount < self.min_amount:
+            return False
+        if self.max_amount is not None and amount > self.max_amount:
+            return False
+        return True
+
+class Categorizer:
+    """
+    The rules of one ledger compiled into a single regex. Each rule is an alternative of
+    the form (?=.*?(?P<rN>pattern)): alternatives are tried in priority order and each
+    looks through the whole comment, so the first rule whose pattern occurs anywhere
+    wins, not the one matching earliest in the text. Pattern results only depend on the
+    comment and are cached per distinct comment; type and amount limits are checked per row.
+    """
+    CACHE_LIMIT = 200_000
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.matcher = None
+        if rules:
+            alternatives = "|".join(f"(?=.*?(?P<r{i}>{rule.body()}))" for i, rule in enumerate(rules))
+            self.matcher = re.compile(alternatives, re.IGNORECASE | re.DOTALL)
+        self.cache = {}
+
+    def matches(self, comment):
+        """
+        Indexes of the rules whose pattern matches, in priority order. The combined regex
+        finds the first; later ones are only looked for while the ones found so far are
+        limited to a type or amount (and so might not apply to a given row).
+        """
+        found = self.cache.get(comment)
+        if found is not None:
+            return found
+        text = db_utils.normalize_comment(comment)
+        m = self.matcher.match(text) if self.matcher else None
+        if m is None:
+            found = ()
+        else:
+            first = int(m.lastgroup[1:])
+            found = [first]
+            rule = self.rules[first]
+            if rule.trans_type or rule.by_amount:
+                for i in range(first + 1, len(self.rules)):
+                    rule = self.rules[i]
+                    if rule.regex.search(text):
+                        found.append(i)
+                        if not (rule.trans_type or rule.by_amount):
+                            break
+            found = tuple(found)
+        if len(self.cache) < self.CACHE_LIMIT:
+            self.cache[comment] = found
+        return found
+
+    def categorize(self, comment, trans_type, amount):
+        for i in self.matches(comment):
+            rule = self.rules[i]
+            if rule.accepts(trans_type, amount):
+                return rule.category_id
+        return NO_CATEGORY
+
+    def chain(self, comment, trans_type):
+        """
+        The rules that can decide rows with this comment and type, in order: those whose
+        pattern matches and type fits, up to the first one without an amount range.
+        """
+        chain = []
+        for i in self.matches(comment):
+            rule = self.rules[i]
+            if rule.accepts_type(trans_type):
+                chain.append(rule)
+                if not rule.by_amount:
+                    break
+        return chain
+
+_categorizers = {}
+_categorizers_lock = threading.Lock()
+
+def load_rules(conn):
+    return conn.execute(f"""
+        SELECT {RULE_COLUMNS} FROM category_rules r ORDER BY r.priority, r.id
+    """).fetchall()
+
+def get_categorizer(db_file=None, conn=None):
+    """The compiled rules of a ledger; recompiled only when the rule table has changed."""
+    db_file = os.path.abspath(db_file or db_utils.DB_FILE)
+    own = conn is None
+    if own:
+        conn = db_utils.connect(db_file)
+    try:
+        rows = load_rules(conn)
+    finally:
+        if own:
+            conn.close()
+    with _categorizers_lock:
+        cached = _categorizers.get(db_file)
+        if cached and cached[0] == rows:
+            return cached[1]
+    categorizer = Categorizer([Rule(*row) for row in rows])
+    with _categorizers_lock:
+        _categorizers[db_file] = (rows, categorizer)
+    return categorizer
+
+def categorize(comment, trans_type, amount, db_file=None):
+    """Category id for a new transaction: NO_CATEGORY when nothing matches, None (still pending) on error."""
+    try:
+        return get_categorizer(db_file).categorize(comment, trans_type, amount)
+    except Exception as e:
+        logger.error(f"Categorize error: {e}")
+        return None
+
+def _bump_version(conn):
+    """Category updates skip the change journal, so caches keyed on it also watch this counter."""
+    conn.execute('''
+        INSERT INTO journal_meta (key, value) VALUES ('category_version', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1
+    ''')
+
+# --- CATEGORIES AND RULES ---
+def list_categories(db_file=None):
+    conn = db_utils.connect(db_file)
+    rows = conn.execute("SELECT id, name FROM categories ORDER BY name").fetchall()
+    conn.close()
+    return rows
+
+def list_rules(db_file=None):
+    """[(rule_id, category_name, kind, pattern, trans_type, min_amount, max_amount, priority)] in match order."""
+    conn = db_utils.connect(db_file)
+    rows = conn.execute("""
+        SELECT r.id, c.name, r.kind, r.pattern, r.trans_type, r.min_amount, r.max_amount, r.priority
+        FROM category_rules r JOIN categories c ON c.id = r.category_id ORDER BY r.priority, r.id
+    """).fetchall()
+    conn.close()
+    return rows
+
+def add_rule(category, kind, pattern=None, trans_type=None, min_amount=None, max_amount=None,
+             priority=DEFAULT_PRIORITY, db_file=None):
+    """Adds a rule (creating the category if needed) and returns its id. Raises ValueError on a bad rule."""
+    category = (category or "").strip()
+    if not category:
+        raise ValueError("Category name is required")
+    if kind not in RULE_KINDS:
+        raise ValueError(f"Rule kind must be one of {', '.join(RULE_KINDS)}")
+    pattern = (pattern or "").strip() or None
+    if kind != "amount" and not pattern:
+        raise ValueError(f"A {kind} rule needs a pattern")
+    if trans_type and trans_type not in db_utils.TRANSACTION_TYPES:
+        raise ValueError(f"Type must be one of {', '.join(db_utils.TRANSACTION_TYPES)}")
+    if kind == "amount" and min_amount is None and max_amount is None and not trans_type:
+        raise ValueError("An amount rule needs a type or an amount range")
+    if kind == "regex" and GROUP_REFERENCE.search(pattern):
+        raise ValueError("Rule regexes can't use named groups or backreferences")
+    conn = db_utils.connect(db_file)
+    try:
+        existing = [Rule(*row) for row in load_rules(conn)]
+    finally:
+        conn.close()
+    try:
+        # Compiled together with the ledger's rules, the way the combined matcher will embed it
+        Categorizer(existing + [Rule(None, None, kind, pattern, trans_type, min_amount, max_amount)])
+    except re.error as e:
+        raise ValueError(f"Invalid regex: {e}")
+
+    def job(conn):
+        conn.execute("INSERT OR IGNORE INTO categories (name) VALUES (?)", (category,))
+        category_id = conn.execute("SELECT id FROM categories WHERE name = ?", (category,)).fetchone()[0]
+        cur = conn.execute(
+            "INSERT INTO category_rules (category_id, kind, pattern, trans_type, min_amount, max_amount, priority) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (category_id, kind, pattern, trans_type, min_amount, max_amount, priority))
+        return cur.lastrowid
+    rule_id = db_utils.get_writer(db_file).submit(job).result()
+    logger.info(f"Category rule {rule_id}: {kind} {pattern!r} -> {category}")
+    return rule_id
+
+def remove_rule(rule_id, db_file=None):
+    """Deletes a rule, and its category once no rule uses it."""
+    def job(conn):
+        row = conn.execute("SELECT category_id FROM category_rules WHERE id = ?", (rule_id,)).fetchone()
+        if row is None:
+            return False
+        conn.execute("DELETE FROM category_rules WHERE id = ?", (rule_id,))
+        if conn.execute("SELECT 1 FROM category_rules WHERE category_id = ?", (row[0],)).fetchone() is None:
+            conn.execute("UPDATE transactions SET category_id = NULL WHERE category_id = ?", (row[0],))
+            conn.execute("DELETE FROM categories WHERE id = ?", (row[0],))
+            _bump_version(conn)
+        return True
+    return db_utils.get_writer(db_file).submit(job).result()
+
+# --- BULK RECATEGORIZE ---
+def _chain_sql(chain):
+    """The amount-dependent part of a rule chain as a SQL CASE over t.amount."""
+    whens = []
+    for rule in chain:
+        if not rule.by_amount:
+            return f"CASE {' '.join(whens)} ELSE {rule.category_id} END"
+        conds = []
+        if rule.min_amount is not None:
+            conds.append(f"ABS(t.amount) >= {float(rule.min_amount)!r}")
+        if rule.max_amount is not None:
+            conds.append(f"ABS(t.amount) <= {float(rule.max_amount)!r}")
+        whens.append(f"WHEN {' AND '.join(conds)} THEN {rule.category_id}")
+    return f"CASE {' '.join(whens)} ELSE {NO_CATEGORY} END"
+
+def _category_expr(chain):
+    if not chain:
+        return str(NO_CATEGORY)
+    if not chain[0].by_amount:
+        return str(chain[0].category_id)
+    return _chain_sql(chain)
+
+def comment_category_sql(comment, trans_type=None, db_file=None):
+    """
+    SQL for the category_id of rows whose comment becomes `comment` (and type trans_type,
+    when given): a CASE on t.type over the rule chains, so a bulk comment edit
+    categorizes in the same UPDATE instead of a recategorize pass.
+    """
+    categorizer = get_categorizer(db_file)
+    if trans_type:
+        return _category_expr(categorizer.chain(comment, trans_type))
+    whens = " ".join(f"WHEN '{t_type}' THEN {_category_expr(categorizer.chain(comment, t_type))}"
+                     for t_type in db_utils.TRANSACTION_TYPES)
+    return f"CASE t.type {whens} ELSE NULL END"
+
+def recategorize(db_file=None, pending_only=False, batch=RECATEGORIZE_BATCH, progress=None):
+    """
+    Runs the current rules over every transaction (or only the ones never categorized)
+    and returns (rows_seen, rows_changed, seconds).
+
+    The rules are evaluated once per distinct (comment, type) pair rather than per row.
+    Each pair gets either a fixed category or, when amount ranges are involved, a chain
+    of rules that becomes a CASE on the amount. The pairs go into a temp table on the
+    writer connection, and each id range of `batch` rows is one set-based
+    UPDATE ... FROM joined on it, in its own writer job.
+    """
+    db_file = db_file or db_utils.DB_FILE
+    started = time.perf_counter()
+    categorizer = get_categorizer(db_file)
+    pending = " AND category_id IS NULL" if pending_only else ""
+    conn = db_utils.connect(db_file)
+    try:
+        seen, max_id = conn.execute(f"SELECT COUNT(*), COALESCE(MAX(id), 0) FROM transactions WHERE 1=1{pending}").fetchone()
+        pairs = conn.execute(f"SELECT comment, type FROM transactions WHERE 1=1{pending} GROUP BY comment, type").fetchall()
+    finally:
+        conn.close()
+
+    mapping, chains = [], {}
+    for comment, t_type in pairs:
+        chain = categorizer.chain(comment, t_type)
+        if not chain:
+            mapping.append((comment, t_type, NO_CATEGORY, None))
+        elif not chain[0].by_amount:
+            mapping.append((comment, t_type, chain[0].category_id, None))
+        else:
+            sql = _chain_sql(chain)
+            mapping.append((comment, t_type, None, chains.setdefault(sql, len(chains))))
+    new_category = "m.category_id"
+    if chains:
+        cases = " ".join(f"WHEN {n} THEN {sql}" for sql, n in chains.items())
+        new_category = f"COALESCE(m.category_id, CASE m.chain {cases} END)"
+
+    writer = db_utils.get_writer(db_file)
+    writer.submit(_load_mapping_job(mapping)).result()
+    changed = 0
+    try:
+        for lo in range(0, max_id, batch):
+            changed += writer.submit(_update_job(new_category, lo, lo + batch, pending)).result()
+            if progress:
+                progress(min(lo + batch, max_id), max_id)
+    finally:
+        writer.submit(lambda c: c.execute("DROP TABLE IF EXISTS temp.category_map")).result()
+    seconds = time.perf_counter() - started
+    logger.info(f"Recategorized {seen:,} rows ({changed:,} changed) in {seconds:.2f}s")
+    return seen, changed, seconds
+
+def _load_mapping_job(mapping):
+    def job(conn):
+        conn.execute("DROP TABLE IF EXISTS temp.category_map")
+        conn.execute('''
+            CREATE TEMP TABLE category_map (
+                comment TEXT, type TEXT, category_id INTEGER, chain INTEGER, PRIMARY KEY (comment, type)
+            )
+        ''')
+        conn.executemany("INSERT INTO temp.category_map (comment, type, category_id, chain) VALUES (?, ?, ?, ?)", mapping)
+    return job
+
+def _update_job(new_category, lo, hi, pending):
+    pending = pending.replace("category_id", "t.category_id")
+    def job(conn):
+        changed = conn.execute(f"""
+            UPDATE transactions AS t SET category_id = {new_category}
+            FROM temp.category_map m
+            WHERE t.id > ? AND t.id <= ?{pending}
+              AND m.comment IS t.comment AND m.type = t.type
+              AND t.category_id IS NOT {new_category}
+        """, (lo, hi)).rowcount
+        if changed:
+            _bump_version(conn)
+        return changed
+    return job
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro categories")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_rules = sub.add_parser("rules", help="List the rules in match order")
+    p_rules.add_argument("db")
+    p_add = sub.add_parser("add-rule", help="Add a rule")
+    p_add.add_argument("db")
+    p_add.add_argument("category")
+    p_add.add_argument("kind", choices=RULE_KINDS)
+    p_add.add_argument("pattern", nargs="?")
+    p_add.add_argument("--type", choices=db_utils.TRANSACTION_TYPES)
+    p_add.add_argument("--min", type=float)
+    p_add.add_argument("--max", type=float)
+    p_add.add_argument("--priority", type=int, default=DEFAULT_PRIORITY)
+    p_remove = sub.add_parser("remove-rule", help="Delete a rule")
+    p_remove.add_argument("db")
+    p_remove.add_argument("rule_id", type=int)
+    p_recat = sub.add_parser("recategorize", help="Re-run the rules over the ledger")
+    p_recat.add_argument("db")
+    p_recat.add_argument("--pending", action="store_true", help="Only rows never categorized")
+    args = parser.parse_args()
+
+    try:
+        db_utils.DB_FILE = os.path.abspath(args.db)
+        db_utils.initialize_database()
+        if args.command == "rules":
+            for rule_id, name, kind, pattern, t_type, lo, hi, priority in list_rules():
+                limits = " ".join(x for x in (t_type and f"type={t_type}", lo is not None and f"min={lo:g}",
+                                              hi is not None and f"max={hi:g}") if x)
+                print(f"{rule_id:>4}  p{priority:<4} {name:<20} {kind:<8} {pattern or '':<24} {limits}")
+        elif args.command == "add-rule":
+            print(f"Added rule {add_rule(args.category, args.kind, args.pattern, args.type, args.min, args.max, args.priority)}")
+        elif args.command == "remove-rule":
+            print("Removed" if remove_rule(args.rule_id) else "No such rule")
+        else:
+            seen, changed, seconds = recategorize(pending_only=args.pending)
+            print(f"{seen:,} rows, {changed:,} changed in {seconds:.2f}s ({seen / max(seconds, 1e-9):,.0f} rows/s)")
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()
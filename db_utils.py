@@ -0,0 +1,1536 @@
+import sqlite3
+import re
+import datetime
+import os
+import sys
+import logging
+import queue
+import threading
+import time
+import bisect
+import heapq
+import calendar
+import itertools
+from array import array
+from operator import itemgetter
+from concurrent.futures import Future
+
+import metrics_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+# Database lives next to the EXE (or script) that is running
+EXE_LOCATION = os.path.dirname(os.path.abspath(sys.argv[0]))
+DB_FILENAME = "finance.db"
+DB_FILE = os.path.join(EXE_LOCATION, DB_FILENAME)
+
+# Seconds a connection waits for another process's write lock before "database is locked"
+BUSY_TIMEOUT = 15.0
+
+# --- CONNECTIONS ---
+def connect(db_file=None, **kwargs):
+    """All connections wait on locks instead of failing; in WAL mode readers never wait on writers."""
+    conn = sqlite3.connect(db_file or DB_FILE, timeout=BUSY_TIMEOUT, **kwargs)
+    conn.execute(f"PRAGMA busy_timeout={int(BUSY_TIMEOUT * 1000)}")
+    return conn
+
+class WriteQueue:
+    """
+    Funnels every write of this process through one connection on one thread.
+    Whatever is queued while a transaction commits goes into the next one, so
+    concurrent inserts share a single BEGIN IMMEDIATE/COMMIT (and fsync). Each job
+    runs in its own savepoint, so one failing row doesn't take the batch down.
+    """
+    def __init__(self, db_file, max_batch=1000):
+        self.db_file = db_file
+        self.max_batch = max_batch
+        self.jobs = queue.Queue()
+        self.thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+        self.thread.start()
+
+    def submit(self, job):
+        """Queues job(conn) and returns a Future with its result."""
+        future = Future()
+        self.jobs.put((job, future))
+        return future
+
+    def execute(self, sql, params=(), timeout=None):
+        """Runs one statement and returns its cursor's (lastrowid, rowcount)."""
+        def job(conn):
+            cur = conn.execute(sql, params)
+            return cur.lastrowid, cur.rowcount
+        return self.submit(job).result(timeout)
+
+    def executemany(self, sql, seq_of_params, timeout=None):
+        def job(conn):
+            return conn.executemany(sql, seq_of_params).rowcount
+        return self.submit(job).result(timeout)
+
+    def close(self):
+        self.jobs.put(None)
+        self.thread.join()
+
+    def _run(self):
+        conn = connect(self.db_file)
+        conn.isolation_level = None   # explicit BEGIN/COMMIT below
+        running = True
+        while running:
+            item = self.jobs.get()
+            if item is None:
+                break
+            batch = [item]
+            while len(batch) < self.max_batch:
+                try:
+                    item = self.jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+            self._commit_batch(conn, batch)
+        conn.close()
+
+    def _begin(self, conn):
+        delay = 0.01
+        deadline = time.monotonic() + BUSY_TIMEOUT * 2
+        while True:
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                return
+            except sqlite3.OperationalError as e:
+                if "locked" not in str(e) and "busy" not in str(e): raise
+                if time.monotonic() >= deadline: raise
+                logger.warning(f"Write lock busy, retrying: {e}")
+                time.sleep(delay)
+                delay = min(delay * 2, 0.5)
+
+    def _commit_batch(self, conn, batch):
+        outcomes = []
+        started = time.perf_counter()
+        try:
+            self._begin(conn)
+            for job, future in batch:
+                conn.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((future, True, job(conn)))
+                    conn.execute("RELEASE job")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    outcomes.append((future, False, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"DB Error: write batch of {len(batch)} failed: {e}")
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            for job, future in batch:
+                future.set_exception(e)
+            metrics_utils.inc("fmp_db_write_failures_total")
+            return
+        metrics_utils.observe("fmp_db_write_batch_seconds", time.perf_counter() - started)
+        metrics_utils.inc("fmp_db_write_jobs_total", len(batch))
+        for future, ok, value in outcomes:
+            if ok: future.set_result(value)
+            else: future.set_exception(value)
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_writer(db_file=None):
+    """The process-wide WriteQueue for a database file."""
+    db_file = os.path.abspath(db_file or DB_FILE)
+    with _writers_lock:
+        writer = _writers.get(db_file)
+        if writer is None:
+            writer = _writers[db_file] = WriteQueue(db_file)
+        return writer
+
+def close_writers():
+    """Flushes queued writes and closes the writer connections (call on exit)."""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+class ChangeWatcher:
+    """
+    Calls on_change (from its own thread) whenever the database is committed to by
+    any other connection: another app instance, the CLI, or this process's writer.
+    PRAGMA data_version is a cheap in-memory check, so polling it costs next to nothing.
+    """
+    def __init__(self, on_change, db_file=None, interval=0.5):
+        self.on_change = on_change
+        self.db_file = db_file
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="db-watcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        conn = connect(self.db_file)
+        try:
+            last = conn.execute("PRAGMA data_version").fetchone()[0]
+            while not self.stop_event.wait(self.interval):
+                version = conn.execute("PRAGMA data_version").fetchone()[0]
+                if version != last:
+                    last = version
+                    try:
+                        self.on_change()
+                    except Exception as e:
+                        logger.error(f"Change handler error: {e}")
+        except Exception as e:
+            logger.error(f"Change watcher stopped: {e}")
+        finally:
+            conn.close()
+
+# --- BACKEND LOGIC ---
+def initialize_database():
+    logger.info("Initializing database...")
+    conn = connect()
+    # Only takes effect on a new file; maintenance_utils converts older ledgers when idle
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    # WAL lets other instances keep reading while one writes; the mode is stored in the file
+    conn.execute("PRAGMA journal_mode=WAL")
+    cursor = conn.cursor()
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            transaction_datetime TEXT NOT NULL,
+            type TEXT NOT NULL,
+            comment TEXT,
+            amount REAL NOT NULL
+        )
+    ''')
+    # Newest-first listings (dashboard, keyset pages of the API) walk this instead of sorting the table
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_datetime ON transactions (transaction_datetime)")
+    create_currencies(cursor)
+    create_change_journal(cursor)
+    create_categories(cursor)
+    create_recurring(cursor)
+    create_budgets(cursor)
+    create_saved_views(cursor)
+    conn.commit()
+    conn.close()
+
+def _add_column(cursor, table, column, decl):
+    if column not in [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+
+def create_currencies(cursor):
+    """
+    transactions.currency is NULL for BASE_CURRENCY (nearly every row), else an ISO code.
+    fx_rates holds daily rates as units of BASE_CURRENCY per unit of the currency; the
+    primary key is what the as-of lookups seek on.
+    """
+    _add_column(cursor, "transactions", "currency", "TEXT")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS fx_rates (
+            currency TEXT NOT NULL,
+            rate_date TEXT NOT NULL,
+            rate REAL NOT NULL,
+            PRIMARY KEY (currency, rate_date)
+        ) WITHOUT ROWID
+    ''')
+    # Tiny while foreign rows are rare; lets single-currency ledgers skip conversion altogether
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_foreign ON transactions(currency) WHERE currency IS NOT NULL")
+
+def create_change_journal(cursor):
+    """
+    Append-only change log filled by triggers on transactions: every insert, update and
+    delete gets a sequence number, so backups and replicas can ship just what changed
+    since the last sequence they saw (see journal_utils.py).
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            transaction_datetime TEXT,
+            type TEXT,
+            comment TEXT,
+            amount REAL
+        )
+    ''')
+    _add_column(cursor, "change_log", "currency", "TEXT")
+    cursor.execute("CREATE TABLE IF NOT EXISTS journal_meta (key TEXT PRIMARY KEY, value TEXT)")
+    # Identifies this database as a change source; copies made with the file keep it
+    cursor.execute("INSERT OR IGNORE INTO journal_meta (key, value) VALUES ('db_id', lower(hex(randomblob(16))))")
+    # Triggers from older versions don't ship the currency; replace them
+    for name in ("journal_insert", "journal_update"):
+        trigger = cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,)).fetchone()
+        if trigger and "currency" not in trigger[0]:
+            cursor.execute(f"DROP TRIGGER {name}")
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_insert AFTER INSERT ON transactions BEGIN
+            INSERT INTO change_log (op, row_id, transaction_datetime, type, comment, amount, currency)
+            VALUES ('I', NEW.id, NEW.transaction_datetime, NEW.type, NEW.comment, NEW.amount, NEW.currency);
+        END
+    ''')
+    # Only the shipped columns: re-categorizing a million rows must not journal a million updates
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_update
+        AFTER UPDATE OF transaction_datetime, type, comment, amount, currency ON transactions BEGIN
+            INSERT INTO change_log (op, row_id, transaction_datetime, type, comment, amount, currency)
+            VALUES ('U', NEW.id, NEW.transaction_datetime, NEW.type, NEW.comment, NEW.amount, NEW.currency);
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER IF NOT EXISTS journal_delete AFTER DELETE ON transactions BEGIN
+            INSERT INTO change_log (op, row_id) VALUES ('D', OLD.id);
+        END
+    ''')
+
+def create_categories(cursor):
+    """
+    Categories and the rules that assign them (see category_utils.py). transactions.category_id
+    is NULL until the categorizer has seen the row and NO_CATEGORY when no rule matched.
+    """
+    cursor.execute("CREATE TABLE IF NOT EXISTS categories (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE COLLATE NOCASE)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS category_rules (
+            id INTEGER PRIMARY KEY,
+            category_id INTEGER NOT NULL REFERENCES categories (id) ON DELETE CASCADE,
+            kind TEXT NOT NULL,
+            pattern TEXT,
+            trans_type TEXT,
+            min_amount REAL,
+            max_amount REAL,
+            priority INTEGER NOT NULL DEFAULT 100
+        )
+    ''')
+    _add_column(cursor, "transactions", "category_id", "INTEGER")
+    # Only rows still waiting for the categorizer are in this index
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_uncategorized ON transactions (id) WHERE category_id IS NULL")
+
+def create_recurring(cursor):
+    """
+    Recurring transactions (see recurring_utils.py), stored once as a rule. Occurrences
+    up to materialized_until are ordinary rows; later ones are never stored, reads
+    expand them for the range they cover (see RecurringRule).
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS recurring_rules (
+            id INTEGER PRIMARY KEY,
+            start_datetime TEXT NOT NULL,
+            unit TEXT NOT NULL,
+            every INTEGER NOT NULL DEFAULT 1,
+            end_date TEXT,
+            type TEXT NOT NULL,
+            comment TEXT,
+            amount REAL NOT NULL,
+            currency TEXT,
+            category_id INTEGER,
+            materialized_until TEXT
+        )
+    ''')
+
+def budget_key_sql(table):
+    """category_sql for the row a trigger sees (NEW or OLD): '' when there is neither a category nor a comment."""
+    return (f"COALESCE((SELECT LOWER(name) FROM categories WHERE id = {table}.category_id), "
+            f"{clean_comment_sql(f'{table}.comment')}, '')")
+
+def budget_spend_sql(table):
+    """A row's expense in BASE_CURRENCY as a positive number; 0 when no rate is known."""
+    return f"(-COALESCE({converted_amount_sql(table=table)}, 0))"
+
+def create_budgets(cursor):
+    """
+    Monthly budgets per category (see budget_utils.py). budget_usage holds the expense of
+    every (month, category) of the ledger, kept current by triggers on transactions like
+    the change journal, so reading what a budget has used is a primary-key seek instead
+    of a SUM over the month. A ledger that is missing the triggers (new, or bulk loaded
+    without them) has its usage rebuilt once, here.
+    """
+    cursor.execute("CREATE TABLE IF NOT EXISTS budgets (key TEXT PRIMARY KEY, monthly_limit REAL NOT NULL)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS budget_usage (
+            month TEXT NOT NULL,
+            key TEXT NOT NULL,
+            spent REAL NOT NULL,
+            PRIMARY KEY (month, key)
+        ) WITHOUT ROWID
+    ''')
+    missing = cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN "
+                             "('budget_insert', 'budget_delete', 'budget_update')").fetchone()[0] < 3
+    for op, table in (("INSERT", "NEW"), ("DELETE", "OLD")):
+        sign = "+" if op == "INSERT" else "-"
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS budget_{op.lower()} AFTER {op} ON transactions WHEN {table}.amount < 0 BEGIN
+                INSERT INTO budget_usage (month, key, spent)
+                VALUES (substr({table}.transaction_datetime, 1, 7), {budget_key_sql(table)}, {sign}{budget_spend_sql(table)})
+                ON CONFLICT (month, key) DO UPDATE SET spent = spent + excluded.spent;
+            END
+        ''')
+    # category_id is watched too: re-categorizing moves expense between keys. Most of its
+    # updates don't (never seen -> no rule matched), and those skip the two upserts.
+    category_name = "(SELECT LOWER(name) FROM categories WHERE id = {}.category_id)"
+    cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS budget_update
+        AFTER UPDATE OF transaction_datetime, comment, amount, currency, category_id ON transactions
+        WHEN (OLD.amount < 0 OR NEW.amount < 0) AND NOT (
+            OLD.transaction_datetime IS NEW.transaction_datetime AND OLD.comment IS NEW.comment
+            AND OLD.amount IS NEW.amount AND OLD.currency IS NEW.currency
+            AND {category_name.format("OLD")} IS {category_name.format("NEW")}
+        ) BEGIN
+            INSERT INTO budget_usage (month, key, spent)
+            SELECT substr(OLD.transaction_datetime, 1, 7), {budget_key_sql("OLD")}, -{budget_spend_sql("OLD")}
+            WHERE OLD.amount < 0
+            ON CONFLICT (month, key) DO UPDATE SET spent = spent + excluded.spent;
+            INSERT INTO budget_usage (month, key, spent)
+            SELECT substr(NEW.transaction_datetime, 1, 7), {budget_key_sql("NEW")}, {budget_spend_sql("NEW")}
+            WHERE NEW.amount < 0
+            ON CONFLICT (month, key) DO UPDATE SET spent = spent + excluded.spent;
+        END
+    ''')
+    if missing:
+        rebuild_budget_usage(cursor)
+
+def budget_usage_sql():
+    """(month, key, spent) of the whole ledger from the rows themselves, as the triggers would have left it."""
+    return f'''
+        SELECT substr(t.transaction_datetime, 1, 7), COALESCE({category_sql()}, ''), -SUM(COALESCE({converted_amount_sql()}, 0))
+        FROM {categorized_from_sql()} WHERE t.amount < 0 GROUP BY 1, 2
+    '''
+
+def rebuild_budget_usage(cursor):
+    cursor.execute("DELETE FROM budget_usage")
+    cursor.execute(f"INSERT INTO budget_usage (month, key, spent) {budget_usage_sql()}")
+
+def view_comment_sql(table):
+    """The History sidebar's grouping of a comment, lower-cased (title-cased on display): 'n/a' when there is none."""
+    return f"COALESCE({clean_comment_sql(f'{table}.comment')}, 'n/a')"
+
+def create_saved_views(cursor):
+    """
+    Saved History filters (see view_utils.py). saved_view_rows is each view's result,
+    in the listing's order by its primary key; seq is the change journal sequence it is
+    current to (NULL while it is being rebuilt). Triggers on the rows keep the per-comment
+    totals and the view's own totals in step, in BASE_CURRENCY.
+    """
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS saved_views (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE COLLATE NOCASE,
+            spec TEXT NOT NULL,
+            window_start TEXT,
+            window_end TEXT,
+            seq INTEGER,
+            fx_version INTEGER,
+            refreshed_at TEXT,
+            row_count INTEGER NOT NULL DEFAULT 0,
+            deposits REAL NOT NULL DEFAULT 0,
+            expenditure REAL NOT NULL DEFAULT 0
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS saved_view_rows (
+            view_id INTEGER NOT NULL,
+            transaction_datetime TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            type TEXT NOT NULL,
+            comment TEXT,
+            amount REAL NOT NULL,
+            currency TEXT,
+            PRIMARY KEY (view_id, transaction_datetime, row_id)
+        ) WITHOUT ROWID
+    ''')
+    # Changed rows are found by id
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_saved_view_rows_id ON saved_view_rows (view_id, row_id)")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS saved_view_totals (
+            view_id INTEGER NOT NULL,
+            comment TEXT NOT NULL,
+            type TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            total REAL NOT NULL,
+            PRIMARY KEY (view_id, comment, type)
+        ) WITHOUT ROWID
+    ''')
+    for op, table, sign in (("INSERT", "NEW", "+"), ("DELETE", "OLD", "-")):
+        amount = f"COALESCE({converted_amount_sql(table=table)}, 0)"
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS saved_view_{op.lower()} AFTER {op} ON saved_view_rows
+            WHEN (SELECT seq FROM saved_views WHERE id = {table}.view_id) IS NOT NULL BEGIN
+                INSERT INTO saved_view_totals (view_id, comment, type, count, total)
+                VALUES ({table}.view_id, {view_comment_sql(table)}, {table}.type, {sign}1, {sign}{amount})
+                ON CONFLICT (view_id, comment, type) DO UPDATE SET count = count + excluded.count, total = total + excluded.total;
+                UPDATE saved_views SET row_count = row_count {sign} 1,
+                    deposits = deposits {sign} MAX({amount}, 0), expenditure = expenditure {sign} MIN({amount}, 0)
+                WHERE id = {table}.view_id;
+            END
+        ''')
+
+NO_CATEGORY = 0
+
+def category_sql(table="t", categories="c"):
+    """Grouping key for reports: the category name where a rule assigned one, else the cleaned comment."""
+    return f"COALESCE(LOWER({categories}.name), {clean_comment_sql(f'{table}.comment')})"
+
+def categorized_from_sql(schema=None):
+    """FROM clause exposing transactions as t joined to their category as c."""
+    prefix = f"{schema}." if schema else ""
+    return f"{prefix}transactions t LEFT JOIN {prefix}categories c ON c.id = t.category_id"
+
+def clean_comment_sql(column_name="comment"):
+    return f"LOWER(TRIM(REPLACE(REPLACE({column_name}, '\n', ''), '\r', '')))"
+
+TRANSACTION_TYPES = ('Deposit', 'Base Expense', 'Borrow')
+
+def signed_amount(trans_type, amount):
+    """Expenses and borrowings are stored negative, deposits positive."""
+    if trans_type in ['Base Expense', 'Borrow']:
+        return -abs(amount)
+    return abs(amount)
+
+# --- CURRENCIES ---
+BASE_CURRENCY = "INR"
+CURRENCY_SYMBOLS = {"INR": "₹", "USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥", "AED": "AED ", "SGD": "S$"}
+_CURRENCY_RE = re.compile(r"^[A-Z]{3}$")
+
+def normalize_currency(currency):
+    """ISO code as stored: None for the base currency. Raises ValueError for anything else that isn't a 3-letter code."""
+    code = (currency or BASE_CURRENCY).strip().upper()
+    if not _CURRENCY_RE.match(code):
+        raise ValueError(f"Invalid currency code: {currency!r}")
+    return None if code == BASE_CURRENCY else code
+
+def format_money(amount, currency=None, decimals=2):
+    code = currency or BASE_CURRENCY
+    symbol = CURRENCY_SYMBOLS.get(code, f"{code} ")
+    return f"{symbol}{amount:,.{decimals}f}"
+
+def _rate_sql(currency_sql, date_sql, schema=None):
+    """As-of rate: the latest on or before the date, else the earliest known. One primary-key seek."""
+    fx = f"{schema}.fx_rates" if schema else "fx_rates"
+    return (f"COALESCE((SELECT r.rate FROM {fx} r WHERE r.currency = {currency_sql} AND r.rate_date <= {date_sql} "
+            f"ORDER BY r.rate_date DESC LIMIT 1), "
+            f"(SELECT r.rate FROM {fx} r WHERE r.currency = {currency_sql} ORDER BY r.rate_date LIMIT 1))")
+
+def converted_amount_sql(reporting=None, table="t", schema=None, mixed=True):
+    """
+    SQL for a row's amount in the reporting currency. Base-currency rows (currency IS NULL)
+    pass straight through; only foreign rows, and every row when reporting in a foreign
+    currency, pay for the rate lookups. Rows with no rate at all come out NULL.
+    mixed=False (see is_multi_currency) drops the CASE for ledgers with no foreign rows.
+    """
+    reporting = normalize_currency(reporting)
+    prefix = f"{table}." if table else ""
+    if reporting is None and not mixed:
+        return f"{prefix}amount"
+    date_sql = f"substr({prefix}transaction_datetime, 1, 10)"
+    to_base = f"(CASE WHEN {prefix}currency IS NULL THEN {prefix}amount ELSE {prefix}amount * {_rate_sql(f'{prefix}currency', date_sql, schema)} END)"
+    if reporting is None:
+        return to_base
+    return f"({to_base} / {_rate_sql(repr(reporting), date_sql, schema)})"
+
+def is_multi_currency(conn):
+    """Whether any transaction is in a foreign currency: one seek on the partial index."""
+    return conn.execute("SELECT EXISTS (SELECT 1 FROM transactions WHERE currency IS NOT NULL)").fetchone()[0] == 1
+
+class RateTable:
+    """
+    The fx_rates of a ledger in memory for converting result batches in Python: per
+    currency a sorted date list for bisect, and a memo of (currency, date) -> rate, since
+    a batch has far fewer distinct days than rows.
+    """
+    def __init__(self, rows=()):
+        self.dates = {}
+        self.rates = {}
+        for currency, rate_date, rate in rows:
+            self.dates.setdefault(currency, []).append(rate_date)
+            self.rates.setdefault(currency, []).append(rate)
+        self.memo = {}
+
+    @classmethod
+    def load(cls, db_file=None):
+        conn = connect(db_file)
+        try:
+            return cls(conn.execute("SELECT currency, rate_date, rate FROM fx_rates ORDER BY currency, rate_date").fetchall())
+        finally:
+            conn.close()
+
+    def rate(self, currency, date):
+        """Units of BASE_CURRENCY per unit of currency on date (as-of), or None without rates."""
+        if currency is None or currency == BASE_CURRENCY:
+            return 1.0
+        key = (currency, date)
+        rate = self.memo.get(key)
+        if rate is None and key not in self.memo:
+            dates = self.dates.get(currency)
+            if dates:
+                i = bisect.bisect_right(dates, date) - 1
+                rate = self.rates[currency][max(i, 0)]
+            self.memo[key] = rate
+        return rate
+
+    def convert(self, amount, currency, date, reporting=None):
+        rate = self.rate(currency, date)
+        if rate is None:
+            return None
+        if reporting and reporting != BASE_CURRENCY:
+            target = self.rate(reporting, date)
+            if not target:
+                return None
+            return amount * rate / target
+        return amount * rate
+
+_rate_tables = {}
+
+def get_rate_table(db_file=None):
+    """The cached RateTable of a ledger; import_rates() drops it."""
+    db_file = os.path.abspath(db_file or DB_FILE)
+    table = _rate_tables.get(db_file)
+    if table is None:
+        table = _rate_tables[db_file] = RateTable.load(db_file)
+    return table
+
+def forget_rate_table(db_file=None):
+    _rate_tables.pop(os.path.abspath(db_file or DB_FILE), None)
+
+@metrics_utils.db_call
+def add_transaction_db(datetime_str, trans_type, comment, amount, category_id=None, currency=None):
+    logger.info(f"Adding transaction: {trans_type}, {amount} {currency or BASE_CURRENCY}")
+    try:
+        amount = signed_amount(trans_type, amount)
+        currency = normalize_currency(currency)
+
+        get_writer().execute(
+            "INSERT INTO transactions (transaction_datetime, type, comment, amount, category_id, currency) VALUES (?, ?, ?, ?, ?, ?)",
+            (datetime_str, trans_type, comment, amount, category_id, currency)
+        )
+        note_comment(comment)
+        return True
+    except Exception as e:
+        logger.error(f"DB Error: {e}")
+        return False
+
+def summary_stats_sql(reporting=None, mixed=True):
+    amount = converted_amount_sql(reporting, mixed=mixed)
+    return f'''
+        SELECT
+        SUM(CASE WHEN t.amount > 0 THEN {amount} ELSE 0 END) AS total_deposits,
+        SUM(CASE WHEN t.amount < 0 THEN {amount} ELSE 0 END) AS total_expenditure,
+        COUNT(*)
+        FROM transactions t
+    '''
+
+@metrics_utils.db_call
+def get_summary_stats(reporting=None):
+    """(deposits, expenditure) in the reporting currency (default BASE_CURRENCY)."""
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute(summary_stats_sql(reporting, is_multi_currency(conn)))
+    result = cursor.fetchone()
+    rules = load_recurring(conn)
+    conn.close()
+    deposits, expenditure = result[0] or 0.0, result[1] or 0.0
+    for _, total in recurring_totals(rules, *recurring_range(), reporting).values():
+        if total > 0: deposits += total
+        else: expenditure += total
+    return deposits, expenditure
+
+@metrics_utils.db_call
+def get_unique_comments():
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+        query = f"SELECT DISTINCT {clean_comment_sql()} FROM transactions WHERE comment IS NOT NULL ORDER BY 1"
+        cursor.execute(query)
+        records = cursor.fetchall()
+        conn.close()
+        return [row[0].title() for row in records if row[0]]
+    except Exception as e:
+        logger.error(f"Error fetching comments: {e}")
+        return []
+
+@metrics_utils.db_call
+def get_available_years():
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+        cursor.execute("SELECT DISTINCT strftime('%Y', transaction_datetime) FROM transactions ORDER BY 1 DESC")
+        years = [row[0] for row in cursor.fetchall() if row[0]]
+        conn.close()
+        if not years:
+            return [str(datetime.datetime.now().year)]
+        return years
+    except Exception as e:
+        logger.error(f"Error fetching years: {e}")
+        return [str(datetime.datetime.now().year)]
+
+@metrics_utils.db_call
+def get_recent_transactions(limit=10):
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, transaction_datetime, type, comment, amount, currency FROM transactions ORDER BY transaction_datetime DESC LIMIT ?", (limit,))
+    data = cursor.fetchall()
+    conn.close()
+    return data
+
+# Pie slices on the dashboard; everything past the top N is summed into one "Other" slice
+CHART_TOP_N = 5
+
+def expense_totals_sql(reporting=None, mixed=True):
+    """(category, total) of every category's expense; uncategorized rows without a comment are ''."""
+    return f'''
+        SELECT COALESCE({category_sql()}, '') AS category, SUM({converted_amount_sql(reporting, mixed=mixed)}) AS total
+        FROM {categorized_from_sql()} WHERE amount < 0 GROUP BY 1
+    '''
+
+def chart_query(limit=CHART_TOP_N, reporting=None, mixed=True):
+    """
+    Expense per category as (sql, params): the top `limit` by size, then one row with a
+    NULL label holding the rest, so the slices add up to total expense. One scan: the
+    GROUP BY totals are ranked by a window function and re-grouped by rank.
+    """
+    query = f'''
+        WITH totals AS ({expense_totals_sql(reporting, mixed)}), ranked AS (
+            SELECT category, total, ROW_NUMBER() OVER (ORDER BY total, category) AS rank FROM totals
+        )
+        SELECT CASE WHEN rank <= ? THEN category END AS label, ABS(SUM(total))
+        FROM ranked GROUP BY label ORDER BY MIN(rank)
+    '''
+    return query, [limit]
+
+def chart_slices(totals, limit=CHART_TOP_N):
+    """chart_query's slices from {category: expense total}, for totals merged in Python."""
+    ranked = sorted(totals.items(), key=lambda kv: (kv[1], kv[0]))
+    data = [(category, abs(total)) for category, total in ranked[:limit]]
+    if len(ranked) > limit:
+        data.append((None, abs(sum(total for _, total in ranked[limit:]))))
+    return data
+
+def add_recurring_expenses(totals, rules, reporting=None, db_file=None):
+    """Adds the expense of the rules' occurrences up to today to {category: expense total}."""
+    for (category, _), (_, total) in recurring_totals(rules, *recurring_range(), reporting, db_file=db_file).items():
+        if total < 0:
+            totals[category or ""] = totals.get(category or "", 0.0) + total
+    return totals
+
+@metrics_utils.db_call
+def get_chart_data(limit=CHART_TOP_N, reporting=None):
+    """[(category, amount)] largest first; a None category is the "Other" slice."""
+    conn = connect()
+    cursor = conn.cursor()
+    rules = load_recurring(conn)
+    if rules:
+        # Occurrences aren't rows, so the ranking is redone after adding them
+        cursor.execute(expense_totals_sql(reporting, is_multi_currency(conn)))
+        totals = dict(cursor.fetchall())
+        conn.close()
+        return chart_slices(add_recurring_expenses(totals, rules, reporting), limit)
+    cursor.execute(*chart_query(limit, reporting, is_multi_currency(conn)))
+    data = cursor.fetchall()
+    conn.close()
+    return data
+
+def filter_where(start_date, end_date, trans_type, comment_like):
+    """The History filter's WHERE clause as (sql, params), shared by the listing and bulk edits."""
+    query = "1=1"
+    params = []
+    # Plain range tests on the stored text (not DATE(...)) so the datetime index can seek
+    if start_date:
+        query += " AND transaction_datetime >= ?"
+        params.append(start_date)
+    if end_date:
+        query += " AND transaction_datetime < DATE(?, '+1 day')"
+        params.append(end_date)
+    if trans_type and trans_type != "All":
+        query += " AND type = ?"
+        params.append(trans_type)
+    if comment_like and comment_like != "All":
+        query += f" AND {clean_comment_sql()} LIKE ?"
+        params.append(f"%{comment_like.lower()}%")
+    return query, params
+
+def filtered_query(start_date, end_date, trans_type, comment_like, after=None, limit=None):
+    """
+    The History filter as (sql, params), newest first. `after` is the (transaction_datetime, id)
+    of the last row of the previous page, for keyset pagination.
+    """
+    where, params = filter_where(start_date, end_date, trans_type, comment_like)
+    query = f"SELECT transaction_datetime, type, comment, amount, id, currency FROM transactions WHERE {where}"
+    if after:
+        query += " AND (transaction_datetime, id) < (?, ?)"
+        params.extend(after)
+    query += " ORDER BY transaction_datetime DESC, id DESC"
+    if limit:
+        query += " LIMIT ?"
+        params.append(limit)
+    return query, params
+
+class TransactionBatch:
+    """
+    Column-oriented query result. Types, comments and currencies are stored once per
+    distinct value (comments already cleaned and title-cased) and referenced by small
+    integer codes; amounts and ids sit in typed arrays. A 1M-row "All Time" filter costs
+    about a third of the memory of a list of tuples. Iterating yields the usual
+    (transaction_datetime, type, comment, amount, id, currency) tuples, one at a time.
+    """
+    __slots__ = ("datetimes", "type_codes", "comment_codes", "currency_codes", "amounts", "ids",
+                 "types", "comments", "currencies", "_type_codes", "_raw_codes", "_display_codes")
+
+    FETCH_SIZE = 5000
+    # merge_recurring() sorts once the occurrences are at least 1/SORT_MERGE_RATIO of the rows
+    SORT_MERGE_RATIO = 16
+
+    def __init__(self):
+        self.datetimes = []
+        self.type_codes = array("B")
+        self.comment_codes = array("I")
+        # Code 0 is the base currency (stored as NULL)
+        self.currency_codes = array("B")
+        self.amounts = array("d")
+        self.ids = array("q")
+        self.types = []
+        self.comments = []
+        self.currencies = [None]
+        self._type_codes = {}
+        self._raw_codes = {}
+        self._display_codes = {}
+
+    @classmethod
+    def from_cursor(cls, cursor):
+        batch = cls()
+        type_code, raw_code = batch._type_codes.get, batch._raw_codes.get
+        while True:
+            rows = cursor.fetchmany(cls.FETCH_SIZE)
+            if not rows:
+                return batch
+            dts, t_types, comments, amounts, ids, currencies = zip(*rows)
+            batch.datetimes.extend(dts)
+            batch.amounts.extend(amounts)
+            batch.ids.extend(ids)
+            # Distinct values are few, so the codes are nearly always a dict hit
+            batch.type_codes.extend([type_code(t) if t in batch._type_codes else batch._code_type(t) for t in t_types])
+            batch.comment_codes.extend([raw_code(c) if c in batch._raw_codes else batch._code_comment(c) for c in comments])
+            if any(currencies):
+                batch.currency_codes.extend([batch._code_currency(c) for c in currencies])
+            else:
+                batch.currency_codes.extend(bytes(len(currencies)))
+
+    def _code_type(self, t_type):
+        code = self._type_codes[t_type] = len(self.types)
+        self.types.append(t_type)
+        return code
+
+    def _code_comment(self, comment):
+        display = (comment or "N/A").replace("\n", "").replace("\r", "").strip().title()
+        code = self._display_codes.get(display)
+        if code is None:
+            code = self._display_codes[display] = len(self.comments)
+            self.comments.append(display)
+        self._raw_codes[comment] = code
+        return code
+
+    def _code_currency(self, currency):
+        try:
+            return self.currencies.index(currency)
+        except ValueError:
+            self.currencies.append(currency)
+            return len(self.currencies) - 1
+
+    def append(self, dt, t_type, comment, amount, row_id, currency=None):
+        self.type_codes.append(self._type_codes[t_type] if t_type in self._type_codes else self._code_type(t_type))
+        self.comment_codes.append(self._raw_codes[comment] if comment in self._raw_codes else self._code_comment(comment))
+        self.currency_codes.append(self._code_currency(currency))
+        self.datetimes.append(dt)
+        self.amounts.append(amount)
+        self.ids.append(row_id)
+
+    def single_currency(self):
+        return len(self.currencies) == 1
+
+    def section(self, start, stop):
+        """Rows start:stop as a batch of their own; the value tables are shared, not copied."""
+        part = TransactionBatch.__new__(TransactionBatch)
+        for name in ("datetimes", "type_codes", "comment_codes", "currency_codes", "amounts", "ids"):
+            setattr(part, name, getattr(self, name)[start:stop])
+        for name in ("types", "comments", "currencies", "_type_codes", "_raw_codes", "_display_codes"):
+            setattr(part, name, getattr(self, name))
+        return part
+
+    def _newest_before(self, dt, lo):
+        """First index from lo whose datetime is older than dt (the batch is newest first)."""
+        datetimes = self.datetimes
+        size = len(datetimes)
+        # Merged rows usually land close together: gallop from lo, then bisect what's left
+        hi, step = lo, 1
+        while hi < size and datetimes[hi] >= dt:
+            lo = hi + 1
+            hi += step
+            step *= 2
+        hi = min(hi, size)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if datetimes[mid] < dt:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
+
+    def merge(self, rows):
+        """
+        A new batch with newest-first rows merged into this one, each after the rows of its
+        own datetime. Every row is placed by a binary search and the runs of this batch in
+        between are copied as array slices, so a few thousand rows merge into a million
+        for the price of one copy. Returns the batch itself when rows is empty.
+        """
+        rows = iter(rows)
+        first = next(rows, None)
+        if first is None:
+            return self
+        merged = self._empty_copy()
+        columns = [(getattr(merged, name).extend, getattr(self, name))
+                   for name in ("datetimes", "type_codes", "comment_codes", "currency_codes", "amounts", "ids")]
+        newest_before, append = self._newest_before, merged.append
+        pos = 0
+        for row in itertools.chain((first,), rows):
+            at = newest_before(row[0], pos)
+            if at > pos:
+                for extend, column in columns:
+                    extend(column[pos:at])
+                pos = at
+            append(*row)
+        for extend, column in columns:
+            extend(column[pos:])
+        return merged
+
+    def _empty_copy(self):
+        """A batch with no rows and copies of this one's value tables."""
+        merged = self.section(0, 0)
+        for name in ("types", "comments", "currencies"):
+            setattr(merged, name, list(getattr(self, name)))
+        for name in ("_type_codes", "_raw_codes", "_display_codes"):
+            setattr(merged, name, dict(getattr(self, name)))
+        return merged
+
+    def merge_recurring(self, rules, first, last):
+        """
+        A new batch with the rules' occurrences between first and last merged in, each after
+        the rows of its datetime. A few are placed row by row (merge). Many, such as years of
+        a daily rule, are built column-wise (only the datetime and id differ between a rule's
+        occurrences, the rest is one repeated code) and put in order with this batch's rows
+        by one stable sort of row numbers, without a tuple per occurrence.
+        """
+        count = sum(len(rule.span(first, last)) for rule in rules)
+        if count * self.SORT_MERGE_RATIO < len(self.datetimes):
+            return self.merge(recurring_occurrences(rules, first, last))
+        merged = self._empty_copy()
+        datetimes = list(self.datetimes)
+        columns = {name: getattr(self, name)[:] for name in ("type_codes", "comment_codes", "currency_codes", "amounts", "ids")}
+        days = {}
+        for rule in rules:
+            dts, ids = rule.columns(first, last, days)
+            if not dts:
+                continue
+            datetimes += dts
+            columns["ids"].extend(ids)
+            type_code = merged._type_codes.get(rule.type)
+            comment_code = merged._raw_codes.get(rule.comment)
+            for name, value in (("type_codes", merged._code_type(rule.type) if type_code is None else type_code),
+                                ("comment_codes", merged._code_comment(rule.comment) if comment_code is None else comment_code),
+                                ("currency_codes", merged._code_currency(rule.currency)), ("amounts", rule.amount)):
+                columns[name].extend(array(columns[name].typecode, [value]) * len(dts))
+        # reverse=True keeps equal datetimes in their order: this batch's rows, then by rule
+        order = sorted(range(len(datetimes)), key=datetimes.__getitem__, reverse=True)
+        gather = itemgetter(*order) if len(order) > 1 else (lambda column: tuple(column))
+        merged.datetimes = list(gather(datetimes))
+        for name, column in columns.items():
+            getattr(merged, name).extend(array(column.typecode, gather(column)))
+        return merged
+
+    def converted_amounts(self, rates, reporting=None):
+        """
+        Amounts in the reporting currency, as a new array. Base-currency batches reporting
+        in the base currency come back as is; otherwise the factor is worked out once per
+        (currency, day), and rows without any rate count as 0.
+        """
+        reporting = normalize_currency(reporting)
+        if reporting is None and self.single_currency():
+            return self.amounts
+        currencies = self.currencies
+        factors = {}
+
+        def factor(key):
+            value = rates.convert(1.0, currencies[key[0]], key[1], reporting)
+            factors[key] = value = value if value is not None else 0.0
+            return value
+
+        rows = zip(self.amounts, self.currency_codes, self.datetimes)
+        if reporting is None:
+            # Only the foreign rows look anything up
+            return array("d", [amt if not code else amt * (factors[k] if (k := (code, dt[:10])) in factors else factor(k))
+                               for amt, code, dt in rows])
+        return array("d", [amt * (factors[k] if (k := (code, dt[:10])) in factors else factor(k))
+                           for amt, code, dt in rows])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        return (self.datetimes[i], self.types[self.type_codes[i]], self.comments[self.comment_codes[i]],
+                self.amounts[i], self.ids[i], self.currencies[self.currency_codes[i]])
+
+    def __iter__(self):
+        types, comments, currencies = self.types, self.comments, self.currencies
+        for dt, t, c, amt, row_id, cur in zip(self.datetimes, self.type_codes, self.comment_codes,
+                                              self.amounts, self.ids, self.currency_codes):
+            yield dt, types[t], comments[c], amt, row_id, currencies[cur]
+
+# --- RECURRING ---
+RECURRING_UNITS = ("day", "week", "month", "year")
+# Occurrences that aren't rows get negative ids: -(rule id * OCCURRENCE_SPAN + occurrence number)
+OCCURRENCE_SPAN = 1 << 24
+
+class RecurringRule:
+    """
+    One recurring_rules row. Occurrence n falls n * every units after the start, at the
+    start's time of day; monthly and yearly dates keep the start's day of the month,
+    clipped to the month's length (a rule starting on the 31st falls on Feb 28/29).
+    Which occurrences fall in a date range is worked out arithmetically, so a rule
+    costs nothing for the years a read doesn't cover.
+    """
+    __slots__ = ("id", "start", "time", "unit", "every", "end", "type", "comment", "amount", "currency",
+                 "category_id", "materialized_until", "category")
+
+    def __init__(self, rule_id, start_datetime, unit, every, end_date, trans_type, comment, amount, currency=None,
+                 category_id=None, materialized_until=None, category=None):
+        if unit not in RECURRING_UNITS:
+            raise ValueError(f"Interval must be one of {', '.join(RECURRING_UNITS)}")
+        self.id = rule_id
+        self.start = datetime.date.fromisoformat(start_datetime[:10])
+        self.time = start_datetime[10:]
+        self.unit = unit
+        self.every = max(1, int(every))
+        self.end = datetime.date.fromisoformat(end_date) if end_date else None
+        self.type = trans_type
+        self.comment = comment
+        self.amount = amount
+        self.currency = currency
+        self.category_id = category_id
+        self.materialized_until = datetime.date.fromisoformat(materialized_until) if materialized_until else None
+        # Report grouping key, as category_sql() computes it for rows
+        self.category = category or normalize_comment(comment)
+
+    def occurrence(self, n):
+        """Date of occurrence n (0 is the start)."""
+        if self.unit == "day":
+            return self.start + datetime.timedelta(days=n * self.every)
+        if self.unit == "week":
+            return self.start + datetime.timedelta(weeks=n * self.every)
+        year, month = divmod(self.start.year * 12 + self.start.month - 1 + n * self._months(), 12)
+        return datetime.date(year, month + 1, min(self.start.day, calendar.monthrange(year, month + 1)[1]))
+
+    def _months(self):
+        return self.every * (12 if self.unit == "year" else 1)
+
+    def _first_on_or_after(self, day):
+        if day <= self.start:
+            return 0
+        if self.unit in ("day", "week"):
+            step = self.every * (7 if self.unit == "week" else 1)
+            return -(-(day - self.start).days // step)
+        n = ((day.year - self.start.year) * 12 + day.month - self.start.month) // self._months()
+        # n is in day's month or before it; clipping can only put it before day
+        while self.occurrence(n) < day:
+            n += 1
+        return n
+
+    def span(self, first, last):
+        """Occurrence numbers from day first to day last (inclusive) that aren't rows yet, as a range."""
+        if self.materialized_until and self.materialized_until >= first:
+            first = self.materialized_until + datetime.timedelta(days=1)
+        if self.end and self.end < last:
+            last = self.end
+        if last < first:
+            return range(0)
+        return range(self._first_on_or_after(first), self._first_on_or_after(last + datetime.timedelta(days=1)))
+
+    def columns(self, first, last, days=None):
+        """
+        (datetimes, ids) of the occurrences between first and last that aren't rows yet,
+        newest first; type, comment, amount and currency are the rule's own. days caches
+        the ISO text of each day ordinal across the rules of one read.
+        """
+        span = self.span(first, last)
+        if not span:
+            return [], range(0)
+        time_of_day = self.time
+        if self.unit in ("day", "week"):
+            start, step = self.start.toordinal(), self.every * (7 if self.unit == "week" else 1)
+            days = {} if days is None else days
+            get, keep, fromordinal = days.get, days.setdefault, datetime.date.fromordinal
+            datetimes = [(get(ordinal) or keep(ordinal, fromordinal(ordinal).isoformat())) + time_of_day
+                         for ordinal in range(start + (span.stop - 1) * step, start + span.start * step - 1, -step)]
+        else:
+            # The month index steps by a constant; only days past the 28th are ever clipped
+            base, months, day = self.start.year * 12 + self.start.month - 1, self._months(), self.start.day
+            if day <= 28:
+                datetimes = [f"{index // 12:04d}-{index % 12 + 1:02d}-{day:02d}{time_of_day}"
+                             for index in range(base + (span.stop - 1) * months, base + span.start * months - 1, -months)]
+            else:
+                datetimes = [self.occurrence(n).isoformat() + time_of_day for n in reversed(span)]
+        base_id = -self.id * OCCURRENCE_SPAN
+        return datetimes, range(base_id - span.stop + 1, base_id - span.start + 1)
+
+    def rows(self, first, last, days=None):
+        """
+        The occurrences between first and last that aren't rows yet, newest first, as History
+        rows: (transaction_datetime, type, comment, amount, id, currency).
+        """
+        datetimes, ids = self.columns(first, last, days)
+        repeat = itertools.repeat
+        return list(zip(datetimes, repeat(self.type), repeat(self.comment), repeat(self.amount), ids,
+                        repeat(self.currency)))
+
+def load_recurring(conn, trans_type=None, comment_like=None):
+    """The ledger's RecurringRules, narrowed by the History filter's type and comment."""
+    where, params = "1=1", []
+    if trans_type and trans_type != "All":
+        where += " AND r.type = ?"
+        params.append(trans_type)
+    if comment_like and comment_like != "All":
+        where += f" AND {clean_comment_sql('r.comment')} LIKE ?"
+        params.append(f"%{comment_like.lower()}%")
+    rows = conn.execute(f"""
+        SELECT r.id, r.start_datetime, r.unit, r.every, r.end_date, r.type, r.comment, r.amount, r.currency,
+               r.category_id, r.materialized_until, CASE WHEN r.category_id > 0 THEN LOWER(c.name) END
+        FROM recurring_rules r LEFT JOIN categories c ON c.id = r.category_id WHERE {where} ORDER BY r.id
+    """, params).fetchall()
+    return [RecurringRule(*row) for row in rows]
+
+def recurring_range(start_date=None, end_date=None):
+    """(first, last) days a read covers. Occurrences after today haven't happened, so last is at most today."""
+    today = datetime.date.today()
+    first = datetime.date.fromisoformat(start_date[:10]) if start_date else datetime.date.min
+    last = datetime.date.fromisoformat(end_date[:10]) if end_date else today
+    return first, min(last, today)
+
+def recurring_occurrences(rules, first, last):
+    """Occurrence rows of the rules between first and last, newest first."""
+    days, rows = {}, []
+    for rule in rules:
+        rows += rule.rows(first, last, days)
+    # Each rule's rows are already a newest-first run, which the sort merges
+    rows.sort(key=itemgetter(0), reverse=True)
+    return rows
+
+def recurring_totals(rules, first, last, reporting=None, rates=None, db_file=None):
+    """
+    {(category, type): [count, total]} of the occurrences between first and last, in the
+    reporting currency. Base-currency rules are count * amount; only foreign ones (or a
+    foreign reporting currency) walk their occurrences for the as-of rates of db_file's
+    ledger (default the active one).
+    """
+    reporting = normalize_currency(reporting)
+    totals = {}
+    for rule in rules:
+        span = rule.span(first, last)
+        if not span:
+            continue
+        if rule.currency is None and reporting is None:
+            total = rule.amount * len(span)
+        else:
+            rates = rates or get_rate_table(db_file)
+            total = sum(rates.convert(rule.amount, rule.currency, rule.occurrence(n).isoformat(), reporting) or 0.0
+                        for n in span)
+        entry = totals.setdefault((rule.category, rule.type), [0, 0.0])
+        entry[0] += len(span)
+        entry[1] += total
+    return totals
+
+@metrics_utils.db_call
+def get_filtered_transactions(start_date, end_date, trans_type, comment_like):
+    """The History filter, newest first, as a TransactionBatch; recurring occurrences in the range are merged in."""
+    logger.info(f"Filtering: {start_date} to {end_date}, Type: {trans_type}, Comment: {comment_like}")
+    try:
+        conn = connect()
+        query, params = filtered_query(start_date, end_date, trans_type, comment_like)
+        records = TransactionBatch.from_cursor(conn.execute(query, params))
+        rules = load_recurring(conn, trans_type, comment_like)
+        conn.close()
+        if rules:
+            records = records.merge_recurring(rules, *recurring_range(start_date, end_date))
+        return records
+    except Exception as e:
+        logger.error(f"Filter error: {e}")
+        return TransactionBatch()
+
+def summary_by_comment_sql(reporting=None, mixed=True):
+    return f"""
+        SELECT {category_sql()} AS clean_comment, type, SUM({converted_amount_sql(reporting, mixed=mixed)}) AS total, COUNT(t.id)
+        FROM {categorized_from_sql()} GROUP BY clean_comment, type ORDER BY total ASC
+    """
+
+@metrics_utils.db_call
+def get_summary_by_comment(reporting=None):
+    try:
+        conn = connect()
+        cursor = conn.cursor()
+        cursor.execute(summary_by_comment_sql(reporting, is_multi_currency(conn)))
+        records = cursor.fetchall()
+        rules = load_recurring(conn)
+        conn.close()
+        if rules:
+            merged = {(comment, t_type): [count, total or 0.0] for comment, t_type, total, count in records}
+            for key, (count, total) in recurring_totals(rules, *recurring_range(), reporting).items():
+                entry = merged.setdefault(key, [0, 0.0])
+                entry[0] += count
+                entry[1] += total
+            records = sorted(((comment, t_type, total, count) for (comment, t_type), (count, total) in merged.items()),
+                             key=lambda r: r[2])
+        return records
+    except Exception as e:
+        logger.error(f"Summary error: {e}")
+        return []
+
+# --- PERIOD COMPARISONS ---
+COMPARISON_PERIODS = ("month", "year")
+
+def _month_start(day, back=0):
+    index = day.year * 12 + day.month - 1 - back
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+def comparison_periods(period="month", anchor=None):
+    """
+    [(label, start, end)] for the anchor's period, the one before it and, for months, the
+    same month a year earlier. Ends are exclusive dates.
+    """
+    anchor = anchor or datetime.date.today()
+    if period == "month":
+        current = _month_start(anchor)
+        periods = [(current, _month_start(anchor, -1)), (_month_start(anchor, 1), current),
+                   (_month_start(anchor, 12), _month_start(anchor, 11))]
+        return [(start.strftime("%b %Y"), start, end) for start, end in periods]
+    if period == "year":
+        return [(str(year), datetime.date(year, 1, 1), datetime.date(year + 1, 1, 1)) for year in (anchor.year, anchor.year - 1)]
+    raise ValueError(f"period must be one of {', '.join(COMPARISON_PERIODS)}")
+
+def period_comparison_query(periods, reporting=None, mixed=True, schema=None):
+    """
+    Per (category, type), one total column per period, as (sql, params). A single pass:
+    the WHERE keeps only the compared periods (index range scans on transaction_datetime)
+    and conditional SUMs pivot each row into its period's column. The inner GROUP BY is
+    on the integer category id, so the comment is only cleaned for uncategorized rows,
+    once per distinct raw comment rather than once per row.
+    """
+    prefix = f"{schema}." if schema else ""
+    amount = converted_amount_sql(reporting, schema=schema, mixed=mixed)
+    sums = ", ".join(
+        f"SUM(CASE WHEN t.transaction_datetime >= ? AND t.transaction_datetime < ? THEN {amount} END) AS p{i}"
+        for i in range(len(periods)))
+    # Back-to-back periods are read as one range: a MULTI-INDEX OR has to de-duplicate rowids
+    spans = []
+    for _, start, end in sorted(periods, key=lambda p: p[1]):
+        if spans and start <= spans[-1][1]:
+            spans[-1][1] = max(spans[-1][1], end)
+        else:
+            spans.append([start, end])
+    ranges = " OR ".join("(t.transaction_datetime >= ? AND t.transaction_datetime < ?)" for _ in spans)
+    totals = ", ".join(f"SUM(g.p{i})" for i in range(len(periods)))
+    bounds = [str(d) for _, start, end in periods for d in (start, end)]
+    span_bounds = [str(d) for span in spans for d in span]
+    query = f"""
+        SELECT COALESCE(LOWER(c.name), {clean_comment_sql("g.raw")}) AS category, g.type, {totals}
+        FROM (
+            SELECT t.category_id, t.type, CASE WHEN t.category_id > 0 THEN NULL ELSE t.comment END AS raw, {sums}
+            FROM {prefix}transactions t
+            WHERE {ranges}
+            GROUP BY 1, 2, 3
+        ) g LEFT JOIN {prefix}categories c ON c.id = g.category_id
+        GROUP BY category, g.type
+    """
+    return query, bounds + span_bounds
+
+def recurring_period_totals(rules, periods, reporting=None, db_file=None):
+    """[(category, type, total per period...)] of the rules' occurrences in each comparison period, up to today."""
+    totals = {}
+    for i, (_, start, end) in enumerate(periods):
+        first, last = recurring_range(start.isoformat(), (end - datetime.timedelta(days=1)).isoformat())
+        for key, (_, total) in recurring_totals(rules, first, last, reporting, db_file=db_file).items():
+            totals.setdefault(key, [None] * len(periods))[i] = total
+    return [(*key, *values) for key, values in totals.items()]
+
+def merge_period_rows(rows, width):
+    """Adds up comparison rows of the same (category, type); a period stays None when no part had rows in it."""
+    merged = {}
+    for category, t_type, *totals in rows:
+        entry = merged.setdefault((category, t_type), [None] * width)
+        for i, total in enumerate(totals):
+            if total is not None:
+                entry[i] = (entry[i] or 0.0) + total
+    return [(k[0], k[1], *v) for k, v in merged.items()]
+
+def change(current, previous):
+    """(absolute change, percent change or None when there is nothing to compare with)."""
+    current, previous = current or 0.0, previous or 0.0
+    diff = current - previous
+    return diff, (diff / abs(previous) * 100 if previous else None)
+
+@metrics_utils.db_call
+def get_period_comparison(period="month", anchor=None, reporting=None):
+    """
+    (period labels, [(category, type, total per period...)]) sorted by the current period's
+    total, expenses first. Totals are None for periods a category had no rows or
+    recurring occurrences in.
+    """
+    periods = comparison_periods(period, anchor)
+    try:
+        conn = connect()
+        try:
+            sql, params = period_comparison_query(periods, reporting, is_multi_currency(conn))
+            rows = conn.execute(sql, params).fetchall()
+            rules = load_recurring(conn)
+        finally:
+            conn.close()
+        if rules:
+            rows = merge_period_rows(rows + recurring_period_totals(rules, periods, reporting), len(periods))
+    except Exception as e:
+        logger.error(f"Comparison error: {e}")
+        rows = []
+    rows.sort(key=lambda r: r[2] or 0.0)
+    return [label for label, _, _ in periods], rows
+
+def aggregate_transactions(transactions_data, pdf_rows=None, reporting=None, rates=None):
+    """
+    Groups filtered rows by (comment, type) for the History sidebar and the PDF export.
+    Returns ({(comment, type): [count, total]}, total_deposits, total_expenditure), the
+    totals in the reporting currency; when a pdf_rows list is passed, the formatted detail
+    rows (in each row's own currency) are appended to it as well.
+    """
+    if isinstance(transactions_data, TransactionBatch):
+        return _aggregate_batch(transactions_data, pdf_rows, reporting, rates)
+    agg = {}
+    total_dep = 0.0
+    total_exp = 0.0
+    for row in transactions_data:
+        dt, t_type, cmt, amt, _, currency = row
+        cmt = (cmt or "N/A").replace("\n", "").replace("\r", "").strip().title()
+        if pdf_rows is not None:
+            pdf_rows.append([dt[:16], t_type, cmt, f"{amt:,.2f}" + (f" {currency}" if currency else "")])
+        if currency or reporting:
+            amt = (rates or get_rate_table()).convert(amt, currency, dt[:10], normalize_currency(reporting)) or 0.0
+        if amt > 0: total_dep += amt
+        else: total_exp += amt
+        key = (cmt, t_type)
+        if key not in agg: agg[key] = [0, 0.0]
+        agg[key][0] += 1
+        agg[key][1] += amt
+    return agg, total_dep, total_exp
+
+def _aggregate_batch(batch, pdf_rows, reporting, rates):
+    """aggregate_transactions over the columns: groups on the integer codes, cleans nothing per row."""
+    agg = {}
+    total_dep = 0.0
+    total_exp = 0.0
+    n_types = max(1, len(batch.types))
+    if reporting or not batch.single_currency():
+        amounts = batch.converted_amounts(rates or get_rate_table(), reporting)
+    else:
+        amounts = batch.amounts
+    for t, c, amt in zip(batch.type_codes, batch.comment_codes, amounts):
+        if amt > 0: total_dep += amt
+        else: total_exp += amt
+        key = c * n_types + t
+        entry = agg.get(key)
+        if entry is None:
+            agg[key] = [1, amt]
+        else:
+            entry[0] += 1
+            entry[1] += amt
+    if pdf_rows is not None:
+        types, comments = batch.types, batch.comments
+        rows = zip(batch.datetimes, batch.type_codes, batch.comment_codes, batch.amounts)
+        if batch.single_currency():
+            pdf_rows.extend([dt[:16], types[t], comments[c], f"{amt:,.2f}"] for dt, t, c, amt in rows)
+        else:
+            suffixes = ["" if cur is None else f" {cur}" for cur in batch.currencies]
+            pdf_rows.extend([dt[:16], types[t], comments[c], f"{amt:,.2f}{suffixes[cur]}"]
+                            for (dt, t, c, amt), cur in zip(rows, batch.currency_codes))
+    named = {(batch.comments[key // n_types], batch.types[key % n_types]): entry for key, entry in agg.items()}
+    return named, total_dep, total_exp
+
+
+# --- COMMENT AUTOCOMPLETE ---
+def normalize_comment(comment):
+    """Python twin of clean_comment_sql."""
+    return (comment or "").replace("\n", "").replace("\r", "").strip().lower()
+
+# Sorts after any character a comment can contain
+_PREFIX_END = chr(0x10FFFF)
+
+class CommentIndex:
+    """
+    In-memory prefix index of normalized comments with usage counts. The comments sit in
+    a sorted list, so a prefix is one bisect range; prefixes matching more than
+    SCAN_LIMIT comments keep their top suggestions precomputed and updated on insert, so
+    a lookup never walks more than SCAN_LIMIT entries.
+    """
+    SCAN_LIMIT = 256
+    TOP_K = 10
+
+    def __init__(self, db_file=None):
+        self.db_file = db_file
+        self.keys = []
+        self.counts = {}
+        self.top = {}
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def load(self):
+        """Reads every distinct comment with its count (one GROUP BY scan) and rebuilds the index."""
+        try:
+            conn = connect(self.db_file)
+            rows = conn.execute(
+                f"SELECT {clean_comment_sql()}, COUNT(*) FROM transactions WHERE comment IS NOT NULL GROUP BY 1"
+            ).fetchall()
+            conn.close()
+        except Exception as e:
+            logger.error(f"Comment index load failed: {e}")
+            return self
+        self.build({key: count for key, count in rows if key})
+        return self
+
+    def build(self, counts):
+        keys = sorted(counts)
+        top = self._precompute(keys, counts)
+        with self.lock:
+            self.keys, self.counts, self.top = keys, dict(counts), top
+            self.loaded = True
+        return self
+
+    def _range(self, prefix, keys=None):
+        keys = self.keys if keys is None else keys
+        lo = bisect.bisect_left(keys, prefix)
+        return lo, bisect.bisect_left(keys, prefix + _PREFIX_END, lo)
+
+    def _best(self, keys, counts, lo, hi):
+        return heapq.nlargest(self.TOP_K, keys[lo:hi], key=lambda k: (counts[k], k))
+
+    def _precompute(self, keys, counts):
+        """Top suggestions for every prefix whose range is too big to scan per keystroke."""
+        top = {}
+        stack = [("", 0, len(keys))]
+        while stack:
+            prefix, lo, hi = stack.pop()
+            if hi - lo <= self.SCAN_LIMIT:
+                continue
+            top[prefix] = self._best(keys, counts, lo, hi)
+            depth = len(prefix) + 1
+            i = lo
+            while i < hi:
+                if len(keys[i]) < depth:
+                    i += 1
+                    continue
+                child = keys[i][:depth]
+                j = bisect.bisect_left(keys, child + _PREFIX_END, i, hi)
+                stack.append((child, i, j))
+                i = j
+        return top
+
+    def note(self, comment):
+        """Counts one more use of a comment (called after each insert)."""
+        key = normalize_comment(comment)
+        if not key:
+            return
+        with self.lock:
+            if key in self.counts:
+                self.counts[key] += 1
+            else:
+                self.counts[key] = 1
+                bisect.insort(self.keys, key)
+            count = self.counts[key]
+            for depth in range(len(key) + 1):
+                prefix = key[:depth]
+                best = self.top.get(prefix)
+                if best is None:
+                    lo, hi = self._range(prefix)
+                    if hi - lo > self.SCAN_LIMIT:
+                        self.top[prefix] = self._best(self.keys, self.counts, lo, hi)
+                    continue
+                if key in best:
+                    best.sort(key=lambda k: (self.counts[k], k), reverse=True)
+                elif len(best) < self.TOP_K or (count, key) > (self.counts[best[-1]], best[-1]):
+                    best.append(key)
+                    best.sort(key=lambda k: (self.counts[k], k), reverse=True)
+                    del best[self.TOP_K:]
+
+    def adjust(self, deltas):
+        """
+        Applies {comment: change in count} after a bulk edit or delete. Comments that drop
+        to zero leave the index; only the precomputed prefixes of changed comments are redone.
+        """
+        with self.lock:
+            prefixes = set()
+            for comment, delta in deltas.items():
+                key = normalize_comment(comment)
+                if not key or not delta:
+                    continue
+                count = self.counts.get(key, 0) + delta
+                if count > 0:
+                    if key not in self.counts:
+                        bisect.insort(self.keys, key)
+                    self.counts[key] = count
+                elif key in self.counts:
+                    del self.counts[key]
+                    del self.keys[bisect.bisect_left(self.keys, key)]
+                prefixes.update(key[:depth] for depth in range(len(key) + 1))
+            for prefix in prefixes:
+                lo, hi = self._range(prefix)
+                if hi - lo > self.SCAN_LIMIT:
+                    self.top[prefix] = self._best(self.keys, self.counts, lo, hi)
+                else:
+                    self.top.pop(prefix, None)
+
+    def suggest(self, prefix, limit=8):
+        """Most used comments starting with prefix, title-cased like the rest of the UI."""
+        prefix = normalize_comment(prefix)
+        with self.lock:
+            best = self.top.get(prefix)
+            if best is None:
+                lo, hi = self._range(prefix)
+                best = self._best(self.keys, self.counts, lo, hi)
+            return [k.title() for k in best[:limit]]
+
+    def all_comments(self):
+        """Every distinct comment in order, as get_unique_comments returns them."""
+        with self.lock:
+            return [k.title() for k in self.keys]
+
+_comment_indexes = {}
+_comment_indexes_lock = threading.Lock()
+
+def get_comment_index(db_file=None, load=True):
+    """The process-wide CommentIndex of a ledger, loaded on first use."""
+    db_file = os.path.abspath(db_file or DB_FILE)
+    with _comment_indexes_lock:
+        index = _comment_indexes.get(db_file)
+        if index is None:
+            index = _comment_indexes[db_file] = CommentIndex(db_file)
+    if load and not index.loaded:
+        index.load()
+    return index
+
+def note_comment(comment, db_file=None):
+    """Feeds a new comment to the ledger's index if one has been built."""
+    index = _comment_indexes.get(os.path.abspath(db_file or DB_FILE))
+    if index is not None and index.loaded:
+        index.note(comment)
+
+def adjust_comments(deltas, db_file=None):
+    """Feeds {comment: change in count} to the ledger's index if one has been built."""
+    index = _comment_indexes.get(os.path.abspath(db_file or DB_FILE))
+    if index is not None and index.loaded:
+        index.adjust(deltas)
@@ -0,0 +1,150 @@
+"""
+Bulk edits and deletes from the History view.
+
+Rows are chosen either by id (the rows ticked in the table) or by the History filter
+itself (filter_where), and each edit is one UPDATE or DELETE statement in one writer
+job, however many rows it touches. The change journal triggers still log every row,
+so backups and replicas pick the edit up like any other.
+
+A new comment is categorized inside the same UPDATE (comment_category_sql); a type
+change alone clears category_id and re-runs the rules over the pending rows. The
+comment index is adjusted by the counts that moved rather than rebuilt.
+
+    python edit_utils.py update finance.db --ids 12,13,14 --set-comment "Groceries"
+    python edit_utils.py update finance.db --from 2024-01-01 --to 2024-01-31 --shift-days 1
+    python edit_utils.py delete finance.db --type "Borrow" --comment "test"
+"""
+import sqlite3
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+
+import db_utils
+import category_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+def target_sql(ids=None, where=None):
+    """(sql, params) choosing the rows to edit: an id list, or a filter_where() predicate."""
+    if ids is not None:
+        # One parameter however many ids: no SQLITE_MAX_VARIABLE_NUMBER to split around
+        return "id IN (SELECT value FROM json_each(?))", [json.dumps([int(i) for i in ids])]
+    if where is None:
+        raise ValueError("A bulk edit needs ids or a filter")
+    return where[0], list(where[1])
+
+def _comment_counts(conn, target, params):
+    return conn.execute(
+        f"SELECT {db_utils.clean_comment_sql()}, COUNT(*) FROM transactions WHERE comment IS NOT NULL AND ({target}) GROUP BY 1",
+        params).fetchall()
+
+def count_rows(ids=None, where=None, db_file=None):
+    """How many rows an edit with this selection would touch (for the confirmation)."""
+    target, params = target_sql(ids, where)
+    conn = db_utils.connect(db_file)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM transactions WHERE {target}", params).fetchone()[0]
+    finally:
+        conn.close()
+
+def bulk_update(ids=None, where=None, trans_type=None, comment=None, shift_days=0, db_file=None):
+    """
+    Edits the chosen rows in one UPDATE and returns how many changed. trans_type also
+    flips the amounts' sign to match it; shift_days moves the date and keeps the time.
+    """
+    sets, params = [], []
+    if trans_type:
+        if trans_type not in db_utils.TRANSACTION_TYPES:
+            raise ValueError(f"Unknown type: {trans_type}")
+        sets += ["type = ?", "amount = CASE WHEN ? = 'Deposit' THEN ABS(amount) ELSE -ABS(amount) END"]
+        params += [trans_type, trans_type]
+    if comment is not None:
+        sets.append("comment = ?")
+        params.append(comment)
+    if shift_days:
+        sets.append("transaction_datetime = DATE(transaction_datetime, ?) || SUBSTR(transaction_datetime, 11)")
+        params.append(f"{int(shift_days):+d} days")
+    if not sets:
+        return 0
+    # A new comment is categorized right in the UPDATE; a type change alone leaves
+    # the rows pending for a recategorize pass, since their comments all differ
+    recategorize = False
+    if comment is not None:
+        sets.append(f"category_id = {category_utils.comment_category_sql(comment, trans_type, db_file)}")
+    elif trans_type:
+        sets.append("category_id = NULL")
+        recategorize = True
+    target, target_params = target_sql(ids, where)
+
+    def job(conn):
+        before = _comment_counts(conn, target, target_params) if comment is not None else []
+        changed = conn.execute(f"UPDATE transactions AS t SET {', '.join(sets)} WHERE {target}", params + target_params).rowcount
+        return before, changed
+
+    started = time.perf_counter()
+    before, changed = db_utils.get_writer(db_file).submit(job).result()
+    if before:
+        deltas = {key: -count for key, count in before}
+        key = db_utils.normalize_comment(comment)
+        deltas[key] = deltas.get(key, 0) + changed
+        db_utils.adjust_comments(deltas, db_file)
+    if recategorize and changed:
+        category_utils.recategorize(db_file, pending_only=True)
+    logger.info(f"Bulk update of {changed:,} rows in {time.perf_counter() - started:.2f}s")
+    return changed
+
+def bulk_delete(ids=None, where=None, db_file=None):
+    """Deletes the chosen rows in one DELETE and returns how many went."""
+    target, target_params = target_sql(ids, where)
+
+    def job(conn):
+        before = _comment_counts(conn, target, target_params)
+        return before, conn.execute(f"DELETE FROM transactions WHERE {target}", target_params).rowcount
+
+    started = time.perf_counter()
+    before, deleted = db_utils.get_writer(db_file).submit(job).result()
+    db_utils.adjust_comments({key: -count for key, count in before}, db_file)
+    logger.info(f"Bulk delete of {deleted:,} rows in {time.perf_counter() - started:.2f}s")
+    return deleted
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro bulk edits")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_update = sub.add_parser("update", help="Edit the chosen rows")
+    p_delete = sub.add_parser("delete", help="Delete the chosen rows")
+    for p in (p_update, p_delete):
+        p.add_argument("db")
+        p.add_argument("--ids", help="Comma-separated transaction ids")
+        p.add_argument("--from", dest="start", help="Filter: first day (YYYY-MM-DD)")
+        p.add_argument("--to", dest="end", help="Filter: last day (YYYY-MM-DD)")
+        p.add_argument("--type", choices=db_utils.TRANSACTION_TYPES, help="Filter: transaction type")
+        p.add_argument("--comment", help="Filter: comment contains")
+    p_update.add_argument("--set-type", choices=db_utils.TRANSACTION_TYPES)
+    p_update.add_argument("--set-comment")
+    p_update.add_argument("--shift-days", type=int, default=0)
+    args = parser.parse_args()
+
+    try:
+        db_utils.DB_FILE = os.path.abspath(args.db)
+        db_utils.initialize_database()
+        ids = [int(i) for i in args.ids.split(",") if i.strip()] if args.ids else None
+        where = None
+        if ids is None:
+            if not (args.start or args.end or args.type or args.comment):
+                raise ValueError("Give --ids or at least one filter; an empty filter would touch every row")
+            where = db_utils.filter_where(args.start, args.end, args.type, args.comment)
+        if args.command == "update":
+            changed = bulk_update(ids, where, args.set_type, args.set_comment, args.shift_days)
+            print(f"Updated {changed:,} rows")
+        else:
+            print(f"Deleted {bulk_delete(ids, where):,} rows")
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()
@@ -0,0 +1,180 @@
+"""
+Spreadsheet and data exports of the History filter: CSV, XLSX and Parquet.
+
+Rows are read from the filter's cursor with fetchmany and handed to the writer one
+batch at a time, so memory stays flat whatever the row count. Recurring occurrences in
+the range are merged in, newest first, as the History view shows them; only they are
+held in memory. Writers:
+    csv      the standard csv module
+    xlsx     openpyxl in write-only mode (rows are streamed to the sheet, never kept),
+             continuing on a new sheet each time one reaches Excel's row limit
+    parquet  pyarrow, one row group per FETCH_SIZE batch
+
+openpyxl and pyarrow are only needed for their own format.
+
+    python export_utils.py finance.db history.parquet --from 2025-01-01 --to 2025-12-31
+"""
+import sqlite3
+import os
+import io
+import sys
+import csv
+import time
+import logging
+import argparse
+import heapq
+from itertools import chain, islice
+from operator import itemgetter
+
+import db_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+EXPORT_FORMATS = ("csv", "xlsx", "parquet")
+FETCH_SIZE = 10_000
+COLUMNS = ["id", "datetime", "type", "comment", "amount", "currency"]
+# Rows Excel opens in one sheet, the header included
+XLSX_MAX_ROWS = 1_048_576
+
+def export_query(start_date=None, end_date=None, trans_type="All", comment_like="All"):
+    """The History filter as (sql, params) selecting COLUMNS, so rows go to the writers untouched."""
+    where, params = db_utils.filter_where(start_date, end_date, trans_type, comment_like)
+    sql = (f"SELECT id, transaction_datetime, type, comment, amount, COALESCE(currency, ?) FROM transactions "
+           f"WHERE {where} ORDER BY transaction_datetime DESC, id DESC")
+    return sql, [db_utils.BASE_CURRENCY] + params
+
+def fetch_batches(conn, sql, params, size=FETCH_SIZE):
+    cursor = conn.execute(sql, params)
+    while True:
+        rows = cursor.fetchmany(size)
+        if not rows:
+            break
+        yield rows
+
+def with_recurring(batches, rules, first, last, size=FETCH_SIZE):
+    """export_query's row batches with the rules' occurrences between first and last merged in by datetime."""
+    base = db_utils.BASE_CURRENCY
+    occurrences = [(row_id, dt, t_type, comment, amount, currency or base)
+                   for dt, t_type, comment, amount, row_id, currency in db_utils.recurring_occurrences(rules, first, last)]
+    # On equal datetimes stored rows come first, as their positive ids sort before occurrence ids
+    rows = heapq.merge(chain.from_iterable(batches), occurrences, key=itemgetter(1), reverse=True)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            break
+        yield batch
+
+def export_batches(conn, start_date=None, end_date=None, trans_type="All", comment_like="All"):
+    """The History filter's rows as COLUMNS batches, recurring occurrences included."""
+    batches = fetch_batches(conn, *export_query(start_date, end_date, trans_type, comment_like))
+    rules = db_utils.load_recurring(conn, trans_type, comment_like)
+    if rules:
+        batches = with_recurring(batches, rules, *db_utils.recurring_range(start_date, end_date))
+    return batches
+
+# --- WRITERS ---
+# Each takes a binary file object and an iterable of row batches, and returns the row count.
+def write_csv(out, batches):
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="")
+    writer = csv.writer(text, lineterminator="\r\n")
+    writer.writerow(COLUMNS)
+    count = 0
+    for rows in batches:
+        writer.writerows(rows)
+        count += len(rows)
+    text.flush()
+    text.detach()
+    return count
+
+def write_xlsx(out, batches):
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ValueError("XLSX export needs openpyxl (pip install openpyxl)")
+    book = Workbook(write_only=True)
+    sheet = book.create_sheet("Transactions")
+    sheet.append(COLUMNS)
+    count, used = 0, 1
+    for rows in batches:
+        for row in rows:
+            if used == XLSX_MAX_ROWS:
+                # Excel truncates a longer sheet, so the rest goes on "Transactions 2" and on
+                sheet = book.create_sheet(f"Transactions {len(book.worksheets) + 1}")
+                sheet.append(COLUMNS)
+                used = 1
+            sheet.append(row)
+            used += 1
+        count += len(rows)
+    book.save(out)
+    return count
+
+def write_parquet(out, batches):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+    schema = pa.schema([("id", pa.int64()), ("datetime", pa.string()), ("type", pa.string()),
+                        ("comment", pa.string()), ("amount", pa.float64()), ("currency", pa.string())])
+    count = 0
+    with pq.ParquetWriter(out, schema) as writer:
+        for rows in batches:
+            columns = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays([pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+                                                    schema=schema))
+            count += len(rows)
+    return count
+
+WRITERS = {"csv": write_csv, "xlsx": write_xlsx, "parquet": write_parquet}
+
+def format_for(path):
+    fmt = os.path.splitext(path)[1].lstrip(".").lower()
+    if fmt not in WRITERS:
+        raise ValueError(f"Unknown export format {fmt!r}: use one of {', '.join(EXPORT_FORMATS)}")
+    return fmt
+
+def write_rows(fmt, out, batches):
+    return WRITERS[fmt](out, batches)
+
+def export_filtered(path, start_date=None, end_date=None, trans_type="All", comment_like="All", fmt=None, db_file=None):
+    """Writes the History filter's rows to path. Returns (rows, seconds)."""
+    fmt = fmt or format_for(path)
+    started = time.perf_counter()
+    conn = db_utils.connect(db_file)
+    try:
+        with open(path, "wb") as out:
+            count = write_rows(fmt, out, export_batches(conn, start_date, end_date, trans_type, comment_like))
+    except Exception:
+        # No half-written file left behind (a missing library fails before any row)
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    finally:
+        conn.close()
+    seconds = time.perf_counter() - started
+    logger.info(f"Exported {count:,} rows to {path} ({fmt}) in {seconds:.2f}s")
+    return count, seconds
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro history export")
+    parser.add_argument("db")
+    parser.add_argument("out", help="Output file; the extension picks the format unless --format is given")
+    parser.add_argument("--format", choices=EXPORT_FORMATS)
+    parser.add_argument("--from", dest="start", help="First day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", help="Last day (YYYY-MM-DD)")
+    parser.add_argument("--type", default="All", choices=("All",) + db_utils.TRANSACTION_TYPES)
+    parser.add_argument("--comment", default="All", help="Comment contains")
+    args = parser.parse_args()
+
+    try:
+        db_utils.DB_FILE = os.path.abspath(args.db)
+        db_utils.initialize_database()
+        rows, seconds = export_filtered(args.out, args.start, args.end, args.type, args.comment, args.format)
+        print(f"{rows:,} rows in {seconds:.2f}s ({rows / seconds if seconds else 0:,.0f} rows/s)")
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()
@@ -0,0 +1,150 @@
+"""
+Local FX rates for multi-currency ledgers. No network: rates come from a CSV of daily
+rates, e.g. a bank's or the RBI reference rate export.
+
+Two CSV layouts are accepted:
+    long:  date,currency,rate          (one row per currency per day)
+    wide:  Date,USD,EUR,GBP            (one column per currency)
+Rates are stored as units of the base currency (INR) per unit of the currency. A file
+quoted the other way round (USD per INR) imports with --per-base.
+
+Each ledger keeps its own rates; a replica imports the same file rather than getting
+them through the journal.
+
+    python fx_utils.py import finance.db rates.csv
+    python fx_utils.py list finance.db --currency USD
+"""
+import sqlite3
+import os
+import sys
+import csv
+import datetime
+import logging
+import argparse
+
+import db_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+DATE_FORMATS = ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y", "%Y/%m/%d", "%d-%b-%Y", "%d %b %Y")
+
+def _parse_date(text):
+    text = text.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.datetime.strptime(text, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    raise ValueError(f"Unrecognised date: {text!r}")
+
+def _parse_rate(text, per_base):
+    rate = float(text.replace(",", ""))
+    if rate <= 0:
+        raise ValueError(f"Rate must be positive: {text!r}")
+    return 1.0 / rate if per_base else rate
+
+def read_rates_csv(path, per_base=False):
+    """Yields (currency, rate_date, rate) from a long or wide rates CSV. Blank cells are skipped."""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.reader(f)
+        header = [h.strip() for h in next(reader)]
+        lowered = [h.lower() for h in header]
+        if lowered[:3] == ["date", "currency", "rate"]:
+            for row in reader:
+                if len(row) >= 3 and row[2].strip():
+                    currency = db_utils.normalize_currency(row[1])
+                    if currency:
+                        yield currency, _parse_date(row[0]), _parse_rate(row[2], per_base)
+        elif lowered and lowered[0] == "date":
+            currencies = [db_utils.normalize_currency(h) for h in header[1:]]
+            for row in reader:
+                if not row or not row[0].strip():
+                    continue
+                rate_date = _parse_date(row[0])
+                for currency, cell in zip(currencies, row[1:]):
+                    if currency and cell.strip():
+                        yield currency, rate_date, _parse_rate(cell, per_base)
+        else:
+            raise ValueError("Expected a 'date,currency,rate' header or 'Date' followed by currency codes")
+
+def _bump_version(conn):
+    """Rate imports skip the change journal, so caches keyed on it also watch this counter."""
+    conn.execute('''
+        INSERT INTO journal_meta (key, value) VALUES ('fx_version', 1)
+        ON CONFLICT (key) DO UPDATE SET value = value + 1
+    ''')
+
+def import_rates(path, db_file=None, per_base=False):
+    """Upserts the rates in a CSV into fx_rates. Returns the number of rates read."""
+    rows = list(read_rates_csv(path, per_base))
+
+    def job(conn):
+        conn.executemany("INSERT OR REPLACE INTO fx_rates (currency, rate_date, rate) VALUES (?, ?, ?)", rows)
+        if rows:
+            _bump_version(conn)
+            # Budget usage holds foreign rows at the rates known when they were written
+            if db_utils.is_multi_currency(conn):
+                db_utils.rebuild_budget_usage(conn)
+    db_utils.get_writer(db_file).submit(job).result()
+    db_utils.forget_rate_table(db_file)
+    logger.info(f"Imported {len(rows)} FX rates from {path}")
+    return len(rows)
+
+def list_rates(db_file=None, currency=None):
+    """[(currency, first date, last date, days, latest rate)], or the daily rates of one currency."""
+    conn = db_utils.connect(db_file)
+    try:
+        if currency:
+            return conn.execute("SELECT currency, rate_date, rate FROM fx_rates WHERE currency = ? ORDER BY rate_date",
+                                (db_utils.normalize_currency(currency),)).fetchall()
+        return conn.execute('''
+            SELECT currency, MIN(rate_date), MAX(rate_date), COUNT(*),
+                   (SELECT r.rate FROM fx_rates r WHERE r.currency = f.currency ORDER BY r.rate_date DESC LIMIT 1)
+            FROM fx_rates f GROUP BY currency ORDER BY currency
+        ''').fetchall()
+    finally:
+        conn.close()
+
+def missing_rate_currencies(db_file=None):
+    """Currencies used by transactions that have no rate at all; their rows count as 0 in reports."""
+    conn = db_utils.connect(db_file)
+    try:
+        return [row[0] for row in conn.execute('''
+            SELECT DISTINCT currency FROM transactions
+            WHERE currency IS NOT NULL AND currency NOT IN (SELECT DISTINCT currency FROM fx_rates)
+        ''')]
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro FX rates")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_import = sub.add_parser("import", help="Import daily rates from a CSV")
+    p_import.add_argument("db")
+    p_import.add_argument("csv")
+    p_import.add_argument("--per-base", action="store_true", help=f"Rates are units of the currency per {db_utils.BASE_CURRENCY}")
+    p_list = sub.add_parser("list", help="Show the stored rates")
+    p_list.add_argument("db")
+    p_list.add_argument("--currency")
+    args = parser.parse_args()
+
+    try:
+        db_utils.DB_FILE = os.path.abspath(args.db)
+        db_utils.initialize_database()
+        if args.command == "import":
+            print(f"Imported {import_rates(args.csv, per_base=args.per_base):,} rates")
+        elif args.currency:
+            for currency, rate_date, rate in list_rates(currency=args.currency):
+                print(f"{rate_date}  {currency}  {rate:,.4f}")
+        else:
+            for currency, first, last, days, latest in list_rates():
+                print(f"{currency}  {first} .. {last}  {days:>5} days  latest {latest:,.4f}")
+        for currency in missing_rate_currencies():
+            print(f"Warning: no rates for {currency}; its transactions count as 0 in reports")
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()
@@ -0,0 +1,279 @@
+"""
+Incremental backup and replication from the change_log journal.
+
+export_changes() writes everything after a sequence number to a small gzip'd file;
+apply_changes() replays such files into another copy of the ledger. Applying is
+idempotent: each replica remembers the last sequence it applied per source database,
+and rows are written by id, so replaying a file twice (or an overlapping one) is harmless.
+The first export of a database is a snapshot of every row, later ones are deltas.
+
+Sync through a shared folder is one-way per ledger: the machine that writes a ledger
+exports, the others apply. Two machines inserting into the same ledger would hand out
+the same ids. Seed a replica from a snapshot export rather than a file copy, since a
+copy keeps the source's id and would skip the source's own files.
+
+    python journal_utils.py export finance.db D:\\Backups\\journal
+    python journal_utils.py apply replica.db D:\\Backups\\journal\\*.fmpj.gz
+    python journal_utils.py sync finance.db "G:\\My Drive\\FinanceSync"
+"""
+import sqlite3
+import os
+import sys
+import glob
+import gzip
+import json
+import logging
+import argparse
+
+import db_utils
+import category_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+# Format 2 adds the currency column; format 1 files (all base currency) still apply
+JOURNAL_FORMAT = 2
+READABLE_FORMATS = (1, 2)
+JOURNAL_SUFFIX = ".fmpj.gz"
+CHANGE_COLUMNS = "seq, op, row_id, transaction_datetime, type, comment, amount, currency"
+
+class JournalError(Exception):
+    pass
+
+def _meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM journal_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+def _set_meta(conn, key, value):
+    conn.execute("INSERT OR REPLACE INTO journal_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+def _ensure_schema(db_file):
+    saved = db_utils.DB_FILE
+    db_utils.DB_FILE = db_file
+    try:
+        db_utils.initialize_database()
+    finally:
+        db_utils.DB_FILE = saved
+
+def journal_file_name(db_id, from_seq, to_seq):
+    return f"journal_{db_id[:12]}_{from_seq:012d}_{to_seq:012d}{JOURNAL_SUFFIX}"
+
+# --- EXPORT ---
+def export_changes(out_dir, db_file=None, since=None):
+    """
+    Writes the changes after `since` (default: after the last export) to a file in
+    out_dir and returns its path, or None when nothing changed. since=0 gives a snapshot.
+    """
+    db_file = db_file or db_utils.DB_FILE
+    _ensure_schema(db_file)
+    conn = db_utils.connect(db_file)
+    conn.isolation_level = None
+    try:
+        # One read transaction, so the snapshot rows and the journal position agree
+        conn.execute("BEGIN")
+        db_id = _meta(conn, "db_id")
+        if since is None:
+            since = int(_meta(conn, "exported_seq", 0))
+        to_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+        snapshot = since == 0
+        if snapshot:
+            changes = conn.execute(
+                "SELECT NULL, 'I', id, transaction_datetime, type, comment, amount, currency FROM transactions ORDER BY id")
+        else:
+            if to_seq <= since:
+                conn.execute("COMMIT")
+                return None
+            oldest = conn.execute("SELECT MIN(seq) FROM change_log").fetchone()[0]
+            if oldest is not None and oldest > since + 1:
+                raise JournalError(f"Changes {since + 1}..{oldest - 1} were pruned; export a snapshot (since=0)")
+            changes = conn.execute(
+                f"SELECT {CHANGE_COLUMNS} FROM change_log WHERE seq > ? ORDER BY seq", (since,))
+
+        os.makedirs(out_dir, exist_ok=True)
+        path = os.path.join(out_dir, journal_file_name(db_id, since, to_seq))
+        tmp_path = path + ".part"
+        count = 0
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+            header = {"format": JOURNAL_FORMAT, "source": db_id, "from_seq": since, "to_seq": to_seq, "snapshot": snapshot}
+            f.write(json.dumps(header) + "\n")
+            for row in changes:
+                f.write(json.dumps(row, separators=(",", ":")) + "\n")
+                count += 1
+        conn.execute("COMMIT")
+        os.replace(tmp_path, path)
+
+        _set_exported(db_file, to_seq)
+        logger.info(f"Journal export: {count} changes ({since}..{to_seq}) -> {path}")
+        return path
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def _set_exported(db_file, seq):
+    def job(conn):
+        current = int(_meta(conn, "exported_seq", 0))
+        if seq > current:
+            _set_meta(conn, "exported_seq", seq)
+    db_utils.get_writer(db_file).submit(job).result()
+
+def prune_journal(up_to_seq, db_file=None):
+    """Drops journal entries that every replica has already received."""
+    return db_utils.get_writer(db_file).execute("DELETE FROM change_log WHERE seq <= ?", (up_to_seq,))[1]
+
+# --- APPLY ---
+def read_journal_header(path):
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+    if header.get("format") not in READABLE_FORMATS:
+        raise JournalError(f"Unsupported journal format in {path}")
+    return header
+
+def apply_changes(paths, db_file=None):
+    """
+    Replays journal files into db_file in sequence order. Returns the number of changes
+    applied; entries at or below the replica's last applied sequence for a source are skipped.
+    """
+    db_file = db_file or db_utils.DB_FILE
+    _ensure_schema(db_file)
+    files = sorted(((read_journal_header(p), p) for p in paths),
+                   key=lambda hp: (hp[0]["source"], hp[0]["to_seq"], not hp[0]["snapshot"]))
+    conn = db_utils.connect(db_file)
+    conn.isolation_level = None
+    applied = 0
+    try:
+        for header, path in files:
+            applied += _apply_file(conn, header, path)
+    finally:
+        conn.close()
+    if applied:
+        # Replayed rows arrive without a category; this replica's own rules assign one
+        category_utils.recategorize(db_file, pending_only=True)
+    return applied
+
+def _apply_file(conn, header, path):
+    source = header["source"]
+    state_key = f"applied:{source}"
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if source == _meta(conn, "db_id"):
+            conn.execute("COMMIT")
+            return 0
+        last = int(_meta(conn, state_key, -1))
+        if header["snapshot"]:
+            if _meta(conn, "exported_seq") is not None:
+                raise JournalError(f"Refusing to load snapshot {os.path.basename(path)} over a ledger that exports its own journal")
+            if last >= header["to_seq"]:
+                conn.execute("COMMIT")
+                return 0
+        elif header["from_seq"] > max(last, 0):
+            raise JournalError(f"Gap before {os.path.basename(path)}: replica is at {last}, file starts after {header['from_seq']}")
+        elif last >= header["to_seq"]:
+            conn.execute("COMMIT")
+            return 0
+
+        # Our own triggers journal the replayed rows too; drop those echoes at the end so a
+        # replica doesn't hand the same changes back to the folder.
+        echo_from = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+        if header["snapshot"]:
+            conn.execute("DELETE FROM transactions")
+
+        count = 0
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            f.readline()
+            for line in f:
+                seq, op, row_id, dt, t_type, comment, amount, *rest = json.loads(line)
+                currency = rest[0] if rest else None
+                if seq is not None and seq <= last:
+                    continue
+                if op == "D":
+                    conn.execute("DELETE FROM transactions WHERE id = ?", (row_id,))
+                else:
+                    # An upsert, not INSERT OR REPLACE: REPLACE deletes the old row without
+                    # firing the delete triggers, so budget_usage would keep the old amount.
+                    # The category is cleared as REPLACE did, for recategorize to assign again.
+                    conn.execute('''
+                        INSERT INTO transactions (id, transaction_datetime, type, comment, amount, currency) VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (id) DO UPDATE SET transaction_datetime = excluded.transaction_datetime, type = excluded.type,
+                            comment = excluded.comment, amount = excluded.amount, currency = excluded.currency, category_id = NULL
+                    ''', (row_id, dt, t_type, comment, amount, currency))
+                count += 1
+
+        conn.execute("DELETE FROM change_log WHERE seq > ?", (echo_from,))
+        _set_meta(conn, state_key, header["to_seq"])
+        conn.execute("COMMIT")
+        logger.info(f"Journal apply: {count} changes from {os.path.basename(path)}")
+        return count
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+
+# --- SHARED FOLDER SYNC ---
+def sync_folder(folder, db_file=None):
+    """
+    Exports this ledger's new changes into folder and applies every other source's files
+    found there. A database that has applied another source's changes is a replica and
+    never exports, so the folder only ever carries the writing machine's journal.
+    """
+    db_file = db_file or db_utils.DB_FILE
+    _ensure_schema(db_file)
+    conn = db_utils.connect(db_file)
+    own_id = _meta(conn, "db_id")
+    conn.close()
+    others = [p for p in glob.glob(os.path.join(folder, f"*{JOURNAL_SUFFIX}"))
+              if not os.path.basename(p).startswith(f"journal_{own_id[:12]}_")]
+    applied = 0
+    if others:
+        try:
+            applied = apply_changes(others, db_file)
+        except JournalError as e:
+            logger.error(f"Journal apply stopped: {e}")
+
+    conn = db_utils.connect(db_file)
+    is_replica = conn.execute("SELECT 1 FROM journal_meta WHERE key LIKE 'applied:%'").fetchone() is not None
+    conn.close()
+    exported = None
+    if not is_replica:
+        try:
+            exported = export_changes(folder, db_file)
+        except JournalError as e:
+            logger.error(f"Journal export skipped: {e}")
+    return exported, applied
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro change journal")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_export = sub.add_parser("export", help="Write changes since the last export")
+    p_export.add_argument("db")
+    p_export.add_argument("out_dir")
+    p_export.add_argument("--since", type=int, help="Start after this sequence (0 = full snapshot)")
+    p_export.add_argument("--prune", action="store_true", help="Drop the exported entries from the journal")
+    p_apply = sub.add_parser("apply", help="Replay journal files into a database")
+    p_apply.add_argument("db")
+    p_apply.add_argument("files", nargs="+")
+    p_sync = sub.add_parser("sync", help="Export to and apply from a shared folder")
+    p_sync.add_argument("db")
+    p_sync.add_argument("folder")
+    args = parser.parse_args()
+
+    try:
+        if args.command == "export":
+            path = export_changes(args.out_dir, args.db, args.since)
+            print(path or "No changes since the last export")
+            if path and args.prune:
+                prune_journal(read_journal_header(path)["to_seq"], args.db)
+        elif args.command == "apply":
+            files = [f for pattern in args.files for f in (glob.glob(pattern) or [pattern])]
+            print(f"Applied {apply_changes(files, args.db)} changes")
+        else:
+            exported, applied = sync_folder(args.folder, args.db)
+            print(f"Exported: {exported or 'nothing new'}; applied {applied} changes")
+    except (JournalError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()
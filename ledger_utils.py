@@ -0,0 +1,245 @@
+import sqlite3
+import os
+import re
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import db_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+# The original finance.db next to the EXE stays the default ledger; the others live in ledgers/
+DEFAULT_LEDGER = "Personal"
+LEDGERS_DIR = os.path.join(db_utils.EXE_LOCATION, "ledgers")
+ACTIVE_LEDGER_FILENAME = "active.txt"
+
+# SQLite's default SQLITE_MAX_ATTACHED; one worker connection attaches at most this many ledgers
+MAX_ATTACHED = 10
+
+# Each worker thread has its own connection and sqlite3 releases the GIL while a query
+# runs, so ledgers really are scanned side by side on separate cores.
+QUERY_WORKERS = min(8, os.cpu_count() or 1)
+
+_NAME_RE = re.compile(r"^[\w][\w .-]{0,63}$")
+
+# --- LEDGER REGISTRY ---
+def valid_ledger_name(name):
+    return bool(name) and bool(_NAME_RE.match(name.strip())) and not name.strip().endswith(".")
+
+def ledger_path(name):
+    if name == DEFAULT_LEDGER:
+        return os.path.join(db_utils.EXE_LOCATION, db_utils.DB_FILENAME)
+    return os.path.join(LEDGERS_DIR, f"{name}.db")
+
+def list_ledgers():
+    """Ledger names, the default first and the rest alphabetically."""
+    names = []
+    try:
+        for entry in os.listdir(LEDGERS_DIR):
+            if entry.endswith(".db"):
+                names.append(entry[:-3])
+    except FileNotFoundError:
+        pass
+    names = sorted(n for n in names if n != DEFAULT_LEDGER)
+    return [DEFAULT_LEDGER] + names
+
+def create_ledger(name):
+    """Creates an empty ledger file with the app's schema and returns its path."""
+    name = (name or "").strip()
+    if not valid_ledger_name(name):
+        raise ValueError(f"Invalid ledger name: {name!r}")
+    if name in list_ledgers():
+        raise ValueError(f"Ledger already exists: {name}")
+    os.makedirs(LEDGERS_DIR, exist_ok=True)
+    path = ledger_path(name)
+    saved = db_utils.DB_FILE
+    db_utils.DB_FILE = path
+    try:
+        db_utils.initialize_database()
+    finally:
+        db_utils.DB_FILE = saved
+    logger.info(f"Created ledger '{name}' at {path}")
+    return path
+
+def get_active_ledger():
+    try:
+        with open(os.path.join(LEDGERS_DIR, ACTIVE_LEDGER_FILENAME), "r", encoding="utf-8") as f:
+            name = f.read().strip()
+        if name in list_ledgers():
+            return name
+    except OSError:
+        pass
+    return DEFAULT_LEDGER
+
+def switch_ledger(name):
+    """Points every db_utils query and write at the named ledger and remembers the choice."""
+    if name not in list_ledgers():
+        raise ValueError(f"Unknown ledger: {name}")
+    db_utils.DB_FILE = ledger_path(name)
+    db_utils.initialize_database()
+    try:
+        os.makedirs(LEDGERS_DIR, exist_ok=True)
+        with open(os.path.join(LEDGERS_DIR, ACTIVE_LEDGER_FILENAME), "w", encoding="utf-8") as f:
+            f.write(name)
+    except OSError as e:
+        logger.error(f"Could not save active ledger: {e}")
+    logger.info(f"Active ledger: {name} ({db_utils.DB_FILE})")
+    return db_utils.DB_FILE
+
+# --- CROSS-LEDGER QUERIES ---
+def _groups(names, workers):
+    """Splits ledgers round-robin into at least `workers` groups of at most MAX_ATTACHED."""
+    count = max(1, min(len(names), max(workers, -(-len(names) // MAX_ATTACHED))))
+    return [names[i::count] for i in range(count) if names[i::count]]
+
+def _run_group(group, paths, build_sql):
+    """Attaches one group of ledgers to a scratch connection and runs a single UNION ALL query over them."""
+    conn = sqlite3.connect(":memory:", timeout=db_utils.BUSY_TIMEOUT)
+    try:
+        conn.execute(f"PRAGMA busy_timeout={int(db_utils.BUSY_TIMEOUT * 1000)}")
+        schemas = []
+        for i, name in enumerate(group):
+            conn.execute(f"ATTACH DATABASE ? AS l{i}", (paths[name],))
+            schemas.append((f"l{i}", name))
+        query = build_sql(schemas)
+        sql, params = query if isinstance(query, tuple) else (query, ())
+        return conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+def run_across_ledgers(build_sql, names=None, workers=None):
+    """
+    Runs build_sql([(schema, ledger_name), ...]) (the SQL, or an (sql, params) pair) once
+    per group of attached ledgers, the groups in parallel worker threads. Returns the rows of every group concatenated; the
+    caller merges these partial aggregates.
+    """
+    names = list(names or list_ledgers())
+    paths = {name: ledger_path(name) for name in names if os.path.exists(ledger_path(name))}
+    names = [n for n in names if n in paths]
+    if not names:
+        return []
+    workers = workers or QUERY_WORKERS
+    groups = _groups(names, workers)
+    if len(groups) == 1:
+        return _run_group(groups[0], paths, build_sql)
+    rows = []
+    with ThreadPoolExecutor(max_workers=min(workers, len(groups))) as pool:
+        for part in pool.map(lambda g: _run_group(g, paths, build_sql), groups):
+            rows.extend(part)
+    return rows
+
+def _quote(text):
+    return "'" + text.replace("'", "''") + "'"
+
+def _recurring_rules(names=None):
+    """
+    [(ledger, path, rules)] of the ledgers with recurring rules. Occurrences aren't rows,
+    so each consolidated read adds them from the rules, at the ledger's own rates.
+    """
+    found = []
+    for name in names or list_ledgers():
+        path = ledger_path(name)
+        if not os.path.exists(path):
+            continue
+        conn = db_utils.connect(path)
+        try:
+            rules = db_utils.load_recurring(conn)
+        finally:
+            conn.close()
+        if rules:
+            found.append((name, path, rules))
+    return found
+
+def get_consolidated_summary(names=None, workers=None, reporting=None):
+    """
+    Deposits/expenditure across ledgers. Returns (total_deposits, total_expenditure,
+    {ledger: (deposits, expenditure)}). Foreign rows convert at each ledger's own rates.
+    """
+    def build(schemas):
+        return " UNION ALL ".join(
+            f"SELECT {_quote(name)}, "
+            f"SUM(CASE WHEN t.amount > 0 THEN {db_utils.converted_amount_sql(reporting, schema=schema)} ELSE 0 END), "
+            f"SUM(CASE WHEN t.amount < 0 THEN {db_utils.converted_amount_sql(reporting, schema=schema)} ELSE 0 END) "
+            f"FROM {schema}.transactions t"
+            for schema, name in schemas)
+    try:
+        per_ledger = {}
+        for name, dep, exp in run_across_ledgers(build, names, workers):
+            per_ledger[name] = (dep or 0.0, exp or 0.0)
+        for name, path, rules in _recurring_rules(names):
+            dep, exp = per_ledger.get(name, (0.0, 0.0))
+            for _, total in db_utils.recurring_totals(rules, *db_utils.recurring_range(), reporting, db_file=path).values():
+                if total > 0: dep += total
+                else: exp += total
+            per_ledger[name] = (dep, exp)
+        total_dep = sum(v[0] for v in per_ledger.values())
+        total_exp = sum(v[1] for v in per_ledger.values())
+        return total_dep, total_exp, per_ledger
+    except Exception as e:
+        logger.error(f"Consolidated summary error: {e}")
+        return 0.0, 0.0, {}
+
+def get_consolidated_summary_by_comment(names=None, workers=None, reporting=None):
+    """get_summary_by_comment across ledgers: [(category, type, total, count)] sorted by total."""
+    category = db_utils.category_sql()
+    def build(schemas):
+        union = " UNION ALL ".join(
+            f"SELECT {category} AS category, type, {db_utils.converted_amount_sql(reporting, schema=schema)} AS amount "
+            f"FROM {db_utils.categorized_from_sql(schema)}" for schema, _ in schemas)
+        return f"SELECT category, type, SUM(amount), COUNT(*) FROM ({union}) GROUP BY category, type"
+    try:
+        merged = {}
+        for comment, t_type, total, count in run_across_ledgers(build, names, workers):
+            entry = merged.setdefault((comment, t_type), [0.0, 0])
+            entry[0] += total or 0.0
+            entry[1] += count
+        for _, path, rules in _recurring_rules(names):
+            for key, (count, total) in db_utils.recurring_totals(rules, *db_utils.recurring_range(), reporting, db_file=path).items():
+                entry = merged.setdefault(key, [0.0, 0])
+                entry[0] += total
+                entry[1] += count
+        records = [(k[0], k[1], v[0], v[1]) for k, v in merged.items()]
+        records.sort(key=lambda r: r[2])
+        return records
+    except Exception as e:
+        logger.error(f"Consolidated comment summary error: {e}")
+        return []
+
+def get_consolidated_chart_data(names=None, workers=None, limit=db_utils.CHART_TOP_N, reporting=None):
+    """get_chart_data across ledgers. The top N and "Other" are taken after merging, since a per-ledger LIMIT would be wrong."""
+    category = db_utils.category_sql()
+    def build(schemas):
+        union = " UNION ALL ".join(
+            f"SELECT COALESCE({category}, '') AS category, {db_utils.converted_amount_sql(reporting, schema=schema)} AS amount "
+            f"FROM {db_utils.categorized_from_sql(schema)} WHERE t.amount < 0"
+            for schema, _ in schemas)
+        return f"SELECT category, SUM(amount) FROM ({union}) GROUP BY 1"
+    try:
+        merged = {}
+        for comment, total in run_across_ledgers(build, names, workers):
+            merged[comment] = merged.get(comment, 0.0) + (total or 0.0)
+        for _, path, rules in _recurring_rules(names):
+            db_utils.add_recurring_expenses(merged, rules, reporting, db_file=path)
+        return db_utils.chart_slices(merged, limit)
+    except Exception as e:
+        logger.error(f"Consolidated chart error: {e}")
+        return []
+
+def get_consolidated_period_comparison(period="month", anchor=None, names=None, workers=None, reporting=None):
+    """get_period_comparison across ledgers: (period labels, [(category, type, total per period...)])."""
+    periods = db_utils.comparison_periods(period, anchor)
+    def build(schemas):
+        parts = [db_utils.period_comparison_query(periods, reporting, schema=schema) for schema, _ in schemas]
+        return " UNION ALL ".join(sql for sql, _ in parts), [p for _, params in parts for p in params]
+    labels = [label for label, _, _ in periods]
+    try:
+        rows = run_across_ledgers(build, names, workers)
+        for _, path, rules in _recurring_rules(names):
+            rows += db_utils.recurring_period_totals(rules, periods, reporting, db_file=path)
+        records = db_utils.merge_period_rows(rows, len(periods))
+        records.sort(key=lambda r: r[2] or 0.0)
+        return labels, records
+    except Exception as e:
+        logger.error(f"Consolidated comparison error: {e}")
+        return labels, []
@@ -0,0 +1,275 @@
+"""
+Idle-time upkeep of the active ledger.
+
+Nothing else ever maintains finance.db: after bulk deletes or a re-import the file keeps
+its free pages, and without statistics the planner has to guess between indexes. While
+the app sits idle, a background thread works through short steps:
+
+    1. ANALYZE (bounded by analysis_limit) the first time, PRAGMA optimize after that
+    2. incremental_vacuum, a few hundred pages per step, each step its own short write
+    3. a WAL checkpoint, so the -wal file doesn't stay at its high-water mark
+
+Between steps it checks the app is still idle and backs off as soon as it isn't. Ledgers
+created before auto_vacuum=INCREMENTAL was turned on are converted once, with a full
+VACUUM on an idle period; that is the only step that can't be sliced.
+
+    python maintenance_utils.py run finance.db
+    python maintenance_utils.py status finance.db
+"""
+import sqlite3
+import os
+import sys
+import time
+import logging
+import datetime
+import threading
+import argparse
+
+import db_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+# --- CONFIGURATION ---
+IDLE_AFTER = int(os.environ.get("FMP_IDLE_AFTER", 120))                 # seconds without user input
+MAINTENANCE_INTERVAL = int(os.environ.get("FMP_MAINTENANCE_INTERVAL", 6 * 60 * 60))
+
+# Pages freed per incremental_vacuum step (4 KiB pages: 2 MiB) and the pause in between
+VACUUM_STEP_PAGES = 512
+STEP_PAUSE = 0.05
+# Rows sampled per index by ANALYZE; plenty for the planner, and bounded on a big ledger
+ANALYSIS_LIMIT = 1000
+# Don't bother converting or vacuuming for less than this much free space
+MIN_FREE_PAGES = 64
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+class MaintenanceCancelled(Exception):
+    pass
+
+def _meta(conn, key):
+    row = conn.execute("SELECT value FROM journal_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def file_sizes(db_file):
+    """(database bytes, -wal bytes)."""
+    def size(path):
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+    return size(db_file), size(db_file + "-wal")
+
+def page_stats(conn):
+    """(page_size, page_count, freelist_count, auto_vacuum)."""
+    return tuple(conn.execute(f"PRAGMA {name}").fetchone()[0]
+                 for name in ("page_size", "page_count", "freelist_count", "auto_vacuum"))
+
+def _probe_queries():
+    month_sql, month_params = db_utils.filtered_query(
+        datetime.date.today().replace(day=1).isoformat(), datetime.date.today().isoformat(), "All", "All")
+    return [
+        ("summary", db_utils.summary_stats_sql(), ()),
+        ("month filter", month_sql, month_params),
+        ("recent", "SELECT id FROM transactions ORDER BY transaction_datetime DESC LIMIT 8", ()),
+    ]
+
+def time_queries(conn):
+    """{name: ms} for a few of the app's everyday queries, to log next to the file sizes."""
+    timings = {}
+    for name, sql, params in _probe_queries():
+        started = time.perf_counter()
+        conn.execute(sql, params).fetchall()
+        timings[name] = (time.perf_counter() - started) * 1000
+    return timings
+
+def _format_timings(timings):
+    return ", ".join(f"{name} {ms:.1f}ms" for name, ms in timings.items())
+
+# --- STEPS ---
+def _analyze(conn):
+    conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+    has_stats = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    # optimize only re-analyzes tables it already has stats for; the first run needs a plain ANALYZE
+    conn.execute("PRAGMA optimize" if has_stats else "ANALYZE")
+
+def _convert_to_incremental(conn):
+    """One-off: auto_vacuum can only change on an existing file through a full VACUUM."""
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("VACUUM")
+
+def _vacuum_steps(conn, keep_going, pages=VACUUM_STEP_PAGES, pause=STEP_PAUSE):
+    """Frees the free pages in small write transactions; returns how many were released."""
+    start = free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    while free:
+        if not keep_going():
+            raise MaintenanceCancelled()
+        # execute() would stop after one page: the pragma frees a page per sqlite3_step
+        conn.executescript(f"PRAGMA incremental_vacuum({min(free, pages)});")
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        time.sleep(pause)
+    return start - free
+
+def _checkpoint(conn):
+    """PASSIVE never waits on anyone; TRUNCATE is only tried with a short busy timeout."""
+    busy, log, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    if not busy and log == done:
+        conn.execute("PRAGMA busy_timeout=50")
+        try:
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        finally:
+            conn.execute(f"PRAGMA busy_timeout={int(db_utils.BUSY_TIMEOUT * 1000)}")
+    return log, done
+
+def run_maintenance(db_file=None, keep_going=lambda: True, convert=True):
+    """
+    Runs every step against db_file, checking keep_going() between them. Returns a dict of
+    what was done; raises MaintenanceCancelled when keep_going() turns False part way.
+    """
+    db_file = db_file or db_utils.DB_FILE
+    conn = db_utils.connect(db_file)
+    conn.isolation_level = None   # each PRAGMA commits on its own
+    try:
+        before_sizes = file_sizes(db_file)
+        page_size, pages, free, auto_vacuum = page_stats(conn)
+        before_timings = time_queries(conn)
+        logger.info(f"Maintenance start: {db_file} {before_sizes[0]:,} bytes (+{before_sizes[1]:,} wal), "
+                    f"{free:,}/{pages:,} pages free; {_format_timings(before_timings)}")
+        report = {"freed_pages": 0, "converted": False}
+
+        _analyze(conn)
+        if not keep_going():
+            raise MaintenanceCancelled()
+
+        if auto_vacuum != AUTO_VACUUM_INCREMENTAL and convert and free >= MIN_FREE_PAGES:
+            started = time.perf_counter()
+            _convert_to_incremental(conn)
+            report["converted"] = True
+            logger.info(f"Maintenance: switched to auto_vacuum=INCREMENTAL in {time.perf_counter() - started:.1f}s")
+        elif auto_vacuum == AUTO_VACUUM_INCREMENTAL and free >= MIN_FREE_PAGES:
+            report["freed_pages"] = _vacuum_steps(conn, keep_going)
+
+        if not keep_going():
+            raise MaintenanceCancelled()
+        _checkpoint(conn)
+
+        db_utils.get_writer(db_file).submit(lambda c: c.execute(
+            "INSERT OR REPLACE INTO journal_meta (key, value) VALUES ('maintained_at', ?)",
+            (datetime.datetime.now().isoformat(timespec="seconds"),))).result()
+
+        after_sizes = file_sizes(db_file)
+        after_timings = time_queries(conn)
+        report.update(before=before_sizes, after=after_sizes, timings_before=before_timings, timings_after=after_timings)
+        logger.info(f"Maintenance done: {after_sizes[0]:,} bytes (+{after_sizes[1]:,} wal), "
+                    f"{report['freed_pages']:,} pages released; {_format_timings(after_timings)}")
+        return report
+    finally:
+        conn.close()
+
+def last_maintained(db_file=None):
+    conn = db_utils.connect(db_file)
+    try:
+        value = _meta(conn, "maintained_at")
+    except sqlite3.Error:
+        value = None
+    finally:
+        conn.close()
+    return datetime.datetime.fromisoformat(value) if value else None
+
+# --- SCHEDULER ---
+class MaintenanceScheduler:
+    """
+    Runs run_maintenance() on the active ledger once per interval, but only after the
+    user has been idle for idle_after seconds and nothing else has written to the ledger
+    in that time. The UI calls touch() on input; a touch during a run stops it at the
+    next step, and it is tried again on the next idle period.
+    """
+    def __init__(self, idle_after=IDLE_AFTER, interval=MAINTENANCE_INTERVAL, check_every=15):
+        self.idle_after = idle_after
+        self.interval = interval
+        self.check_every = check_every
+        self.last_activity = time.monotonic()
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+        self.data_version = None
+        self.quiet_since = time.monotonic()
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def touch(self):
+        self.last_activity = time.monotonic()
+
+    def idle(self):
+        now = time.monotonic()
+        return (not self.stop_event.is_set() and now - self.last_activity >= self.idle_after
+                and now - self.quiet_since >= self.idle_after)
+
+    def due(self, db_file):
+        last = last_maintained(db_file)
+        return last is None or (datetime.datetime.now() - last).total_seconds() >= self.interval
+
+    def _watch_writes(self, conn):
+        # data_version moves when any other connection (our writer included) commits
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if version != self.data_version:
+            self.data_version = version
+            self.quiet_since = time.monotonic()
+
+    def _run(self):
+        conn, conn_file = None, None
+        while not self.stop_event.wait(self.check_every):
+            db_file = db_utils.DB_FILE
+            try:
+                if conn_file != db_file:
+                    if conn:
+                        conn.close()
+                    conn, conn_file = db_utils.connect(db_file), db_file
+                    self.data_version, self.quiet_since = None, time.monotonic()
+                self._watch_writes(conn)
+                if self.idle() and self.due(db_file):
+                    run_maintenance(db_file, keep_going=self.idle)
+            except MaintenanceCancelled:
+                logger.info("Maintenance paused: the app is busy again")
+            except Exception as e:
+                logger.error(f"Maintenance failed: {e}")
+        if conn:
+            conn.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro database maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_run = sub.add_parser("run", help="Run every maintenance step now")
+    p_run.add_argument("db")
+    p_run.add_argument("--no-convert", action="store_true", help="Skip the one-off VACUUM to auto_vacuum=INCREMENTAL")
+    p_status = sub.add_parser("status", help="Show free pages, sizes and the last run")
+    p_status.add_argument("db")
+    args = parser.parse_args()
+
+    try:
+        db_utils.DB_FILE = os.path.abspath(args.db)
+        db_utils.initialize_database()
+        if args.command == "run":
+            report = run_maintenance(convert=not args.no_convert)
+            print(f"{report['before'][0]:,} -> {report['after'][0]:,} bytes, {report['freed_pages']:,} pages released"
+                  + (", converted to incremental auto_vacuum" if report["converted"] else ""))
+            for name, ms in report["timings_before"].items():
+                print(f"  {name:<14} {ms:8.1f} ms -> {report['timings_after'][name]:8.1f} ms")
+        else:
+            conn = db_utils.connect()
+            page_size, pages, free, auto_vacuum = page_stats(conn)
+            conn.close()
+            size, wal = file_sizes(db_utils.DB_FILE)
+            modes = {0: "none", 1: "full", 2: "incremental"}
+            print(f"{size:,} bytes (+{wal:,} wal), {free:,} of {pages:,} pages free, auto_vacuum={modes.get(auto_vacuum, auto_vacuum)}")
+            print(f"Last maintained: {last_maintained() or 'never'}")
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()
@@ -0,0 +1,334 @@
+"""
+Runtime metrics for sessions that stay open for days: counters, latency histograms and
+periodic memory samples, kept in one process-wide registry.
+
+Collection is off until enable() is called, by the metrics endpoint or by opening the
+diagnostics panel (Ctrl+Shift+D). Until then every instrumented call costs one flag
+check and nothing is recorded. Once on, recording is a dict lookup and a bisect under a
+lock; a sampler thread reads RSS (and tracemalloc, when allocation tracing is switched
+on) every SAMPLE_EVERY seconds.
+
+The endpoint serves the Prometheus text format on 127.0.0.1 only:
+
+    FMP_METRICS_PORT=9464 Finance.exe        # then GET http://127.0.0.1:9464/metrics
+    FMP_TRACEMALLOC=1                        # also trace Python allocations (slower)
+"""
+import os
+import sys
+import time
+import bisect
+import ctypes
+import logging
+import threading
+import functools
+import tracemalloc
+import collections
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+# --- CONFIGURATION ---
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.environ.get("FMP_METRICS_PORT", 0))          # 0: no endpoint
+TRACE_MEMORY = os.environ.get("FMP_TRACEMALLOC") == "1"
+SAMPLE_EVERY = int(os.environ.get("FMP_METRICS_SAMPLE", 30))       # seconds between memory samples
+SAMPLE_HISTORY = 240                                                 # two hours at the default
+TOP_ALLOCATIONS = 15
+
+# Histogram upper bounds: seconds for latencies, rows for row counts
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROW_BUCKETS = (10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+METRIC_HELP = {
+    "fmp_db_call_seconds": ("histogram", "Latency of db_utils read and insert functions"),
+    "fmp_db_errors_total": ("counter", "db_utils function calls that raised"),
+    "fmp_db_write_batch_seconds": ("histogram", "Latency of one writer-queue transaction"),
+    "fmp_db_write_jobs_total": ("counter", "Jobs committed by the writer queue"),
+    "fmp_db_write_failures_total": ("counter", "Writer-queue transactions rolled back"),
+    "fmp_ui_refresh_seconds": ("histogram", "Time to rebuild and push one view"),
+    "fmp_history_rows_rendered": ("histogram", "Rows put in the History table per filter run"),
+    "fmp_pdf_files_total": ("counter", "PDF files generated"),
+    "fmp_pdf_pages_total": ("counter", "PDF pages generated"),
+    "fmp_pdf_render_seconds": ("histogram", "Time to lay out and write one PDF"),
+    "fmp_process_resident_bytes": ("gauge", "Resident set size at the last sample"),
+    "fmp_python_traced_bytes": ("gauge", "Python heap traced by tracemalloc at the last sample"),
+    "fmp_python_traced_peak_bytes": ("gauge", "Peak traced Python heap since tracing started"),
+    "fmp_threads": ("gauge", "Live Python threads at the last sample"),
+    "fmp_uptime_seconds": ("gauge", "Seconds since metrics were enabled"),
+}
+
+enabled = False
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "count", "total")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)   # the last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (the largest bound for +Inf)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+class Registry:
+    """Counters, gauges and histograms keyed by (name, labels)."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def inc(self, name, value=1, labels=()):
+        key = (name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name, value, labels=()):
+        with self.lock:
+            self.gauges[(name, labels)] = value
+
+    def observe(self, name, value, labels=(), buckets=LATENCY_BUCKETS):
+        key = (name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = Histogram(buckets)
+            hist.observe(value)
+
+    def reset(self):
+        with self.lock:
+            self.counters, self.gauges, self.histograms = {}, {}, {}
+            self.started = time.time()
+
+    def rows(self):
+        """[(name, labels, kind, count, value, p95)] for the diagnostics panel; value is the mean for histograms."""
+        with self.lock:
+            out = [(n, l, "counter", v, v, None) for (n, l), v in self.counters.items()]
+            out += [(n, l, "gauge", None, v, None) for (n, l), v in self.gauges.items()]
+            out += [(n, l, "histogram", h.count, h.total / h.count if h.count else 0.0, h.quantile(0.95))
+                    for (n, l), h in self.histograms.items()]
+        return sorted(out, key=lambda r: (r[0], r[1]))
+
+    def prometheus_text(self):
+        with self.lock:
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+            gauges[("fmp_uptime_seconds", ())] = time.time() - self.started
+            histograms = {key: (h.buckets, list(h.counts), h.count, h.total) for key, h in self.histograms.items()}
+        lines = []
+        names = sorted({n for n, _ in counters} | {n for n, _ in gauges} | {n for n, _ in histograms})
+        for name in names:
+            kind, text = METRIC_HELP.get(name, ("untyped", name))
+            lines += [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+            for (n, labels), value in sorted(gauges.items()):
+                if n == name:
+                    lines.append(f"{name}{_labels(labels)} {_number(value)}")
+            for (n, labels), (buckets, counts, count, total) in sorted(histograms.items()):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, c in zip(buckets, counts):
+                    cumulative += c
+                    lines.append(f"{name}_bucket{_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+def _number(value):
+    return str(value) if isinstance(value, int) else f"{value:.9g}"
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+REGISTRY = Registry()
+
+# --- RECORDING ---
+# Each is a no-op until enable(); labels are passed as a tuple of (name, value) pairs.
+def inc(name, value=1, labels=()):
+    if enabled:
+        REGISTRY.inc(name, value, labels)
+
+def observe(name, value, labels=(), buckets=LATENCY_BUCKETS):
+    if enabled:
+        REGISTRY.observe(name, value, labels, buckets)
+
+def db_call(fn):
+    """Times a db_utils function into fmp_db_call_seconds{function=...}."""
+    labels = (("function", fn.__name__),)
+
+    @functools.wraps(fn)
+    def call(*args, **kwargs):
+        if not enabled:
+            return fn(*args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            REGISTRY.inc("fmp_db_errors_total", 1, labels)
+            raise
+        finally:
+            REGISTRY.observe("fmp_db_call_seconds", time.perf_counter() - started, labels)
+    return call
+
+def ui_refresh(view, started):
+    """Records one refresh of `view` that began at perf_counter() `started`."""
+    if enabled:
+        REGISTRY.observe("fmp_ui_refresh_seconds", time.perf_counter() - started, (("view", view),))
+
+def pdf_generated(pages, seconds):
+    if enabled:
+        REGISTRY.inc("fmp_pdf_files_total")
+        REGISTRY.inc("fmp_pdf_pages_total", pages)
+        REGISTRY.observe("fmp_pdf_render_seconds", seconds)
+
+# --- MEMORY ---
+class _MemoryCounters(ctypes.Structure):
+    _fields_ = [("cb", ctypes.c_ulong), ("PageFaultCount", ctypes.c_ulong)] + [
+        (name, ctypes.c_size_t) for name in (
+            "PeakWorkingSetSize", "WorkingSetSize", "QuotaPeakPagedPoolUsage", "QuotaPagedPoolUsage",
+            "QuotaPeakNonPagedPoolUsage", "QuotaNonPagedPoolUsage", "PagefileUsage", "PeakPagefileUsage")]
+
+def resident_bytes():
+    """Current RSS (the working set on Windows), or None where it can't be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        if sys.platform == "win32":
+            counters = _MemoryCounters(cb=ctypes.sizeof(_MemoryCounters))
+            kernel32 = ctypes.windll.kernel32
+            kernel32.GetCurrentProcess.restype = ctypes.c_void_p
+            if ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.c_void_p(kernel32.GetCurrentProcess()),
+                                                        ctypes.byref(counters), counters.cb):
+                return counters.WorkingSetSize
+            return None
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def trace_memory(on=True):
+    """Starts or stops tracemalloc; while it runs every allocation is slower."""
+    if on and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not on and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def top_allocations(limit=TOP_ALLOCATIONS):
+    """[(file:line, bytes, blocks)] holding the most traced memory; empty when not tracing."""
+    if not tracemalloc.is_tracing():
+        return []
+    stats = tracemalloc.take_snapshot().filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ]).statistics("lineno")
+    return [(f"{os.path.basename(s.traceback[0].filename)}:{s.traceback[0].lineno}", s.size, s.count)
+            for s in stats[:limit]]
+
+def sample_memory():
+    """Takes one memory sample into the gauges and returns it as (time, rss, traced, peak)."""
+    rss = resident_bytes()
+    traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    if rss is not None:
+        REGISTRY.set("fmp_process_resident_bytes", rss)
+    if traced is not None:
+        REGISTRY.set("fmp_python_traced_bytes", traced)
+        REGISTRY.set("fmp_python_traced_peak_bytes", peak)
+    REGISTRY.set("fmp_threads", threading.active_count())
+    return time.time(), rss, traced, peak
+
+class MemorySampler:
+    """Background thread taking a memory sample every `interval` seconds; keeps the last SAMPLE_HISTORY."""
+    def __init__(self, interval=SAMPLE_EVERY):
+        self.interval = interval
+        self.samples = collections.deque(maxlen=SAMPLE_HISTORY)
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="metrics-sampler", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.samples.append(sample_memory())
+            except Exception as e:
+                logger.error(f"Memory sample failed: {e}")
+            if self.stop_event.wait(self.interval):
+                break
+
+sampler = None
+_enable_lock = threading.Lock()
+
+def enable(trace=TRACE_MEMORY):
+    """Turns collection on (once) and starts the memory sampler."""
+    global enabled, sampler
+    with _enable_lock:
+        if enabled:
+            return
+        if trace:
+            trace_memory(True)
+        REGISTRY.reset()
+        enabled = True
+        sampler = MemorySampler().start()
+    logger.info("Runtime metrics enabled")
+
+# --- ENDPOINT ---
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # A foreign Host header means a browser page reached us through DNS rebinding
+        host = (self.headers.get("Host") or "").rsplit(":", 1)[0].strip("[]")
+        if host not in ("127.0.0.1", "::1", "localhost"):
+            self.send_error(403)
+            return
+        if self.path.split("?")[0].rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metrics endpoint: {format % args}")
+
+def start_endpoint(port=METRICS_PORT, host=METRICS_HOST):
+    """Enables collection and serves /metrics from a daemon thread. Returns the server."""
+    enable()
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-endpoint", daemon=True).start()
+    logger.info(f"Metrics endpoint on http://{host}:{server.server_address[1]}/metrics")
+    return server
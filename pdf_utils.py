@@ -0,0 +1,197 @@
+import os
+import sys
+import logging
+import time
+import traceback
+from reportlab.lib.pagesizes import letter
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, PageBreak, Image as RLImage
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+import metrics_utils
+
+logger = logging.getLogger()
+
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    try:
+        base_path = sys._MEIPASS
+    except Exception:
+        base_path = os.path.abspath(".")
+    return os.path.join(base_path, relative_path)
+
+# ReportLab needs absolute OS paths
+LOGO_FULL_PATH = os.path.join(resource_path("."), "assets", "logo.png")
+
+# Above this many detail rows the table is cut into page-sized tables (see _page_tables)
+LARGE_TABLE_ROWS = 1000
+# Frame padding SimpleDocTemplate puts inside the margins, top plus bottom
+FRAME_PADDING = 12
+
+def _page_tables(doc, heading, data, col_widths, style):
+    """
+    A long details table as one Table per page, each with its header row. ReportLab splits
+    a long table by rebuilding everything after the break on every page, which made a
+    17k-row annual statement take 40x as long as a 1.4k-row month.
+    """
+    headers, rows = data[0], data[1:]
+    sample = Table([headers, rows[0]], colWidths=col_widths)
+    sample.setStyle(style)
+    sample.wrap(doc.width, doc.height)
+    header_h, row_h = sample._rowHeights[0], sample._rowHeights[1]
+    available = doc.height - FRAME_PADDING - header_h
+    _, heading_h = heading.wrap(doc.width, doc.height)
+    # One row spare per page for rounding
+    first = int((available - heading_h - heading.getSpaceBefore() - heading.getSpaceAfter() - 10) // row_h) - 1
+    per_page = int(available // row_h) - 1
+    tables = []
+    start = 0
+    while start < len(rows):
+        size = first if not tables else per_page
+        t = Table([headers] + rows[start:start + size], repeatRows=1, colWidths=col_widths)
+        t.setStyle(style)
+        tables.append(t)
+        start += size
+    return tables
+
+# --- MODERN PDF GENERATOR ---
+def draw_canvas_elements(canvas, doc):
+    """Draws Watermark AND Page Border"""
+    try:
+        canvas.saveState()
+        page_width, page_height = letter
+
+        canvas.setStrokeColor(colors.black)
+        canvas.setLineWidth(2)
+        canvas.rect(20, 20, page_width - 40, page_height - 40)
+
+        if os.path.exists(LOGO_FULL_PATH):
+            canvas.setFillAlpha(0.1)
+            image_width = 300
+            image_height = 300
+            x = (page_width - image_width) / 2
+            y = (page_height - image_height) / 2
+            canvas.drawImage(LOGO_FULL_PATH, x, y, width=image_width, height=image_height, mask='auto', preserveAspectRatio=True)
+        canvas.restoreState()
+    except Exception as e:
+        logger.warning(f"Canvas error: {e}")
+
+def generate_modern_pdf(filename, data_dict):
+    return build_pdf(filename, data_dict) > 0
+
+def build_pdf(filename, data_dict):
+    """generate_modern_pdf, returning the number of pages written (0 on failure)."""
+    started = time.perf_counter()
+    try:
+        doc = SimpleDocTemplate(filename, pagesize=letter)
+        elements = []
+        styles = getSampleStyleSheet()
+
+        title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=20, alignment=TA_LEFT, spaceAfter=5, textColor=colors.darkblue)
+        header_name_style = ParagraphStyle('Name', parent=styles['Heading1'], fontSize=24, alignment=TA_LEFT, spaceAfter=2, textColor=colors.black)
+
+        text_col = [
+            Paragraph("Santanu Ghosh", header_name_style),
+            Spacer(1, 6),
+            Paragraph(data_dict.get("title", "Finance Report"), title_style)
+        ]
+        if os.path.exists(LOGO_FULL_PATH):
+            logo_img = RLImage(LOGO_FULL_PATH, width=60, height=60)
+            header_table = Table([[logo_img, text_col]], colWidths=[70, 400])
+            header_table.setStyle(TableStyle([
+                ('VALIGN', (0,0), (-1,-1), 'TOP'),
+                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+                ('LEFTPADDING', (0,0), (-1,-1), 0),
+            ]))
+            elements.append(header_table)
+        else:
+            elements.extend(text_col)
+
+        elements.append(Spacer(1, 10))
+
+        filter_info = data_dict.get("filter_info", "")
+        if filter_info:
+            p_filter = Paragraph(f"<b>REPORT CONTEXT:</b> {filter_info}", styles['Normal'])
+            t_filter = Table([[p_filter]], colWidths=[480])
+            t_filter.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (-1, -1), colors.aliceblue),
+                ('BOX', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+                ('PADDING', (0, 0), (-1, -1), 10),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ]))
+            elements.append(t_filter)
+            elements.append(Spacer(1, 20))
+
+        summary_data = data_dict.get("summary", [])
+        if summary_data:
+            elements.append(Paragraph("<b>Summary Overview</b>", styles['Heading3']))
+            elements.append(Spacer(1, 5))
+            t_sum = Table(summary_data, hAlign='LEFT', colWidths=[200, 150])
+            t_sum.setStyle(TableStyle([
+                ('BACKGROUND', (0, 0), (0, -1), colors.whitesmoke),
+                ('TEXTCOLOR', (0, 0), (0, -1), colors.darkgrey),
+                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+            ]))
+            elements.append(t_sum)
+            elements.append(Spacer(1, 25))
+
+        cat_headers = data_dict.get("cat_headers", [])
+        cat_rows = data_dict.get("cat_rows", [])
+        if cat_headers and cat_rows:
+            elements.append(Paragraph("<b>Category Breakdown</b>", styles['Heading3']))
+            elements.append(Spacer(1, 10))
+            cat_table_data = [cat_headers] + cat_rows
+            t_cat = Table(cat_table_data, repeatRows=1, colWidths=[200, 100, 60, 120])
+            cat_style = TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.darkslategray),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+                ('TOPPADDING', (0, 0), (-1, 0), 10),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+            ])
+            t_cat.setStyle(cat_style)
+            elements.append(t_cat)
+            elements.append(Spacer(1, 25))
+
+        headers = data_dict.get("headers", [])
+        rows = data_dict.get("rows", [])
+        if headers and rows:
+            heading = Paragraph("<b>Transaction Details</b>", styles['Heading3'])
+            table_data = [headers] + rows
+            col_widths = data_dict.get("col_widths", [120, 100, 160, 100])
+            main_style = TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.darkslategray),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 10),
+                ('TOPPADDING', (0, 0), (-1, 0), 10),
+                ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+                # One striping command: a style command per row made every page split re-scan all of them
+                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.whitesmoke]),
+            ])
+            if len(rows) > LARGE_TABLE_ROWS:
+                elements += [PageBreak(), heading, Spacer(1, 10)]
+                elements += _page_tables(doc, heading, table_data, col_widths, main_style)
+            else:
+                t = Table(table_data, repeatRows=1, colWidths=col_widths)
+                t.setStyle(main_style)
+                elements += [heading, Spacer(1, 10), t]
+
+        doc.build(elements, onFirstPage=draw_canvas_elements, onLaterPages=draw_canvas_elements)
+        logger.info(f"PDF Generated: {filename}")
+        metrics_utils.pdf_generated(doc.page, time.perf_counter() - started)
+        return doc.page
+    except Exception as e:
+        logger.error(f"PDF Error: {e}")
+        traceback.print_exc()
+        return 0
@@ -0,0 +1,156 @@
+"""
+Recurring transactions: rent, salaries, EMIs entered once as a rule instead of every month.
+
+A rule is stored once (start, interval, optional end, type, comment, amount, currency).
+Its occurrences are not written as rows: the History filter, the dashboard totals and
+chart, the per-category summary, period comparisons, budgets, the all-ledger reports,
+statements and file exports expand them for the date range they read, up to today (see
+db_utils.RecurringRule). materialize() turns the occurrences up to a day into ordinary
+rows, for journal backups and the API, which read rows only, and moves the rule's
+materialized_until past them so nothing is counted twice.
+
+    python recurring_utils.py add finance.db "2024-01-01 09:00" month "Base Expense" 25000 --comment Rent
+    python recurring_utils.py list finance.db
+    python recurring_utils.py materialize finance.db
+    python recurring_utils.py remove finance.db 3
+"""
+import sqlite3
+import os
+import sys
+import time
+import logging
+import argparse
+import datetime
+
+import db_utils
+import category_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+def add_recurring(start_datetime, unit, trans_type, amount, comment=None, every=1, end_date=None, currency=None,
+                  db_file=None):
+    """Stores a rule and returns its id. The amount is signed by the type, as for add_transaction_db."""
+    try:
+        datetime.datetime.strptime(start_datetime, "%Y-%m-%d %H:%M")
+    except ValueError:
+        raise ValueError(f"Start must be YYYY-MM-DD HH:MM: {start_datetime!r}")
+    if end_date:
+        if datetime.date.fromisoformat(end_date) < datetime.date.fromisoformat(start_datetime[:10]):
+            raise ValueError("The end date is before the start")
+    if trans_type not in db_utils.TRANSACTION_TYPES:
+        raise ValueError(f"Type must be one of {', '.join(db_utils.TRANSACTION_TYPES)}")
+    if int(every) < 1:
+        raise ValueError("The interval must be at least 1")
+    amount = db_utils.signed_amount(trans_type, float(amount))
+    currency = db_utils.normalize_currency(currency)
+    # Validates the unit the same way reads will
+    db_utils.RecurringRule(None, start_datetime, unit, every, end_date, trans_type, comment, amount)
+    category_id = category_utils.categorize(comment, trans_type, abs(amount), db_file)
+
+    def job(conn):
+        return conn.execute('''
+            INSERT INTO recurring_rules (start_datetime, unit, every, end_date, type, comment, amount, currency, category_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (start_datetime, unit, int(every), end_date or None, trans_type, comment, amount, currency, category_id)).lastrowid
+    rule_id = db_utils.get_writer(db_file).submit(job).result()
+    logger.info(f"Recurring rule {rule_id}: every {every} {unit} from {start_datetime}, {trans_type} {amount}")
+    return rule_id
+
+def list_recurring(db_file=None):
+    """The ledger's rules as db_utils.RecurringRule objects, oldest first."""
+    conn = db_utils.connect(db_file)
+    try:
+        return db_utils.load_recurring(conn)
+    finally:
+        conn.close()
+
+def remove_recurring(rule_id, db_file=None):
+    """Deletes a rule. Occurrences already materialized stay, as ordinary transactions."""
+    def job(conn):
+        return conn.execute("DELETE FROM recurring_rules WHERE id = ?", (rule_id,)).rowcount > 0
+    return db_utils.get_writer(db_file).submit(job).result()
+
+def describe(rule):
+    every = f"every {rule.every} {rule.unit}s" if rule.every > 1 else f"every {rule.unit}"
+    until = f" until {rule.end.isoformat()}" if rule.end else ""
+    return f"{every} from {rule.start.isoformat()}{rule.time}{until}"
+
+def materialize(until=None, db_file=None):
+    """
+    Writes every occurrence up to day `until` (default today) as a transaction, in one
+    writer job with the materialized_until update. Returns the number of rows written.
+    """
+    until = min(until or datetime.date.today(), datetime.date.today())
+    started = time.perf_counter()
+
+    def job(conn):
+        rows = []
+        for rule in db_utils.load_recurring(conn):
+            # Re-categorized now: the rules may have changed since the recurring rule was added
+            category_id = category_utils.categorize(rule.comment, rule.type, abs(rule.amount), db_file)
+            rows += [occurrence[:4] + (occurrence[5], category_id) for occurrence in rule.rows(datetime.date.min, until)]
+        conn.executemany('''
+            INSERT INTO transactions (transaction_datetime, type, comment, amount, currency, category_id)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', rows)
+        conn.execute("UPDATE recurring_rules SET materialized_until = ? WHERE materialized_until IS NULL OR materialized_until < ?",
+                     (until.isoformat(), until.isoformat()))
+        return rows
+
+    rows = db_utils.get_writer(db_file).submit(job).result()
+    deltas = {}
+    for row in rows:
+        key = db_utils.normalize_comment(row[2])
+        deltas[key] = deltas.get(key, 0) + 1
+    db_utils.adjust_comments(deltas, db_file)
+    logger.info(f"Materialized {len(rows):,} recurring occurrences up to {until} in {time.perf_counter() - started:.2f}s")
+    return len(rows)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro recurring transactions")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_list = sub.add_parser("list", help="List the rules")
+    p_list.add_argument("db")
+    p_add = sub.add_parser("add", help="Add a rule")
+    p_add.add_argument("db")
+    p_add.add_argument("start", help="First occurrence (YYYY-MM-DD HH:MM)")
+    p_add.add_argument("unit", choices=db_utils.RECURRING_UNITS)
+    p_add.add_argument("type", choices=db_utils.TRANSACTION_TYPES)
+    p_add.add_argument("amount", type=float)
+    p_add.add_argument("--comment")
+    p_add.add_argument("--every", type=int, default=1, help="Units between occurrences")
+    p_add.add_argument("--end", help="Last possible day (YYYY-MM-DD)")
+    p_add.add_argument("--currency")
+    p_remove = sub.add_parser("remove", help="Delete a rule")
+    p_remove.add_argument("db")
+    p_remove.add_argument("rule_id", type=int)
+    p_mat = sub.add_parser("materialize", help="Write the occurrences up to a day as transactions")
+    p_mat.add_argument("db")
+    p_mat.add_argument("--until", help="Last day (YYYY-MM-DD, default today)")
+    args = parser.parse_args()
+
+    try:
+        db_utils.DB_FILE = os.path.abspath(args.db)
+        db_utils.initialize_database()
+        if args.command == "list":
+            first, last = db_utils.recurring_range()
+            for rule in list_recurring():
+                pending = len(rule.span(first, last))
+                print(f"{rule.id:>4}  {rule.type:<13} {db_utils.format_money(rule.amount, rule.currency):>14}  "
+                      f"{(rule.comment or '')[:24]:<24} {describe(rule)}  ({pending} not materialized)")
+        elif args.command == "add":
+            rule_id = add_recurring(args.start, args.unit, args.type, args.amount, args.comment, args.every,
+                                    args.end, args.currency)
+            print(f"Added rule {rule_id}")
+        elif args.command == "remove":
+            print("Removed" if remove_recurring(args.rule_id) else "No such rule")
+        else:
+            until = datetime.date.fromisoformat(args.until) if args.until else None
+            print(f"Wrote {materialize(until):,} transactions")
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()
@@ -0,0 +1,84 @@
+"""
+Line storage behind the Reports viewer.
+
+A report is kept as a list of formatted lines, never as one joined string: the viewer
+only ever renders the window of lines that is on screen, so a report with 100k lines
+costs the same to scroll as one with 40. Lines are appended from a generator, and the
+first window can be shown before the generator is done.
+
+Find is a case-insensitive substring search over a lowercased copy of the lines, built
+on the first search and extended as lines are appended.
+"""
+import bisect
+
+class ReportBuffer:
+    def __init__(self, lines=()):
+        self.lines = []
+        self._lower = []
+        self.query = ""
+        self.matches = []
+        self.extend(lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def clear(self):
+        self.lines, self._lower = [], []
+        self.query, self.matches = "", []
+
+    def extend(self, lines):
+        start = len(self.lines)
+        self.lines.extend(lines)
+        if self._lower:
+            self._lower.extend(line.lower() for line in self.lines[start:])
+        if self.query:
+            self.matches.extend(self._scan(start))
+
+    def feed(self, lines, chunk=1000):
+        """Appends lines from an iterable `chunk` at a time, yielding the line count after each chunk."""
+        batch = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= chunk:
+                self.extend(batch)
+                batch = []
+                yield len(self.lines)
+        if batch:
+            self.extend(batch)
+        yield len(self.lines)
+
+    # --- WINDOW ---
+    def clamp(self, offset, count):
+        """First line of a `count`-line window starting near `offset`, kept inside the report."""
+        return max(0, min(offset, len(self.lines) - count))
+
+    def window(self, offset, count):
+        return self.lines[offset:offset + count]
+
+    # --- FIND ---
+    def _scan(self, start=0):
+        if len(self._lower) < len(self.lines):
+            self._lower.extend(line.lower() for line in self.lines[len(self._lower):])
+        query = self.query
+        return [i for i in range(start, len(self._lower)) if query in self._lower[i]]
+
+    def find(self, query):
+        """Sets the search and returns the matching line numbers."""
+        self.query = (query or "").lower()
+        self.matches = self._scan() if self.query else []
+        return self.matches
+
+    def next_match(self, line, forward=True):
+        """The first match after (or before) `line`, wrapping around; None when nothing matches."""
+        if not self.matches:
+            return None
+        if forward:
+            i = bisect.bisect_right(self.matches, line)
+            return self.matches[i % len(self.matches)]
+        i = bisect.bisect_left(self.matches, line)
+        return self.matches[i - 1]
+
+    def match_number(self, line):
+        """1-based position of `line` among the matches, or 0 when it isn't one."""
+        i = bisect.bisect_left(self.matches, line)
+        return i + 1 if i < len(self.matches) and self.matches[i] == line else 0
@@ -0,0 +1,195 @@
+"""
+Batch export of monthly and annual PDF statements.
+
+For a range of months the ledger is read once: a single History query over the whole
+range, newest first, with the recurring occurrences merged in as the History view does,
+so each month is a contiguous run of rows and the annual statement is just a longer run. Each period's rows become a TransactionBatch section and go
+through the same aggregation and PDF layout as the History "Export Current View".
+
+Rendering is the slow part (ReportLab is pure Python), so the PDFs are built in a
+process pool, one file per task.
+
+    python statement_utils.py finance.db statements/ --from 2025-01 --to 2025-12
+"""
+import sqlite3
+import os
+import sys
+import time
+import logging
+import argparse
+import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import db_utils
+import pdf_utils
+import metrics_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+EXPORT_WORKERS = os.cpu_count() or 1
+
+def parse_month(text):
+    """'2025-03' -> date(2025, 3, 1)."""
+    try:
+        return datetime.datetime.strptime(text.strip(), "%Y-%m").date()
+    except ValueError:
+        raise ValueError(f"Expected a month as YYYY-MM: {text!r}")
+
+def statement_periods(first_month, last_month, annual=True):
+    """
+    [(key, label, start, end)] for every month from first_month to last_month, and with
+    annual=True one more per calendar year in the range (clipped to the range).
+    """
+    if last_month < first_month:
+        raise ValueError("The last month is before the first")
+    periods = []
+    month = first_month.replace(day=1)
+    while month <= last_month:
+        following = (month + datetime.timedelta(days=32)).replace(day=1)
+        periods.append((month.strftime("%Y-%m"), month.strftime("%B %Y"), month, following - datetime.timedelta(days=1)))
+        month = following
+    if annual:
+        for year in range(first_month.year, last_month.year + 1):
+            months = [p for p in periods if p[2].year == year]
+            label = f"Year {year}" if len(months) == 12 else f"{months[0][1]} - {months[-1][1]}"
+            periods.append((str(year), label, months[0][2], months[-1][3]))
+    return periods
+
+def pdf_money(amount, reporting=None):
+    # The PDF font has no rupee sign
+    return f"{reporting or 'Rs.'} {amount:,.2f}"
+
+def statement_data(batch, title, filter_info, reporting=None, rates=None):
+    """The data_dict for pdf_utils.generate_modern_pdf: summary, category totals and every row."""
+    pdf_rows = []
+    agg, total_dep, total_exp = db_utils.aggregate_transactions(batch, pdf_rows, reporting=reporting, rates=rates)
+    cat_rows = [[k[0], k[1], str(agg[k][0]), f"{agg[k][1]:,.2f}"] for k in sorted(agg, key=lambda x: agg[x][1])]
+    return {
+        "title": title,
+        "filter_info": filter_info,
+        "summary": [
+            ("Date Generated", datetime.datetime.now().strftime('%Y-%m-%d %H:%M')),
+            ("Total Records", str(len(pdf_rows))),
+            ("Total Deposits", pdf_money(total_dep, reporting)),
+            ("Total Expenditure", pdf_money(total_exp, reporting)),
+            ("Net Balance", pdf_money(total_dep + total_exp, reporting))
+        ],
+        "cat_headers": ["Category", "Type", "Cnt", "Amount"],
+        "cat_rows": cat_rows,
+        "headers": ["Date", "Type", "Comment", "Amount"],
+        "rows": pdf_rows
+    }
+
+def _month_runs(batch):
+    """{'YYYY-MM': (start, stop)} of a newest-first batch; each month is one contiguous run."""
+    runs = {}
+    for i, dt in enumerate(batch.datetimes):
+        month = dt[:7]
+        run = runs.get(month)
+        if run is None:
+            runs[month] = [i, i + 1]
+        else:
+            run[1] = i + 1
+    return runs
+
+def build_statements(periods, reporting=None, db_file=None, ledger=None):
+    """[(file name, data_dict)] for the periods, from one query over their whole span."""
+    start = min(p[2] for p in periods).isoformat()
+    end = max(p[3] for p in periods).isoformat()
+    conn = db_utils.connect(db_file)
+    try:
+        sql, params = db_utils.filtered_query(start, end, "All", "All")
+        batch = db_utils.TransactionBatch.from_cursor(conn.execute(sql, params))
+        rules = db_utils.load_recurring(conn)
+    finally:
+        conn.close()
+    if rules:
+        batch = batch.merge_recurring(rules, *db_utils.recurring_range(start, end))
+    rates = db_utils.get_rate_table(db_file)
+    runs = _month_runs(batch)
+    prefix = f"{ledger} " if ledger else ""
+    statements = []
+    for key, label, first, last in periods:
+        # A period's months are adjacent runs: newest month's start to the oldest month's stop
+        months = [runs[m] for m in runs if first.isoformat()[:7] <= m <= last.isoformat()[:7]]
+        part = batch.section(min(r[0] for r in months), max(r[1] for r in months)) if months else db_utils.TransactionBatch()
+        title = "Annual Statement" if len(key) == 4 else "Monthly Statement"
+        info = f"{prefix}{label} ({first.isoformat()} to {last.isoformat()})"
+        statements.append((f"{prefix}Statement {key}.pdf", statement_data(part, title, info, reporting, rates)))
+    return statements, len(batch)
+
+def _render(path, data_dict):
+    started = time.perf_counter()
+    pages = pdf_utils.build_pdf(path, data_dict)
+    return path, pages > 0, time.perf_counter() - started, len(data_dict["rows"]), pages
+
+def export_statements(first_month, last_month, out_dir, annual=True, reporting=None, workers=None,
+                      db_file=None, ledger=None, progress=None):
+    """
+    Writes the statements of a month range into out_dir. progress(path, ok, seconds, rows)
+    is called as each file finishes. Returns a dict with the per-file results and totals.
+    """
+    started = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    statements, rows = build_statements(statement_periods(first_month, last_month, annual), reporting, db_file, ledger)
+    fetched = time.perf_counter() - started
+    jobs = [(os.path.join(out_dir, name), data) for name, data in statements]
+    workers = max(1, min(workers or EXPORT_WORKERS, len(jobs)))
+
+    results = []
+    def done(result):
+        results.append(result[:4])
+        if progress:
+            progress(*result[:4])
+    if workers == 1:
+        for path, data in jobs:
+            done(_render(path, data))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for future in as_completed([pool.submit(_render, path, data) for path, data in jobs]):
+                result = future.result()
+                # Rendered in a worker process: its metrics never reach this one
+                metrics_utils.pdf_generated(result[4], result[2])
+                done(result)
+
+    seconds = time.perf_counter() - started
+    report = {
+        "files": results, "rows": rows, "workers": workers, "fetch_seconds": fetched, "seconds": seconds,
+        "files_per_second": len(results) / seconds if seconds else 0.0,
+        "failed": [path for path, ok, _, _ in results if not ok],
+    }
+    logger.info(f"Exported {len(results)} statements ({rows:,} rows) to {out_dir} in {seconds:.2f}s "
+                f"with {workers} workers: {report['files_per_second']:.1f} files/s")
+    return report
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro batch statements")
+    parser.add_argument("db")
+    parser.add_argument("out_dir")
+    parser.add_argument("--from", dest="first", required=True, help="First month (YYYY-MM)")
+    parser.add_argument("--to", dest="last", required=True, help="Last month (YYYY-MM)")
+    parser.add_argument("--no-annual", action="store_true", help="Only the monthly statements")
+    parser.add_argument("--workers", type=int, default=EXPORT_WORKERS)
+    parser.add_argument("--currency", help="Reporting currency for the totals")
+    args = parser.parse_args()
+
+    try:
+        db_utils.DB_FILE = os.path.abspath(args.db)
+        db_utils.initialize_database()
+        report = export_statements(
+            parse_month(args.first), parse_month(args.last), args.out_dir, not args.no_annual,
+            db_utils.normalize_currency(args.currency) if args.currency else None, args.workers,
+            progress=lambda path, ok, seconds, rows: print(
+                f"  {os.path.basename(path):<28} {rows:>9,} rows {seconds * 1000:9.0f} ms{'' if ok else '  FAILED'}"))
+        print(f"{len(report['files'])} files, {report['rows']:,} rows in {report['seconds']:.2f}s "
+              f"(read {report['fetch_seconds']:.2f}s, {report['workers']} workers): "
+              f"{report['files_per_second']:.1f} files/s, {report['rows'] / report['seconds']:,.0f} rows/s")
+        if report["failed"]:
+            sys.exit(1)
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()
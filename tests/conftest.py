@@ -0,0 +1,40 @@
+"""
+Shared fixtures. Tests run against throwaway ledgers in pytest's tmp_path, never the
+finance.db next to the code.
+"""
+import os
+import sys
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TESTS_DIR)
+for path in (REPO_DIR, os.path.join(REPO_DIR, "tools")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+import db_utils
+
+
+@pytest.fixture
+def ledger(tmp_path, monkeypatch):
+    """Path of a new, initialized ledger that db_utils.DB_FILE points at for the test."""
+    path = str(tmp_path / "finance.db")
+    monkeypatch.setattr(db_utils, "DB_FILE", path)
+    db_utils.initialize_database()
+    yield path
+    db_utils.close_writers()
+
+
+@pytest.fixture
+def release_server(tmp_path, monkeypatch):
+    """A FakeReleaseServer publishing tmp_path/assets, with the updater pointed at it."""
+    import updater_utils
+    from fake_release_server import FakeReleaseServer
+
+    server = FakeReleaseServer(assets_dir=str(tmp_path / "assets")).start()
+    monkeypatch.setattr(updater_utils, "UPDATE_API_URL", server.api_url)
+    monkeypatch.setattr(updater_utils, "UPDATE_CACHE_FILE", str(tmp_path / "update_cache.json"))
+    yield server
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,78 @@
+"""The local API under concurrent load: streamed exports beside ordinary queries."""
+import asyncio
+
+import db_utils
+from api_server import ApiServer
+from api_load_test import Client
+
+ROWS = 60_000
+
+
+def _fill(ledger):
+    rows = [(f"2025-{1 + i % 12:02d}-{1 + i % 28:02d} 10:00", "Base Expense", f"shop {i % 500}", -1.0 - i % 997)
+            for i in range(ROWS)]
+    db_utils.get_writer(ledger).executemany(
+        "INSERT INTO transactions (transaction_datetime, type, comment, amount) VALUES (?, ?, ?, ?)", rows)
+
+
+async def _slow_export(port):
+    """Starts /export.ndjson and reads only its first bytes, leaving the rest unread."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /export.ndjson HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n")
+    await writer.drain()
+    assert (await reader.readline()).startswith(b"HTTP/1.1 200")
+    return reader, writer
+
+
+async def _finish_export(reader, writer):
+    """Reads the rest of the chunked body; returns the number of NDJSON lines."""
+    while await reader.readline() != b"\r\n":
+        pass
+    body = bytearray()
+    while True:
+        length = int((await reader.readline()).strip(), 16)
+        body += await reader.readexactly(length + 2)
+        if length == 0:
+            break
+    writer.close()
+    return body.count(b"\n") - body.count(b"\r\n")
+
+
+async def _exercise(ledger):
+    server = await ApiServer(ledger, port=0, readers=1).start()
+    try:
+        # Exports whose clients stop reading must not hold up the next query
+        stalled = [await _slow_export(server.port) for _ in range(2)]
+        await asyncio.sleep(0.2)
+        client = Client(server.port)
+        await client.open()
+        status, page = await asyncio.wait_for(client.request("GET", "/transactions?limit=10"), 5)
+        assert status == 200 and len(page["items"]) == 10
+
+        async def query():
+            c = Client(server.port)
+            await c.open()
+            for path in ("/summary", "/transactions?limit=50", "/summary/comments"):
+                status, _ = await c.request("GET", path)
+                assert status == 200
+            c.close()
+
+        async def export():
+            return await _finish_export(*await _slow_export(server.port))
+
+        results = await asyncio.wait_for(asyncio.gather(*[query() for _ in range(6)], *[export() for _ in range(3)]), 60)
+        assert results[6:] == [ROWS] * 3
+        status, summary = await client.request("GET", "/summary")
+        assert summary["count"] == ROWS
+        client.close()
+
+        # The stalled downloads still complete once their clients read again
+        counts = await asyncio.wait_for(asyncio.gather(*[_finish_export(*pair) for pair in stalled]), 60)
+        assert counts == [ROWS, ROWS]
+    finally:
+        await server.close()
+
+
+def test_exports_and_queries_run_concurrently(ledger):
+    _fill(ledger)
+    asyncio.run(_exercise(ledger))
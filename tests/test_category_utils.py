@@ -0,0 +1,102 @@
+"""The combined rule matcher, its type and amount chains, and the SQL CASE built from them."""
+import sqlite3
+
+import pytest
+
+import db_utils
+import category_utils
+from category_utils import Rule, Categorizer
+from db_utils import NO_CATEGORY
+
+
+def _rule(rule_id, category_id, kind, pattern=None, trans_type=None, min_amount=None, max_amount=None):
+    return Rule(rule_id, category_id, kind, pattern, trans_type, min_amount, max_amount)
+
+
+def test_first_rule_by_priority_wins_wherever_it_matches():
+    categorizer = Categorizer([
+        _rule(1, 10, "keyword", "groceries"),
+        _rule(2, 20, "regex", r"uber|ola"),
+        _rule(3, 30, "keyword", "uber"),
+    ])
+    # "uber" comes first in the text, but the groceries rule is tried first
+    assert categorizer.categorize("Uber to groceries", "Base Expense", -100) == 10
+    assert categorizer.categorize("UBER eats", "Base Expense", -100) == 20
+    assert categorizer.categorize("rent", "Base Expense", -100) == NO_CATEGORY
+    assert categorizer.matches("uber") == (1,)
+
+
+def test_type_and_amount_limits_fall_through_to_later_rules():
+    categorizer = Categorizer([
+        _rule(1, 10, "keyword", "rent", trans_type="Deposit"),
+        _rule(2, 20, "keyword", "rent", min_amount=10_000),
+        _rule(3, 30, "keyword", "rent", max_amount=500),
+        _rule(4, 40, "keyword", "rent"),
+        _rule(5, 50, "keyword", "rent"),
+    ])
+    assert categorizer.matches("House rent") == (0, 1, 2, 3)
+    assert categorizer.categorize("House rent", "Deposit", 25_000) == 10
+    assert categorizer.categorize("House rent", "Base Expense", -25_000) == 20
+    assert categorizer.categorize("House rent", "Base Expense", -100) == 30
+    assert categorizer.categorize("House rent", "Base Expense", -2_000) == 40
+    assert [r.rule_id for r in categorizer.chain("House rent", "Deposit")] == [1]
+    assert [r.rule_id for r in categorizer.chain("House rent", "Base Expense")] == [2, 3, 4]
+
+
+def test_amount_rules_need_no_pattern():
+    categorizer = Categorizer([
+        _rule(1, 10, "keyword", "salary", trans_type="Deposit"),
+        _rule(2, 20, "amount", trans_type="Base Expense", min_amount=50_000),
+    ])
+    assert categorizer.categorize("anything", "Base Expense", -60_000) == 20
+    assert categorizer.categorize("anything", "Base Expense", -600) == NO_CATEGORY
+    assert categorizer.categorize("Salary June", "Deposit", 90_000) == 10
+
+
+def _case(sql, amount):
+    conn = sqlite3.connect(":memory:")
+    try:
+        return conn.execute(f"SELECT {sql} FROM (SELECT ? AS amount) t", (amount,)).fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("amount", [-25_000, -10_000, -2_000, -500, -100, 0])
+def test_chain_sql_agrees_with_categorize(amount):
+    categorizer = Categorizer([
+        _rule(1, 20, "keyword", "rent", min_amount=10_000),
+        _rule(2, 30, "keyword", "rent", max_amount=500),
+        _rule(3, 40, "keyword", "rent"),
+    ])
+    sql = category_utils._category_expr(categorizer.chain("rent", "Base Expense"))
+    assert sql.startswith("CASE ")
+    assert _case(sql, amount) == categorizer.categorize("rent", "Base Expense", amount)
+
+
+def test_chain_sql_without_a_fallback_rule():
+    categorizer = Categorizer([_rule(1, 20, "keyword", "rent", min_amount=10_000, max_amount=20_000)])
+    sql = category_utils._chain_sql(categorizer.chain("rent", "Base Expense"))
+    assert _case(sql, -15_000) == 20
+    assert _case(sql, -25_000) == NO_CATEGORY
+
+
+@pytest.mark.parametrize("pattern", [r"(?P<n>ola)", r"(a)\1", r"(?P<n>x)(?P=n)", r"(x)\g<1>"])
+def test_add_rule_rejects_group_references(ledger, pattern):
+    with pytest.raises(ValueError):
+        category_utils.add_rule("Travel", "regex", pattern, db_file=ledger)
+    assert category_utils.list_rules(ledger) == []
+
+
+def test_rules_compile_together_after_add_rule(ledger):
+    category_utils.add_rule("Travel", "regex", r"(uber|ola)\s+ride", db_file=ledger)
+    category_utils.add_rule("Travel", "regex", r"(metro)", db_file=ledger)
+    with pytest.raises(ValueError):
+        category_utils.add_rule("Travel", "regex", r"(unclosed", db_file=ledger)
+    travel = category_utils.list_categories(ledger)[0][0]
+    assert category_utils.categorize("Ola ride home", "Base Expense", -300, ledger) == travel
+    assert category_utils.categorize("metro card", "Base Expense", -300, ledger) == travel
+
+    db_utils.add_transaction_db("2025-06-01 10:00", "Base Expense", "uber ride", -250.0)
+    seen, changed, _ = category_utils.recategorize(ledger)
+    assert (seen, changed) == (1, 1)
+    assert "CASE t.type" in category_utils.comment_category_sql("uber ride", db_file=ledger)
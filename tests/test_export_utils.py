@@ -0,0 +1,43 @@
+"""XLSX exports continue on a new sheet at Excel's row limit."""
+import pytest
+
+import export_utils
+
+openpyxl = pytest.importorskip("openpyxl")
+
+
+def _rows(count):
+    return [(i, f"2025-06-01 10:{i % 60:02d}", "Deposit", f"row {i}", float(i), "INR") for i in range(1, count + 1)]
+
+
+def _sheets(path):
+    book = openpyxl.load_workbook(path, read_only=True)
+    try:
+        return {sheet.title: [list(row) for row in sheet.iter_rows(values_only=True)] for sheet in book.worksheets}
+    finally:
+        book.close()
+
+
+def test_xlsx_splits_sheets_at_the_row_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_utils, "XLSX_MAX_ROWS", 4)
+    rows = _rows(8)
+    path = tmp_path / "history.xlsx"
+    with open(path, "wb") as out:
+        assert export_utils.write_xlsx(out, [rows[:5], rows[5:]]) == 8
+
+    sheets = _sheets(path)
+    assert list(sheets) == ["Transactions", "Transactions 2", "Transactions 3"]
+    assert all(len(sheet) <= 4 and sheet[0] == export_utils.COLUMNS for sheet in sheets.values())
+    assert [tuple(row) for sheet in sheets.values() for row in sheet[1:]] == rows
+
+
+def test_xlsx_fills_a_sheet_exactly(tmp_path, monkeypatch):
+    monkeypatch.setattr(export_utils, "XLSX_MAX_ROWS", 4)
+    path = tmp_path / "history.xlsx"
+    with open(path, "wb") as out:
+        export_utils.write_xlsx(out, [_rows(3)])
+    assert list(_sheets(path)) == ["Transactions"]
+
+    with open(path, "wb") as out:
+        export_utils.write_xlsx(out, [])
+    assert _sheets(path) == {"Transactions": [export_utils.COLUMNS]}
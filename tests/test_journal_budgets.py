@@ -0,0 +1,36 @@
+"""Journal replay keeps a replica's budget_usage counters in step with the source."""
+import db_utils
+import budget_utils
+import journal_utils
+
+
+def _usage(path):
+    conn = db_utils.connect(path)
+    try:
+        return dict(((month, key), round(spent, 2)) for month, key, spent in
+                    conn.execute("SELECT month, key, spent FROM budget_usage WHERE spent != 0"))
+    finally:
+        conn.close()
+
+
+def test_replayed_updates_and_deletes_keep_usage(ledger, tmp_path):
+    replica = str(tmp_path / "replica.db")
+    folder = str(tmp_path / "journal")
+    budget_utils.set_budget("groceries", 1000, ledger)
+    for amount in (-100.0, -150.0, -40.0):
+        db_utils.add_transaction_db("2025-06-10 10:00", "Base Expense", "Groceries", amount)
+    db_utils.add_transaction_db("2025-06-11 10:00", "Base Expense", "Fuel", -60.0)
+
+    journal_utils.apply_changes([journal_utils.export_changes(folder, ledger)], replica)
+    assert budget_utils.verify_usage(replica) == []
+
+    writer = db_utils.get_writer(ledger)
+    writer.execute("UPDATE transactions SET amount = -200.0 WHERE amount = -100.0")
+    writer.execute("UPDATE transactions SET comment = 'fuel' WHERE amount = -40.0")
+    writer.execute("UPDATE transactions SET transaction_datetime = '2025-07-01 09:00' WHERE amount = -150.0")
+    writer.execute("DELETE FROM transactions WHERE comment = 'Fuel'")
+
+    assert journal_utils.apply_changes([journal_utils.export_changes(folder, ledger)], replica) == 4
+    assert budget_utils.verify_usage(replica) == []
+    assert _usage(replica) == _usage(ledger) == {
+        ("2025-06", "groceries"): 200.0, ("2025-06", "fuel"): 40.0, ("2025-07", "groceries"): 150.0}
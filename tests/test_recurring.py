@@ -0,0 +1,119 @@
+"""
+Recurring rules expanded on read give the same reports as the same occurrences written
+as rows by materialize().
+"""
+import csv
+import datetime
+
+import pytest
+
+import db_utils
+import budget_utils
+import export_utils
+import ledger_utils
+import recurring_utils
+import statement_utils
+
+
+def _rounded(value):
+    if isinstance(value, float):
+        return round(value, 2)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_rounded(v) for v in value)
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    return value
+
+
+def _without_ids(batch):
+    return sorted(row[:4] + row[5:] for row in batch)
+
+
+def _export(path):
+    export_utils.export_filtered(path)
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.reader(f))
+    # Occurrences have negative ids; drop the id column and compare the rest in order
+    return [row[1:] for row in rows]
+
+
+def _statements():
+    today = datetime.date.today()
+    periods = statement_utils.statement_periods(today.replace(year=today.year - 1, day=1), today)
+    statements, _ = statement_utils.build_statements(periods)
+    for _, data in statements:
+        data["summary"] = data["summary"][1:]
+        data["rows"].sort()
+    return statements
+
+
+def _reports(ledger, monkeypatch):
+    monkeypatch.setattr(ledger_utils, "ledger_path", lambda name: ledger)
+    today = datetime.date.today()
+    return _rounded({
+        "history": _without_ids(db_utils.get_filtered_transactions(None, None, "All", "All")),
+        "history_rent": _without_ids(db_utils.get_filtered_transactions(
+            today.replace(year=today.year - 1).isoformat(), today.isoformat(), "Base Expense", "rent")),
+        "summary": db_utils.get_summary_stats(),
+        "by_comment": sorted(db_utils.get_summary_by_comment()),
+        "chart": db_utils.get_chart_data(limit=2),
+        "month_comparison": sorted(db_utils.get_period_comparison("month")[1]),
+        "year_comparison": sorted(db_utils.get_period_comparison("year")[1]),
+        "budgets": budget_utils.budget_status(),
+        "consolidated": ledger_utils.get_consolidated_summary(["Personal"]),
+        "consolidated_by_comment": sorted(ledger_utils.get_consolidated_summary_by_comment(["Personal"])),
+        "consolidated_chart": ledger_utils.get_consolidated_chart_data(["Personal"], limit=2),
+        "consolidated_comparison": sorted(ledger_utils.get_consolidated_period_comparison("month", names=["Personal"])[1]),
+        "statements": _statements(),
+        "export": _export(ledger + ".csv"),
+    })
+
+
+@pytest.fixture
+def rules(ledger):
+    today = datetime.date.today()
+    for day, t_type, comment, amount in ((3, "Base Expense", "Groceries", 450.0), (20, "Deposit", "Salary", 90000.0),
+                                         (40, "Base Expense", "Fuel", 1200.0), (65, "Base Expense", "Rent", 800.0)):
+        db_utils.add_transaction_db(f"{(today - datetime.timedelta(days=day)).isoformat()} 10:00", t_type, comment, amount)
+    start = today.replace(year=today.year - 2)
+    recurring_utils.add_recurring("2024-01-31 09:00", "month", "Base Expense", 25000, "Rent")
+    recurring_utils.add_recurring(f"{start.isoformat()} 08:00", "month", "Deposit", 90000, "Salary", every=1)
+    recurring_utils.add_recurring(f"{start.isoformat()} 07:30", "week", "Base Expense", 300, "Groceries", every=2)
+    recurring_utils.add_recurring(f"{(today - datetime.timedelta(days=100)).isoformat()} 06:00", "day", "Base Expense", 40,
+                                  "Coffee", every=3)
+    recurring_utils.add_recurring(f"{start.isoformat()} 12:00", "year", "Base Expense", 5000, "Insurance",
+                                  end_date=(today - datetime.timedelta(days=30)).isoformat())
+    budget_utils.set_budget("groceries", 2000)
+    budget_utils.set_budget("rent", 30000)
+    return ledger
+
+
+def test_expanded_reports_match_materialized_rows(rules, monkeypatch):
+    expanded = _reports(rules, monkeypatch)
+    assert recurring_utils.materialize() > 0
+    assert all(len(rule.span(*db_utils.recurring_range())) == 0 for rule in recurring_utils.list_recurring())
+    assert _reports(rules, monkeypatch) == expanded
+
+
+def test_month_end_rules_clip_to_short_months():
+    rule = db_utils.RecurringRule(1, "2024-01-31 09:00", "month", 1, None, "Base Expense", "Rent", -1.0)
+    datetimes, ids = rule.columns(datetime.date(2024, 1, 1), datetime.date(2024, 5, 1))
+    assert datetimes == ["2024-04-30 09:00", "2024-03-31 09:00", "2024-02-29 09:00", "2024-01-31 09:00"]
+    assert list(ids) == [-(db_utils.OCCURRENCE_SPAN + n) for n in (3, 2, 1, 0)]
+
+
+@pytest.mark.parametrize("ratio", [0, 10 ** 9])
+def test_merge_recurring_sort_and_gallop_agree(rules, monkeypatch, ratio):
+    conn = db_utils.connect()
+    try:
+        sql, params = db_utils.filtered_query(None, None, "All", "All")
+        batch = db_utils.TransactionBatch.from_cursor(conn.execute(sql, params))
+        loaded = db_utils.load_recurring(conn)
+    finally:
+        conn.close()
+    first, last = db_utils.recurring_range()
+    expected = list(batch.merge(db_utils.recurring_occurrences(loaded, first, last)))
+    monkeypatch.setattr(db_utils.TransactionBatch, "SORT_MERGE_RATIO", ratio)
+    merged = list(batch.merge_recurring(loaded, first, last))
+    assert [row[0] for row in merged] == sorted((row[0] for row in merged), reverse=True)
+    assert sorted(merged) == sorted(expected)
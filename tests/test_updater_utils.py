@@ -0,0 +1,282 @@
+"""Update downloads, delta patches and the binary swap, against synthetic binaries and a local release server."""
+import os
+import sys
+import time
+import random
+import subprocess
+
+import pytest
+
+import updater_utils
+from make_delta import make_delta
+
+NEW_VERSION = "v9.9.9"
+EXE_NAME = "FinanceManagerPro.exe"
+
+
+def _write(path, data):
+    with open(path, "wb") as f:
+        f.write(data)
+    return str(path)
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _builds(seed=7, size=256 * 1024):
+    """An old and a new build: shifted code, scattered changed bytes and appended data."""
+    rng = random.Random(seed)
+    old = rng.randbytes(size)
+    new = bytearray(old[:1000] + rng.randbytes(300) + old[1000:])
+    for offset in range(5000, len(new), 4099):
+        new[offset] ^= 0xFF
+    return old, bytes(new) + rng.randbytes(2000)
+
+
+@pytest.fixture
+def delta(tmp_path):
+    """(old path, new path, delta path) of two synthetic builds and the delta between them."""
+    old, new = _builds()
+    old_path = _write(tmp_path / "old.exe", old)
+    new_path = _write(tmp_path / "new.exe", new)
+    delta_path = str(tmp_path / "update.delta")
+    make_delta(old_path, new_path, delta_path, updater_utils.CURRENT_VERSION, NEW_VERSION)
+    return old_path, new_path, delta_path
+
+
+# --- RELEASE CHECK / DOWNLOADS ---
+def test_fetch_latest_release_revalidates_with_the_etag(release_server):
+    api = "/repos/santanugh/FinanceManagerPro/releases/latest"
+    release = updater_utils.fetch_latest_release(force=True)
+    assert release["tag_name"] == NEW_VERSION
+    assert updater_utils.fetch_latest_release() == release
+    assert release_server.hits[api] == 1
+
+    # A 304 hands back the cached copy, so a mark put on it survives the check
+    cache = updater_utils.load_release_cache()
+    assert cache["etag"]
+    cache["release"]["cached"] = True
+    updater_utils.save_release_cache(cache)
+    assert updater_utils.fetch_latest_release(force=True)["cached"]
+    assert release_server.hits[api] == 2
+
+    release_server.tag = "v10.0.0"
+    release = updater_utils.fetch_latest_release(force=True)
+    assert release["tag_name"] == "v10.0.0" and "cached" not in release
+
+
+@pytest.fixture
+def published(release_server):
+    """(url, sha256, bytes) of a 1 MB binary on the release server."""
+    path, digest = release_server.make_binary(size=1024 * 1024)
+    return f"{release_server.base_url}/download/{EXE_NAME}", digest, _read(path)
+
+
+def test_download_file_resumes_after_dropped_connections(release_server, published, tmp_path):
+    url, digest, data = published
+    release_server.drop_after = 200_000
+    dest = str(tmp_path / "update_temp.exe")
+    assert updater_utils.download_file(url, dest, len(data), digest) == digest
+    assert _read(dest) == data
+    assert release_server.drops >= 5
+    assert not os.path.exists(dest + ".part")
+
+
+def test_download_file_resumes_a_partial_file(release_server, published, tmp_path):
+    url, digest, data = published
+    dest = str(tmp_path / "update_temp.exe")
+    _write(dest + ".part", data[:300_000])
+    progress = []
+    assert updater_utils.download_file(url, dest, len(data), digest, progress.append) == digest
+    assert _read(dest) == data
+    assert progress[-1] == 1.0
+
+
+def test_download_file_in_segments(release_server, published, tmp_path):
+    url, digest, data = published
+    dest = str(tmp_path / "update_temp.exe")
+    assert updater_utils.download_file(url, dest, len(data), digest, segments=4) == digest
+    assert _read(dest) == data
+
+
+def test_download_file_rejects_a_checksum_mismatch(release_server, published, tmp_path):
+    url, _, data = published
+    dest = str(tmp_path / "update_temp.exe")
+    with pytest.raises(updater_utils.DownloadError, match="Checksum Mismatch"):
+        updater_utils.download_file(url, dest, len(data), "0" * 64)
+    assert not os.path.exists(dest) and not os.path.exists(dest + ".part")
+
+
+# --- DELTA UPDATES ---
+def test_apply_delta_rebuilds_the_new_build(delta, tmp_path):
+    old_path, new_path, delta_path = delta
+    out_path = str(tmp_path / "out.exe")
+    digest = updater_utils.apply_delta(old_path, delta_path, out_path)
+    assert _read(out_path) == _read(new_path)
+    assert digest == updater_utils.sha256_of_file(new_path).hexdigest()
+    assert os.path.getsize(delta_path) < os.path.getsize(new_path) // 10
+
+
+@pytest.mark.parametrize("damage", ["truncated", "corrupt"])
+def test_apply_delta_rejects_a_damaged_delta(delta, tmp_path, damage):
+    old_path, _, delta_path = delta
+    data = bytearray(_read(delta_path))
+    if damage == "truncated":
+        data = data[:len(data) // 2]
+    else:
+        for offset in range(len(data) // 2, len(data), 97):
+            data[offset] ^= 0x5A
+    _write(delta_path, data)
+    out_path = str(tmp_path / "out.exe")
+    with pytest.raises(updater_utils.DeltaError):
+        updater_utils.apply_delta(old_path, delta_path, out_path)
+    assert not os.path.exists(out_path) and not os.path.exists(out_path + ".tmp")
+
+
+def test_apply_delta_rejects_another_source_build(delta, tmp_path):
+    old_path, _, delta_path = delta
+    data = bytearray(_read(old_path))
+    data[0] ^= 0xFF
+    other_path = _write(tmp_path / "other.exe", data)
+    with pytest.raises(updater_utils.DeltaError, match="source build"):
+        updater_utils.apply_delta(other_path, delta_path, str(tmp_path / "out.exe"))
+
+
+def _publish(server, delta_path, tmp_path):
+    """Publishes the new build, its checksum and the delta; returns the installed build and the full EXE's URL."""
+    old, new = _builds()
+    assets = server.assets_dir
+    os.makedirs(assets)
+    new_path = _write(os.path.join(assets, EXE_NAME), new)
+    with open(new_path + ".sha256", "w") as f:
+        f.write(f"{updater_utils.sha256_of_file(new_path).hexdigest()}  {EXE_NAME}\n")
+    os.replace(delta_path, os.path.join(assets, updater_utils.delta_asset_name(
+        "FinanceManagerPro", updater_utils.CURRENT_VERSION, NEW_VERSION)))
+    updater_utils.fetch_latest_release(force=True)
+    return _write(tmp_path / "installed.exe", old), f"{server.base_url}/download/{EXE_NAME}"
+
+
+def _full_downloads(server):
+    return server.hits.get(f"/download/{EXE_NAME}", 0)
+
+
+def test_fetch_update_binary_uses_the_delta(release_server, delta, tmp_path):
+    installed, url = _publish(release_server, delta[2], tmp_path)
+    dest = str(tmp_path / "update_temp.exe")
+    updater_utils.fetch_update_binary(url, dest, installed, NEW_VERSION)
+    assert _read(dest) == _read(delta[1])
+    assert _full_downloads(release_server) == 0
+
+
+@pytest.mark.parametrize("problem", ["corrupt delta", "other source build"])
+def test_fetch_update_binary_falls_back_to_the_full_download(release_server, delta, tmp_path, problem):
+    if problem == "corrupt delta":
+        data = _read(delta[2])
+        _write(delta[2], data[:len(data) // 2])
+    installed, url = _publish(release_server, delta[2], tmp_path)
+    if problem == "other source build":
+        _write(installed, b"\0" + _read(installed)[1:])
+    dest = str(tmp_path / "update_temp.exe")
+    digest = updater_utils.fetch_update_binary(url, dest, installed, NEW_VERSION)
+    assert _read(dest) == _read(delta[1])
+    assert digest == updater_utils.sha256_of_file(dest).hexdigest()
+    assert _full_downloads(release_server) > 0
+    assert not os.path.exists(dest + updater_utils.DELTA_SUFFIX)
+
+
+# --- INSTALL / SWAP ---
+def _child(seconds):
+    return subprocess.Popen([sys.executable, "-c", f"import time; time.sleep({seconds})"])
+
+
+@pytest.mark.parametrize("pidfd", [True, False], ids=["pidfd", "polling"])
+def test_wait_for_pid_exit(monkeypatch, pidfd):
+    if not pidfd:
+        monkeypatch.delattr(os, "pidfd_open", raising=False)
+    elif not hasattr(os, "pidfd_open"):
+        pytest.skip("os.pidfd_open needs Linux 5.3 and Python 3.9")
+    proc = _child(0.3)
+    try:
+        assert updater_utils.wait_for_pid_exit(proc.pid, timeout=10)
+        assert not updater_utils.pid_alive(proc.pid)
+    finally:
+        proc.wait()
+
+    proc = _child(30)
+    try:
+        assert not updater_utils.wait_for_pid_exit(proc.pid, timeout=0.1)
+        assert updater_utils.pid_alive(proc.pid)
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def test_swap_binary_keeps_the_previous_build(tmp_path):
+    target = _write(tmp_path / "app.exe", b"old build")
+    new = _write(tmp_path / "update_temp.exe", b"new build")
+    backup = updater_utils.swap_binary(new, target)
+    assert _read(target) == b"new build" and _read(backup) == b"old build"
+    assert not os.path.exists(new)
+
+
+def test_swap_binary_puts_the_old_build_back(tmp_path):
+    target = _write(tmp_path / "app.exe", b"old build")
+    with pytest.raises(OSError):
+        updater_utils.swap_binary(str(tmp_path / "missing.exe"), target, timeout=0.1)
+    assert _read(target) == b"old build"
+    assert not os.path.exists(target + updater_utils.BACKUP_SUFFIX)
+
+
+def _script(path, body):
+    """A Python script standing in for a build; launched with the running interpreter."""
+    return _write(path, body.encode("utf-8"))
+
+
+def _wait_for(path, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not os.path.exists(path):
+        assert time.monotonic() < deadline, f"{path} never appeared"
+        time.sleep(0.02)
+
+
+def test_install_and_relaunch_rolls_back_a_crashing_build(tmp_path):
+    marker = str(tmp_path / "old_build_ran")
+    old_build = f"open({marker!r}, 'w').close()\n"
+    target = _script(tmp_path / "app.py", old_build)
+    new = _script(tmp_path / "update_temp.py", "import sys\nsys.exit(3)\n")
+    running = _child(0.2)
+    try:
+        timings = updater_utils.install_and_relaunch(new, target, pid=running.pid, timeout=10,
+                                                     launch_cmd=[sys.executable, target], health_check=5)
+    finally:
+        running.wait()
+    assert timings["rolled_back"]
+    assert _read(target) == old_build.encode("utf-8")
+    assert not os.path.exists(target + updater_utils.BACKUP_SUFFIX)
+    _wait_for(marker)
+
+
+def test_install_and_relaunch_keeps_a_healthy_build(tmp_path):
+    target = _script(tmp_path / "app.py", "raise SystemExit(1)\n")
+    new = _script(tmp_path / "update_temp.py", "pass\n")
+    timings = updater_utils.install_and_relaunch(new, target, launch_cmd=[sys.executable, target], health_check=5)
+    assert not timings["rolled_back"]
+    assert _read(target) == b"pass\n"
+    assert not os.path.exists(target + updater_utils.BACKUP_SUFFIX)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="uses an executable shell script as the build")
+def test_install_and_relaunch_restores_the_backup_when_the_new_build_cannot_start(tmp_path):
+    marker = str(tmp_path / "old_build_ran")
+    old_build = f"#!/bin/sh\ntouch '{marker}'\n".encode("utf-8")
+    target = _write(tmp_path / "app", old_build)
+    os.chmod(target, 0o755)
+    # Not executable: starting it fails with PermissionError
+    new = _write(tmp_path / "update_temp", b"\x7fELF broken build")
+    timings = updater_utils.install_and_relaunch(new, target, health_check=5)
+    assert timings["rolled_back"]
+    assert _read(target) == old_build
+    assert not os.path.exists(target + updater_utils.BACKUP_SUFFIX)
+    _wait_for(marker)
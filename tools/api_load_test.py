@@ -0,0 +1,190 @@
+"""
+Load test for api_server.py.
+
+Starts the server on a copy of a synthetic ledger, then runs N keep-alive clients for a
+fixed time, each picking requests from a mix of paged reads, summaries, small bulk
+inserts and comment lookups. Reports requests/sec and p50/p99 latency per endpoint, and
+the throughput of a full streamed export.
+
+    python tools/api_load_test.py --rows 100000 --clients 16 --seconds 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+from synthetic_ledger import cached_ledger
+
+HOST = "127.0.0.1"
+
+# (name, weight)
+MIX = [
+    ("page", 40),
+    ("page_filtered", 15),
+    ("page_next", 15),
+    ("summary", 10),
+    ("by_comment", 5),
+    ("comments", 10),
+    ("insert", 5),
+]
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+class Client:
+    """A raw keep-alive HTTP/1.1 client, so the client side costs as little as possible."""
+
+    def __init__(self, port):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(HOST, self.port)
+
+    async def request(self, method, path, body=None):
+        head = f"{method} {path} HTTP/1.1\r\nHost: {HOST}:{self.port}\r\n"
+        data = b""
+        if body is not None:
+            data = json.dumps(body).encode()
+            head += f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+        self.writer.write((head + "\r\n").encode() + data)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding") == "chunked":
+            size = 0
+            while True:
+                length = int((await self.reader.readline()).strip(), 16)
+                await self.reader.readexactly(length + 2)   # the chunk and its CRLF; only sizes are kept
+                size += length
+                if length == 0:
+                    return status, size
+        payload = await self.reader.readexactly(int(headers.get("content-length", 0)))
+        return status, json.loads(payload) if payload else None
+
+    def close(self):
+        self.writer.close()
+
+
+async def worker(port, deadline, rng, latencies, errors, mix):
+    client = Client(port)
+    await client.open()
+    cursor = None
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    while time.perf_counter() < deadline:
+        kind = rng.choices(names, weights)[0]
+        method, body = "GET", None
+        if kind == "page":
+            path = "/transactions?limit=50"
+        elif kind == "page_filtered":
+            year = rng.randint(2015, 2025)
+            path = f"/transactions?start={year}-01-01&end={year}-12-31&type=Base%20Expense&limit=50"
+        elif kind == "page_next":
+            path = f"/transactions?limit=50&cursor={cursor}" if cursor else "/transactions?limit=50"
+        elif kind == "summary":
+            path = "/summary"
+        elif kind == "by_comment":
+            path = "/summary/comments"
+        elif kind == "comments":
+            path = "/comments?prefix=" + rng.choice("abcdefghilmnoprstw")
+        else:
+            method, path = "POST", "/transactions"
+            body = [{"datetime": "2025-12-31 12:00", "type": "Base Expense", "comment": "load test", "amount": rng.randint(1, 500)}
+                    for _ in range(10)]
+        t0 = time.perf_counter()
+        status, payload = await client.request(method, path, body)
+        latencies.setdefault(kind, []).append(time.perf_counter() - t0)
+        if status >= 300:
+            errors.append((kind, status))
+        elif kind.startswith("page"):
+            cursor = payload["next_cursor"]
+    client.close()
+
+
+async def run_load(port, clients, seconds, mix):
+    latencies, errors = {}, []
+    deadline = time.perf_counter() + seconds
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(port, deadline, random.Random(i), latencies, errors, mix) for i in range(clients)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def run_export(port, path):
+    client = Client(port)
+    await client.open()
+    t0 = time.perf_counter()
+    status, size = await client.request("GET", path)
+    elapsed = time.perf_counter() - t0
+    client.close()
+    return status, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requests/sec and latency of the local API")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--read-only", action="store_true", help="Leave the bulk inserts out of the mix")
+    parser.add_argument("--out", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    source = cached_ledger(args.rows)
+    with tempfile.TemporaryDirectory() as workdir:
+        db_file = os.path.join(workdir, "finance.db")
+        shutil.copyfile(source, db_file)
+        server = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, "api_server.py"), "--db", db_file, "--port", "0"],
+                                  stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        try:
+            port = int(server.stdout.readline().strip().rsplit(":", 1)[1])
+            mix = [(name, weight) for name, weight in MIX if not (args.read_only and name == "insert")]
+            latencies, errors, elapsed = asyncio.run(run_load(port, args.clients, args.seconds, mix))
+            total = sum(len(v) for v in latencies.values())
+            print(f"{args.rows:,} rows, {args.clients} clients, {elapsed:.1f}s: "
+                  f"{total / elapsed:,.0f} req/s, {len(errors)} errors")
+            report = {"rows": args.rows, "clients": args.clients, "req_per_s": total / elapsed,
+                      "errors": len(errors), "endpoints": {}}
+            for kind, values in sorted(latencies.items()):
+                p50, p99 = statistics.median(values) * 1000, percentile(values, 0.99) * 1000
+                report["endpoints"][kind] = {"count": len(values), "p50_ms": p50, "p99_ms": p99}
+                print(f"  {kind:<14} {len(values):7,} | p50 {p50:7.2f} ms | p99 {p99:7.2f} ms")
+            every = [v for values in latencies.values() for v in values]
+            report["p99_ms"] = percentile(every, 0.99) * 1000
+            print(f"  {'all':<14} {len(every):7,} | p50 {statistics.median(every) * 1000:7.2f} ms | p99 {report['p99_ms']:7.2f} ms")
+
+            for path in ("/export.ndjson", "/export.csv"):
+                status, size, seconds = asyncio.run(run_export(port, path))
+                print(f"  {path:<14} {size / 1024 / 1024:6.1f} MB in {seconds:5.2f}s (status {status})")
+                report["endpoints"][path] = {"bytes": size, "seconds": seconds}
+        finally:
+            server.terminate()
+            server.wait()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Local stand-in for the GitHub releases API.
+
+Serves /repos/<user>/<repo>/releases/latest with an ETag (answering 304 on If-None-Match)
+and the release assets from a folder, with Range support and optional mid-stream
+connection drops, so the updater can be exercised without the network:
+
+    python tools/fake_release_server.py --tag v9.9.9 --assets dist --make-binary 200 --drop-after 5000000
+    set FMP_UPDATE_API_URL=http://127.0.0.1:8765/repos/santanugh/FinanceManagerPro/releases/latest
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class ReleaseHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _send_file(self, path):
+        """Serves a file with Range support, cutting the connection after drop_after bytes if set."""
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        status = 200
+        range_header = self.headers.get("Range")
+        if range_header and range_header.startswith("bytes=") and self.server.ranges:
+            first, _, last = range_header[6:].partition("-")
+            start = int(first or 0)
+            end = min(int(last), size - 1) if last else size - 1
+            if start >= size:
+                self._send(416, headers={"Content-Range": f"bytes */{size}"})
+                return
+            status = 206
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(end - start + 1))
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.end_headers()
+        if self.command == "HEAD":
+            return
+
+        budget = self.server.drop_after or (end - start + 1)
+        with open(path, "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0 and budget > 0:
+                block = f.read(min(256 * 1024, remaining, budget))
+                if not block: break
+                if self.server.throttle:
+                    time.sleep(len(block) / self.server.throttle)
+                self.wfile.write(block)
+                remaining -= len(block)
+                budget -= len(block)
+        if remaining > 0:
+            # Simulate a dropped connection mid-stream
+            with self.server.lock:
+                self.server.drops += 1
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits[self.path] = server.hits.get(self.path, 0) + 1
+
+        if self.path.endswith("/releases/latest"):
+            body, etag = server.release_body()
+            if self.headers.get("If-None-Match") == etag:
+                self._send(304, headers={"ETag": etag})
+                return
+            self._send(200, body, {"Content-Type": "application/json", "ETag": etag})
+            return
+
+        if self.path.startswith("/download/"):
+            name = os.path.basename(self.path)
+            path = os.path.join(server.assets_dir, name)
+            if not os.path.isfile(path):
+                self._send(404)
+                return
+            self._send_file(path)
+            return
+
+        self._send(404)
+
+
+class FakeReleaseServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, tag="v9.9.9", assets_dir=".", host="127.0.0.1", port=0, verbose=False,
+                 ranges=True, drop_after=0, throttle=0):
+        super().__init__((host, port), ReleaseHandler)
+        self.tag = tag
+        self.assets_dir = assets_dir
+        self.verbose = verbose
+        self.ranges = ranges            # honour Range requests
+        self.drop_after = drop_after    # cut every download response after this many bytes
+        self.throttle = throttle        # bytes/second per connection, 0 = unlimited
+        self.hits = {}
+        self.drops = 0
+        self.lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self):
+        return f"{self.base_url}/repos/santanugh/FinanceManagerPro/releases/latest"
+
+    def release_body(self):
+        assets = []
+        if os.path.isdir(self.assets_dir):
+            for name in sorted(os.listdir(self.assets_dir)):
+                path = os.path.join(self.assets_dir, name)
+                if os.path.isfile(path):
+                    assets.append({
+                        "name": name,
+                        "size": os.path.getsize(path),
+                        "browser_download_url": f"{self.base_url}/download/{name}",
+                    })
+        body = json.dumps({"tag_name": self.tag, "assets": assets}).encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        return body, etag
+
+    def make_binary(self, name="FinanceManagerPro.exe", size=64 * 1024 * 1024, seed=1, checksum=True):
+        """Writes a deterministic fake release binary (and its .sha256 asset) into assets_dir."""
+        os.makedirs(self.assets_dir, exist_ok=True)
+        path = os.path.join(self.assets_dir, name)
+        rng = random.Random(seed)
+        hasher = hashlib.sha256()
+        with open(path, "wb") as f:
+            remaining = size
+            while remaining > 0:
+                block = rng.randbytes(min(1024 * 1024, remaining))
+                f.write(block)
+                hasher.update(block)
+                remaining -= len(block)
+        if checksum:
+            with open(path + ".sha256", "w") as f:
+                f.write(f"{hasher.hexdigest()}  {name}\n")
+        return path, hasher.hexdigest()
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the GitHub releases API")
+    parser.add_argument("--tag", default="v9.9.9")
+    parser.add_argument("--assets", default=".", help="Folder whose files are published as release assets")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--make-binary", type=int, default=0, metavar="MB",
+                        help="Create a fake FinanceManagerPro.exe of this size (plus .sha256) first")
+    parser.add_argument("--drop-after", type=int, default=0, metavar="BYTES",
+                        help="Cut every download connection after this many bytes")
+    parser.add_argument("--no-ranges", action="store_true", help="Ignore Range requests")
+    parser.add_argument("--throttle", type=int, default=0, metavar="BYTES_PER_SEC")
+    args = parser.parse_args()
+
+    server = FakeReleaseServer(args.tag, args.assets, port=args.port, verbose=True,
+                               ranges=not args.no_ranges, drop_after=args.drop_after, throttle=args.throttle)
+    if args.make_binary:
+        print("Created", *server.make_binary(size=args.make_binary * 1024 * 1024))
+    print(f"Serving releases/latest at {server.api_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,155 @@
+"""
+Builds a delta patch between two releases of the EXE for updater_utils.apply_delta.
+
+    python tools/make_delta.py old\\FinanceManagerPro.exe dist\\FinanceManagerPro.exe --from 1.0.2 --to 1.0.3
+
+Upload the resulting FinanceManagerPro-1.0.2-to-1.0.3.delta next to the full EXE in the release.
+Matching works like bsdiff's approximate matches: the old file is indexed by aligned blocks,
+each hit is extended in both directions, and runs that differ only in a few scattered bytes
+(shifted addresses, timestamps) stay one copy op with sparse byte patches.
+"""
+import argparse
+import json
+import lzma
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import updater_utils
+from updater_utils import DELTA_MAGIC, _COPY, _PATCH, _INSERT
+
+BLOCK = 64                 # index granularity: any common run >= 2 * BLOCK - 1 bytes is found
+FUZZ_WINDOW = 64           # window used to decide whether a mismatching run is still "the same code"
+FUZZ_MAX_DIFF = 8          # at most this many differing bytes per window to keep patching
+EXTEND_STEP = 64 * 1024
+
+
+def index_blocks(old):
+    index = {}
+    for offset in range(0, len(old) - BLOCK + 1, BLOCK):
+        index.setdefault(old[offset:offset + BLOCK], offset)
+    return index
+
+
+def common_prefix(old, o, new, p, limit):
+    """Length of the exact common run old[o:] / new[p:], comparing big slices first."""
+    n = 0
+    step = EXTEND_STEP
+    while n < limit:
+        k = min(step, limit - n)
+        if old[o + n:o + n + k] == new[p + n:p + n + k]:
+            n += k
+        elif k > 1:
+            step = max(k // 8, 1)
+        else:
+            break
+    return n
+
+
+def extend_match(old, o, new, p):
+    """
+    Extends a match forward from old[o]/new[p], tolerating sparse differences.
+    Returns (length, patches) where patches are (relative offset, new byte).
+    """
+    limit = min(len(old) - o, len(new) - p)
+    n = 0
+    patches = []
+    while n < limit:
+        n += common_prefix(old, o + n, new, p + n, limit - n)
+        if n >= limit:
+            break
+        window = min(FUZZ_WINDOW, limit - n)
+        diffs = [i for i in range(window) if old[o + n + i] != new[p + n + i]]
+        if len(diffs) > FUZZ_MAX_DIFF:
+            break
+        patches.extend((n + i, new[p + n + i]) for i in diffs)
+        n += window
+    # Don't end on a patched tail: trim back to the last exact byte
+    while patches and patches[-1][0] == n - 1:
+        patches.pop()
+        n -= 1
+    return n, patches
+
+
+def diff(old, new):
+    """Yields ('C', offset, length, patches) and ('I', bytes) ops that rebuild new from old."""
+    index = index_blocks(old)
+    literal_start = 0
+    p = 0
+    end = len(new) - BLOCK + 1
+    while p < end:
+        o = index.get(new[p:p + BLOCK])
+        if o is None:
+            p += 1
+            continue
+        # Extend backwards into the pending literal run
+        back = 0
+        while p - back > literal_start and o - back > 0 and old[o - back - 1] == new[p - back - 1]:
+            back += 1
+        o -= back
+        p -= back
+        length, patches = extend_match(old, o, new, p)
+        if p > literal_start:
+            yield ("I", new[literal_start:p])
+        yield ("C", o, length, patches)
+        p += length
+        literal_start = p
+    if literal_start < len(new):
+        yield ("I", new[literal_start:])
+
+
+def make_delta(old_path, new_path, out_path, from_version, to_version):
+    with open(old_path, "rb") as f:
+        old = f.read()
+    with open(new_path, "rb") as f:
+        new = f.read()
+
+    header = {
+        "from_version": from_version.lstrip("v"),
+        "to_version": to_version.lstrip("v"),
+        "old_sha256": updater_utils.sha256_of_file(old_path).hexdigest(),
+        "new_sha256": updater_utils.sha256_of_file(new_path).hexdigest(),
+        "new_size": len(new),
+    }
+    stats = {"copy_ops": 0, "copied": 0, "patched": 0, "insert_ops": 0, "inserted": 0}
+
+    with open(out_path, "wb") as out:
+        out.write(DELTA_MAGIC)
+        out.write(json.dumps(header).encode("utf-8") + b"\n")
+        with lzma.open(out, "wb", preset=9) as ops:
+            for op in diff(old, new):
+                if op[0] == "C":
+                    _, offset, length, patches = op
+                    ops.write(b"C" + _COPY.pack(offset, length, len(patches)))
+                    ops.write(b"".join(_PATCH.pack(rel, value) for rel, value in patches))
+                    stats["copy_ops"] += 1
+                    stats["copied"] += length
+                    stats["patched"] += len(patches)
+                else:
+                    ops.write(b"I" + _INSERT.pack(len(op[1])) + op[1])
+                    stats["insert_ops"] += 1
+                    stats["inserted"] += len(op[1])
+            ops.write(b"E")
+    return header, stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create a delta update between two EXE builds")
+    parser.add_argument("old")
+    parser.add_argument("new")
+    parser.add_argument("--from", dest="from_version", required=True)
+    parser.add_argument("--to", dest="to_version", required=True)
+    parser.add_argument("-o", "--out-dir", default=".")
+    args = parser.parse_args()
+
+    base_name = os.path.splitext(os.path.basename(args.new))[0]
+    out_path = os.path.join(args.out_dir, updater_utils.delta_asset_name(base_name, args.from_version, args.to_version))
+
+    t0 = time.perf_counter()
+    header, stats = make_delta(args.old, args.new, out_path, args.from_version, args.to_version)
+    elapsed = time.perf_counter() - t0
+    size = os.path.getsize(out_path)
+    print(f"{out_path}: {size:,} bytes ({size / max(header['new_size'], 1):.1%} of full EXE) in {elapsed:.1f}s")
+    print(f"  copied {stats['copied']:,} bytes in {stats['copy_ops']} ops ({stats['patched']:,} patched), "
+          f"inserted {stats['inserted']:,} bytes in {stats['insert_ops']} ops")
@@ -0,0 +1,152 @@
+"""
+Measures how much a running backup disturbs the app.
+
+A stand-in UI loop runs on asyncio the way Flet's does: a frame tick every 16 ms doing a
+point read, plus an add_transaction_db every 250 ms. Its lateness and latencies are
+recorded with no backup, during a stepped online backup (backup_utils defaults), during a
+single-step backup, and during a plain file copy of the live database.
+
+    python tools/measure_backup_impact.py --size-mb 1024
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+import db_utils
+import backup_utils
+from synthetic_ledger import cached_ledger
+
+# Average on-disk size of a synthetic row, including its share of the b-tree
+BYTES_PER_ROW = 56
+FRAME = 0.016
+WRITE_EVERY = 0.25
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct))]
+
+
+async def ui_loop(db_file, stop, max_id):
+    lateness, reads, writes = [], [], []
+    conn = db_utils.connect(db_file)
+    rng = random.Random(1)
+    loop = asyncio.get_running_loop()
+    next_write = loop.time() + WRITE_EVERY
+    while not stop.is_set():
+        expected = loop.time() + FRAME
+        await asyncio.sleep(FRAME)
+        lateness.append(max(0.0, loop.time() - expected))
+
+        t0 = time.perf_counter()
+        conn.execute("SELECT transaction_datetime, type, comment, amount FROM transactions WHERE id = ?",
+                     (rng.randint(1, max_id),)).fetchone()
+        reads.append(time.perf_counter() - t0)
+
+        if loop.time() >= next_write:
+            next_write += WRITE_EVERY
+            t0 = time.perf_counter()
+            # Same call the Add view makes; it blocks the UI until the write queue commits it
+            db_utils.add_transaction_db("2025-12-31 12:00", "Base Expense", "backup probe", 1.0)
+            writes.append(time.perf_counter() - t0)
+    conn.close()
+    return lateness, reads, writes
+
+
+def run_scenario(name, db_file, max_id, action, idle=3.0):
+    stop = threading.Event()
+    timings = {}
+
+    def background():
+        time.sleep(0.5)
+        t0 = time.perf_counter()
+        if action:
+            action()
+            timings["duration_s"] = time.perf_counter() - t0
+        else:
+            time.sleep(idle)
+        stop.set()
+
+    worker = threading.Thread(target=background)
+    worker.start()
+    lateness, reads, writes = asyncio.run(ui_loop(db_file, stop, max_id))
+    worker.join()
+    result = {
+        "scenario": name,
+        "duration_s": timings.get("duration_s"),
+        "frames": len(lateness),
+        "frame_late_p50_ms": statistics.median(lateness) * 1000,
+        "frame_late_p99_ms": percentile(lateness, 0.99) * 1000,
+        "frame_late_max_ms": max(lateness) * 1000,
+        "read_p99_ms": percentile(reads, 0.99) * 1000,
+        "write_p99_ms": percentile(writes, 0.99) * 1000 if writes else None,
+        "write_max_ms": max(writes) * 1000 if writes else None,
+    }
+    duration = f"{result['duration_s']:6.1f}s" if result["duration_s"] is not None else "     - "
+    print(f"{name:<22} {duration} | frame lateness p50 {result['frame_late_p50_ms']:6.1f} ms "
+          f"p99 {result['frame_late_p99_ms']:7.1f} ms max {result['frame_late_max_ms']:7.1f} ms | "
+          f"read p99 {result['read_p99_ms']:6.2f} ms | write p99 {result['write_p99_ms'] or 0:7.1f} ms "
+          f"max {result['write_max_ms'] or 0:7.1f} ms", flush=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="UI responsiveness while a backup runs")
+    parser.add_argument("--size-mb", type=int, default=1024, help="Approximate ledger size")
+    parser.add_argument("--out", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    rows = args.size_mb * 1024 * 1024 // BYTES_PER_ROW
+    print(f"Preparing a ~{args.size_mb} MB ledger ({rows:,} rows)...", flush=True)
+    source = cached_ledger(rows)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        db_file = os.path.join(workdir, "finance.db")
+        shutil.copyfile(source, db_file)
+        db_utils.DB_FILE = db_file
+        db_utils.initialize_database()
+        print(f"Ledger: {os.path.getsize(db_file) / 1024 / 1024:,.0f} MB", flush=True)
+        conn = db_utils.connect(db_file)
+        max_id = conn.execute("SELECT MAX(id) FROM transactions").fetchone()[0]
+        conn.close()
+        backup_dir = os.path.join(workdir, "backups")
+
+        def backup(**kwargs):
+            def action():
+                path = backup_utils.backup_database(db_file, backup_dir, **kwargs)
+                os.remove(path)
+            return action
+
+        def plain_copy():
+            shutil.copyfile(db_file, os.path.join(workdir, "copy.db"))
+            os.remove(os.path.join(workdir, "copy.db"))
+
+        reports = [
+            run_scenario("no backup", db_file, max_id, None),
+            run_scenario("stepped", db_file, max_id, backup(compress=False)),
+            run_scenario("stepped + gzip", db_file, max_id, backup(compress=True)),
+            run_scenario("single step", db_file, max_id, backup(compress=False, pages=-1, pause=0)),
+            run_scenario("file copy (unsafe)", db_file, max_id, plain_copy),
+        ]
+        db_utils.close_writers()
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
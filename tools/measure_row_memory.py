@@ -0,0 +1,84 @@
+"""
+Per-row memory of the History "All Time" filter.
+
+Runs the filter on a synthetic ledger the old way (fetchall() into a list of tuples) and
+as a TransactionBatch, then builds the sidebar aggregate and the PDF detail rows from
+each. tracemalloc reports what each step keeps alive and the peak along the way.
+
+    python tools/measure_row_memory.py --rows 1000000
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, os.path.join(REPO_DIR, "benchmarks"))
+import db_utils
+from synthetic_ledger import cached_ledger
+
+
+def fetch_tuples():
+    conn = db_utils.connect()
+    query, params = db_utils.filtered_query(None, None, "All", "All")
+    rows = conn.execute(query, params).fetchall()
+    conn.close()
+    return rows
+
+
+def fetch_batch():
+    return db_utils.get_filtered_transactions(None, None, "All", "All")
+
+
+def measure(name, fetch):
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    data = fetch()
+    fetch_s = time.perf_counter() - t0
+    held, fetch_peak = tracemalloc.get_traced_memory()
+
+    t0 = time.perf_counter()
+    pdf_rows = []
+    db_utils.aggregate_transactions(data, pdf_rows)
+    aggregate_s = time.perf_counter() - t0
+    with_pdf, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    rows = len(data)
+    result = {
+        "model": name,
+        "rows": rows,
+        "result_bytes_per_row": held / rows,
+        "fetch_peak_bytes_per_row": fetch_peak / rows,
+        "with_pdf_rows_bytes_per_row": with_pdf / rows,
+        "peak_bytes_per_row": peak / rows,
+        "fetch_s": fetch_s,
+        "aggregate_and_pdf_rows_s": aggregate_s,
+    }
+    print(f"{name:<8} result {result['result_bytes_per_row']:6.1f} B/row (fetch peak {result['fetch_peak_bytes_per_row']:6.1f}) | "
+          f"+pdf rows {result['with_pdf_rows_bytes_per_row']:6.1f} B/row (peak {result['peak_bytes_per_row']:6.1f}) | "
+          f"fetch {fetch_s:5.2f}s, aggregate+pdf {aggregate_s:5.2f}s", flush=True)
+    del data, pdf_rows
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per row of filter results")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--out", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    db_utils.DB_FILE = cached_ledger(args.rows)
+    reports = [measure("tuples", fetch_tuples), measure("batch", fetch_batch)]
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
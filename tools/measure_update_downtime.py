@@ -0,0 +1,129 @@
+"""
+Measures end-to-end update downtime of the swap engine (updater_utils.install_and_relaunch).
+
+A stand-in "app" (a small Python script used as the target binary) is started, the swap
+engine is pointed at its PID, the app is closed, and the time from the old process exiting
+to the new build writing its start-up mark is recorded. Runs on Linux, macOS and Windows:
+
+    python tools/measure_update_downtime.py --runs 20
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import updater_utils
+
+FAKE_APP = """
+import sys, time
+with open(sys.argv[1], "a") as f:
+    f.write("{version} %r\\n" % time.time())
+if "{version}" == "old":
+    while True:
+        time.sleep(1)
+"""
+
+# What the old install path slept regardless of how fast the app closed:
+# launch.bat `timeout /t 1` + time.sleep(2) after taskkill + time.sleep(2) before relaunch
+LEGACY_FIXED_DELAY = 1 + 2 + 2
+
+
+def read_marks(marker):
+    marks = {}
+    if os.path.exists(marker):
+        with open(marker) as f:
+            for line in f:
+                version, ts = line.split()
+                marks[version] = float(ts)
+    return marks
+
+
+def wait_for_mark(marker, version, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if version in read_marks(marker):
+            return read_marks(marker)[version]
+        time.sleep(0.001)
+    raise TimeoutError(f"{version} build never started")
+
+
+def measure_once(workdir):
+    target = os.path.join(workdir, "FinanceManagerPro.py")
+    new_build = os.path.join(workdir, "update_temp.py")
+    marker = os.path.join(workdir, "marks.txt")
+    for path in (target + updater_utils.BACKUP_SUFFIX, marker):
+        if os.path.exists(path):
+            os.remove(path)
+    with open(target, "w") as f:
+        f.write(FAKE_APP.replace("{version}", "old"))
+    with open(new_build, "w") as f:
+        f.write(FAKE_APP.replace("{version}", "new"))
+
+    app = subprocess.Popen([sys.executable, target, marker])
+    wait_for_mark(marker, "old")
+
+    result = {}
+
+    def updater():
+        result["timings"] = updater_utils.install_and_relaunch(
+            new_build, target, app.pid, launch_cmd=[sys.executable, target, marker])
+
+    worker = threading.Thread(target=updater)
+    worker.start()
+    time.sleep(0.05)            # let the updater block on the PID first, as in the real hand-over
+
+    app.terminate()             # the app closing itself after launching the updater
+    app.wait()
+    exited_at = time.time()
+
+    started_at = wait_for_mark(marker, "new")
+    worker.join()
+
+    timings = result["timings"]
+    timings["end_to_end"] = started_at - exited_at
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure updater swap downtime")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="Print the raw JSON report only")
+    args = parser.parse_args()
+
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(args.runs):
+            runs.append(measure_once(workdir))
+
+    def summary(key):
+        values = [r[key] for r in runs]
+        return {"min": min(values), "median": statistics.median(values), "max": max(values)}
+
+    report = {
+        "runs": args.runs,
+        "platform": sys.platform,
+        "swap": summary("swap"),
+        "launch": summary("launch"),
+        "downtime": summary("downtime"),
+        "end_to_end": summary("end_to_end"),
+        "legacy_fixed_delay": LEGACY_FIXED_DELAY,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{args.runs} runs on {sys.platform}")
+    for key in ("swap", "launch", "downtime", "end_to_end"):
+        s = report[key]
+        print(f"  {key:<11} min {s['min'] * 1000:8.2f} ms   median {s['median'] * 1000:8.2f} ms   max {s['max'] * 1000:8.2f} ms")
+    print(f"  legacy path slept {LEGACY_FIXED_DELAY} s in fixed delays alone")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,8 +15,8 @@ import threading
 import subprocess
 import datetime
 import ctypes
-# 'requests' must be imported AFTER we cleaned the environment
-import requests 
+# updater_utils imports 'requests', so it must come AFTER we cleaned the environment
+import updater_utils
 
 # --- SSL CERTIFICATE SETUP ---
 def configure_ssl():
@@ -56,11 +56,12 @@ def log(message):
 log("--- UPDATER STARTED (TKINTER) ---")
 
 class UpdaterApp:
-    def __init__(self, root, url, version, target_exe):
+    def __init__(self, root, url, version, target_exe, pid=None):
         self.root = root
         self.url = url
         self.version = version
         self.target_exe = target_exe
+        self.pid = pid
         self.exe_name = os.path.basename(target_exe)
         
         self.root.title("System Update")
@@ -99,84 +100,60 @@ class UpdaterApp:
 
         threading.Thread(target=self.run_update, daemon=True).start()
 
+    # Tk widgets must only be touched from the mainloop thread, so the worker posts changes via after()
     def update_status(self, text, color="lightgray"):
-        self.lbl_status.config(text=text, fg=color)
+        self.root.after(0, lambda: self.lbl_status.config(text=text, fg=color))
+
+    def set_progress(self, fraction):
+        self.root.after(0, lambda: self.progress.configure(value=fraction * 100))
 
     def run_update(self):
         temp_file = "update_temp.exe"
 
-        # 1. KILL OLD APP
-        self.update_status("Closing application...")
-        log(f"Killing {self.exe_name}...")
-        subprocess.run(f'taskkill /F /IM "{self.exe_name}"', shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        time.sleep(2)
+        # 1. DOWNLOAD (skipped when the app already downloaded and verified the update)
+        if os.path.isfile(self.url):
+            temp_file = self.url
+            log(f"Using downloaded update {temp_file}")
+        else:
+            try:
+                self.update_status("Downloading...")
+                log(f"Downloading from {self.url}")
 
-        # 2. DOWNLOAD
-        try:
-            self.update_status("Downloading...")
-            log(f"Downloading from {self.url}")
-            
-            headers = {'User-Agent': 'FinanceManagerPro'}
-            response = requests.get(self.url, headers=headers, stream=True, timeout=30)
-            
-            if response.status_code != 200:
-                raise Exception(f"HTTP Error {response.status_code}")
-
-            total_size = int(response.headers.get('content-length', 0))
-            downloaded = 0
-            
-            with open(temp_file, "wb") as f:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        downloaded += len(chunk)
-                        if total_size > 0:
-                            percent = (downloaded / total_size) * 100
-                            self.progress['value'] = percent
-            
-            log("Download complete.")
-        except Exception as e:
-            log(f"Download Error: {e}")
-            self.update_status("Download Failed", "red")
-            time.sleep(3)
-            os._exit(1)
+                # Patches the installed EXE when the release has a matching delta, otherwise
+                # downloads the full EXE (resuming dropped connections, checksum verified)
+                digest = updater_utils.fetch_update_binary(self.url, temp_file, self.target_exe, self.version,
+                                                           progress_callback=self.set_progress)
 
-        # 3. SWAP
-        self.update_status("Installing...")
-        log("Swapping files...")
-        
-        swap_success = False
-        for i in range(10):
-            try:
-                if os.path.exists(self.target_exe):
-                    os.remove(self.target_exe)
-                if os.path.exists(temp_file):
-                    os.rename(temp_file, self.target_exe)
-                swap_success = True
-                break
+                log(f"Download complete. SHA-256 {digest}")
             except Exception as e:
-                log(f"Retry {i}: {e}")
-                self.update_status(f"Retrying install ({i+1}/10)...")
-                time.sleep(1)
-                subprocess.run(f'taskkill /F /IM "{self.exe_name}"', shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                log(f"Download Error: {e}")
+                self.update_status("Download Failed", "red")
+                time.sleep(3)
+                os._exit(1)
+
+        # 2. WAIT FOR THE APP TO EXIT, SWAP, RESTART
+        if not self.pid:
+            # Started by an older build that doesn't pass its PID: close it by name.
+            # swap_binary keeps retrying until Windows releases the file.
+            log(f"Killing {self.exe_name}...")
+            subprocess.run(f'taskkill /F /IM "{self.exe_name}"', shell=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
-        if not swap_success:
+        try:
+            log(f"Swapping files (waiting on PID {self.pid})...")
+            timings = updater_utils.install_and_relaunch(temp_file, self.target_exe, self.pid, status=self.update_status)
+            log("Timings: " + ", ".join(f"{k}={v:.3f}s" if isinstance(v, float) else f"{k}={v}" for k, v in timings.items()))
+            if timings["rolled_back"]:
+                self.update_status("Update failed. Previous version restored.", "red")
+                time.sleep(3)
+                os._exit(1)
+            self.update_status("Done!", "#66BB6A")
+            self.set_progress(1.0)
+        except Exception as e:
+            log(f"Critical Swap Failure: {e}")
             self.update_status("File Locked. Please Restart PC.", "red")
-            log("Critical Swap Failure.")
             time.sleep(5)
             os._exit(1)
 
-        # 4. RESTART
-        self.update_status("Done! Restarting...", "#66BB6A")
-        self.progress['value'] = 100
-        log("Restarting Main App...")
-        time.sleep(2)
-        
-        try:
-            subprocess.Popen([self.target_exe], close_fds=True, creationflags=0x00000008)
-        except Exception as e:
-            log(f"Launch Error: {e}")
-
         log("Exiting.")
         os._exit(0)
 
@@ -190,9 +167,13 @@ if __name__ == "__main__":
             url_arg = ""
             ver_arg = "Unknown"
             tgt_arg = "FinanceManagerPro.exe"
+        try:
+            pid_arg = int(sys.argv[4])
+        except:
+            pid_arg = None
 
         root = tk.Tk()
-        app = UpdaterApp(root, url_arg, ver_arg, tgt_arg)
+        app = UpdaterApp(root, url_arg, ver_arg, tgt_arg, pid_arg)
         root.mainloop()
     except Exception as e:
         log(f"CRASH: {e}")
\ No newline at end of file
@@ -5,13 +5,36 @@ import subprocess
 import packaging.version
 import logging
 import time
-import datetime
+import json
+import threading
+import hashlib
+import ctypes
+import select
+import shutil
+import signal
+import lzma
+import struct
+from requests.adapters import HTTPAdapter
 
 # --- CONFIGURATION ---
 GITHUB_USER = "santanugh"
 GITHUB_REPO = "FinanceManagerPro"
 CURRENT_VERSION = "1.0.2" 
 
+# The releases endpoint can be pointed at a local stand-in server for testing
+UPDATE_API_URL = os.environ.get(
+    "FMP_UPDATE_API_URL",
+    f"https://api.github.com/repos/{GITHUB_USER}/{GITHUB_REPO}/releases/latest"
+)
+
+# Minimum time between two network checks. Launches inside this window reuse the cached release.
+UPDATE_CHECK_INTERVAL = int(os.environ.get("FMP_UPDATE_CHECK_INTERVAL", 6 * 60 * 60))
+
+# Release metadata cache lives next to the EXE, like finance.db
+UPDATE_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(sys.argv[0])), "update_cache.json")
+
+USER_AGENT = 'FinanceManagerPro'
+
 # --- SSL CERTIFICATE FIX FOR FROZEN APPS ---
 def configure_ssl():
     """Forces requests to use the bundled certifi certificate inside the EXE."""
@@ -26,115 +49,719 @@ def configure_ssl():
 # Run this immediately
 configure_ssl()
 
-def check_for_updates():
-    api_url = f"https://api.github.com/repos/{GITHUB_USER}/{GITHUB_REPO}/releases/latest"
+# --- SHARED HTTP SESSION ---
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """Returns one pooled requests.Session shared by the update check and the downloads."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({'User-Agent': USER_AGENT})
+            _session = session
+        return _session
+
+# --- RELEASE METADATA CACHE ---
+def load_release_cache(cache_file=None):
+    cache_file = cache_file or UPDATE_CACHE_FILE
     try:
-        headers = {'User-Agent': 'FinanceManagerPro'}
-        # SECURE CHECK
-        response = requests.get(api_url, headers=headers, timeout=10)
-        
-        if response.status_code != 200: return None, None
-        
-        data = response.json()
-        latest_tag = data.get("tag_name", "v0.0.0")
-        assets = data.get("assets", [])
-        
-        if not assets: return None, None
-        
-        download_url = ""
-        expected_size = 0
-        for asset in assets:
-            if asset["name"].lower().endswith(".exe"):
-                download_url = asset["browser_download_url"]
-                expected_size = asset["size"]
-                break
-        
-        if not download_url: return None, None
-
-        v_current = packaging.version.parse(CURRENT_VERSION)
-        v_latest = packaging.version.parse(latest_tag.lstrip("v"))
-        
-        if v_latest > v_current:
-            return download_url, latest_tag, expected_size
-    except:
+        with open(cache_file, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if isinstance(cache, dict) and cache.get("url") == UPDATE_API_URL:
+            return cache
+    except (OSError, ValueError):
         pass
+    return {}
+
+def save_release_cache(cache, cache_file=None):
+    cache_file = cache_file or UPDATE_CACHE_FILE
+    tmp_file = cache_file + ".tmp"
+    try:
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logging.warning(f"Update cache write failed: {e}")
+
+def fetch_latest_release(force=False, min_interval=None, cache_file=None):
+    """
+    Returns the releases/latest JSON, hitting the network at most once per check interval.
+    Uses the cached ETag so an unchanged release costs a 304 with no body.
+    """
+    min_interval = UPDATE_CHECK_INTERVAL if min_interval is None else min_interval
+    cache = load_release_cache(cache_file)
+    now = time.time()
+
+    if not force and cache.get("release") and now - cache.get("checked_at", 0) < min_interval:
+        return cache["release"]
+
+    headers = {}
+    if cache.get("etag") and cache.get("release"):
+        headers['If-None-Match'] = cache["etag"]
+
+    # SECURE CHECK
+    response = get_session().get(UPDATE_API_URL, headers=headers, timeout=10)
+
+    if response.status_code == 304:
+        cache["checked_at"] = now
+        save_release_cache(cache, cache_file)
+        return cache["release"]
+
+    if response.status_code != 200:
+        return None
+
+    release = response.json()
+    save_release_cache({
+        "url": UPDATE_API_URL,
+        "etag": response.headers.get("ETag"),
+        "checked_at": now,
+        "release": release,
+    }, cache_file)
+    return release
+
+def parse_release(data):
+    latest_tag = data.get("tag_name", "v0.0.0")
+    assets = data.get("assets", [])
+
+    if not assets: return None, None
+
+    download_url = ""
+    expected_size = 0
+    for asset in assets:
+        if asset["name"].lower().endswith(".exe"):
+            download_url = asset["browser_download_url"]
+            expected_size = asset["size"]
+            break
+
+    if not download_url: return None, None
+
+    v_current = packaging.version.parse(CURRENT_VERSION)
+    v_latest = packaging.version.parse(latest_tag.lstrip("v"))
+
+    if v_latest > v_current:
+        return download_url, latest_tag, expected_size
     return None, None
 
-def download_update(download_url, expected_size, progress_callback=None):
-    new_exe_name = "update_temp.exe"
-    if os.path.exists(new_exe_name):
-        try: os.remove(new_exe_name)
-        except: pass
+def check_for_updates(force=False):
+    try:
+        data = fetch_latest_release(force=force)
+        if data:
+            return parse_release(data)
+    except Exception as e:
+        logging.warning(f"Update check failed: {e}")
+    return None, None
 
+# --- DOWNLOADS ---
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+PROGRESS_INTERVAL = 0.1        # seconds between progress callbacks
+DOWNLOAD_RETRIES = 8
+
+class DownloadError(Exception):
+    pass
+
+class ProgressThrottle:
+    """Forwards progress (0.0-1.0) at most every `interval` seconds, plus the final 100%."""
+    def __init__(self, callback, interval=PROGRESS_INTERVAL):
+        self.callback = callback
+        self.interval = interval
+        self.last_call = 0.0
+        self.lock = threading.Lock()
+
+    def __call__(self, done, total):
+        if not self.callback or total <= 0:
+            return
+        now = time.monotonic()
+        with self.lock:
+            if done < total and now - self.last_call < self.interval:
+                return
+            self.last_call = now
+        self.callback(min(done / total, 1.0))
+
+def next_chunk_size(chunk_size, elapsed):
+    """Grows the read buffer while reads come back fast and shrinks it when the link is slow."""
+    if elapsed < 0.05:
+        return min(chunk_size * 2, MAX_CHUNK_SIZE)
+    if elapsed > 0.5:
+        return max(chunk_size // 2, MIN_CHUNK_SIZE)
+    return chunk_size
+
+def sha256_of_file(path, hasher=None, limit=None):
+    hasher = hasher or hashlib.sha256()
+    remaining = limit
+    with open(path, "rb") as f:
+        while remaining is None or remaining > 0:
+            block = f.read(MAX_CHUNK_SIZE if remaining is None else min(MAX_CHUNK_SIZE, remaining))
+            if not block: break
+            hasher.update(block)
+            if remaining is not None: remaining -= len(block)
+    return hasher
+
+def parse_checksum_text(text, asset_name=None):
+    """Accepts a bare digest, `sha256sum` output or a SHA256SUMS file listing several assets."""
+    for line in text.splitlines():
+        parts = line.strip().split()
+        if not parts: continue
+        digest = parts[0].lower()
+        if len(digest) != 64 or any(c not in "0123456789abcdef" for c in digest): continue
+        if len(parts) == 1 or asset_name is None or parts[-1].lstrip("*") == asset_name:
+            return digest
+    return None
+
+def get_published_sha256(download_url):
+    """
+    Looks for the checksum asset published next to the executable: `<asset>.sha256`
+    or a SHA256SUMS / checksums.txt listing. Returns None when the release has none.
+    """
+    asset_name = download_url.rsplit("/", 1)[-1]
+    candidates = []
+    release = load_release_cache().get("release") or {}
+    for asset in release.get("assets", []):
+        name = asset.get("name", "")
+        if name.lower() in (f"{asset_name.lower()}.sha256", "sha256sums", "sha256sums.txt", "checksums.txt"):
+            candidates.append(asset["browser_download_url"])
+    if not candidates:
+        candidates.append(download_url + ".sha256")
+
+    for url in candidates:
+        try:
+            response = get_session().get(url, timeout=10)
+            if response.status_code == 200:
+                digest = parse_checksum_text(response.text, asset_name)
+                if digest: return digest
+        except Exception as e:
+            logging.warning(f"Checksum fetch failed ({url}): {e}")
+    return None
+
+def _stream_range(url, f, start, end, progress, hasher=None, timeout=30):
+    """
+    Streams bytes [start, end] (end=None means to EOF) into f at its current position.
+    Returns the number of bytes written; a dropped connection simply returns early.
+    """
+    headers = {}
+    if start > 0 or end is not None:
+        headers['Range'] = f"bytes={start}-" + ("" if end is None else str(end))
+
+    response = get_session().get(url, headers=headers, stream=True, timeout=timeout)
     try:
-        headers = {'User-Agent': 'FinanceManagerPro'}
-        # SECURE DOWNLOAD
-        response = requests.get(download_url, headers=headers, stream=True, timeout=30)
-        
-        downloaded_size = 0
-        
-        with open(new_exe_name, "wb") as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded_size += len(chunk)
-                    
-                    if expected_size > 0 and progress_callback:
-                        percent = downloaded_size / expected_size
-                        progress_callback(percent)
-
-        if os.path.exists(new_exe_name):
-            actual_size = os.path.getsize(new_exe_name)
-            if expected_size > 0 and abs(actual_size - expected_size) > 1024:
-                logging.error(f"Size Mismatch! Expected {expected_size}, got {actual_size}")
-                return False
-            return True
-        return False
+        if response.status_code == 416:
+            return 0
+        if start > 0 and response.status_code == 200:
+            # Server ignored the Range header: restart from the beginning
+            raise DownloadError("range-ignored")
+        if response.status_code not in (200, 206):
+            raise DownloadError(f"HTTP Error {response.status_code}")
+
+        written = 0
+        chunk_size = MIN_CHUNK_SIZE
+        try:
+            while True:
+                t0 = time.monotonic()
+                chunk = response.raw.read(chunk_size, decode_content=True)
+                if not chunk: break
+                f.write(chunk)
+                if hasher: hasher.update(chunk)
+                written += len(chunk)
+                progress(len(chunk))
+                chunk_size = next_chunk_size(chunk_size, time.monotonic() - t0)
+        except DownloadError:
+            raise
+        except Exception as e:
+            logging.warning(f"Connection dropped after {start + written} bytes: {e}")
+        return written
+    finally:
+        response.close()
+
+def _probe(url):
+    """Returns (size, accepts_ranges) from a HEAD request, or (0, False) if unknown."""
+    try:
+        response = get_session().head(url, allow_redirects=True, timeout=10)
+        size = int(response.headers.get('content-length', 0))
+        return size, response.headers.get('accept-ranges', '').lower() == 'bytes'
+    except Exception:
+        return 0, False
+
+def download_file(url, dest, expected_size=0, expected_sha256=None, progress_callback=None,
+                  segments=1, retries=DOWNLOAD_RETRIES):
+    """
+    Downloads url to dest through dest + '.part', resuming with HTTP Range after a
+    dropped connection or from a partial file left by an earlier run. The SHA-256 is
+    computed while streaming and checked against expected_sha256 before dest is
+    replaced. segments > 1 fetches byte ranges in parallel when the server allows it.
+    Raises DownloadError on failure.
+    """
+    part_file = dest + ".part"
+    total, accepts_ranges = _probe(url)
+    total = total or expected_size
+    if expected_size and total and total != expected_size:
+        logging.warning(f"Server reports {total} bytes, release lists {expected_size}")
+
+    throttle = ProgressThrottle(progress_callback)
+    lock = threading.Lock()
+    state = {"done": 0}
+
+    def progress(n):
+        with lock:
+            state["done"] += n
+            done = state["done"]
+        throttle(done, total)
+
+    if segments > 1 and accepts_ranges and total >= segments * MIN_CHUNK_SIZE:
+        hasher = _download_segmented(url, part_file, total, segments, retries, progress)
+    else:
+        hasher = _download_single(url, part_file, total, accepts_ranges, retries, state, progress)
+
+    actual_size = os.path.getsize(part_file)
+    if total and actual_size != total:
+        raise DownloadError(f"Size Mismatch! Expected {total}, got {actual_size}")
+
+    digest = hasher.hexdigest()
+    if expected_sha256 and digest != expected_sha256.lower():
+        os.remove(part_file)
+        raise DownloadError(f"Checksum Mismatch! Expected {expected_sha256}, got {digest}")
+
+    os.replace(part_file, dest)
+    throttle(total or actual_size, total or actual_size)
+    return digest
+
+def _download_single(url, part_file, total, accepts_ranges, retries, state, progress):
+    hasher = hashlib.sha256()
+    offset = 0
+    if os.path.exists(part_file):
+        offset = os.path.getsize(part_file)
+        if accepts_ranges and (not total or offset <= total):
+            sha256_of_file(part_file, hasher)
+            logging.info(f"Resuming download at {offset} bytes")
+        else:
+            offset = 0
+    state["done"] = offset
+
+    attempt = 0
+    with open(part_file, "ab" if offset else "wb") as f:
+        while not total or offset < total:
+            try:
+                written = _stream_range(url, f, offset, None, progress, hasher)
+            except DownloadError as e:
+                if str(e) != "range-ignored": raise
+                accepts_ranges = False
+                written = None
+            except Exception as e:
+                logging.warning(f"Download attempt failed: {e}")
+                written = 0
+            offset += written or 0
+            f.flush()
+
+            if not total and written is not None: break   # size unknown: take what was sent
+            if total and offset >= total: break
+
+            if written and accepts_ranges:
+                attempt = 0
+            else:
+                attempt += 1
+                if attempt > retries:
+                    raise DownloadError(f"Gave up after {retries} retries at {offset} bytes")
+                time.sleep(min(0.5 * attempt, 5))
+
+            if not accepts_ranges:
+                # Can't resume without Range support: start again
+                f.seek(0); f.truncate()
+                hasher = hashlib.sha256()
+                offset = 0; state["done"] = 0
+    return hasher
+
+def _download_segmented(url, part_file, total, segments, retries, progress):
+    seg_size = -(-total // segments)
+    with open(part_file, "wb") as f:
+        f.truncate(total)
+
+    errors = []
+
+    def fetch(start, end):
+        pos = start
+        attempt = 0
+        with open(part_file, "r+b") as f:
+            while pos <= end:
+                f.seek(pos)
+                try:
+                    written = _stream_range(url, f, pos, end, progress)
+                except Exception as e:
+                    logging.warning(f"Segment {start}-{end} failed: {e}")
+                    written = 0
+                pos += written
+                if written == 0:
+                    attempt += 1
+                    if attempt > retries:
+                        errors.append(f"segment {start}-{end} stalled at {pos}")
+                        return
+                    time.sleep(min(0.5 * attempt, 5))
+                else:
+                    attempt = 0
+
+    workers = []
+    for start in range(0, total, seg_size):
+        t = threading.Thread(target=fetch, args=(start, min(start + seg_size, total) - 1), daemon=True)
+        t.start()
+        workers.append(t)
+    for t in workers:
+        t.join()
+
+    if errors:
+        os.remove(part_file)
+        raise DownloadError("; ".join(errors))
+    # Segments land out of order, so hash the assembled file in one sequential pass
+    return sha256_of_file(part_file)
+
+def download_update(download_url, expected_size, progress_callback=None, to_version=None):
+    new_exe_name = "update_temp.exe"
+    try:
+        if to_version:
+            digest = fetch_update_binary(download_url, new_exe_name, os.path.abspath(sys.executable),
+                                         to_version, expected_size, progress_callback)
+        else:
+            expected_sha256 = get_published_sha256(download_url)
+            if not expected_sha256:
+                logging.warning("No published checksum for this release; verifying size only.")
+            digest = download_file(download_url, new_exe_name, expected_size, expected_sha256, progress_callback)
+        logging.info(f"Download verified (sha256 {digest})")
+        return True
     except Exception as e:
         logging.error(f"Download Error: {e}")
         return False
 
-def install_update():
-    new_exe_name = "update_temp.exe"
-    current_exe = os.path.abspath(sys.executable)
-    exe_name = os.path.basename(current_exe)
-    
-    log_dir = "update_logs"
-    if not os.path.exists(log_dir): os.makedirs(log_dir)
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    log_file = os.path.abspath(os.path.join(log_dir, f"install_{timestamp}.txt"))
-
-    bat_script = f"""
-@echo off
-echo [INFO] Script Started > "{log_file}"
-echo [INFO] Waiting for {exe_name} to close... >> "{log_file}"
-timeout /t 3 >> "{log_file}"
-
-echo [INFO] Killing process... >> "{log_file}"
-taskkill /F /IM "{exe_name}" >> "{log_file}" 2>&1
-taskkill /F /IM "flet.exe" >> "{log_file}" 2>&1
-
-echo [INFO] Deleting old file... >> "{log_file}"
-:DEL_LOOP
-del "{exe_name}" >> "{log_file}" 2>&1
-if exist "{exe_name}" (
-    echo [RETRY] File locked, waiting... >> "{log_file}"
-    timeout /t 1 >> "{log_file}"
-    goto DEL_LOOP
-)
+# --- DELTA UPDATES ---
+# A delta asset rebuilds the new EXE from the installed one. It is published next to the
+# full EXE as "<name>-<from>-to-<to>.delta" (see tools/make_delta.py). Layout:
+#   DELTA_MAGIC, one JSON header line, then an LZMA stream of ops:
+#   b'C' <offset u64> <length u64> <npatch u32> + npatch * (<rel u32> <byte u8>)
+#        copy old[offset:offset+length], then overwrite the few bytes that changed
+#   b'I' <length u64> + data    insert literal bytes
+#   b'E'                        end of stream
+DELTA_MAGIC = b"FMPDELTA1\n"
+DELTA_SUFFIX = ".delta"
+_COPY = struct.Struct("<QQI")
+_PATCH = struct.Struct("<IB")
+_INSERT = struct.Struct("<Q")
+
+class DeltaError(Exception):
+    pass
+
+def delta_asset_name(base_name, from_version, to_version):
+    return f"{base_name}-{from_version.lstrip('v')}-to-{to_version.lstrip('v')}{DELTA_SUFFIX}"
+
+def find_delta_asset(release, from_version, to_version):
+    """Returns the release asset patching from_version to to_version, or None."""
+    suffix = f"-{from_version.lstrip('v')}-to-{to_version.lstrip('v')}{DELTA_SUFFIX}".lower()
+    for asset in (release or {}).get("assets", []):
+        if asset.get("name", "").lower().endswith(suffix):
+            return asset
+    return None
+
+def read_delta_header(f):
+    if f.read(len(DELTA_MAGIC)) != DELTA_MAGIC:
+        raise DeltaError("Not a delta file")
+    return json.loads(f.readline().decode("utf-8"))
+
+def _read_exact(stream, n):
+    data = stream.read(n)
+    if len(data) != n:
+        raise DeltaError("Truncated delta")
+    return data
+
+def apply_delta(old_path, delta_path, new_path):
+    """
+    Rebuilds the new binary from old_path in one streaming pass over the patch.
+    The installed file is checked against the header before anything is written,
+    and the result is hashed as it is written. Returns the new SHA-256; raises
+DeltaError for a source mismatch, a truncated or corrupt patch, or a failed check.
+    """
+    with open(delta_path, "rb") as df:
+        header = read_delta_header(df)
+        old_digest = sha256_of_file(old_path).hexdigest()
+        if old_digest != header["old_sha256"]:
+            raise DeltaError("Installed binary does not match the delta's source build")
+
+        hasher = hashlib.sha256()
+        tmp_path = new_path + ".tmp"
+        try:
+            with open(old_path, "rb") as old, open(tmp_path, "wb") as out, lzma.open(df, "rb") as ops:
+                while True:
+                    op = _read_exact(ops, 1)
+                    if op == b"E":
+                        break
+                    if op == b"C":
+                        offset, length, npatch = _COPY.unpack(_read_exact(ops, _COPY.size))
+                        patches = _read_exact(ops, npatch * _PATCH.size)
+                        old.seek(offset)
+                        done = 0
+                        pending = iter(_PATCH.iter_unpack(patches))
+                        patch = next(pending, None)
+                        while done < length:
+                            block = bytearray(old.read(min(MAX_CHUNK_SIZE, length - done)))
+                            if not block:
+                                raise DeltaError("Copy beyond end of installed binary")
+                            end = done + len(block)
+                            while patch is not None and patch[0] < end:
+                                block[patch[0] - done] = patch[1]
+                                patch = next(pending, None)
+                            out.write(block)
+                            hasher.update(block)
+                            done = end
+                    elif op == b"I":
+                        (length,) = _INSERT.unpack(_read_exact(ops, _INSERT.size))
+                        while length > 0:
+                            block = _read_exact(ops, min(MAX_CHUNK_SIZE, length))
+                            out.write(block)
+                            hasher.update(block)
+                            length -= len(block)
+                    else:
+                        raise DeltaError(f"Unknown delta op {op!r}")
+        except (EOFError, lzma.LZMAError, struct.error) as e:
+            # A truncated or damaged LZMA stream
+            os.remove(tmp_path)
+            raise DeltaError(f"Corrupt delta: {e}") from e
+        except DeltaError:
+            os.remove(tmp_path)
+            raise
+
+    digest = hasher.hexdigest()
+    if digest != header["new_sha256"] or os.path.getsize(tmp_path) != header["new_size"]:
+        os.remove(tmp_path)
+        raise DeltaError("Patched binary failed verification")
+    os.replace(tmp_path, new_path)
+    return digest
+
+def fetch_update_binary(download_url, dest, installed_exe, to_version, expected_size=0, progress_callback=None):
+    """
+    Produces the new EXE at dest. Uses a delta patch against installed_exe when the
+    release publishes one for CURRENT_VERSION -> to_version, and falls back to the
+    full (resumable, checksum-verified) download otherwise. Returns the SHA-256.
+    """
+    release = load_release_cache().get("release")
+    expected_sha256 = get_published_sha256(download_url)
+    delta = find_delta_asset(release, CURRENT_VERSION, to_version)
+
+    if delta and os.path.exists(installed_exe):
+        delta_file = dest + DELTA_SUFFIX
+        try:
+            logging.info(f"Applying delta {delta['name']} ({delta.get('size', 0)} bytes)")
+            download_file(delta["browser_download_url"], delta_file, delta.get("size", 0),
+                          progress_callback=progress_callback)
+            digest = apply_delta(installed_exe, delta_file, dest)
+            if expected_sha256 and digest != expected_sha256:
+                raise DeltaError("Patched binary does not match the published checksum")
+            return digest
+        except Exception as e:
+            logging.warning(f"Delta update failed, falling back to full download: {e}")
+        finally:
+            if os.path.exists(delta_file):
+                os.remove(delta_file)
+
+    if not expected_sha256:
+        logging.warning("No published checksum for this release; verifying size only.")
+    return download_file(download_url, dest, expected_size, expected_sha256, progress_callback)
+
+# --- INSTALL / SWAP ---
+BACKUP_SUFFIX = ".old"
+SWAP_TIMEOUT = 30            # seconds to wait for the app to exit before terminating it
+HEALTH_CHECK_SECONDS = 5     # a relaunched build that crashes within this window is rolled back
+
+if os.name == "nt":
+    DETACHED_PROCESS = 0x00000008
+    CREATE_NEW_PROCESS_GROUP = 0x00000200
+    SYNCHRONIZE = 0x00100000
+    PROCESS_TERMINATE = 0x0001
+    WAIT_OBJECT_0 = 0
+
+class SwapError(Exception):
+    pass
 
-echo [INFO] Swapping files... >> "{log_file}"
-move "{new_exe_name}" "{exe_name}" >> "{log_file}" 2>&1
-
-echo [INFO] Restarting App... >> "{log_file}"
-start "" "{exe_name}"
-echo [INFO] Done. >> "{log_file}"
-del "%~f0"
-"""
-    with open("updater.bat", "w") as f:
-        f.write(bat_script)
-    
+def pid_alive(pid):
+    if os.name == "nt":
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if not handle: return False
+        try:
+            return kernel32.WaitForSingleObject(handle, 0) != WAIT_OBJECT_0
+        finally:
+            kernel32.CloseHandle(handle)
     try:
-        os.startfile("updater.bat")
-    except:
-        pass
\ No newline at end of file
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    # An exited but unreaped child still answers kill(0); treat zombies as gone
+    try:
+        with open(f"/proc/{pid}/stat", "r") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except (OSError, IndexError):
+        return True
+
+def wait_for_pid_exit(pid, timeout=SWAP_TIMEOUT):
+    """Blocks until process `pid` has exited. Returns False if it is still running after timeout."""
+    if os.name == "nt":
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(SYNCHRONIZE, False, pid)
+        if not handle: return True
+        try:
+            return kernel32.WaitForSingleObject(handle, int(timeout * 1000)) == WAIT_OBJECT_0
+        finally:
+            kernel32.CloseHandle(handle)
+
+    if hasattr(os, "pidfd_open"):
+        try:
+            fd = os.pidfd_open(pid)
+        except ProcessLookupError:
+            return True
+        except OSError:
+            fd = None
+        if fd is not None:
+            try:
+                # The pidfd becomes readable the moment the process exits
+                ready, _, _ = select.select([fd], [], [], timeout)
+                return bool(ready)
+            finally:
+                os.close(fd)
+
+    deadline = time.monotonic() + timeout
+    delay = 0.001
+    while pid_alive(pid):
+        if time.monotonic() >= deadline: return False
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+    return True
+
+def terminate_pid(pid):
+    try:
+        if os.name == "nt":
+            kernel32 = ctypes.windll.kernel32
+            handle = kernel32.OpenProcess(PROCESS_TERMINATE, False, pid)
+            if handle:
+                kernel32.TerminateProcess(handle, 1)
+                kernel32.CloseHandle(handle)
+        else:
+            os.kill(pid, signal.SIGTERM)
+    except Exception as e:
+        logging.warning(f"Terminate {pid} failed: {e}")
+
+def _retry_until(action, deadline):
+    """Retries a file operation that fails while Windows (or an AV scanner) still holds the file."""
+    delay = 0.01
+    while True:
+        try:
+            return action()
+        except OSError:
+            if time.monotonic() >= deadline: raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+def swap_binary(new_path, target_path, timeout=SWAP_TIMEOUT):
+    """
+    Moves new_path over target_path with atomic renames, keeping the previous build at
+    target_path + '.old'. If the second rename fails the old build is put back.
+    Returns the backup path.
+    """
+    backup_path = target_path + BACKUP_SUFFIX
+    deadline = time.monotonic() + timeout
+    if os.path.exists(target_path):
+        _retry_until(lambda: os.replace(target_path, backup_path), deadline)
+    try:
+        _retry_until(lambda: os.replace(new_path, target_path), deadline)
+    except OSError:
+        if os.path.exists(backup_path):
+            os.replace(backup_path, target_path)
+        raise
+    return backup_path
+
+def rollback_binary(target_path, timeout=SWAP_TIMEOUT):
+    backup_path = target_path + BACKUP_SUFFIX
+    _retry_until(lambda: os.replace(backup_path, target_path), time.monotonic() + timeout)
+
+def launch_detached(cmd, cwd=None):
+    if os.name == "nt":
+        return subprocess.Popen(cmd, cwd=cwd, close_fds=True, creationflags=DETACHED_PROCESS | CREATE_NEW_PROCESS_GROUP)
+    return subprocess.Popen(cmd, cwd=cwd, close_fds=True, start_new_session=True)
+
+def install_and_relaunch(new_path, target_path, pid=None, launch_cmd=None, timeout=SWAP_TIMEOUT,
+                         health_check=HEALTH_CHECK_SECONDS, status=None):
+    """
+    Waits for the running app (pid) to exit, swaps in new_path, and relaunches right away.
+    If the new build can't be started, or exits with an error inside the health_check
+    window, the previous build is restored and started instead. Returns the timings (seconds) of each phase;
+    "downtime" runs from the old process exiting to the new one being started.
+    """
+    status = status or (lambda text: None)
+    launch_cmd = launch_cmd or [target_path]
+    cwd = os.path.dirname(os.path.abspath(target_path))
+
+    t_start = time.perf_counter()
+    if pid:
+        status("Waiting for application to close...")
+        if not wait_for_pid_exit(pid, timeout):
+            logging.warning(f"PID {pid} still running after {timeout}s, terminating it")
+            terminate_pid(pid)
+            if not wait_for_pid_exit(pid, 5):
+                raise SwapError(f"Application (PID {pid}) did not exit")
+    t_exited = time.perf_counter()
+
+    status("Installing...")
+    backup_path = swap_binary(new_path, target_path, timeout)
+    t_swapped = time.perf_counter()
+
+    status("Done! Restarting...")
+    failure = None
+    try:
+        proc = launch_detached(launch_cmd, cwd)
+    except OSError as e:
+        proc, failure = None, f"failed to start ({e})"
+    t_launched = time.perf_counter()
+
+    timings = {
+        "wait_exit": t_exited - t_start,
+        "swap": t_swapped - t_exited,
+        "launch": t_launched - t_swapped,
+        "downtime": t_launched - t_exited,
+        "rolled_back": False,
+    }
+
+    if proc is not None and health_check:
+        try:
+            code = proc.wait(timeout=health_check)
+        except subprocess.TimeoutExpired:
+            code = None
+        if code not in (None, 0):
+            failure = f"exited with code {code}"
+    if failure:
+        logging.error(f"New build {failure}, rolling back")
+        status("Update failed, restoring previous version...")
+        rollback_binary(target_path, timeout)
+        launch_detached(launch_cmd, cwd)
+        timings["rolled_back"] = True
+        return timings
+
+    try:
+        os.remove(backup_path)
+    except OSError:
+        pass   # still mapped by a scanner etc; replaced on the next update anyway
+    return timings
+
+def launch_updater(updater_src, source, version_tag, target_exe, pid):
+    """
+    Copies the bundled updater next to the app and starts it detached. `source` is the
+    release URL or an already downloaded file; the updater waits for `pid` to exit.
+    """
+    updater_dest = os.path.join(os.path.dirname(target_exe), "updater_tool.exe")
+    shutil.copy(updater_src, updater_dest)
+    return launch_detached([updater_dest, source, version_tag, target_exe, str(pid)],
+                           cwd=os.path.dirname(target_exe))
+
+def install_update(updater_src, version_tag=""):
+    """Hands the verified update_temp.exe over to the updater, which swaps it in once this process exits."""
+    new_exe_name = os.path.abspath("update_temp.exe")
+    current_exe = os.path.abspath(sys.executable)
+    return launch_updater(updater_src, new_exe_name, version_tag, current_exe, os.getpid())
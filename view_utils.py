@@ -0,0 +1,373 @@
+"""
+Saved History views: a named filter ("Borrow, last 6 months", "groceries this year")
+whose result is kept in the ledger and brought up to date instead of re-run.
+
+A view stores its spec (the History filter's mode, type and comment) and its matching
+rows in saved_view_rows, with per-comment and overall totals kept by triggers (see
+db_utils.create_saved_views). Refreshing looks only at what moved since the view was
+last current:
+    rows       the change journal's entries since the view's sequence; only those
+               row ids are tested against the filter's predicate
+    window     rolling windows (last 3/6 months, this month/year) slide with the day:
+               rows that fell out of the window are dropped, the days it gained are
+               read off the datetime index
+    rates      an FX import re-totals the stored rows
+A view is rebuilt from the ledger when it is new, when the journal no longer has every
+change since its sequence (pruned, or replayed from another ledger), or when more than
+REBUILD_AFTER rows changed. Opening a view reads its stored rows, so it costs the size of
+its result, not of the ledger.
+
+    python view_utils.py save finance.db "Borrowed" --mode 6_months --type Borrow
+    python view_utils.py save finance.db "Groceries" --mode this_year --type "Base Expense" --comment groceries
+    python view_utils.py list finance.db
+    python view_utils.py show finance.db Groceries
+"""
+import sqlite3
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import calendar
+import datetime
+
+import db_utils
+
+# Shares the root logger configured by Finance.py
+logger = logging.getLogger()
+
+# The History filter's modes, plus calendar windows that follow today
+VIEW_MODES = ("all", "month", "year", "range", "3_months", "6_months", "this_month", "this_year")
+ROLLING_DAYS = {"3_months": 90, "6_months": 180}
+# Past this many changed rows a rebuild is cheaper than testing them one id at a time
+REBUILD_AFTER = 50_000
+
+def make_spec(mode, trans_type="All", comment_like="All", month=None, year=None, start=None, end=None):
+    """A view's filter as stored; raises ValueError for an incomplete one."""
+    if mode not in VIEW_MODES:
+        raise ValueError(f"Mode must be one of {', '.join(VIEW_MODES)}")
+    if trans_type not in ("All",) + db_utils.TRANSACTION_TYPES:
+        raise ValueError(f"Unknown type: {trans_type}")
+    spec = {"mode": mode, "type": trans_type or "All", "comment": comment_like or "All"}
+    if mode == "month":
+        if not month:
+            raise ValueError("A month view needs a month (YYYY-MM)")
+        datetime.date.fromisoformat(f"{month}-01")
+        spec["month"] = month
+    elif mode == "year":
+        if not year:
+            raise ValueError("A year view needs a year")
+        spec["year"] = str(int(year))
+    elif mode == "range":
+        if not start or not end:
+            raise ValueError("A date range view needs a start and an end")
+        if datetime.date.fromisoformat(end) < datetime.date.fromisoformat(start):
+            raise ValueError("The end date is before the start")
+        spec["start"], spec["end"] = start, end
+    return spec
+
+def view_window(spec, today=None):
+    """(start_date, end_date) of the spec on `today`, as run_filter passes them to filter_where."""
+    today = today or datetime.date.today()
+    mode = spec["mode"]
+    if mode in ("month", "this_month"):
+        first = datetime.date.fromisoformat(f"{spec['month']}-01") if mode == "month" else today.replace(day=1)
+        return first.isoformat(), first.replace(day=calendar.monthrange(first.year, first.month)[1]).isoformat()
+    if mode in ("year", "this_year"):
+        year = spec["year"] if mode == "year" else today.year
+        return f"{year}-01-01", f"{year}-12-31"
+    if mode in ROLLING_DAYS:
+        return (today - datetime.timedelta(days=ROLLING_DAYS[mode])).isoformat(), today.isoformat()
+    if mode == "range":
+        return spec["start"], spec["end"]
+    return None, None
+
+def _bounds(start_date, end_date):
+    """The window as stored: [start, day after end) on the datetime text, None for open."""
+    end = (datetime.date.fromisoformat(end_date) + datetime.timedelta(days=1)).isoformat() if end_date else None
+    return start_date or None, end
+
+def describe_spec(spec):
+    mode = spec["mode"]
+    window = {"all": "all time", "3_months": "last 3 months", "6_months": "last 6 months",
+              "this_month": "this month", "this_year": "this year"}.get(mode)
+    if window is None:
+        window = spec.get("month") or spec.get("year") or f"{spec.get('start')} to {spec.get('end')}"
+    parts = [] if spec["type"] == "All" else [spec["type"]]
+    if spec["comment"] != "All":
+        parts.append(f"comment={spec['comment']}")
+    return ", ".join(parts + [window])
+
+# --- REFRESH ---
+def _where(spec, lo, hi):
+    """The filter's predicate with the window as [lo, hi) bounds on the stored text."""
+    where, params = db_utils.filter_where(None, None, spec["type"], spec["comment"])
+    if lo:
+        where += " AND transaction_datetime >= ?"
+        params.append(lo)
+    if hi:
+        where += " AND transaction_datetime < ?"
+        params.append(hi)
+    return where, params
+
+def _insert_rows(conn, view_id, where, params):
+    conn.execute(f'''
+        INSERT INTO saved_view_rows (view_id, transaction_datetime, row_id, type, comment, amount, currency)
+        SELECT ?, transaction_datetime, id, type, comment, amount, currency FROM transactions WHERE {where}
+    ''', [view_id] + params)
+
+def _versions(conn):
+    """(change journal sequence, fx version) of the ledger."""
+    seq, fx = conn.execute('''
+        SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'change_log'),
+               (SELECT value FROM journal_meta WHERE key = 'fx_version')
+    ''').fetchone()
+    return seq or 0, int(fx or 0)
+
+def _retotal(conn, view_id):
+    """Totals summed afresh from the stored rows: after a rebuild, and at new FX rates."""
+    # v, not r: the rate lookups already call fx_rates r
+    amount = f"COALESCE({db_utils.converted_amount_sql(table='v')}, 0)"
+    conn.execute("DELETE FROM saved_view_totals WHERE view_id = ?", (view_id,))
+    conn.execute(f'''
+        INSERT INTO saved_view_totals (view_id, comment, type, count, total)
+        SELECT v.view_id, {db_utils.view_comment_sql('v')}, v.type, COUNT(*), SUM({amount})
+        FROM saved_view_rows v WHERE v.view_id = ? GROUP BY 2, 3
+    ''', (view_id,))
+    conn.execute(f'''
+        UPDATE saved_views SET (row_count, deposits, expenditure) = (
+            SELECT COUNT(*), COALESCE(SUM(MAX(a, 0)), 0), COALESCE(SUM(MIN(a, 0)), 0)
+            FROM (SELECT {amount} AS a FROM saved_view_rows v WHERE v.view_id = ?)
+        ) WHERE id = ?
+    ''', (view_id, view_id))
+
+def _rebuild(conn, view_id, spec, lo, hi):
+    # seq NULL switches the row triggers off; the totals are summed once at the end
+    conn.execute("UPDATE saved_views SET seq = NULL WHERE id = ?", (view_id,))
+    conn.execute("DELETE FROM saved_view_rows WHERE view_id = ?", (view_id,))
+    _insert_rows(conn, view_id, *_where(spec, lo, hi))
+    _retotal(conn, view_id)
+
+def _overlaps(lo0, hi0, lo1, hi1):
+    return (hi0 is None or lo1 is None or lo1 < hi0) and (hi1 is None or lo0 is None or lo0 < hi1)
+
+def _slide(conn, view_id, spec, lo0, hi0, lo1, hi1):
+    """Moves an overlapping window: drops rows outside [lo1, hi1), adds the days it gained."""
+    outside, params = [], [view_id]
+    if lo1:
+        outside.append("transaction_datetime < ?")
+        params.append(lo1)
+    if hi1:
+        outside.append("transaction_datetime >= ?")
+        params.append(hi1)
+    if outside:
+        conn.execute(f"DELETE FROM saved_view_rows WHERE view_id = ? AND ({' OR '.join(outside)})", params)
+    if lo0 is not None and (lo1 is None or lo1 < lo0):
+        _insert_rows(conn, view_id, *_where(spec, lo1, lo0))
+    if hi0 is not None and (hi1 is None or hi1 > hi0):
+        _insert_rows(conn, view_id, *_where(spec, hi0, hi1))
+
+def _apply_changes(conn, view_id, spec, lo, hi, seq):
+    """Re-tests the rows the journal changed since seq: out of the view, then back in if they match."""
+    ids = json.dumps([row[0] for row in conn.execute("SELECT DISTINCT row_id FROM change_log WHERE seq > ?", (seq,))])
+    conn.execute("DELETE FROM saved_view_rows WHERE view_id = ? AND row_id IN (SELECT value FROM json_each(?))",
+                 (view_id, ids))
+    where, params = _where(spec, lo, hi)
+    _insert_rows(conn, view_id, f"id IN (SELECT value FROM json_each(?)) AND {where}", [ids] + params)
+
+def _refresh_job(view_id, today, force):
+    def job(conn):
+        row = conn.execute("SELECT spec, window_start, window_end, seq, fx_version FROM saved_views WHERE id = ?",
+                           (view_id,)).fetchone()
+        if row is None:
+            raise ValueError(f"No saved view {view_id}")
+        spec, lo0, hi0, seq, fx0 = json.loads(row[0]), row[1], row[2], row[3], row[4]
+        lo, hi = _bounds(*view_window(spec, today))
+        now_seq, fx = _versions(conn)
+        how = "fresh"
+        journalled = 0 if seq is None else conn.execute("SELECT COUNT(*) FROM change_log WHERE seq > ?", (seq,)).fetchone()[0]
+        if (force or seq is None or journalled != now_seq - seq or journalled > REBUILD_AFTER
+                or not _overlaps(lo0, hi0, lo, hi)):
+            _rebuild(conn, view_id, spec, lo, hi)
+            how = "rebuilt"
+        else:
+            if (lo0, hi0) != (lo, hi):
+                _slide(conn, view_id, spec, lo0, hi0, lo, hi)
+                how = "incremental"
+            if journalled:
+                _apply_changes(conn, view_id, spec, lo, hi, seq)
+                how = "incremental"
+            if fx != fx0:
+                _retotal(conn, view_id)
+                how = "incremental"
+        if how != "fresh":
+            conn.execute('''
+                UPDATE saved_views SET window_start = ?, window_end = ?, seq = ?, fx_version = ?, refreshed_at = ? WHERE id = ?
+            ''', (lo, hi, now_seq, fx, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), view_id))
+        return how
+    return job
+
+def _is_current(conn, view_id, today):
+    row = conn.execute("SELECT spec, window_start, window_end, seq, fx_version FROM saved_views WHERE id = ?",
+                       (view_id,)).fetchone()
+    if row is None:
+        raise ValueError(f"No saved view {view_id}")
+    return (row[3], row[4]) == _versions(conn) and (row[1], row[2]) == _bounds(*view_window(json.loads(row[0]), today))
+
+def refresh_view(view_id, db_file=None, today=None, force=False):
+    """
+    Brings a view up to date; returns "fresh" (nothing to do), "incremental" or "rebuilt".
+    A current view is recognized on a read connection, so it costs the writer nothing.
+    """
+    if not force:
+        conn = db_utils.connect(db_file)
+        try:
+            if _is_current(conn, view_id, today):
+                return "fresh"
+        finally:
+            conn.close()
+    started = time.perf_counter()
+    how = db_utils.get_writer(db_file).submit(_refresh_job(view_id, today, force)).result()
+    logger.info(f"Saved view {view_id} {how} in {time.perf_counter() - started:.3f}s")
+    return how
+
+# --- VIEWS ---
+def save_view(name, spec, db_file=None, today=None):
+    """Saves (or replaces) a named view and computes its result. Returns its id."""
+    name = (name or "").strip()
+    if not name:
+        raise ValueError("A saved view needs a name")
+    spec = make_spec(spec["mode"], spec.get("type", "All"), spec.get("comment", "All"), spec.get("month"),
+                     spec.get("year"), spec.get("start"), spec.get("end"))
+
+    def job(conn):
+        conn.execute('''
+            INSERT INTO saved_views (name, spec) VALUES (?, ?)
+            ON CONFLICT (name) DO UPDATE SET spec = excluded.spec, seq = NULL
+        ''', (name, json.dumps(spec)))
+        return conn.execute("SELECT id FROM saved_views WHERE name = ?", (name,)).fetchone()[0]
+    view_id = db_utils.get_writer(db_file).submit(job).result()
+    refresh_view(view_id, db_file, today, force=True)
+    return view_id
+
+def delete_view(name, db_file=None):
+    def job(conn):
+        row = conn.execute("SELECT id FROM saved_views WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return False
+        # The view goes first, so the row triggers find nothing to keep totals for
+        conn.execute("DELETE FROM saved_views WHERE id = ?", row)
+        conn.execute("DELETE FROM saved_view_rows WHERE view_id = ?", row)
+        conn.execute("DELETE FROM saved_view_totals WHERE view_id = ?", row)
+        return True
+    return db_utils.get_writer(db_file).submit(job).result()
+
+def list_views(db_file=None):
+    """[(id, name, spec, row_count, refreshed_at)] by name."""
+    conn = db_utils.connect(db_file)
+    try:
+        rows = conn.execute("SELECT id, name, spec, row_count, refreshed_at FROM saved_views ORDER BY name").fetchall()
+    finally:
+        conn.close()
+    return [(view_id, name, json.loads(spec), count, refreshed) for view_id, name, spec, count, refreshed in rows]
+
+def open_view(name, db_file=None, today=None):
+    """
+    Refreshes a view and reads it back: (spec, TransactionBatch newest first, (agg, deposits,
+    expenditure)) with the totals shaped like aggregate_transactions' in BASE_CURRENCY.
+    Recurring occurrences in the window are merged in, as the History filter does.
+    """
+    conn = db_utils.connect(db_file)
+    try:
+        row = conn.execute("SELECT id FROM saved_views WHERE name = ?", (name,)).fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        raise ValueError(f"No saved view named {name!r}")
+    view_id = row[0]
+    refresh_view(view_id, db_file, today)
+
+    conn = db_utils.connect(db_file)
+    try:
+        spec, deposits, expenditure = conn.execute(
+            "SELECT spec, deposits, expenditure FROM saved_views WHERE id = ?", (view_id,)).fetchone()
+        spec = json.loads(spec)
+        batch = db_utils.TransactionBatch.from_cursor(conn.execute('''
+            SELECT transaction_datetime, type, comment, amount, row_id, currency FROM saved_view_rows
+            WHERE view_id = ? ORDER BY transaction_datetime DESC, row_id DESC
+        ''', (view_id,)))
+        agg = {(comment.title(), t_type): [count, total] for comment, t_type, count, total in conn.execute(
+            "SELECT comment, type, count, total FROM saved_view_totals WHERE view_id = ? AND count > 0", (view_id,))}
+        rules = db_utils.load_recurring(conn, spec["type"], spec["comment"])
+    finally:
+        conn.close()
+    if rules:
+        occurrences = list(db_utils.recurring_occurrences(rules, *db_utils.recurring_range(*view_window(spec, today))))
+        if occurrences:
+            batch = batch.merge(occurrences)
+            extra, extra_dep, extra_exp = db_utils.aggregate_transactions(occurrences)
+            for key, (count, total) in extra.items():
+                entry = agg.setdefault(key, [0, 0.0])
+                entry[0] += count
+                entry[1] += total
+            deposits += extra_dep
+            expenditure += extra_exp
+    return spec, batch, (agg, deposits, expenditure)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description="Finance Manager Pro saved History views")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p_save = sub.add_parser("save", help="Save (or replace) a view")
+    p_save.add_argument("db")
+    p_save.add_argument("name")
+    p_save.add_argument("--mode", choices=VIEW_MODES, default="all")
+    p_save.add_argument("--type", default="All", choices=("All",) + db_utils.TRANSACTION_TYPES)
+    p_save.add_argument("--comment", default="All", help="Comment contains")
+    p_save.add_argument("--month", help="YYYY-MM, for --mode month")
+    p_save.add_argument("--year", help="YYYY, for --mode year")
+    p_save.add_argument("--from", dest="start", help="First day (YYYY-MM-DD), for --mode range")
+    p_save.add_argument("--to", dest="end", help="Last day (YYYY-MM-DD), for --mode range")
+    p_list = sub.add_parser("list", help="List the views")
+    p_list.add_argument("db")
+    p_show = sub.add_parser("show", help="Refresh a view and print its newest rows and totals")
+    p_show.add_argument("db")
+    p_show.add_argument("name")
+    p_show.add_argument("--limit", type=int, default=20)
+    p_refresh = sub.add_parser("refresh", help="Bring every view up to date")
+    p_refresh.add_argument("db")
+    p_refresh.add_argument("--rebuild", action="store_true", help="Recompute from the ledger")
+    p_delete = sub.add_parser("delete", help="Delete a view")
+    p_delete.add_argument("db")
+    p_delete.add_argument("name")
+    args = parser.parse_args()
+
+    try:
+        db_utils.DB_FILE = os.path.abspath(args.db)
+        db_utils.initialize_database()
+        if args.command == "save":
+            spec = make_spec(args.mode, args.type, args.comment, args.month, args.year, args.start, args.end)
+            view_id = save_view(args.name, spec)
+            print(f"Saved view {view_id}: {describe_spec(spec)}")
+        elif args.command == "list":
+            for view_id, name, spec, count, refreshed in list_views():
+                print(f"{view_id:>4}  {name[:24]:<24} {count:>10,} rows  {describe_spec(spec)}  (refreshed {refreshed})")
+        elif args.command == "show":
+            started = time.perf_counter()
+            spec, batch, (agg, deposits, expenditure) = open_view(args.name)
+            seconds = time.perf_counter() - started
+            for dt, t_type, comment, amount, _, currency in list(batch)[:args.limit]:
+                print(f"{dt[:16]}  {t_type:<13} {comment[:30]:<30} {db_utils.format_money(amount, currency):>14}")
+            print(f"{len(batch):,} rows in {seconds * 1000:.1f} ms. Deposits {db_utils.format_money(deposits)}, "
+                  f"expense {db_utils.format_money(expenditure)}")
+        elif args.command == "refresh":
+            for view_id, name, _, _, _ in list_views():
+                print(f"{name}: {refresh_view(view_id, force=args.rebuild)}")
+        else:
+            print("Deleted" if delete_view(args.name) else "No such view")
+    except (ValueError, sqlite3.Error, OSError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    finally:
+        db_utils.close_writers()